@@ -6,7 +6,9 @@ from flask_httpauth import HTTPBasicAuth
 from flask_cors import CORS
 from celery import Celery
 from celery import Task
+from celery.signals import worker_process_init
 from config import Config
+import logging
 import os
 
 db = SQLAlchemy()
@@ -33,6 +35,11 @@ def create_app():
     register_all_routes(api)
     api.init_app(app)
 
+    # Periodically log metrics of in-process caches and writers, starting with the first request of each process
+    from app.utilities.logging.metrics_reporter import start_metrics_reporter
+
+    app.before_request(lambda: start_metrics_reporter(app=app))
+
     return app
 
 
@@ -42,6 +49,19 @@ def celery_init_app(app: Flask) -> Celery:
             with app.app_context():
                 return self.run(*args, **kwargs)
 
+    # Preload Pydantic models of output schemas in each worker process before it receives tasks
+    @worker_process_init.connect(weak=False)
+    def warm_up_worker_process(**kwargs):
+        from app.utilities.output_schema.schema_registry import (
+            warm_up_pydantic_schema_registry,
+        )
+
+        try:
+            with app.app_context():
+                warm_up_pydantic_schema_registry()
+        except Exception as e:
+            logging.warning(f"Failed to warm up Pydantic schema registry: {str(e)}")
+
     celery_app = Celery(app.name, task_cls=FlaskTask)
     celery_app.config_from_object(app.config["CELERY"])
     celery_app.set_default()
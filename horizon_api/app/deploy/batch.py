@@ -0,0 +1,89 @@
+"""Provides function to deploy many inputs, possibly across several tasks, with a bounded pool of worker threads."""
+
+from app.deploy.compiled_prompt_cache import CompiledPrompt
+from app.deploy.prompt import generate_output
+from app.models.component.prompt import Prompt
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+def generate_batch_outputs(
+    deployment_list: List[dict],
+    compiled_prompts: Dict[int, Tuple[Prompt, CompiledPrompt]],
+    task_errors: Dict[int, str],
+    openai_api_key: str = None,
+    anthropic_api_key: str = None,
+    log_deployment: bool = False,
+    max_workers: int = 8,
+) -> Iterator[Tuple[int, dict, Optional[dict]]]:
+    """Generates output for each deployment concurrently, yielding results as they complete.
+
+    Worker threads do not access the db; prompts must be compiled beforehand and deployment logs are returned to the caller to
+    be queued for the deployment log writer.
+
+    Args:
+        deployment_list (List[dict]): deployments, each with "task_id" and "inputs" keys.
+        compiled_prompts (Dict[int, Tuple[Prompt, CompiledPrompt]]): active prompt and its compiled version for each task id.
+        task_errors (Dict[int, str]): error message for each task id that cannot be deployed (e.g., task not found).
+        openai_api_key (str, optional): OpenAI API key to use for OpenAI models. Defaults to None.
+        anthropic_api_key (str, optional): Anthropic API key to use for Anthropic models. Defaults to None.
+        log_deployment (bool, optional): whether to return details of each successful deployment to log. Defaults to False.
+        max_workers (int, optional): max number of deployments run concurrently. Defaults to 8.
+
+    Yields:
+        Iterator[Tuple[int, dict, Optional[dict]]]: position of deployment in deployment_list, result with either "completion"
+            or "error" key, and details of deployment to log (None if not logged or failed).
+    """
+    # Report deployments of tasks that cannot be deployed without running them
+    runnable_positions = []
+    for i, deployment in enumerate(deployment_list):
+        if deployment["task_id"] in task_errors:
+            yield i, {
+                "index": i,
+                "task_id": deployment["task_id"],
+                "error": task_errors[deployment["task_id"]],
+            }, None
+        else:
+            runnable_positions.append(i)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        futures = {
+            executor.submit(
+                generate_output,
+                compiled_prompt=compiled_prompts[deployment_list[i]["task_id"]][1],
+                input_values=deployment_list[i]["inputs"],
+                openai_api_key=openai_api_key,
+                anthropic_api_key=anthropic_api_key,
+                include_deployment_log_values=log_deployment,
+            ): i
+            for i in runnable_positions
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            task_id = deployment_list[i]["task_id"]
+            try:
+                output, deployment_log_values = future.result()
+            except Exception as e:
+                yield i, {
+                    "index": i,
+                    "task_id": task_id,
+                    "error": f"Failed with exception: {str(e)}",
+                }, None
+                continue
+
+            # Add task and prompt ids to details of deployment to log
+            if deployment_log_values is not None:
+                deployment_log_values = dict(
+                    deployment_log_values,
+                    task_id=task_id,
+                    prompt_id=compiled_prompts[task_id][0].id,
+                )
+            yield i, {
+                "index": i,
+                "task_id": task_id,
+                "completion": output,
+            }, deployment_log_values
+    finally:
+        # Cancel remaining deployments if caller stops consuming results (e.g., client disconnects from stream)
+        executor.shutdown(wait=False, cancel_futures=True)
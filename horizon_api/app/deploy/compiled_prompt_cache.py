@@ -0,0 +1,224 @@
+"""Per-process cache of prompts compiled for deployment.
+
+Compiling a prompt for deployment parses its stored model and template JSON, reconstructs the prompt object (loading the vector
+db for few-shot prompts), and reconstructs the output parser (downloading and executing the Pydantic model from s3). Compiled
+prompts are keyed by prompt id and the prompt's updated_at timestamp, so any change to the prompt row produces a new key in
+every process. Changes that do not touch the prompt row (e.g., uploading or deleting an output schema for its task) must bump
+updated_at of the task's prompts with touch_prompts_for_task.
+
+LLM API keys are never cached; model objects are created per deployment from the cached model config.
+
+Typical usage example:
+
+    compiled_prompt = get_compiled_prompt_cache().get_or_compile(prompt=prompt, task=task)
+    prompt_string = compiled_prompt.prompt_object.format(**input_values)
+"""
+
+from app import db
+from app.models.component.post_processing.post_processing import PostProcessing
+from app.models.component.prompt import Prompt
+from app.models.component.task import Task
+from app.models.prompt.base import BasePromptTemplate
+from app.models.prompt.factory import PromptTemplateFactory
+from app.utilities.dataset_processing import dataset_profile
+from app.utilities.vector_db import vector_db
+from config import Config
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Tuple
+import json
+import threading
+
+
+class CompiledPrompt:
+    """Prompt object, output parser, and model config of a prompt, ready to deploy."""
+
+    def __init__(
+        self,
+        prompt_object: BasePromptTemplate,
+        model_name: str,
+        model_params: dict,
+        post_processing: Optional[PostProcessing] = None,
+    ):
+        """Initializes compiled prompt.
+
+        Args:
+            prompt_object (BasePromptTemplate): reconstructed prompt object.
+            model_name (str): name of llm.
+            model_params (dict): stored llm parameters, without llm API key.
+            post_processing (Optional[PostProcessing], optional): output parser for task's output schema, without llm for retries.
+                Defaults to None.
+        """
+        self.prompt_object = prompt_object
+        self.model_name = model_name
+        self.model_params = model_params
+        self.post_processing = post_processing
+
+
+def compile_prompt(prompt: Prompt, task: Task) -> CompiledPrompt:
+    """Reconstructs prompt object, output parser, and model config of prompt.
+
+    Args:
+        prompt (Prompt): prompt object from db.
+        task (Task): task associated with prompt.
+
+    Raises:
+        ValueError: no vector db or evaluation dataset present.
+
+    Returns:
+        CompiledPrompt: prompt ready to deploy.
+    """
+    # Get the template type and template_data from the prompt
+    template_type = prompt.template_type
+    template_data = json.loads(prompt.template_data)
+
+    # Create prompt instance based on if object is zero-shot or few-shot
+    if template_type == "prompt":
+        prompt_instance = PromptTemplateFactory.reconstruct_prompt_object(
+            template_type, **template_data
+        )
+    elif template_type == "fewshot":
+        # Try to fetch vector db
+        if task.vector_db_metadata:
+            evaluation_dataset_vector_db = vector_db.load_vector_db(
+                vector_db_metadata=json.loads(task.vector_db_metadata),
+                openai_api_key=Config.HORIZON_OPENAI_API_KEY,
+            )
+
+        # If vector db does not exist, set it up from raw evaluation dataset
+        elif task.evaluation_dataset:
+            # Get processed evaluation dataset from profile of raw dataset
+            evaluation_dataset_dataframe = dataset_profile.get_dataset_profile(
+                raw_dataset_s3_key=task.evaluation_dataset
+            ).get_evaluation_dataset()
+
+            # Initialize vector db
+            evaluation_dataset_vector_db = vector_db.initialize_vector_db_from_dataset(
+                task_id=task.id,
+                evaluation_dataset=evaluation_dataset_dataframe,
+                openai_api_key=Config.HORIZON_OPENAI_API_KEY,
+            )
+
+            # Store vector db metadata in task object and commit changes to db
+            task.store_vector_db_metadata(vector_db=evaluation_dataset_vector_db)
+
+        # Throw error if no raw or vector db version of evaluation dataset
+        else:
+            raise ValueError("No vector db or evaluation dataset present")
+
+        prompt_instance = PromptTemplateFactory.reconstruct_prompt_object(
+            template_type=template_type,
+            evaluation_dataset_vector_db=evaluation_dataset_vector_db,
+            template_data=template_data,
+        )
+
+    # Load output parser once, rather than on every deployment attempt
+    post_processing = None
+    if task.pydantic_model:
+        post_processing = PostProcessing(pydantic_model_s3_key=task.pydantic_model)
+
+    return CompiledPrompt(
+        prompt_object=prompt_instance,
+        model_name=prompt.model_name,
+        model_params=json.loads(prompt.model),
+        post_processing=post_processing,
+    )
+
+
+class CompiledPromptCache:
+    """Thread-safe LRU cache of compiled prompts keyed by prompt id and updated_at timestamp."""
+
+    def __init__(self, max_entries: int = 256):
+        """Initializes cache.
+
+        Args:
+            max_entries (int, optional): max number of compiled prompts kept in memory. Defaults to 256.
+        """
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[int, Tuple[Optional[datetime], CompiledPrompt]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compile(self, prompt: Prompt, task: Task) -> CompiledPrompt:
+        """Returns compiled prompt from cache, compiling and caching it if missing or stale.
+
+        Args:
+            prompt (Prompt): prompt object from db.
+            task (Task): task associated with prompt.
+
+        Returns:
+            CompiledPrompt: prompt ready to deploy.
+        """
+        with self._lock:
+            cached_entry = self._cache.get(prompt.id)
+            if cached_entry is not None and cached_entry[0] == prompt.updated_at:
+                self._cache.move_to_end(prompt.id)
+                self.hits += 1
+                return cached_entry[1]
+            self.misses += 1
+
+        # Compile outside of lock so that slow compilations do not block deployments of other prompts
+        compiled_prompt = compile_prompt(prompt=prompt, task=task)
+        with self._lock:
+            self._cache[prompt.id] = (prompt.updated_at, compiled_prompt)
+            self._cache.move_to_end(prompt.id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return compiled_prompt
+
+    def invalidate(self, prompt_id: int) -> None:
+        """Removes compiled prompt from cache of this process.
+
+        Args:
+            prompt_id (int): id of prompt.
+        """
+        with self._lock:
+            self._cache.pop(prompt_id, None)
+
+    def clear(self) -> None:
+        """Removes all compiled prompts from cache of this process."""
+        with self._lock:
+            self._cache.clear()
+
+
+def touch_prompts_for_task(task: Task) -> None:
+    """Bumps updated_at of all prompts of task so that compiled versions are recompiled by every process.
+
+    Changes are added to the current db session and must be committed by the caller.
+
+    Args:
+        task (Task): task whose prompts depend on changed data (e.g., output schema).
+    """
+    prompt_id_list = [
+        prompt_id
+        for (prompt_id,) in db.session.query(Prompt.id).filter(
+            Prompt.task_id == task.id
+        )
+    ]
+    Prompt.query.filter(Prompt.task_id == task.id).update(
+        {"updated_at": datetime.utcnow()}, synchronize_session="fetch"
+    )
+    for prompt_id in prompt_id_list:
+        get_compiled_prompt_cache().invalidate(prompt_id=prompt_id)
+
+
+_compiled_prompt_cache = None
+_compiled_prompt_cache_lock = threading.Lock()
+
+
+def get_compiled_prompt_cache() -> CompiledPromptCache:
+    """Returns compiled prompt cache shared within this process, configured from Config.
+
+    Returns:
+        CompiledPromptCache: shared compiled prompt cache.
+    """
+    global _compiled_prompt_cache
+    with _compiled_prompt_cache_lock:
+        if _compiled_prompt_cache is None:
+            _compiled_prompt_cache = CompiledPromptCache(
+                max_entries=Config.COMPILED_PROMPT_CACHE_MAX_ENTRIES
+            )
+        return _compiled_prompt_cache
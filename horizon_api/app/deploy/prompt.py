@@ -1,24 +1,23 @@
 """Provides function to deploy a Prompt object and return the generated output or completion."""
 
-from app import db
+from app.deploy.compiled_prompt_cache import CompiledPrompt, get_compiled_prompt_cache
 from app.models.component.post_processing.post_processing import PostProcessing
 from app.models.component.prompt import Prompt
 from app.models.component.task import Task
+from app.models.llm.base import BaseLLM
 from app.models.llm.factory import LLMFactory
 from app.models.llm.open_ai import ChatOpenAI
 from app.models.llm.anthropic import ChatAnthropic
-from app.models.prompt.factory import PromptTemplateFactory
+from app.models.prompt.base import BasePromptTemplate
 from app.models.prompt.chat import HumanMessage
-from app.utilities.dataset_processing import data_check
-from app.utilities.logging.task_logger import TaskLogger
-from app.utilities.S3.s3_util import download_file_from_s3_and_save_locally
-from app.utilities.vector_db import vector_db
-from config import Config
-from config import Config
-import json
+from app.utilities.logging.deployment_log_writer import get_deployment_log_writer
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain.schema import LLMResult
 from datetime import datetime
+from typing import Any, Iterator, Optional, Tuple
+import queue
+import threading
 import time
-import os
 
 
 def deploy_prompt(
@@ -50,11 +49,276 @@ def deploy_prompt(
     task_id = prompt.task_id
     task = Task.query.get(task_id)
 
-    # Get the model_name from the prompt
-    model_name = prompt.model_name
+    # Get compiled prompt object, output parser, and model config, compiling them if not cached for current prompt version
+    compiled_prompt = get_compiled_prompt_cache().get_or_compile(
+        prompt=prompt, task=task
+    )
 
-    # Get the model_params from the prompt
-    model_params = json.loads(prompt.model)
+    # Generate output
+    output, deployment_log_values = generate_output(
+        compiled_prompt=compiled_prompt,
+        input_values=input_values,
+        openai_api_key=openai_api_key,
+        anthropic_api_key=anthropic_api_key,
+        include_deployment_log_values=log_deployment,
+    )
+
+    # Queue deployment log if logging is enabled
+    if log_deployment:
+        get_deployment_log_writer().enqueue(
+            pending_deployment_log_values=dict(
+                deployment_log_values, task_id=prompt.task_id, prompt_id=prompt.id
+            )
+        )
+
+    return output
+
+
+def generate_output(
+    compiled_prompt: CompiledPrompt,
+    input_values: dict,
+    openai_api_key: str = None,
+    anthropic_api_key: str = None,
+    include_deployment_log_values: bool = False,
+) -> Tuple[str, Optional[dict]]:
+    """Generates output of compiled prompt for given input values. Does not access the db, so it can run in worker threads.
+
+    Args:
+        compiled_prompt (CompiledPrompt): prompt object, output parser, and model config of prompt.
+        input_values (dict): dict of key-value pairs representing the input variables for prompt.
+        openai_api_key (str): OpenAI API key to use if selected model is from OpenAI. Defaults to None.
+        anthropic_api_key (str, optional): Anthropic API key to use if selected model is from Anthropic. Defaults to None.
+        include_deployment_log_values (bool, optional): whether to compute data lengths and costs of deployment to log.
+            Defaults to False.
+
+    Raises:
+        ValueError: if selected model is from OpenAI, then need to provide OpenAI API key.
+        ValueError: if selected model is from Anthropic, then need to provide Anthropic API key.
+        Exception: could not generate output that matches output schema.
+
+    Returns:
+        Tuple[str, Optional[dict]]: output of prompt and details of deployment to log (excluding task and prompt ids), or None
+            if not requested.
+    """
+    # Create the model instance and post-processing, and format prompt
+    model_instance, post_processing = create_model_instance(
+        compiled_prompt=compiled_prompt,
+        openai_api_key=openai_api_key,
+        anthropic_api_key=anthropic_api_key,
+    )
+    (
+        original_formatted_prompt,
+        formatted_prompt_for_llm,
+        prompt_for_data_analysis,
+    ) = format_prompt(
+        prompt_object=compiled_prompt.prompt_object,
+        model_instance=model_instance,
+        input_values=input_values,
+    )
+
+    # Generate output with up to 3 tries
+    max_tries = 3
+    inference_start_time = time.time()
+    for i in range(max_tries):
+        try:
+            llm_result = model_instance.generate([formatted_prompt_for_llm])
+            output = llm_result.generations[0][0].text.strip()
+
+            # Conduct post-processing of output, if applicable
+            if post_processing:
+                output = post_processing.parse_and_retry_if_needed(
+                    original_output=output, prompt_string=original_formatted_prompt
+                )
+
+            break
+
+        except Exception as e:
+            if i == max_tries - 1:
+                raise Exception(str(e))
+            else:
+                continue
+
+    inference_end_time = time.time()
+    if not include_deployment_log_values:
+        return output, None
+
+    return output, get_pending_deployment_log_values(
+        model_instance=model_instance,
+        model_name=compiled_prompt.model_name,
+        input_values=input_values,
+        output=output,
+        inference_latency=inference_end_time - inference_start_time,
+        prompt_for_data_analysis=prompt_for_data_analysis,
+        llm_result=llm_result,
+    )
+
+
+def deploy_prompt_stream(
+    prompt: Prompt,
+    input_values: dict,
+    openai_api_key: str = None,
+    anthropic_api_key: str = None,
+    log_deployment: bool = False,
+) -> Iterator[dict]:
+    """Deploy a prompt with the given input_values, yielding tokens of the completion as the llm generates them.
+
+    Yields a "token" event for each token, then either a "completion" event with the full output (validated against the
+    output schema, if any) or an "error" event. The deployment is logged once the stream finishes, as with deploy_prompt.
+
+    Args:
+        prompt (Prompt): prompt object from db.
+        input_values (dict): dict of key-value pairs representing the input variables for prompt.
+        openai_api_key (str): OpenAI API key to use if selected model is from OpenAI. Defaults to None.
+        anthropic_api_key (str, optional): Anthropic API key to use if selected model is from Anthropic. Defaults to None.
+        log_deployment (bool, optional): whether to log the deployment. Defaults to False.
+
+    Yields:
+        Iterator[dict]: events with "event" key of "token", "completion", or "error".
+    """
+    try:
+        # Get task and compiled prompt
+        task = Task.query.get(prompt.task_id)
+        compiled_prompt = get_compiled_prompt_cache().get_or_compile(
+            prompt=prompt, task=task
+        )
+
+        # Create the model instance with streaming enabled, and format prompt
+        model_instance, post_processing = create_model_instance(
+            compiled_prompt=compiled_prompt,
+            openai_api_key=openai_api_key,
+            anthropic_api_key=anthropic_api_key,
+        )
+        model_instance.streaming = True
+        (
+            original_formatted_prompt,
+            formatted_prompt_for_llm,
+            prompt_for_data_analysis,
+        ) = format_prompt(
+            prompt_object=compiled_prompt.prompt_object,
+            model_instance=model_instance,
+            input_values=input_values,
+        )
+    except Exception as e:
+        yield {"event": "error", "error": f"Failed with exception: {str(e)}"}
+        return
+
+    # Run llm in background thread and relay tokens as they arrive
+    token_queue = queue.Queue()
+    token_handler = TokenQueueCallbackHandler(token_queue=token_queue)
+    inference_start_time = time.time()
+    generation_thread = threading.Thread(
+        target=generate_with_token_queue,
+        kwargs={
+            "model_instance": model_instance,
+            "formatted_prompt_for_llm": formatted_prompt_for_llm,
+            "token_handler": token_handler,
+        },
+        daemon=True,
+    )
+    generation_thread.start()
+    while True:
+        item = token_queue.get()
+        if isinstance(item, TokenStreamEnd):
+            break
+        yield {"event": "token", "token": item}
+    inference_end_time = time.time()
+    if item.error is not None:
+        yield {"event": "error", "error": f"Failed with exception: {str(item.error)}"}
+        return
+
+    # Validate full output against output schema, if applicable
+    output = item.output.strip()
+    if post_processing:
+        try:
+            output = post_processing.parse_and_retry_if_needed(
+                original_output=output, prompt_string=original_formatted_prompt
+            )
+        except Exception as e:
+            yield {"event": "error", "error": str(e)}
+            return
+    yield {"event": "completion", "completion": output}
+
+    # Queue deployment log if logging is enabled
+    if log_deployment:
+        get_deployment_log_writer().enqueue(
+            pending_deployment_log_values=dict(
+                get_pending_deployment_log_values(
+                    model_instance=model_instance,
+                    model_name=compiled_prompt.model_name,
+                    input_values=input_values,
+                    output=output,
+                    inference_latency=inference_end_time - inference_start_time,
+                    prompt_for_data_analysis=prompt_for_data_analysis,
+                    llm_result=item.llm_result,
+                ),
+                task_id=prompt.task_id,
+                prompt_id=prompt.id,
+            )
+        )
+
+
+class TokenStreamEnd:
+    """Marks end of token stream, holding generation result or error raised by llm."""
+
+    def __init__(self, llm_result: LLMResult = None, error: Exception = None):
+        self.llm_result = llm_result
+        self.output = llm_result.generations[0][0].text if llm_result else ""
+        self.error = error
+
+
+class TokenQueueCallbackHandler(BaseCallbackHandler):
+    """Callback handler that puts each new token generated by llm in a queue."""
+
+    def __init__(self, token_queue: queue.Queue):
+        self.token_queue = token_queue
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self.token_queue.put(token)
+
+
+def generate_with_token_queue(
+    model_instance: BaseLLM,
+    formatted_prompt_for_llm: Any,
+    token_handler: TokenQueueCallbackHandler,
+) -> None:
+    """Runs streaming llm generation, putting each token and then a TokenStreamEnd marker in the handler's queue.
+
+    Args:
+        model_instance (BaseLLM): llm with streaming enabled.
+        formatted_prompt_for_llm (Any): prompt string or messages to pass to llm.
+        token_handler (TokenQueueCallbackHandler): callback handler holding queue of tokens.
+    """
+    try:
+        llm_result = model_instance.generate(
+            [formatted_prompt_for_llm], callbacks=[token_handler]
+        )
+        token_handler.token_queue.put(TokenStreamEnd(llm_result=llm_result))
+    except Exception as e:
+        token_handler.token_queue.put(TokenStreamEnd(error=e))
+
+
+def create_model_instance(
+    compiled_prompt: CompiledPrompt,
+    openai_api_key: str = None,
+    anthropic_api_key: str = None,
+) -> Tuple[BaseLLM, Optional[PostProcessing]]:
+    """Creates llm of compiled prompt with provided llm API key, and post-processing that retries with it, if applicable.
+
+    Args:
+        compiled_prompt (CompiledPrompt): prompt object, output parser, and model config of prompt.
+        openai_api_key (str): OpenAI API key to use if selected model is from OpenAI. Defaults to None.
+        anthropic_api_key (str, optional): Anthropic API key to use if selected model is from Anthropic. Defaults to None.
+
+    Raises:
+        ValueError: if selected model is from OpenAI, then need to provide OpenAI API key.
+        ValueError: if selected model is from Anthropic, then need to provide Anthropic API key.
+
+    Returns:
+        Tuple[BaseLLM, Optional[PostProcessing]]: llm and post-processing details.
+    """
+    # Get the model_name and a copy of model_params from the compiled prompt
+    model_name = compiled_prompt.model_name
+    model_params = dict(compiled_prompt.model_params)
 
     # Add llm api key
     if LLMFactory.llm_classes[model_name]["provider"] == "OpenAI":
@@ -71,64 +335,38 @@ def deploy_prompt(
     # Create the model instance
     model_instance = LLMFactory.create_llm(model_name, **model_params)
 
-    # Get the template type from the prompt
-    template_type = prompt.template_type
-
-    # Get the template_data from the prompt
-    template_data = json.loads(prompt.template_data)
-
-    # Create prompt instance based on if object is zero-shot or few-shot
-    if template_type == "prompt":
-        prompt_instance = PromptTemplateFactory.reconstruct_prompt_object(
-            template_type, **template_data
-        )
-    elif template_type == "fewshot":
-        # Try to fetch vector db
-        if task.vector_db_metadata:
-            evaluation_dataset_vector_db = vector_db.load_vector_db(
-                vector_db_metadata=json.loads(task.vector_db_metadata),
-                openai_api_key=Config.HORIZON_OPENAI_API_KEY,
+    # Set up post-processing with this model instance for retries, if applicable
+    post_processing = None
+    if compiled_prompt.post_processing:
+        post_processing = (
+            compiled_prompt.post_processing.copy_with_llm_for_retry_output_parser(
+                llm=model_instance
             )
+        )
 
-        # If vector db does not exist, set it up from raw evaluation dataset
-        elif task.evaluation_dataset:
-            # Get raw dataset
-            raw_dataset_file_path = download_file_from_s3_and_save_locally(
-                task.evaluation_dataset
-            )
-            evaluation_dataset_dataframe = data_check.get_evaluation_dataset(
-                dataset_file_path=raw_dataset_file_path,
-                escape_curly_braces=True,
-            )
-            os.remove(raw_dataset_file_path)
-
-            # Initialize vector db
-            evaluation_dataset_vector_db = vector_db.initialize_vector_db_from_dataset(
-                task_id=task.id,
-                evaluation_dataset=evaluation_dataset_dataframe,
-                openai_api_key=Config.HORIZON_OPENAI_API_KEY,
-            )
+    return model_instance, post_processing
 
-            # Store vector db metadata in task object and commit changes to db
-            task.store_vector_db_metadata(vector_db=evaluation_dataset_vector_db)
 
-        # Throw error if no raw or vector db version of evaluation dataset
-        else:
-            raise ValueError("No vector db or evaluation dataset present")
+def format_prompt(
+    prompt_object: BasePromptTemplate, model_instance: BaseLLM, input_values: dict
+) -> Tuple[str, Any, list]:
+    """Formats prompt with input values for given llm.
 
-        prompt_instance = PromptTemplateFactory.reconstruct_prompt_object(
-            template_type=template_type,
-            evaluation_dataset_vector_db=evaluation_dataset_vector_db,
-            template_data=template_data,
-        )
+    Args:
+        prompt_object (BasePromptTemplate): prompt object.
+        model_instance (BaseLLM): llm to format prompt for.
+        input_values (dict): dict of key-value pairs representing the input variables for prompt.
 
+    Returns:
+        Tuple[str, Any, list]: formatted prompt string, prompt to pass to llm, and prompt messages for data length analysis.
+    """
     # Prepend "var_" to input variable names as done in Task generation (to prevent collisions with internal variable names)
     processed_input_values = {}
     for variable, value in input_values.items():
         processed_input_values["var_" + variable] = value
 
     # Format prompt by substituting input values
-    original_formatted_prompt = prompt_instance.format(**processed_input_values)
+    original_formatted_prompt = prompt_object.format(**processed_input_values)
 
     # If model is ChatOpenAI or ChatAnthropic, wrap message with HumanMessage object
     if type(model_instance) == ChatOpenAI or type(model_instance) == ChatAnthropic:
@@ -138,63 +376,66 @@ def deploy_prompt(
         formatted_prompt_for_llm = original_formatted_prompt
         prompt_for_data_analysis = [formatted_prompt_for_llm]
 
-    # Generate output with up to 3 tries
-    max_tries = 3
-    inference_start_time = time.time()
-    for i in range(max_tries):
-        try:
-            llm_result = model_instance.generate([formatted_prompt_for_llm])
-            output = llm_result.generations[0][0].text.strip()
+    return original_formatted_prompt, formatted_prompt_for_llm, prompt_for_data_analysis
 
-            # Conduct post-processing of output, if applicable
-            if task.pydantic_model:
-                post_processing = PostProcessing(
-                    pydantic_model_s3_key=task.pydantic_model, llm=model_instance
-                )
-                output = post_processing.parse_and_retry_if_needed(
-                    original_output=output, prompt_string=original_formatted_prompt
-                )
 
-            break
+def get_pending_deployment_log_values(
+    model_instance: BaseLLM,
+    model_name: str,
+    input_values: dict,
+    output: str,
+    inference_latency: float,
+    prompt_for_data_analysis: list,
+    llm_result: LLMResult,
+) -> dict:
+    """Returns details of deployment to log (excluding task and prompt ids), without counting tokens on the request path.
 
-        except Exception as e:
-            if i == max_tries - 1:
-                raise Exception(str(e))
-            else:
-                continue
+    Token counts reported by the llm provider are used as is. Otherwise, the prompt and completion strings are kept so that the
+    deployment log writer can count tokens and compute costs in the background.
 
-    inference_end_time = time.time()
+    Args:
+        model_instance (BaseLLM): llm used for deployment.
+        model_name (str): name of llm.
+        input_values (dict): dict of key-value pairs representing the input variables for prompt.
+        output (str): output of prompt.
+        inference_latency (float): seconds taken to generate output.
+        prompt_for_data_analysis (list): prompt messages passed into llm.
+        llm_result (LLMResult): generation result from the llm.
 
-    # Log deployment if logging is enabled
-    if log_deployment:
-        prompt_data_length = model_instance.get_prompt_data_length(
-            prompt_messages=prompt_for_data_analysis, llm_result=llm_result
-        )
-        completion_data_length = model_instance.get_completion_data_length(
-            llm_result=llm_result
-        )
-        prompt_cost = LLMFactory.get_prompt_cost(
-            model_name=model_name, prompt_data_length=prompt_data_length
-        )
-        completion_cost = LLMFactory.get_completion_cost(
-            model_name=model_name, completion_data_length=completion_data_length
-        )
+    Returns:
+        dict: log values accepted by deployment log writer.
+    """
+    pending_deployment_log_values = {
+        "timestamp": datetime.utcnow(),
+        "model_name": model_name,
+        "input_values": input_values,
+        "llm_completion": output,
+        "inference_latency": inference_latency,
+        "prompt_data_length": None,
+        "completion_data_length": None,
+    }
 
-        logger = TaskLogger()
-        logger.log_deployment(
-            task_id=prompt.task_id,
-            prompt_id=prompt.id,
-            timestamp=datetime.utcnow(),
-            model_name=model_name,
-            input_values=input_values,
-            llm_completion=output,
-            inference_latency=inference_end_time - inference_start_time,
-            data_unit=LLMFactory.get_data_unit(model_name=model_name),
-            prompt_data_length=prompt_data_length,
-            completion_data_length=completion_data_length,
-            prompt_cost=prompt_cost,
-            completion_cost=completion_cost,
-            total_inference_cost=prompt_cost + completion_cost,
-        )
+    # Use token usage reported by llm provider, if any (not reported by Anthropic or for streamed completions)
+    token_usage = (llm_result.llm_output or {}).get("token_usage") or {}
+    if "prompt_tokens" in token_usage and "completion_tokens" in token_usage:
+        pending_deployment_log_values["prompt_data_length"] = token_usage[
+            "prompt_tokens"
+        ]
+        pending_deployment_log_values["completion_data_length"] = token_usage[
+            "completion_tokens"
+        ]
+        return pending_deployment_log_values
 
-    return output
+    # Otherwise keep prompt and completion strings to count tokens later, formatted as sent to llm
+    if type(model_instance) == ChatAnthropic:
+        pending_deployment_log_values[
+            "prompt_string"
+        ] = model_instance._convert_messages_to_prompt(prompt_for_data_analysis)
+    else:
+        pending_deployment_log_values["prompt_string"] = "\n".join(
+            getattr(message, "content", message) for message in prompt_for_data_analysis
+        )
+    pending_deployment_log_values["completion_string"] = llm_result.generations[0][
+        0
+    ].text
+    return pending_deployment_log_values
@@ -1 +1,2 @@
 from .inference_evaluation_results import InferenceEvaluationResults
+from .inference_evaluation_results_log import InferenceEvaluationResultsLog
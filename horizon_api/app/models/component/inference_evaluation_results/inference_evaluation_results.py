@@ -3,9 +3,8 @@
 Class stores ids corresponding to prompt-model candidates and evaluation data to avoid duplicating their values, so these
 must be fetched from separate data structures when needed.
 
-This class does not optimize for latency associated with DataFrames. This was implemented this way because the primary 
-bottleneck is LLM inference, this approach was faster to implement, and it has additional DataFrame functionality that 
-may be useful (e.g., as compared to storing values in lists or dicts). This may be optimized later.
+Each instance holds the results of a single inference and evaluation run, which are filled column by column. Results are
+aggregated across runs with InferenceEvaluationResultsLog rather than by concatenating DataFrames.
 
 Typical usage example:
 
@@ -17,7 +16,6 @@ Typical usage example:
 import pandas as pd
 import numpy as np
 from typing import List
-from itertools import product
 
 
 class InferenceEvaluationResults(pd.DataFrame):
@@ -47,35 +45,32 @@ class InferenceEvaluationResults(pd.DataFrame):
             raise ValueError(
                 "Cannot have only one of prompt_model_id_list or evaluation_data_id_list be empty."
             )
-        # If prompt_model_id_list and evaluation_data_id_list are both non-empty, then prepare each permutation of them
-        if len(prompt_model_id_list) != 0 and len(evaluation_data_id_list) != 0:
-            # Prepare permutations of prompt-model candidates and evaluation data to be computed
-            evaluation_permutations = list(
-                product(prompt_model_id_list, evaluation_data_id_list)
-            )
-            unzipped_values = list(zip(*evaluation_permutations))
-            prompt_model_id_list = list(unzipped_values[0])
-            evaluation_data_id_list = list(unzipped_values[1])
+        # Prepare each permutation of prompt-model candidates and evaluation data to be computed
+        num_rows = len(prompt_model_id_list) * len(evaluation_data_id_list)
+        prompt_model_id_array = np.repeat(
+            np.asarray(prompt_model_id_list, dtype=np.int64),
+            len(evaluation_data_id_list),
+        )
+        evaluation_data_id_array = np.tile(
+            np.asarray(evaluation_data_id_list, dtype=np.int64),
+            len(prompt_model_id_list),
+        )
 
         # Initialize remaining columns in DataFrame
         # Initialize output, inference quality, inference cost, and inference latency with NaN placeholder values
-        stage_id = [stage_id] * len(prompt_model_id_list)
-        output_list = [np.nan] * len(prompt_model_id_list)
-        inference_quality_list = [np.nan] * len(prompt_model_id_list)
-        inference_cost_list = [np.nan] * len(prompt_model_id_list)
-        inference_latency_list = [np.nan] * len(prompt_model_id_list)
-        evaluation_latency_list = [np.nan] * len(prompt_model_id_list)
+        stage_id_array = np.full(num_rows, stage_id, dtype=object)
+        output_array = np.full(num_rows, np.nan, dtype=object)
 
         # Initialize preallocated DataFrame for inference and evaluation computation
         super().__init__(
             {
-                "prompt_model_id": prompt_model_id_list,
-                "evaluation_data_id": evaluation_data_id_list,
-                "stage_id": stage_id,
-                "output": output_list,
-                "inference_quality": inference_quality_list,
-                "inference_cost": inference_cost_list,
-                "inference_latency": inference_latency_list,
-                "evaluation_latency": evaluation_latency_list,
+                "prompt_model_id": prompt_model_id_array,
+                "evaluation_data_id": evaluation_data_id_array,
+                "stage_id": stage_id_array,
+                "output": output_array,
+                "inference_quality": np.full(num_rows, np.nan),
+                "inference_cost": np.full(num_rows, np.nan),
+                "inference_latency": np.full(num_rows, np.nan),
+                "evaluation_latency": np.full(num_rows, np.nan),
             }
         )
@@ -0,0 +1,149 @@
+"""Append-only columnar log to aggregate inference and evaluation results across iterations and stages of Task creation.
+
+Repeatedly concatenating DataFrames copies every previously aggregated row on each iteration, which is quadratic in the number
+of inferences. This log instead stores each column in a preallocated NumPy array that doubles in capacity when full, so
+appending a block of results only copies the new rows. A DataFrame is built from the filled portion of the arrays when it is
+needed for shortlisting or reporting.
+
+Typical usage example:
+
+    aggregated_inference_evaluation_results = InferenceEvaluationResultsLog()
+    aggregated_inference_evaluation_results.append(inference_evaluation_results)
+    shortlist.shortlist_prompt_model_candidates(
+        inference_evaluation_results=aggregated_inference_evaluation_results.to_dataframe(), ...
+    )
+"""
+
+import pandas as pd
+import numpy as np
+
+# Column names and dtypes of InferenceEvaluationResults
+COLUMN_DTYPES = {
+    "prompt_model_id": np.int64,
+    "evaluation_data_id": np.int64,
+    "stage_id": object,
+    "output": object,
+    "inference_quality": np.float64,
+    "inference_cost": np.float64,
+    "inference_latency": np.float64,
+    "evaluation_latency": np.float64,
+}
+
+
+class InferenceEvaluationResultsLog:
+    """Append-only columnar store of inference and evaluation results for prompt-model candidates."""
+
+    def __init__(self, initial_capacity: int = 256) -> None:
+        """Preallocates array for each column of inference and evaluation results.
+
+        Args:
+            initial_capacity (int, optional): number of rows to preallocate. Defaults to 256.
+        """
+        self.num_rows = 0
+        self.columns = {
+            column: np.empty(max(1, initial_capacity), dtype=dtype)
+            for column, dtype in COLUMN_DTYPES.items()
+        }
+
+        # Metadata reported by filtering strategies (e.g., number of inferences saved)
+        self.attrs = {}
+
+    def __len__(self) -> int:
+        """Returns number of rows in log."""
+        return self.num_rows
+
+    def get_capacity(self) -> int:
+        """Returns number of rows that fit in log before arrays are reallocated."""
+        return len(self.columns["prompt_model_id"])
+
+    def reserve(self, num_rows: int) -> None:
+        """Grows arrays, doubling capacity as needed, so that at least num_rows rows fit.
+
+        Args:
+            num_rows (int): total number of rows to fit.
+        """
+        capacity = self.get_capacity()
+        if num_rows <= capacity:
+            return
+        while capacity < num_rows:
+            capacity *= 2
+        for column, array in self.columns.items():
+            resized_array = np.empty(capacity, dtype=array.dtype)
+            resized_array[: self.num_rows] = array[: self.num_rows]
+            self.columns[column] = resized_array
+
+    def append(self, inference_evaluation_results: pd.DataFrame) -> None:
+        """Appends block of inference and evaluation results to end of log.
+
+        Args:
+            inference_evaluation_results (pd.DataFrame): inference and evaluation results with the columns of
+                InferenceEvaluationResults.
+
+        Raises:
+            ValueError: checks that inference and evaluation results have all required columns.
+        """
+        missing_columns = set(COLUMN_DTYPES.keys()) - set(
+            inference_evaluation_results.columns
+        )
+        if len(missing_columns) > 0:
+            raise ValueError(
+                f"Inference and evaluation results are missing columns: {sorted(missing_columns)}"
+            )
+
+        # Copy each column of block into the next free rows of the preallocated arrays
+        num_new_rows = len(inference_evaluation_results)
+        self.reserve(num_rows=self.num_rows + num_new_rows)
+        for column, array in self.columns.items():
+            array[
+                self.num_rows : self.num_rows + num_new_rows
+            ] = inference_evaluation_results[column].to_numpy(dtype=array.dtype)
+        self.num_rows += num_new_rows
+
+    def extend(
+        self, inference_evaluation_results_log: "InferenceEvaluationResultsLog"
+    ) -> None:
+        """Appends all rows of another log to end of this log.
+
+        Args:
+            inference_evaluation_results_log (InferenceEvaluationResultsLog): log to append.
+        """
+        num_new_rows = len(inference_evaluation_results_log)
+        self.reserve(num_rows=self.num_rows + num_new_rows)
+        for column, array in self.columns.items():
+            array[
+                self.num_rows : self.num_rows + num_new_rows
+            ] = inference_evaluation_results_log.columns[column][:num_new_rows]
+        self.num_rows += num_new_rows
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Returns inference and evaluation results logged so far, with the columns of InferenceEvaluationResults.
+
+        Columns share memory with the log where possible, so the returned DataFrame should be copied before being modified.
+
+        Returns:
+            pd.DataFrame: inference and evaluation results.
+        """
+        inference_evaluation_results = pd.DataFrame(
+            {column: array[: self.num_rows] for column, array in self.columns.items()},
+            copy=False,
+        )
+        inference_evaluation_results.attrs.update(self.attrs)
+        return inference_evaluation_results
+
+    @classmethod
+    def from_dataframe(
+        cls, inference_evaluation_results: pd.DataFrame
+    ) -> "InferenceEvaluationResultsLog":
+        """Creates log holding provided inference and evaluation results.
+
+        Args:
+            inference_evaluation_results (pd.DataFrame): inference and evaluation results.
+
+        Returns:
+            InferenceEvaluationResultsLog: log with provided results.
+        """
+        inference_evaluation_results_log = cls(
+            initial_capacity=len(inference_evaluation_results)
+        )
+        inference_evaluation_results_log.append(inference_evaluation_results)
+        return inference_evaluation_results_log
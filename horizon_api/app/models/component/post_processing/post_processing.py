@@ -1,9 +1,8 @@
 """Data structure to track post-processing operations."""
 
 from app.models.llm.base import BaseLLM
-from app.models.parser.pydantic_output_parser import PydanticOutputParser
 from app.models.parser.retry_output_parser import RetryOutputParser
-from app.utilities.output_schema import output_schema
+from app.utilities.output_schema.schema_registry import get_pydantic_schema_registry
 from langchain.prompts.prompt import PromptTemplate
 import copy
 
@@ -22,15 +21,13 @@ class PostProcessing:
             pydantic_model_s3_key (str): s3 key for pydantic model of output schema.
             llm (BaseLLM, optional): LLM object to use when retrying with output errors. Defaults to None.
         """
-        self.pydantic_object = output_schema.get_pydantic_object_from_s3(
+        # Get Pydantic object, output parser, and format instructions from registry of loaded output schemas
+        loaded_schema = get_pydantic_schema_registry().get(
             pydantic_model_s3_key=pydantic_model_s3_key
         )
-        self.pydantic_output_parser = PydanticOutputParser(
-            pydantic_object=self.pydantic_object
-        )
-        self.output_format_instructions = (
-            self.pydantic_output_parser.get_format_instructions()
-        )
+        self.pydantic_object = loaded_schema.pydantic_object
+        self.pydantic_output_parser = loaded_schema.pydantic_output_parser
+        self.output_format_instructions = loaded_schema.output_format_instructions
 
         # Initialize RetryOutputParser if llm object provided
         self.retry_output_parser = None
@@ -52,6 +49,21 @@ class PostProcessing:
             llm=llm_copy, parser=self.pydantic_output_parser
         )
 
+    def copy_with_llm_for_retry_output_parser(self, llm: BaseLLM) -> "PostProcessing":
+        """Returns copy of post-processing object that retries with provided llm, leaving this object unchanged.
+
+        Pydantic object and output parser are shared with the copy since they are not modified after initialization.
+
+        Args:
+            llm (BaseLLM): LLM object to use when retrying with output errors.
+
+        Returns:
+            PostProcessing: copy of post-processing object with its own RetryOutputParser.
+        """
+        post_processing_copy = copy.copy(self)
+        post_processing_copy.set_llm_for_retry_output_parser(llm=llm)
+        return post_processing_copy
+
     def parse_and_retry_if_needed(
         self, original_output: str, prompt_string: str
     ) -> str:
@@ -4,6 +4,7 @@ from app.utilities.dataset_processing import input_variable_naming
 from app.models.component.task_deployment_log.task_deployment_log import (
     TaskDeploymentLog,
 )
+from datetime import datetime
 from typing import TYPE_CHECKING
 import json
 
@@ -32,6 +33,9 @@ class Prompt(db.Model):
     evaluation_job_name = db.Column(db.String(100), nullable=True)
     model_name = db.Column(db.String(100), nullable=True)
     inference_statistics = db.Column(db.String(1000), nullable=True)
+    updated_at = db.Column(
+        db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
     deployment_logs = db.relationship(
         "TaskDeploymentLog",
         backref="prompt",
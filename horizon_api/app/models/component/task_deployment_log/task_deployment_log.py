@@ -22,6 +22,13 @@ class TaskDeploymentLog(db.Model):
     completion_cost = db.Column(db.Float, nullable=False)
     total_inference_cost = db.Column(db.Float, nullable=False)
 
+    # Index to page through logs of a task in time order (with id to break ties between logs with the same timestamp)
+    __table_args__ = (
+        db.Index(
+            "ix_task_deployment_log_task_id_timestamp_id", "task_id", "timestamp", "id"
+        ),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
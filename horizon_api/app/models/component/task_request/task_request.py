@@ -6,14 +6,10 @@ Class organizes information around Task request, including objective, input vari
 from app.models.llm.factory import LLMFactory
 from app.models.schema import HumanMessage
 from app.utilities.dataset_processing import input_variable_naming
-from app.utilities.dataset_processing import data_check
-from app.utilities.dataset_processing import data_length
-from app.utilities.dataset_processing import llm_applicability
-from app.utilities.dataset_processing import segment_data
-from app.utilities.S3.s3_util import download_file_from_s3_and_save_locally
+from app.utilities.dataset_processing import dataset_profile
 from app.utilities.vector_db import vector_db
 from typing import List
-import os
+import pandas as pd
 
 
 class TaskRequest:
@@ -53,8 +49,8 @@ class TaskRequest:
             ValueError: checks if vector db or raw dataset and task id passed if proceeding with vector db.
         """
         self.user_objective = user_objective
+        self.dataset_profile = None
         self.input_variables = None
-        self.evaluation_dataset_dataframe = None
         self.evaluation_dataset_vector_db = None
         self.num_train_data = None
         self.num_test_data = num_test_data_input
@@ -75,41 +71,26 @@ class TaskRequest:
         if not raw_dataset_s3_key:
             raise ValueError("Must pass raw dataset")
 
-        # Get raw dataset
-        raw_dataset_file_path = download_file_from_s3_and_save_locally(
-            raw_dataset_s3_key
-        )
-        self.evaluation_dataset_dataframe = data_check.get_evaluation_dataset(
-            dataset_file_path=raw_dataset_file_path,
-            escape_curly_braces=True,
+        # Load profile of raw dataset (processed dataset, data lengths, applicable llms, and train and test data segmentation),
+        # which is only computed the first time this version of the dataset is used
+        self.dataset_profile = dataset_profile.get_dataset_profile(
+            raw_dataset_s3_key=raw_dataset_s3_key,
             input_variables_to_chunk=input_variables_to_chunk,
         )
-        os.remove(raw_dataset_file_path)
 
         # Set input variables
-        self.input_variables = input_variable_naming.get_input_variables(
-            dataset_fields=self.evaluation_dataset_dataframe.columns.to_list()
-        )
+        self.input_variables = self.dataset_profile.input_variables
 
         # Set evaluation data length
-        evaluation_data_length = data_length.get_evaluation_data_length(
-            evaluation_dataset=self.evaluation_dataset_dataframe,
-            unescape_curly_braces=True,
+        self.max_input_tokens = self.dataset_profile.max_input_tokens
+        self.max_ground_truth_tokens = self.dataset_profile.max_ground_truth_tokens
+        self.max_input_characters = self.dataset_profile.max_input_characters
+        self.max_ground_truth_characters = (
+            self.dataset_profile.max_ground_truth_characters
         )
-        self.max_input_tokens = evaluation_data_length["max_input_tokens"]
-        self.max_ground_truth_tokens = evaluation_data_length["max_ground_truth_tokens"]
-        self.max_input_characters = evaluation_data_length["max_input_characters"]
-        self.max_ground_truth_characters = evaluation_data_length[
-            "max_ground_truth_characters"
-        ]
 
         # Set applicable llms
-        self.applicable_llms = llm_applicability.get_applicable_llms(
-            max_input_tokens=self.max_input_tokens,
-            max_ground_truth_tokens=self.max_ground_truth_tokens,
-            max_input_characters=self.max_input_characters,
-            max_ground_truth_characters=self.max_ground_truth_characters,
-        )
+        self.applicable_llms = self.dataset_profile.applicable_llms
 
         # Check that at least one llm is applicable
         if len(self.applicable_llms) == 0:
@@ -124,9 +105,10 @@ class TaskRequest:
             )
 
         # Get number of test and train data points, which will be used to index data points
-        evaluation_dataset_segments = segment_data.segment_evaluation_dataset(
-            num_unique_data=len(self.evaluation_dataset_dataframe),
-            num_test_data_input=self.num_test_data,
+        evaluation_dataset_segments = (
+            self.dataset_profile.get_evaluation_dataset_segments(
+                num_test_data_input=self.num_test_data
+            )
         )
         self.num_train_data = evaluation_dataset_segments["num_train_data"]
         self.num_test_data = evaluation_dataset_segments["num_test_data"]
@@ -158,6 +140,15 @@ class TaskRequest:
                     "Must provide either vector db or raw dataset and task id."
                 )
 
+    @property
+    def evaluation_dataset_dataframe(self) -> pd.DataFrame:
+        """Processed evaluation dataset, read from the dataset profile on first use.
+
+        Returns:
+            pd.DataFrame: processed evaluation dataset.
+        """
+        return self.dataset_profile.get_evaluation_dataset()
+
     def get_normalized_input_variables(self) -> List[str]:
         """Get input variables from evaluation dataset without "var_" prepended to them.
 
@@ -0,0 +1,254 @@
+"""Content-addressed cache for text embeddings.
+
+Embeddings are keyed by a hash of the embedding model and normalized text, so the same string is only embedded once across
+task generations and deployments handled by the same host. The cache has two tiers:
+    1. In-process LRU of float32 vectors, bounded by number of entries.
+    2. On-disk SQLite table of float32 blobs, bounded by total size in bytes. Least recently used entries are evicted first.
+
+Typical usage example:
+
+    embedding_cache = get_embedding_cache()
+    cached_embeddings = embedding_cache.get_many(model="text-embedding-ada-002", texts=texts)
+    embedding_cache.set_many(model="text-embedding-ada-002", texts=missing_texts, embeddings=missing_embeddings)
+"""
+
+from collections import OrderedDict
+from config import Config
+from typing import Dict, List, Optional
+import hashlib
+import numpy as np
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+
+class EmbeddingCache:
+    """Two-tier (in-process LRU and on-disk SQLite) cache for text embeddings."""
+
+    def __init__(
+        self,
+        memory_max_entries: int = 10000,
+        disk_path: str = None,
+        disk_max_bytes: int = 512 * 1024 * 1024,
+    ):
+        """Initializes cache and creates on-disk table if needed.
+
+        Args:
+            memory_max_entries (int, optional): max number of embeddings kept in memory. Defaults to 10000.
+            disk_path (str, optional): path to SQLite database file. If None, only the in-process tier is used. Defaults to None.
+            disk_max_bytes (int, optional): max total size of embeddings stored on disk. Defaults to 512 MB.
+        """
+        self.memory_max_entries = memory_max_entries
+        self.disk_path = disk_path
+        self.disk_max_bytes = disk_max_bytes
+        self._memory_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._disk_bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+
+        # Setup on-disk tier
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._connection = sqlite3.connect(
+                disk_path, timeout=30, check_same_thread=False
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, embedding BLOB NOT NULL, "
+                "num_bytes INTEGER NOT NULL, last_access_time REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_access_time ON embeddings (last_access_time)"
+            )
+            self._connection.commit()
+            self._disk_bytes = self._get_disk_bytes()
+
+    @staticmethod
+    def get_key(model: str, text: str) -> str:
+        """Returns cache key for given model and text.
+
+        Text is normalized to NFC unicode form and stripped of surrounding whitespace before hashing.
+
+        Args:
+            model (str): name of embedding model.
+            text (str): text to embed.
+
+        Returns:
+            str: cache key.
+        """
+        normalized_text = unicodedata.normalize("NFC", text).strip()
+        return hashlib.sha256(f"{model}\n{normalized_text}".encode("UTF-8")).hexdigest()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Returns cached embedding for each text, or None for texts not in the cache.
+
+        Args:
+            model (str): name of embedding model.
+            texts (List[str]): texts to look up.
+
+        Returns:
+            List[Optional[List[float]]]: cached embedding for each text, or None if not cached.
+        """
+        keys = [self.get_key(model=model, text=text) for text in texts]
+        embeddings: Dict[str, np.ndarray] = {}
+
+        with self._lock:
+            # Check in-process tier
+            for key in keys:
+                if key in self._memory_cache:
+                    self._memory_cache.move_to_end(key)
+                    embeddings[key] = self._memory_cache[key]
+
+            # Check on-disk tier for remaining keys, then promote hits to in-process tier
+            disk_keys = [key for key in dict.fromkeys(keys) if key not in embeddings]
+            if self._connection is not None and len(disk_keys) > 0:
+                for i in range(0, len(disk_keys), 500):
+                    batch_keys = disk_keys[i : i + 500]
+                    rows = self._connection.execute(
+                        f"SELECT key, embedding FROM embeddings WHERE key IN ({','.join(['?'] * len(batch_keys))})",
+                        batch_keys,
+                    ).fetchall()
+                    for key, embedding in rows:
+                        embeddings[key] = np.frombuffer(embedding, dtype=np.float32)
+                        self._add_to_memory_cache(key=key, embedding=embeddings[key])
+                    self._connection.executemany(
+                        "UPDATE embeddings SET last_access_time = ? WHERE key = ?",
+                        [(time.time(), key) for key, _ in rows],
+                    )
+                self._connection.commit()
+
+            # Update hit and miss counters
+            for key in keys:
+                if key not in embeddings:
+                    self.misses += 1
+                elif key in disk_keys:
+                    self.disk_hits += 1
+                else:
+                    self.memory_hits += 1
+
+        return [embeddings[key].tolist() if key in embeddings else None for key in keys]
+
+    def set_many(
+        self, model: str, texts: List[str], embeddings: List[List[float]]
+    ) -> None:
+        """Stores embeddings for given texts in both tiers, evicting least recently used entries if needed.
+
+        Args:
+            model (str): name of embedding model.
+            texts (List[str]): texts that were embedded.
+            embeddings (List[List[float]]): embedding for each text.
+        """
+        rows = {}
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                key = self.get_key(model=model, text=text)
+                embedding = np.asarray(embedding, dtype=np.float32)
+                self._add_to_memory_cache(key=key, embedding=embedding)
+                rows[key] = (key, embedding.tobytes(), embedding.nbytes, time.time())
+            rows = list(rows.values())
+
+            if self._connection is not None and len(rows) > 0:
+                # Take write lock before inserting, so that total size on disk is consistent with concurrent writers in other
+                # processes sharing the same database file
+                self._connection.execute("BEGIN IMMEDIATE")
+                try:
+                    self._connection.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, embedding, num_bytes, last_access_time) VALUES (?, ?, ?, ?)",
+                        rows,
+                    )
+                    self._disk_bytes = self._get_disk_bytes()
+                    self._evict_from_disk()
+                    self._connection.commit()
+                except Exception:
+                    self._connection.rollback()
+                    raise
+
+    def _add_to_memory_cache(self, key: str, embedding: np.ndarray) -> None:
+        """Adds embedding to in-process tier, evicting least recently used entries if needed. Assumes lock is held.
+
+        Args:
+            key (str): cache key.
+            embedding (np.ndarray): float32 embedding.
+        """
+        self._memory_cache[key] = embedding
+        self._memory_cache.move_to_end(key)
+        while len(self._memory_cache) > self.memory_max_entries:
+            self._memory_cache.popitem(last=False)
+
+    def _get_disk_bytes(self) -> int:
+        """Returns total size of embeddings stored on disk, including those written by other processes. Assumes lock is held.
+
+        Returns:
+            int: total size in bytes.
+        """
+        return self._connection.execute(
+            "SELECT COALESCE(SUM(num_bytes), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def _evict_from_disk(self) -> None:
+        """Deletes least recently used entries from disk until total size is below 90% of the limit. Assumes lock and write
+        transaction are held."""
+        if self._disk_bytes <= self.disk_max_bytes:
+            return
+
+        target_bytes = int(self.disk_max_bytes * 0.9)
+        rows = self._connection.execute(
+            "SELECT key, num_bytes FROM embeddings ORDER BY last_access_time"
+        )
+        keys_to_delete = []
+        for key, num_bytes in rows:
+            if self._disk_bytes <= target_bytes:
+                break
+            keys_to_delete.append((key,))
+            self._disk_bytes -= num_bytes
+        self._connection.executemany(
+            "DELETE FROM embeddings WHERE key = ?", keys_to_delete
+        )
+        self.disk_evictions += len(keys_to_delete)
+
+    def get_metrics(self) -> dict:
+        """Returns hit and miss counters and cache sizes for monitoring.
+
+        Returns:
+            dict: cache metrics.
+        """
+        with self._lock:
+            num_lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / num_lookups
+                if num_lookups > 0
+                else 0,
+                "memory_entries": len(self._memory_cache),
+                "disk_bytes": self._disk_bytes,
+                "disk_evictions": self.disk_evictions,
+            }
+
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Returns embedding cache shared within this process, configured from Config.
+
+    Returns:
+        EmbeddingCache: shared embedding cache.
+    """
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache(
+                memory_max_entries=Config.EMBEDDING_CACHE_MEMORY_MAX_ENTRIES,
+                disk_path=Config.EMBEDDING_CACHE_PATH,
+                disk_max_bytes=Config.EMBEDDING_CACHE_DISK_MAX_BYTES,
+            )
+        return _embedding_cache
@@ -1,10 +1,13 @@
 """Wrapper around OpenAI embedding models.
 
-Copied code from LangChain then added logic to reset OpenAI API key in case it was reset by other processes."""
+Copied code from LangChain then added logic to pass the OpenAI API key with each request, so that concurrent llm inference calls
+using other API keys do not interfere with embedding calls, and to share the rate limit budget of that API key with other calls.
+"""
 
 from __future__ import annotations
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import (
     Any,
     Callable,
@@ -30,6 +33,12 @@ import openai
 
 from langchain.embeddings.base import Embeddings
 from langchain.utils import get_from_dict_or_env
+from app.models.embedding.cache import get_embedding_cache
+from app.utilities.rate_limiting.rate_limiter import (
+    get_rate_limiter,
+    estimate_num_tokens,
+    wait_unless_rate_limited,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -38,11 +47,17 @@ def _create_retry_decorator(embeddings: OpenAIEmbeddings) -> Callable[[Any], Any
     min_seconds = 4
     max_seconds = 10
     # Wait 2^x * 1 second between each retry starting with
-    # 4 seconds, then up to 10 seconds, then 10 seconds afterwards
+    # 4 seconds, then up to 10 seconds, then 10 seconds afterwards. Rate limit errors are retried without extra backoff since
+    # the next attempt waits in the shared rate limiter.
     return retry(
         reraise=True,
         stop=stop_after_attempt(embeddings.max_retries),
-        wait=wait_exponential(multiplier=1, min=min_seconds, max=max_seconds),
+        wait=wait_unless_rate_limited(
+            is_rate_limit_error=lambda e: isinstance(e, openai.error.RateLimitError),
+            fallback_wait=wait_exponential(
+                multiplier=1, min=min_seconds, max=max_seconds
+            ),
+        ),
         retry=(
             retry_if_exception_type(openai.error.Timeout)
             | retry_if_exception_type(openai.error.APIError)
@@ -57,10 +72,25 @@ def _create_retry_decorator(embeddings: OpenAIEmbeddings) -> Callable[[Any], Any
 def embed_with_retry(embeddings: OpenAIEmbeddings, **kwargs: Any) -> Any:
     """Use tenacity to retry the embedding call."""
     retry_decorator = _create_retry_decorator(embeddings)
+    rate_limiter = get_rate_limiter(
+        provider="OpenAI", api_key=embeddings.openai_api_key
+    )
+
+    # Estimate tokens from token ids if input is already encoded, otherwise from text length
+    inputs = kwargs["input"] if isinstance(kwargs["input"], list) else [kwargs["input"]]
+    if all(isinstance(input, list) for input in inputs):
+        num_tokens = sum(len(input) for input in inputs)
+    else:
+        num_tokens = estimate_num_tokens(prompts=inputs)
 
     @retry_decorator
     def _embed_with_retry(**kwargs: Any) -> Any:
-        return embeddings.client.create(**kwargs)
+        with rate_limiter.limit(num_tokens=num_tokens):
+            try:
+                return embeddings.client.create(**kwargs)
+            except openai.error.RateLimitError as e:
+                rate_limiter.record_rate_limit(headers=e.headers)
+                raise
 
     return _embed_with_retry(**kwargs)
 
@@ -120,11 +150,15 @@ class OpenAIEmbeddings(BaseModel, Embeddings):
     disallowed_special: Union[Literal["all"], Set[str], Tuple[()]] = "all"
     chunk_size: int = 1000
     """Maximum number of texts to embed in each batch"""
+    max_concurrent_chunks: int = 4
+    """Maximum number of batches to embed in parallel."""
     max_retries: int = 6
     """Maximum number of retries to make when generating."""
     request_timeout: Optional[Union[float, Tuple[float, float]]] = None
     """Timeout in seconds for the OpenAPI request."""
     headers: Any = None
+    use_cache: bool = True
+    """Whether to look up and store embeddings in the shared embedding cache."""
 
     class Config:
         """Configuration for this pydantic object."""
@@ -209,17 +243,28 @@ class OpenAIEmbeddings(BaseModel, Embeddings):
                     tokens += [token[j : j + self.embedding_ctx_length]]
                     indices += [i]
 
+            # Submit chunks in parallel. Results are collected in the original chunk order
             batched_embeddings = []
             _chunk_size = chunk_size or self.chunk_size
-            for i in range(0, len(tokens), _chunk_size):
-                response = embed_with_retry(
-                    self,
-                    input=tokens[i : i + _chunk_size],
-                    engine=self.deployment,
-                    request_timeout=self.request_timeout,
-                    headers=self.headers,
+            token_chunks = [
+                tokens[i : i + _chunk_size] for i in range(0, len(tokens), _chunk_size)
+            ]
+            with ThreadPoolExecutor(
+                max_workers=max(1, min(self.max_concurrent_chunks, len(token_chunks)))
+            ) as executor:
+                responses = executor.map(
+                    lambda token_chunk: embed_with_retry(
+                        self,
+                        input=token_chunk,
+                        engine=self.deployment,
+                        request_timeout=self.request_timeout,
+                        headers=self.headers,
+                        api_key=self.openai_api_key,
+                    ),
+                    token_chunks,
                 )
-                batched_embeddings += [r["embedding"] for r in response["data"]]
+                for response in responses:
+                    batched_embeddings += [r["embedding"] for r in response["data"]]
 
             results: List[List[List[float]]] = [[] for _ in range(len(texts))]
             num_tokens_in_batch: List[List[int]] = [[] for _ in range(len(texts))]
@@ -236,6 +281,7 @@ class OpenAIEmbeddings(BaseModel, Embeddings):
                         engine=self.deployment,
                         request_timeout=self.request_timeout,
                         headers=self.headers,
+                        api_key=self.openai_api_key,
                     )["data"][0]["embedding"]
                 else:
                     average = np.average(
@@ -268,6 +314,7 @@ class OpenAIEmbeddings(BaseModel, Embeddings):
                 engine=engine,
                 request_timeout=self.request_timeout,
                 headers=self.headers,
+                api_key=self.openai_api_key,
             )["data"][0]["embedding"]
 
     def embed_documents(
@@ -283,12 +330,32 @@ class OpenAIEmbeddings(BaseModel, Embeddings):
         Returns:
             List of embeddings, one for each text.
         """
-        # Reset OpenAI API key in case it was changed by other processes (e.g., llm inference calls)
-        openai.api_key = self.openai_api_key
-
         # NOTE: to keep things simple, we assume the list may contain texts longer
         #       than the maximum context and use length-safe embedding function.
-        return self._get_len_safe_embeddings(texts, engine=self.deployment)
+        if not self.use_cache:
+            return self._get_len_safe_embeddings(texts, engine=self.deployment)
+
+        # Fetch cached embeddings, then embed each missing text once and add it to the cache
+        embedding_cache = get_embedding_cache()
+        embeddings = embedding_cache.get_many(model=self.model, texts=texts)
+        missing_texts = list(
+            dict.fromkeys(
+                text for text, embedding in zip(texts, embeddings) if embedding is None
+            )
+        )
+        if len(missing_texts) > 0:
+            missing_embeddings = self._get_len_safe_embeddings(
+                missing_texts, engine=self.deployment
+            )
+            embedding_cache.set_many(
+                model=self.model, texts=missing_texts, embeddings=missing_embeddings
+            )
+            missing_embedding_per_text = dict(zip(missing_texts, missing_embeddings))
+            embeddings = [
+                embedding if embedding is not None else missing_embedding_per_text[text]
+                for text, embedding in zip(texts, embeddings)
+            ]
+        return embeddings
 
     def embed_query(self, text: str) -> List[float]:
         """Call out to OpenAI's embedding endpoint for embedding query text.
@@ -299,8 +366,15 @@ class OpenAIEmbeddings(BaseModel, Embeddings):
         Returns:
             Embedding for the text.
         """
-        # Reset OpenAI API key in case it was changed by other processes (e.g., llm inference calls)
-        openai.api_key = self.openai_api_key
-
-        embedding = self._embedding_func(text, engine=self.deployment)
+        if not self.use_cache:
+            return self._embedding_func(text, engine=self.deployment)
+
+        # Fetch cached embedding, otherwise embed text and add it to the cache
+        embedding_cache = get_embedding_cache()
+        embedding = embedding_cache.get_many(model=self.model, texts=[text])[0]
+        if embedding is None:
+            embedding = self._embedding_func(text, engine=self.deployment)
+            embedding_cache.set_many(
+                model=self.model, texts=[text], embeddings=[embedding]
+            )
         return embedding
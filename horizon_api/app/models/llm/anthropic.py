@@ -1,29 +1,53 @@
 from .base import BaseLLM
 from langchain.chat_models import ChatAnthropic as ChatAnthropicOriginal
 from langchain.schema import LLMResult
+from app.utilities.rate_limiting.rate_limiter import (
+    RateLimiter,
+    get_rate_limiter,
+    estimate_num_tokens,
+    wait_unless_rate_limited,
+)
+from app.utilities.tokenization import tokenizer
 import anthropic
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_result
-from typing import Any
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
+from typing import Any, List
 import re
 
 
+def get_status_code(e: BaseException) -> int:
+    """Parses status code from Anthropic API exception.
+
+    Args:
+        e (BaseException): exception raised by Anthropic client.
+
+    Returns:
+        int: status code, or None if exception is not an Anthropic API exception with a status code.
+    """
+    if type(e) != anthropic.ApiException or len(e.args) == 0:
+        return None
+    match = re.search(r"status code: (\d+)", str(e.args[0]))
+    if match is None:
+        return None
+    return int(match.group(1))
+
+
 class ChatAnthropic(BaseLLM, ChatAnthropicOriginal):
     def get_model_name(self) -> str:
         return self.model
 
     @staticmethod
     def get_data_length(sample_str: str) -> int:
-        return anthropic.count_tokens(sample_str)
+        return tokenizer.count_tokens(text=sample_str, tokenizer_name="claude")
 
     def get_prompt_data_length(
         self, prompt_messages: list, llm_result: LLMResult
     ) -> int:
         prompt_string = self._convert_messages_to_prompt(prompt_messages)
-        return anthropic.count_tokens(prompt_string)
+        return tokenizer.count_tokens(text=prompt_string, tokenizer_name="claude")
 
     def get_completion_data_length(self, llm_result: LLMResult) -> int:
         completion_string = llm_result.generations[0][0].text
-        return anthropic.count_tokens(completion_string)
+        return tokenizer.count_tokens(text=completion_string, tokenizer_name="claude")
 
     def get_model_params_to_store(self) -> dict:
         return {
@@ -32,20 +56,39 @@ class ChatAnthropic(BaseLLM, ChatAnthropicOriginal):
             "max_tokens_to_sample": self.max_tokens_to_sample,
         }
 
+    def get_rate_limiter(self) -> RateLimiter:
+        return get_rate_limiter(provider="Anthropic", api_key=self.anthropic_api_key)
+
     def set_temperature(self, temperature: float) -> None:
         self.temperature = temperature
 
-    # Add retry functionality for Anthropic inference calls
+    # Add retry functionality for Anthropic inference calls. Rate limit errors (status code 429) are retried without extra
+    # backoff since the next attempt waits in the shared rate limiter.
     @retry(
         reraise=True,
-        wait=wait_exponential(multiplier=1, min=4, max=10),
+        wait=wait_unless_rate_limited(
+            is_rate_limit_error=lambda e: get_status_code(e) == 429,
+            fallback_wait=wait_exponential(multiplier=1, min=4, max=10),
+        ),
         stop=stop_after_attempt(6),
         # Retry only if error is not invalid API key (status code 401) or unprocessable entity (status code 422)
-        retry=retry_if_result(
-            lambda e: type(e) == anthropic.ApiException
-            and int(re.search(r"status code: (\d+)", e.args[0]).group(1))
-            not in [401, 422]
+        retry=retry_if_exception(
+            lambda e: get_status_code(e) is not None
+            and get_status_code(e) not in [401, 422]
         ),
     )
-    def generate(self, *args: Any, **kwargs: Any) -> Any:
-        return super(ChatAnthropicOriginal, self).generate(*args, **kwargs)
+    def generate(self, messages: List[Any], *args: Any, **kwargs: Any) -> Any:
+        # Wait for shared rate limit budget, and report rate limit errors so that concurrency backs off
+        rate_limiter = self.get_rate_limiter()
+        num_tokens = estimate_num_tokens(
+            prompts=messages, max_output_tokens=self.max_tokens_to_sample
+        )
+        with rate_limiter.limit(num_tokens=num_tokens):
+            try:
+                return super(ChatAnthropicOriginal, self).generate(
+                    messages, *args, **kwargs
+                )
+            except anthropic.ApiException as e:
+                if get_status_code(e) == 429:
+                    rate_limiter.record_rate_limit()
+                raise
@@ -5,6 +5,7 @@ from .open_ai import (
     ChatOpenAI,
 )
 from .anthropic import ChatAnthropic
+from config import Config
 
 
 class LLMFactory:
@@ -13,6 +14,7 @@ class LLMFactory:
             "class": ChatOpenAI,
             "provider": "OpenAI",
             "data_unit": "token",
+            "tokenizer": "gpt-3.5-turbo",
             "data_limit": 4096,
             "price_per_data_unit_prompt": 0.0015 / 1000,
             "price_per_data_unit_completion": 0.002 / 1000,
@@ -21,6 +23,7 @@ class LLMFactory:
             "class": ChatOpenAI,
             "provider": "OpenAI",
             "data_unit": "token",
+            "tokenizer": "gpt-3.5-turbo",
             "data_limit": 16000,
             "price_per_data_unit_prompt": 0.003 / 1000,
             "price_per_data_unit_completion": 0.004 / 1000,
@@ -29,6 +32,7 @@ class LLMFactory:
             "class": OpenAI,
             "provider": "OpenAI",
             "data_unit": "token",
+            "tokenizer": "text-davinci-003",
             "data_limit": 4097,
             "price_per_data_unit_prompt": 0.02 / 1000,
             "price_per_data_unit_completion": 0.02 / 1000,
@@ -37,6 +41,7 @@ class LLMFactory:
             "class": ChatAnthropic,
             "provider": "Anthropic",
             "data_unit": "token",
+            "tokenizer": "claude",
             "data_limit": 9000,
             "price_per_data_unit_prompt": 1.63 / 1000000,
             "price_per_data_unit_completion": 5.51 / 1000000,
@@ -45,6 +50,7 @@ class LLMFactory:
             "class": ChatAnthropic,
             "provider": "Anthropic",
             "data_unit": "token",
+            "tokenizer": "claude",
             "data_limit": 9000,
             "price_per_data_unit_prompt": 11.02 / 1000000,
             "price_per_data_unit_completion": 32.68 / 1000000,
@@ -92,10 +98,19 @@ class LLMFactory:
 
         return model_params
 
+    @staticmethod
+    def get_max_concurrent_requests(model_name: str) -> int:
+        provider = LLMFactory.llm_classes[model_name]["provider"]
+        return Config.LLM_PROVIDER_LIMITS[provider]["max_concurrent_requests"]
+
     @staticmethod
     def get_data_unit(model_name: str) -> str:
         return LLMFactory.llm_classes[model_name]["data_unit"]
 
+    @staticmethod
+    def get_tokenizer_name(model_name: str) -> str:
+        return LLMFactory.llm_classes[model_name]["tokenizer"]
+
     @staticmethod
     def get_prompt_cost(model_name: str, prompt_data_length: int) -> float:
         return (
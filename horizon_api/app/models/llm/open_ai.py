@@ -1,8 +1,14 @@
 from langchain.llms import OpenAI as OpenAIOriginal
 from langchain.chat_models import ChatOpenAI as ChatOpenAIOriginal
-from langchain.schema import LLMResult
+from langchain.schema import BaseMessage, LLMResult
 from .base import BaseLLM
-import tiktoken
+from app.utilities.rate_limiting.rate_limiter import (
+    RateLimiter,
+    get_rate_limiter,
+    estimate_num_tokens,
+    wait_unless_rate_limited,
+)
+from app.utilities.tokenization import tokenizer
 from tenacity import (
     retry,
     retry_if_exception_type,
@@ -10,17 +16,27 @@ from tenacity import (
     wait_exponential,
 )
 import openai
-from typing import Any
+from typing import Any, Dict, List, Optional, Tuple
 
 
 class OpenAI(BaseLLM, OpenAIOriginal):
+    # Surface rate limit errors to the retry in generate instead of retrying them inside langchain
+    max_retries: int = 1
+
     def get_model_name(self) -> str:
         return self.model_name
 
+    @property
+    def _invocation_params(self) -> Dict[str, Any]:
+        # Send API key with each request rather than through the process-global openai.api_key, which other threads using
+        # other API keys may change between assignment and request
+        return {**super()._invocation_params, "api_key": self.openai_api_key}
+
     @staticmethod
     def get_data_length(sample_str: str) -> int:
-        encoding_davinci = tiktoken.encoding_for_model("text-davinci-003")
-        return len(encoding_davinci.encode(sample_str))
+        return tokenizer.count_tokens(
+            text=sample_str, tokenizer_name="text-davinci-003"
+        )
 
     def get_prompt_data_length(
         self, prompt_messages: list, llm_result: LLMResult
@@ -37,13 +53,20 @@ class OpenAI(BaseLLM, OpenAIOriginal):
             "max_tokens": self.max_tokens,
         }
 
+    def get_rate_limiter(self) -> RateLimiter:
+        return get_rate_limiter(provider="OpenAI", api_key=self.openai_api_key)
+
     def set_temperature(self, temperature: float) -> None:
         self.temperature = temperature
 
-    # Add additional retry functionality for OpenAI inference calls
+    # Add additional retry functionality for OpenAI inference calls. Rate limit errors are retried without extra backoff
+    # since the next attempt waits in the shared rate limiter.
     @retry(
         reraise=True,
-        wait=wait_exponential(multiplier=1, min=4, max=10),
+        wait=wait_unless_rate_limited(
+            is_rate_limit_error=lambda e: isinstance(e, openai.error.RateLimitError),
+            fallback_wait=wait_exponential(multiplier=1, min=4, max=10),
+        ),
         stop=stop_after_attempt(6),
         # Retry only if error is not invalid API key (status code 401) or unprocessable entity (status code 422)
         retry=(
@@ -54,20 +77,39 @@ class OpenAI(BaseLLM, OpenAIOriginal):
             | retry_if_exception_type(openai.error.ServiceUnavailableError)
         ),
     )
-    def generate(self, *args: Any, **kwargs: Any) -> Any:
-        # Reset OpenAI API key in case it was changed by other processes (e.g., OpenAI embeddings)
-        openai.api_key = self.openai_api_key
-        return super(OpenAIOriginal, self).generate(*args, **kwargs)
+    def generate(self, prompts: List[Any], *args: Any, **kwargs: Any) -> Any:
+        # Wait for shared rate limit budget, and report rate limit errors so that concurrency backs off
+        rate_limiter = self.get_rate_limiter()
+        num_tokens = estimate_num_tokens(
+            prompts=prompts, max_output_tokens=max(self.max_tokens or 0, 0) * self.n
+        )
+        with rate_limiter.limit(num_tokens=num_tokens):
+            try:
+                return super(OpenAIOriginal, self).generate(prompts, *args, **kwargs)
+            except openai.error.RateLimitError as e:
+                rate_limiter.record_rate_limit(headers=e.headers)
+                raise
 
 
 class ChatOpenAI(BaseLLM, ChatOpenAIOriginal):
+    # Surface rate limit errors to the retry in generate instead of retrying them inside langchain
+    max_retries: int = 1
+
     def get_model_name(self) -> str:
         return self.model_name
 
+    def _create_message_dicts(
+        self, messages: List[BaseMessage], stop: Optional[List[str]]
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        # Send API key with each request rather than through the process-global openai.api_key, which other threads using
+        # other API keys may change between assignment and request
+        message_dicts, params = super()._create_message_dicts(messages, stop)
+        params["api_key"] = self.openai_api_key
+        return message_dicts, params
+
     @staticmethod
     def get_data_length(sample_str: str) -> int:
-        encoding_turbo = tiktoken.encoding_for_model("gpt-3.5-turbo")
-        return len(encoding_turbo.encode(sample_str))
+        return tokenizer.count_tokens(text=sample_str, tokenizer_name="gpt-3.5-turbo")
 
     def get_prompt_data_length(
         self, prompt_messages: list, llm_result: LLMResult
@@ -84,13 +126,20 @@ class ChatOpenAI(BaseLLM, ChatOpenAIOriginal):
             "max_tokens": self.max_tokens,
         }
 
+    def get_rate_limiter(self) -> RateLimiter:
+        return get_rate_limiter(provider="OpenAI", api_key=self.openai_api_key)
+
     def set_temperature(self, temperature: float) -> None:
         self.model_kwargs["temperature"] = temperature
 
-    # Add additional retry functionality for OpenAI inference calls
+    # Add additional retry functionality for OpenAI inference calls. Rate limit errors are retried without extra backoff
+    # since the next attempt waits in the shared rate limiter.
     @retry(
         reraise=True,
-        wait=wait_exponential(multiplier=1, min=4, max=10),
+        wait=wait_unless_rate_limited(
+            is_rate_limit_error=lambda e: isinstance(e, openai.error.RateLimitError),
+            fallback_wait=wait_exponential(multiplier=1, min=4, max=10),
+        ),
         stop=stop_after_attempt(6),
         # Retry only if error is not invalid API key (status code 401) or unprocessable entity (status code 422)
         retry=(
@@ -101,7 +150,17 @@ class ChatOpenAI(BaseLLM, ChatOpenAIOriginal):
             | retry_if_exception_type(openai.error.ServiceUnavailableError)
         ),
     )
-    def generate(self, *args: Any, **kwargs: Any) -> Any:
-        # Reset OpenAI API key in case it was changed by other processes (e.g., OpenAI embeddings)
-        openai.api_key = self.openai_api_key
-        return super(ChatOpenAIOriginal, self).generate(*args, **kwargs)
+    def generate(self, prompts: List[Any], *args: Any, **kwargs: Any) -> Any:
+        # Wait for shared rate limit budget, and report rate limit errors so that concurrency backs off
+        rate_limiter = self.get_rate_limiter()
+        num_tokens = estimate_num_tokens(
+            prompts=prompts, max_output_tokens=max(self.max_tokens or 0, 0) * self.n
+        )
+        with rate_limiter.limit(num_tokens=num_tokens):
+            try:
+                return super(ChatOpenAIOriginal, self).generate(
+                    prompts, *args, **kwargs
+                )
+            except openai.error.RateLimitError as e:
+                rate_limiter.record_rate_limit(headers=e.headers)
+                raise
@@ -0,0 +1,720 @@
+"""In-process vector store backed by a memory-mapped float32 embedding matrix and a columnar metadata table.
+
+Implements the same interface as the Pinecone wrapper used during Task generation and deployment, with brute-force vectorized
+similarity search instead of network calls. Each namespace is persisted as a directory on local disk and optionally mirrored to
+s3:
+    - embeddings.npy: float32 matrix with one row per vector (memory-mapped when loaded).
+    - metadata.json: vector ids and metadata stored column by column.
+    - ground_truth_embeddings.npz: ground truth embedding matrix and corresponding evaluation data ids.
+
+Typical usage example:
+
+    vector_db = LocalVectorStore(directory=directory, namespace=namespace, embedding_function=embeddings.embed_query)
+    vector_db.add_text_embeddings_and_metadata(texts=texts, metadata=metadata)
+    examples = vector_db.max_marginal_relevance_search(query=query, k=4, filter_statement={"evaluation_data_id": {"$lt": 10}})
+"""
+
+from .base import BaseVectorStore
+from .pinecone import VECTOR_ID_FORMAT_STRING
+from app.utilities.S3.s3_util import (
+    upload_directory_to_s3,
+    delete_directory_from_s3,
+)
+from langchain.docstore.document import Document
+from langchain.embeddings.base import Embeddings
+from langchain.vectorstores.base import VectorStore
+from langchain.vectorstores.utils import maximal_marginal_relevance
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import json
+import numpy as np
+import os
+import shutil
+import threading
+
+EMBEDDINGS_FILE_NAME = "embeddings.npy"
+METADATA_FILE_NAME = "metadata.json"
+GROUND_TRUTH_EMBEDDINGS_FILE_NAME = "ground_truth_embeddings.npz"
+
+
+class LocalVectorStore(BaseVectorStore, VectorStore):
+    def __init__(
+        self,
+        directory: str,
+        namespace: str,
+        embedding_function: Callable[[str], List[float]],
+        embed_documents_function: Callable[[List[str]], List[List[float]]] = None,
+        input_variables: List[str] = None,
+        num_unique_data: int = None,
+        s3_directory: str = None,
+    ):
+        """Initializes vector store and loads namespace from directory if it was previously persisted.
+
+        Args:
+            directory (str): local directory holding the namespace files.
+            namespace (str): namespace of vector store.
+            embedding_function (Callable[[str], List[float]]): function to embed a single text.
+            embed_documents_function (Callable[[List[str]], List[List[float]]], optional): function to embed a batch of texts.
+                Defaults to None.
+            input_variables (List[str], optional): List of input variables. Defaults to None.
+            num_unique_data (int, optional): Number of unique data points stored for user's namespace (without double counting across
+                chunks of the same data). Defaults to None.
+            s3_directory (str, optional): s3 directory to mirror namespace files to. If None, namespace is only persisted locally.
+                Defaults to None.
+        """
+        self.directory = directory
+        self.namespace = namespace
+        self._embedding_function = embedding_function
+        self.embed_documents_function = embed_documents_function
+        self.input_variables = input_variables
+        self.num_unique_data = num_unique_data
+        self.s3_directory = s3_directory
+        self.max_num_chunks = 1
+        self._lock = threading.Lock()
+
+        # Vector data
+        self._ids: List[str] = []
+        self._row_per_id: Dict[str, int] = {}
+        self._metadata_columns: Dict[str, list] = {}
+        self._embeddings = None
+        self._normalized_embeddings = None
+
+        # Ground truth embeddings
+        self._ground_truth_embedding_rows: Dict[int, int] = {}
+        self._ground_truth_embeddings = None
+
+        self._load()
+
+    def _load(self) -> None:
+        """Loads namespace files from directory, if they exist."""
+        metadata_file_path = os.path.join(self.directory, METADATA_FILE_NAME)
+        if os.path.exists(metadata_file_path):
+            with open(metadata_file_path) as metadata_file:
+                stored_metadata = json.load(metadata_file)
+            self._ids = stored_metadata["ids"]
+            self._row_per_id = {id: row for row, id in enumerate(self._ids)}
+            self._metadata_columns = stored_metadata["columns"]
+            self.max_num_chunks = stored_metadata.get("max_num_chunks", 1)
+            self._embeddings = np.load(
+                os.path.join(self.directory, EMBEDDINGS_FILE_NAME), mmap_mode="r"
+            )
+            self._normalized_embeddings = None
+
+        ground_truth_file_path = os.path.join(
+            self.directory, GROUND_TRUTH_EMBEDDINGS_FILE_NAME
+        )
+        if os.path.exists(ground_truth_file_path):
+            with np.load(ground_truth_file_path) as ground_truth_embeddings_file:
+                self._ground_truth_embeddings = ground_truth_embeddings_file[
+                    "embeddings"
+                ]
+                self._ground_truth_embedding_rows = {
+                    int(evaluation_data_id): row
+                    for row, evaluation_data_id in enumerate(
+                        ground_truth_embeddings_file["evaluation_data_ids"]
+                    )
+                }
+
+    def _save(self) -> None:
+        """Writes namespace files to directory, then mirrors them to s3 if configured. Assumes lock is held."""
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Write embeddings matrix, then reopen it memory-mapped
+        if self._embeddings is not None:
+            embeddings_file_path = os.path.join(self.directory, EMBEDDINGS_FILE_NAME)
+            temp_file_path = embeddings_file_path + ".tmp.npy"
+            np.save(temp_file_path, np.asarray(self._embeddings, dtype=np.float32))
+            os.replace(temp_file_path, embeddings_file_path)
+            self._embeddings = np.load(embeddings_file_path, mmap_mode="r")
+
+        # Write columnar metadata
+        with open(os.path.join(self.directory, METADATA_FILE_NAME), "w") as file:
+            json.dump(
+                {
+                    "ids": self._ids,
+                    "columns": self._metadata_columns,
+                    "max_num_chunks": self.max_num_chunks,
+                },
+                file,
+                default=lambda value: value.item(),
+            )
+
+        # Write ground truth embeddings
+        if self._ground_truth_embeddings is not None:
+            evaluation_data_ids = sorted(
+                self._ground_truth_embedding_rows,
+                key=self._ground_truth_embedding_rows.get,
+            )
+            np.savez(
+                os.path.join(self.directory, GROUND_TRUTH_EMBEDDINGS_FILE_NAME),
+                evaluation_data_ids=np.array(evaluation_data_ids, dtype=np.int64),
+                embeddings=np.asarray(self._ground_truth_embeddings, dtype=np.float32),
+            )
+
+        if self.s3_directory:
+            upload_directory_to_s3(
+                local_directory_path=self.directory,
+                s3_base_directory=self.s3_directory,
+            )
+
+    def _get_normalized_embeddings(self) -> np.ndarray:
+        """Returns embeddings matrix with unit-length rows, computing it on first use. Assumes lock is held.
+
+        Returns:
+            np.ndarray: normalized embeddings matrix.
+        """
+        if self._normalized_embeddings is None:
+            embeddings = np.asarray(self._embeddings, dtype=np.float32)
+            self._normalized_embeddings = embeddings / np.maximum(
+                np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12
+            )
+        return self._normalized_embeddings
+
+    def _get_metadata(self, row: int) -> dict:
+        """Returns metadata of given row.
+
+        Args:
+            row (int): row index.
+
+        Returns:
+            dict: metadata.
+        """
+        return {
+            key: values[row]
+            for key, values in self._metadata_columns.items()
+            if values[row] is not None
+        }
+
+    def add_text_embeddings_and_metadata(
+        self,
+        texts: Iterable[str],
+        metadata: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        batch_size: int = 32,
+        embedding_batch_size: int = 500,
+    ) -> List[str]:
+        """Embed texts and add associated ids, embeddings, and metadata to vectorstore without adding texts themselves.
+
+        Args:
+            texts (Iterable[str]): Texts to add to the vectorstore.
+            metadata (Optional[List[dict]], optional): Optional list of metadata.
+            ids (Optional[List[str]], optional): Optional list of IDs. Defaults to ids derived from evaluation data id and chunk
+                index.
+            batch_size (int, optional): unused; kept for compatibility with Pinecone wrapper. Defaults to 32.
+            embedding_batch_size (int, optional): number of texts embedded per batch if batch embedding function is available.
+                Defaults to 500.
+
+        Returns:
+            List[str]: List of IDs of the added texts.
+        """
+        texts = list(texts)
+        metadata = metadata or [{} for _ in texts]
+
+        # Embed texts
+        if self.embed_documents_function is not None:
+            embeddings = []
+            for i in range(0, len(texts), embedding_batch_size):
+                embeddings += self.embed_documents_function(
+                    texts[i : i + embedding_batch_size]
+                )
+        else:
+            embeddings = [self._embedding_function(text) for text in texts]
+
+        with self._lock:
+            # Derive ids from evaluation data id and chunk index
+            if ids is None:
+                ids = []
+                num_chunks_per_evaluation_data_id = {}
+                for metadata_item in metadata:
+                    evaluation_data_id = int(metadata_item["evaluation_data_id"])
+                    chunk_index = num_chunks_per_evaluation_data_id.get(
+                        evaluation_data_id, 0
+                    )
+                    num_chunks_per_evaluation_data_id[evaluation_data_id] = (
+                        chunk_index + 1
+                    )
+                    ids.append(
+                        VECTOR_ID_FORMAT_STRING.format(
+                            evaluation_data_id=evaluation_data_id,
+                            chunk_index=chunk_index,
+                        )
+                    )
+                self.max_num_chunks = max(
+                    [self.max_num_chunks]
+                    + list(num_chunks_per_evaluation_data_id.values())
+                )
+
+            # Append embeddings and metadata columns
+            new_embeddings = np.asarray(embeddings, dtype=np.float32)
+            if self._embeddings is None:
+                self._embeddings = new_embeddings
+            else:
+                self._embeddings = np.vstack([self._embeddings, new_embeddings])
+            self._normalized_embeddings = None
+
+            num_existing_rows = len(self._ids)
+            keys = list(
+                dict.fromkeys(
+                    list(self._metadata_columns)
+                    + [key for metadata_item in metadata for key in metadata_item]
+                )
+            )
+            for key in keys:
+                column = self._metadata_columns.setdefault(
+                    key, [None] * num_existing_rows
+                )
+                column += [metadata_item.get(key) for metadata_item in metadata]
+
+            for id in ids:
+                self._row_per_id[id] = len(self._ids)
+                self._ids.append(id)
+
+            self._save()
+
+        return ids
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """Embed texts and add them to vectorstore with metadata. Texts themselves are not stored.
+
+        Args:
+            texts (Iterable[str]): Texts to add to the vectorstore.
+            metadatas (Optional[List[dict]], optional): Optional list of metadata.
+
+        Returns:
+            List[str]: List of IDs of the added texts.
+        """
+        return self.add_text_embeddings_and_metadata(
+            texts=texts, metadata=metadatas, **kwargs
+        )
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        """Creates vector store in given directory and namespace, then adds texts to it.
+
+        Args:
+            texts (List[str]): Texts to add to the vectorstore.
+            embedding (Embeddings): embeddings object.
+            metadatas (Optional[List[dict]], optional): Optional list of metadata.
+
+        Returns:
+            LocalVectorStore: vector store.
+        """
+        vector_store = cls(
+            embedding_function=embedding.embed_query,
+            embed_documents_function=embedding.embed_documents,
+            **kwargs,
+        )
+        vector_store.add_texts(texts=texts, metadatas=metadatas)
+        return vector_store
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: dict = None, **kwargs: Any
+    ) -> List[Document]:
+        """Returns documents holding metadata of the vectors most similar to query.
+
+        Args:
+            query (str): query text.
+            k (int, optional): number of documents to return. Defaults to 4.
+            filter (dict, optional): statement to filter metadata. Defaults to None.
+
+        Returns:
+            List[Document]: documents with empty page content and vector metadata.
+        """
+        query_embedding = np.asarray(self._embedding_function(query), dtype=np.float32)
+        with self._lock:
+            rows, _ = self._get_most_similar_rows(
+                query_embedding=query_embedding, k=k, filter_statement=filter
+            )
+            return [
+                Document(page_content="", metadata=self._get_metadata(row))
+                for row in rows
+            ]
+
+    def _get_filter_mask(self, filter_statement: dict = None) -> np.ndarray:
+        """Evaluates Pinecone-style metadata filter over all rows. Assumes lock is held.
+
+        Supports equality on values and the operators $eq, $ne, $gt, $gte, $lt, $lte, $in, $nin, $and, and $or.
+
+        Args:
+            filter_statement (dict, optional): statement to filter metadata. Defaults to None.
+
+        Raises:
+            ValueError: checks that filter operators are supported.
+
+        Returns:
+            np.ndarray: boolean mask of rows matching filter.
+        """
+        mask = np.ones(len(self._ids), dtype=bool)
+        for key, condition in (filter_statement or {}).items():
+            if key == "$and":
+                for sub_statement in condition:
+                    mask &= self._get_filter_mask(sub_statement)
+                continue
+            if key == "$or":
+                sub_mask = np.zeros(len(self._ids), dtype=bool)
+                for sub_statement in condition:
+                    sub_mask |= self._get_filter_mask(sub_statement)
+                mask &= sub_mask
+                continue
+
+            values = np.array(
+                self._metadata_columns.get(key, [None] * len(self._ids)), dtype=object
+            )
+            present = np.array([value is not None for value in values], dtype=bool)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, operand in condition.items():
+                if operator == "$eq":
+                    mask &= present & (values == operand)
+                elif operator == "$ne":
+                    mask &= ~present | (values != operand)
+                elif operator in ["$gt", "$gte", "$lt", "$lte"]:
+                    compare = {
+                        "$gt": np.greater,
+                        "$gte": np.greater_equal,
+                        "$lt": np.less,
+                        "$lte": np.less_equal,
+                    }[operator]
+                    mask &= present & np.array(
+                        [
+                            is_present and bool(compare(value, operand))
+                            for value, is_present in zip(values, present)
+                        ],
+                        dtype=bool,
+                    )
+                elif operator == "$in":
+                    mask &= present & np.isin(values, list(operand))
+                elif operator == "$nin":
+                    mask &= ~(present & np.isin(values, list(operand)))
+                else:
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+        return mask
+
+    def _get_most_similar_rows(
+        self, query_embedding: np.ndarray, k: int, filter_statement: dict = None
+    ) -> tuple:
+        """Returns rows most similar to query by cosine similarity, in order of decreasing similarity. Assumes lock is held.
+
+        Args:
+            query_embedding (np.ndarray): embedding of query.
+            k (int): number of rows to return.
+            filter_statement (dict, optional): statement to filter metadata. Defaults to None.
+
+        Returns:
+            tuple: array of row indices and array of corresponding similarities.
+        """
+        if self._embeddings is None or k <= 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+
+        candidate_rows = np.flatnonzero(self._get_filter_mask(filter_statement))
+        query_embedding = query_embedding / max(np.linalg.norm(query_embedding), 1e-12)
+        similarities = (
+            self._get_normalized_embeddings()[candidate_rows] @ query_embedding
+        )
+
+        # Select top k without sorting all candidates, then sort selected rows
+        if len(candidate_rows) > k:
+            top_k = np.argpartition(-similarities, k - 1)[:k]
+        else:
+            top_k = np.arange(len(candidate_rows))
+        top_k = top_k[np.argsort(-similarities[top_k], kind="stable")]
+        return candidate_rows[top_k], similarities[top_k]
+
+    def get_backend(self) -> str:
+        """Returns name of vector db backend.
+
+        Returns:
+            str: "local".
+        """
+        return "local"
+
+    def get_namespace(self) -> str:
+        """Returns namespace.
+
+        Returns:
+            str: namespace.
+        """
+        return self.namespace
+
+    def get_input_variables(self) -> List[str]:
+        """Returns list of input variables.
+
+        Returns:
+            list: list of input variables.
+        """
+        return self.input_variables
+
+    def get_num_unique_data(self) -> int:
+        """Returns number of unique data points (i.e., rows in evaluation dataset before chunking).
+
+        Returns:
+            int: number of unique data points.
+        """
+        return self.num_unique_data
+
+    def get_ground_truth_embeddings_s3_key(self) -> str:
+        """Returns None since ground truth embeddings are persisted with the namespace files.
+
+        Returns:
+            str: None.
+        """
+        return None
+
+    def get_deterministic_vector_ids(self) -> bool:
+        """Returns True since vector ids are always derived from evaluation data id and chunk index.
+
+        Returns:
+            bool: True.
+        """
+        return True
+
+    def get_max_num_chunks(self) -> int:
+        """Returns max number of chunks stored for any evaluation data id.
+
+        Returns:
+            int: max number of chunks.
+        """
+        return self.max_num_chunks
+
+    def set_ground_truth_embeddings(
+        self, evaluation_data_id_list: List[int], ground_truth_embeddings: np.ndarray
+    ) -> None:
+        """Stores ground truth embeddings and persists them with the namespace files.
+
+        Args:
+            evaluation_data_id_list (List[int]): evaluation data id corresponding to each row of the embeddings matrix.
+            ground_truth_embeddings (np.ndarray): matrix of ground truth embeddings with one row per evaluation data id.
+        """
+        with self._lock:
+            self._add_ground_truth_embeddings(
+                evaluation_data_id_list=evaluation_data_id_list,
+                ground_truth_embeddings=ground_truth_embeddings,
+            )
+            self._save()
+
+    def _add_ground_truth_embeddings(
+        self, evaluation_data_id_list: List[int], ground_truth_embeddings: np.ndarray
+    ) -> None:
+        """Adds ground truth embeddings to in-memory matrix. Assumes lock is held.
+
+        Args:
+            evaluation_data_id_list (List[int]): evaluation data id corresponding to each row of the embeddings matrix.
+            ground_truth_embeddings (np.ndarray): matrix of ground truth embeddings with one row per evaluation data id.
+        """
+        ground_truth_embeddings = np.asarray(ground_truth_embeddings, dtype=np.float32)
+        if self._ground_truth_embeddings is None:
+            self._ground_truth_embeddings = np.empty(
+                (0, ground_truth_embeddings.shape[1]), dtype=np.float32
+            )
+
+        offset = len(self._ground_truth_embeddings)
+        self._ground_truth_embeddings = np.vstack(
+            [self._ground_truth_embeddings, ground_truth_embeddings]
+        )
+        for i, evaluation_data_id in enumerate(evaluation_data_id_list):
+            self._ground_truth_embedding_rows[int(evaluation_data_id)] = offset + i
+
+    def get_ground_truth_embeddings(
+        self, evaluation_data_id_list: List[int]
+    ) -> np.ndarray:
+        """Returns matrix of ground truth embeddings for the given evaluation data ids, embedding missing ground truths once.
+
+        Args:
+            evaluation_data_id_list (List[int]): list of evaluation data ids.
+
+        Returns:
+            np.ndarray: matrix of ground truth embeddings with one row per evaluation data id in the given order.
+        """
+        with self._lock:
+            missing_evaluation_data_id_list = list(
+                dict.fromkeys(
+                    int(evaluation_data_id)
+                    for evaluation_data_id in evaluation_data_id_list
+                    if int(evaluation_data_id) not in self._ground_truth_embedding_rows
+                )
+            )
+
+        if len(missing_evaluation_data_id_list) > 0:
+            db_results = self.get_data_per_evaluation_data_id(
+                evaluation_data_id_list=missing_evaluation_data_id_list,
+                include_embeddings=False,
+                include_input_variables_in_metadata=False,
+            )
+            ground_truths = [
+                str(metadata["ground_truth"]) for metadata in db_results["metadata"]
+            ]
+            if self.embed_documents_function is not None:
+                ground_truth_embeddings = self.embed_documents_function(ground_truths)
+            else:
+                ground_truth_embeddings = [
+                    self._embedding_function(ground_truth)
+                    for ground_truth in ground_truths
+                ]
+            self.set_ground_truth_embeddings(
+                evaluation_data_id_list=missing_evaluation_data_id_list,
+                ground_truth_embeddings=ground_truth_embeddings,
+            )
+
+        with self._lock:
+            rows = [
+                self._ground_truth_embedding_rows[int(evaluation_data_id)]
+                for evaluation_data_id in evaluation_data_id_list
+            ]
+            return self._ground_truth_embeddings[rows]
+
+    def get_data_per_evaluation_data_id(
+        self,
+        evaluation_data_id_list: List[int],
+        query: str = None,
+        include_embeddings: bool = True,
+        include_metatata: bool = True,
+        include_evaluation_data_id_in_metadata: bool = True,
+        include_input_variables_in_metadata: bool = True,
+        include_ground_truth_in_metadata: bool = True,
+    ) -> dict:
+        """Gets record for each of the provided evaluation data ids that is most similar to given query string, then returns
+        consolidated list of ids, metadata, and embeddings across all the records.
+
+        If query string is not provided, then gets first record for each of the provided evaluation data ids.
+
+        Args:
+            evaluation_data_id_list (List[int]): list of evaluation data ids for which to get one record each.
+            query (str): query to find most similar entry.
+            include_embeddings (bool, optional): whether to include embeddings. Defaults to True.
+            include_metadata (bool, optional): whether to include metadata. Defaults to True.
+            include_evaluation_data_id_in_metadata (bool, optional): whether to include "evaluation_data_id" key in metadata.
+                Defaults to True.
+            include_input_variables_in_metadata (bool, optional): whether to include input variable keys in metadata. Defaults to
+                True.
+            include_ground_truth_in_metadata (bool, optional): whether to include "ground_truth" key in metadata. Defaults to True.
+
+        Raises:
+            ValueError: checks that a record exists for each evaluation data id.
+
+        Returns:
+            dict: consolidated list of ids, metadata, and embeddings.
+        """
+        # Embed query only if there are multiple chunks to choose from
+        query_embedding = None
+        if query and self.max_num_chunks > 1:
+            query_embedding = np.asarray(
+                self._embedding_function(query), dtype=np.float32
+            )
+
+        with self._lock:
+            # Select one chunk per evaluation data id
+            rows = []
+            for id in evaluation_data_id_list:
+                chunk_rows = [
+                    self._row_per_id[vector_id]
+                    for vector_id in [
+                        VECTOR_ID_FORMAT_STRING.format(
+                            evaluation_data_id=int(id), chunk_index=chunk_index
+                        )
+                        for chunk_index in range(self.max_num_chunks)
+                    ]
+                    if vector_id in self._row_per_id
+                ]
+                if len(chunk_rows) == 0:
+                    raise ValueError(
+                        f"No vector db record found for evaluation data id {id}."
+                    )
+                if query_embedding is not None:
+                    chunk_similarities = (
+                        self._get_normalized_embeddings()[chunk_rows] @ query_embedding
+                    )
+                    rows.append(chunk_rows[int(np.argmax(chunk_similarities))])
+                else:
+                    rows.append(chunk_rows[0])
+
+            # Package combined results into single dict
+            combined_db_result = {"ids": [self._ids[row] for row in rows]}
+            if include_embeddings:
+                combined_db_result["embeddings"] = np.asarray(
+                    self._embeddings[rows], dtype=np.float32
+                ).tolist()
+            if include_metatata:
+                excluded_keys = set()
+                if not include_evaluation_data_id_in_metadata:
+                    excluded_keys.add("evaluation_data_id")
+                if not include_input_variables_in_metadata:
+                    excluded_keys.update(self.get_input_variables() or [])
+                if not include_ground_truth_in_metadata:
+                    excluded_keys.add("ground_truth")
+                combined_db_result["metadata"] = [
+                    {
+                        key: value
+                        for key, value in self._get_metadata(row).items()
+                        if key not in excluded_keys
+                    }
+                    for row in rows
+                ]
+
+        return combined_db_result
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        filter_statement: dict = None,
+        lambda_mult: float = 0.5,
+    ) -> List[Dict[str, str]]:
+        """Return metadata selected using maximal marginal relevance.
+
+        Maximal marginal relevance optimizes for similarity to query and diversity among selected items.
+
+        Args:
+            query (str): text for which to pull similar metadata.
+            k (int, optional): number of metadata to return. Defaults to 4.
+            fetch_k (int, optional): number of metadata to pass to max marginal relevance algorithm. Defaults to 20.
+            filter_statement (dict, optional): statement to filter metadata pulled. Defaults to None.
+            lambda_mult (float, optional): Number between 0 and 1 that determines the degree of diversity among the results with 0
+                corresponding to maximum diversity and 1 to minimum diversity. Defaults to 0.5.
+
+        Returns:
+            Dict[str, str]: list of metadata.
+        """
+        query_embedding = np.asarray(self._embedding_function(query), dtype=np.float32)
+
+        with self._lock:
+            # Get most similar rows that match filter
+            rows, _ = self._get_most_similar_rows(
+                query_embedding=query_embedding,
+                k=fetch_k,
+                filter_statement=filter_statement,
+            )
+            embeddings = np.asarray(self._embeddings[rows], dtype=np.float32)
+
+            # Select results using max marginal relevance
+            mmr_selected = maximal_marginal_relevance(
+                query_embedding,
+                embeddings,
+                k=k,
+                lambda_mult=lambda_mult,
+            )
+            return [self._get_metadata(rows[i]) for i in mmr_selected]
+
+    def delete_namespace(self) -> None:
+        """Deletes all vectors and metadata in namespace, locally and in s3."""
+        with self._lock:
+            self._ids = []
+            self._row_per_id = {}
+            self._metadata_columns = {}
+            self._embeddings = None
+            self._normalized_embeddings = None
+            self._ground_truth_embedding_rows = {}
+            self._ground_truth_embeddings = None
+            shutil.rmtree(self.directory, ignore_errors=True)
+            if self.s3_directory:
+                delete_directory_from_s3(s3_directory=self.s3_directory)
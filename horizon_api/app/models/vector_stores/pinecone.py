@@ -1,20 +1,41 @@
 """Wrapper around LangChain Pinecone vector db object."""
 
 from .base import BaseVectorStore
+from app.utilities.S3.object_store import read_object
 from langchain.vectorstores import Pinecone as PineconeOriginal
 from langchain.vectorstores.utils import maximal_marginal_relevance
-from typing import Any, Iterable, List, Optional, Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Iterable, List, Optional, Dict
+import io
+import logging
+import threading
+import time
 import uuid
 import numpy as np
 
 VECTOR_DIMENSIONS = 1536
 
+# Format of deterministic vector ids, which allow records to be fetched by id instead of queried one at a time
+VECTOR_ID_FORMAT_STRING = "evaluation_data_id_{evaluation_data_id}_chunk_{chunk_index}"
+
+# Max number of ids per fetch request (ids are sent as query parameters) and max number of parallel requests to vector db
+FETCH_BATCH_SIZE = 100
+MAX_CONCURRENT_REQUESTS = 16
+
+# Max number of batches embedded and upserted in parallel when ingesting data
+MAX_CONCURRENT_EMBEDDING_BATCHES = 4
+MAX_CONCURRENT_UPSERTS = 4
+
 
 class Pinecone(BaseVectorStore, PineconeOriginal):
     def __init__(
         self,
         input_variables: List[str] = None,
         num_unique_data: int = None,
+        ground_truth_embeddings_s3_key: str = None,
+        embed_documents_function: Callable[[List[str]], List[List[float]]] = None,
+        deterministic_vector_ids: bool = False,
+        max_num_chunks: int = 1,
         **kwargs,
     ):
         """Initializes object with custom fields and then calls parent constructor.
@@ -23,9 +44,22 @@ class Pinecone(BaseVectorStore, PineconeOriginal):
             input_variables (List[str], optional): List of input variables. Defaults to None.
             num_unique_data (int, optional): Number of unique data points stored for user's namespace (without double counting across
                 chunks of the same data). Defaults to None.
+            ground_truth_embeddings_s3_key (str, optional): s3 key for precomputed ground truth embeddings matrix. Defaults to None.
+            embed_documents_function (Callable[[List[str]], List[List[float]]], optional): function to embed a batch of texts.
+                Defaults to None.
+            deterministic_vector_ids (bool, optional): whether vector ids are derived from evaluation data id and chunk index, so
+                records can be fetched by id. False for namespaces created with random vector ids. Defaults to False.
+            max_num_chunks (int, optional): max number of chunks stored for any evaluation data id. Defaults to 1.
         """
         self.input_variables = input_variables
         self.num_unique_data = num_unique_data
+        self.ground_truth_embeddings_s3_key = ground_truth_embeddings_s3_key
+        self.embed_documents_function = embed_documents_function
+        self.deterministic_vector_ids = deterministic_vector_ids
+        self.max_num_chunks = max_num_chunks
+        self._ground_truth_embedding_rows = None
+        self._ground_truth_embeddings = None
+        self._ground_truth_embeddings_lock = threading.Lock()
         super().__init__(**kwargs)
 
     def add_text_embeddings_and_metadata(
@@ -34,36 +68,149 @@ class Pinecone(BaseVectorStore, PineconeOriginal):
         metadata: Optional[List[dict]] = None,
         ids: Optional[List[str]] = None,
         batch_size: int = 32,
+        embedding_batch_size: int = 500,
     ) -> List[str]:
         """Embed texts and add associated ids, embeddings, and metadata to vectorstore without adding texts themselves.
 
         Not adding texts reduces memory required. This is useful when all the data in the text is captured in the metadata.
 
+        If a batch embedding function is available, texts are embedded in batches and each batch is upserted while later batches
+        are still being embedded.
+
         Args:
             texts (Iterable[str]): Texts to add to the vectorstore.
             metadata (Optional[List[dict]], optional): Optional list of metadata.
             ids (Optional[List[str]], optional): Optional list of IDs.
             batch_size (int, optional): batch size for upserting vectors. Defaults to 32.
+            embedding_batch_size (int, optional): number of texts embedded per batch if batch embedding function is available.
+                Defaults to 500.
 
         Returns:
             List[str]: List of IDs of the added texts.
         """
-        # Embed and create the documents. Do not upload the actual text since all the data is in the metadata
-        docs = []
+        texts = list(texts)
+        start_time = time.time()
+
+        # Derive ids from evaluation data id and chunk index if using deterministic vector ids, otherwise use random ids
+        if ids is None and metadata and self.deterministic_vector_ids:
+            ids = []
+            num_chunks_per_evaluation_data_id = {}
+            for metadata_item in metadata:
+                evaluation_data_id = int(metadata_item["evaluation_data_id"])
+                chunk_index = num_chunks_per_evaluation_data_id.get(
+                    evaluation_data_id, 0
+                )
+                num_chunks_per_evaluation_data_id[evaluation_data_id] = chunk_index + 1
+                ids.append(
+                    self.get_vector_id(
+                        evaluation_data_id=evaluation_data_id, chunk_index=chunk_index
+                    )
+                )
+            self.max_num_chunks = max(
+                num_chunks_per_evaluation_data_id.values(), default=1
+            )
+
         ids = ids or [str(uuid.uuid4()) for _ in texts]
-        for i, text in enumerate(texts):
-            embedding = self._embedding_function(text)
-            metadata_item = metadata[i] if metadata else {}
-            docs.append((ids[i], embedding, metadata_item))
-
-        # upsert to Pinecone
-        self._index.upsert(
-            vectors=docs,
-            namespace=self._namespace,
-            batch_size=batch_size,
+
+        # Embed texts one at a time if batch embedding function is not available
+        if self.embed_documents_function is None:
+            # Embed and create the documents. Do not upload the actual text since all the data is in the metadata
+            docs = []
+            for i, text in enumerate(texts):
+                embedding = self._embedding_function(text)
+                metadata_item = metadata[i] if metadata else {}
+                docs.append((ids[i], embedding, metadata_item))
+
+            # upsert to Pinecone
+            self._index.upsert(
+                vectors=docs,
+                namespace=self._namespace,
+                batch_size=batch_size,
+            )
+
+        # Otherwise, embed batches of texts in parallel and upsert each batch as soon as it is embedded, so that upserts overlap
+        # with embedding of later batches
+        else:
+
+            def embed_batch(batch_start: int) -> List[tuple]:
+                batch_texts = texts[batch_start : batch_start + embedding_batch_size]
+                batch_embeddings = self.embed_documents_function(batch_texts)
+                return [
+                    (
+                        ids[batch_start + i],
+                        embedding,
+                        metadata[batch_start + i] if metadata else {},
+                    )
+                    for i, embedding in enumerate(batch_embeddings)
+                ]
+
+            with ThreadPoolExecutor(
+                max_workers=MAX_CONCURRENT_EMBEDDING_BATCHES
+            ) as embedding_executor, ThreadPoolExecutor(
+                max_workers=MAX_CONCURRENT_UPSERTS
+            ) as upsert_executor:
+                embedding_futures = [
+                    embedding_executor.submit(embed_batch, batch_start)
+                    for batch_start in range(0, len(texts), embedding_batch_size)
+                ]
+                upsert_futures = [
+                    upsert_executor.submit(
+                        self._index.upsert,
+                        vectors=embedding_future.result(),
+                        namespace=self._namespace,
+                        batch_size=batch_size,
+                    )
+                    for embedding_future in as_completed(embedding_futures)
+                ]
+                for upsert_future in upsert_futures:
+                    upsert_future.result()
+
+        # Report ingest throughput
+        ingest_time = time.time() - start_time
+        print(
+            f"Ingested {len(texts)} rows into vector db in {ingest_time:.2f} seconds ({len(texts) / max(ingest_time, 1e-9):.1f} rows/sec)"
         )
         return ids
 
+    @staticmethod
+    def get_vector_id(evaluation_data_id: int, chunk_index: int = 0) -> str:
+        """Returns deterministic vector id for given chunk of evaluation data point.
+
+        Args:
+            evaluation_data_id (int): evaluation data id.
+            chunk_index (int, optional): index of chunk for this evaluation data point. Defaults to 0.
+
+        Returns:
+            str: vector id.
+        """
+        return VECTOR_ID_FORMAT_STRING.format(
+            evaluation_data_id=int(evaluation_data_id), chunk_index=chunk_index
+        )
+
+    def get_deterministic_vector_ids(self) -> bool:
+        """Returns whether vector ids are derived from evaluation data id and chunk index.
+
+        Returns:
+            bool: whether vector ids are deterministic.
+        """
+        return self.deterministic_vector_ids
+
+    def get_max_num_chunks(self) -> int:
+        """Returns max number of chunks stored for any evaluation data id.
+
+        Returns:
+            int: max number of chunks.
+        """
+        return self.max_num_chunks
+
+    def get_backend(self) -> str:
+        """Returns name of vector db backend.
+
+        Returns:
+            str: "pinecone".
+        """
+        return "pinecone"
+
     def get_namespace(self) -> str:
         """Returns namespace.
 
@@ -88,6 +235,147 @@ class Pinecone(BaseVectorStore, PineconeOriginal):
         """
         return self.num_unique_data
 
+    def get_ground_truth_embeddings_s3_key(self) -> str:
+        """Returns s3 key for precomputed ground truth embeddings matrix.
+
+        Returns:
+            str: s3 key.
+        """
+        return self.ground_truth_embeddings_s3_key
+
+    def set_ground_truth_embeddings(
+        self, evaluation_data_id_list: List[int], ground_truth_embeddings: np.ndarray
+    ) -> None:
+        """Stores ground truth embeddings in memory, replacing embeddings previously stored for the same evaluation data ids.
+
+        Args:
+            evaluation_data_id_list (List[int]): evaluation data id corresponding to each row of the embeddings matrix.
+            ground_truth_embeddings (np.ndarray): matrix of ground truth embeddings with one row per evaluation data id.
+        """
+        with self._ground_truth_embeddings_lock:
+            self._add_ground_truth_embeddings(
+                evaluation_data_id_list=evaluation_data_id_list,
+                ground_truth_embeddings=ground_truth_embeddings,
+            )
+
+    def _add_ground_truth_embeddings(
+        self, evaluation_data_id_list: List[int], ground_truth_embeddings: np.ndarray
+    ) -> None:
+        """Adds ground truth embeddings to in-memory matrix. Assumes lock is held.
+
+        Args:
+            evaluation_data_id_list (List[int]): evaluation data id corresponding to each row of the embeddings matrix.
+            ground_truth_embeddings (np.ndarray): matrix of ground truth embeddings with one row per evaluation data id.
+        """
+        ground_truth_embeddings = np.asarray(ground_truth_embeddings, dtype=np.float32)
+        if self._ground_truth_embeddings is None:
+            self._ground_truth_embedding_rows = {}
+            self._ground_truth_embeddings = np.empty(
+                (0, ground_truth_embeddings.shape[1]), dtype=np.float32
+            )
+
+        offset = len(self._ground_truth_embeddings)
+        self._ground_truth_embeddings = np.vstack(
+            [self._ground_truth_embeddings, ground_truth_embeddings]
+        )
+        for i, evaluation_data_id in enumerate(evaluation_data_id_list):
+            self._ground_truth_embedding_rows[int(evaluation_data_id)] = offset + i
+
+    def get_ground_truth_embeddings(
+        self, evaluation_data_id_list: List[int]
+    ) -> np.ndarray:
+        """Returns matrix of ground truth embeddings for the given evaluation data ids.
+
+        Ground truth embeddings are loaded from s3 the first time they are needed. Ground truths missing from the precomputed matrix
+        (e.g., for vector db namespaces created before embeddings were precomputed) are fetched from the vector db and embedded
+        once, then kept in memory for later calls.
+
+        Args:
+            evaluation_data_id_list (List[int]): list of evaluation data ids.
+
+        Raises:
+            ValueError: checks if embedding function exists to embed missing ground truths.
+
+        Returns:
+            np.ndarray: matrix of ground truth embeddings with one row per evaluation data id in the given order.
+        """
+        with self._ground_truth_embeddings_lock:
+            # Load precomputed ground truth embeddings from s3 if not yet loaded
+            if (
+                self._ground_truth_embeddings is None
+                and self.ground_truth_embeddings_s3_key
+            ):
+                ground_truth_embeddings_bytes, _ = read_object(
+                    key=self.ground_truth_embeddings_s3_key
+                )
+
+                # If precomputed embeddings are missing, fall through to embedding ground truths below
+                if ground_truth_embeddings_bytes is None:
+                    logging.warning(
+                        f"Ground truth embeddings {self.ground_truth_embeddings_s3_key} do not exist; embedding ground truths instead"
+                    )
+                else:
+                    with np.load(
+                        io.BytesIO(ground_truth_embeddings_bytes)
+                    ) as ground_truth_embeddings_file:
+                        self._add_ground_truth_embeddings(
+                            evaluation_data_id_list=ground_truth_embeddings_file[
+                                "evaluation_data_ids"
+                            ].tolist(),
+                            ground_truth_embeddings=ground_truth_embeddings_file[
+                                "embeddings"
+                            ],
+                        )
+
+            # Embed ground truths that are not available yet
+            missing_evaluation_data_id_list = list(
+                dict.fromkeys(
+                    int(evaluation_data_id)
+                    for evaluation_data_id in evaluation_data_id_list
+                    if self._ground_truth_embedding_rows is None
+                    or int(evaluation_data_id) not in self._ground_truth_embedding_rows
+                )
+            )
+            if len(missing_evaluation_data_id_list) > 0:
+                if (
+                    self.embed_documents_function is None
+                    and self._embedding_function is None
+                ):
+                    raise ValueError(
+                        "Must specify an embedding function to embed ground truths."
+                    )
+                db_results = self.get_data_per_evaluation_data_id(
+                    evaluation_data_id_list=missing_evaluation_data_id_list,
+                    include_embeddings=False,
+                    include_input_variables_in_metadata=False,
+                )
+                ground_truths = [
+                    str(metadata["ground_truth"]) for metadata in db_results["metadata"]
+                ]
+                if self.embed_documents_function is not None:
+                    ground_truth_embeddings = self.embed_documents_function(
+                        ground_truths
+                    )
+                else:
+                    ground_truth_embeddings = [
+                        self._embedding_function(ground_truth)
+                        for ground_truth in ground_truths
+                    ]
+                self._add_ground_truth_embeddings(
+                    evaluation_data_id_list=[
+                        metadata["evaluation_data_id"]
+                        for metadata in db_results["metadata"]
+                    ],
+                    ground_truth_embeddings=ground_truth_embeddings,
+                )
+
+            # Select rows in the order of the given evaluation data ids
+            rows = [
+                self._ground_truth_embedding_rows[int(evaluation_data_id)]
+                for evaluation_data_id in evaluation_data_id_list
+            ]
+            return self._ground_truth_embeddings[rows]
+
     def get_data_per_evaluation_data_id(
         self,
         evaluation_data_id_list: List[int],
@@ -120,38 +408,30 @@ class Pinecone(BaseVectorStore, PineconeOriginal):
         Returns:
             dict: consolidated list of db ids, metadata, and embeddings.
         """
-        # Embed query if provided
-        if query:
-            query_embedding = self._embedding_function(query)
-        # Otherwise, use zero vector
+        # Fetch db record for each evaluation data id that is most similar to query
+        # If no query string is provided, then fetch first db record for each of the provided evaluation data ids
+        if self.deterministic_vector_ids:
+            fetched_data_list = self._fetch_data_per_evaluation_data_id(
+                evaluation_data_id_list=evaluation_data_id_list, query=query
+            )
         else:
-            query_embedding = [0] * VECTOR_DIMENSIONS
+            fetched_data_list = self._query_data_per_evaluation_data_id(
+                evaluation_data_id_list=evaluation_data_id_list,
+                query=query,
+                include_embeddings=include_embeddings,
+                include_metadata=include_metatata,
+            )
 
         # Create lists to store combined results from db pull
-        combined_ids = []
+        combined_ids = [fetched_data["id"] for fetched_data in fetched_data_list]
         if include_embeddings:
-            combined_embeddings = []
+            combined_embeddings = [
+                list(fetched_data["values"]) for fetched_data in fetched_data_list
+            ]
         if include_metatata:
-            combined_metadata = []
-
-        # Fetch db record for each evaluation data id that is most similar to query, then add to combined list
-        # If no query string is provided, then fetch first db record for each of the provided evaluation data ids
-        for id in evaluation_data_id_list:
-            db_result = self._index.query(
-                vector=query_embedding,
-                filter={"evaluation_data_id": id},
-                top_k=1,
-                namespace=self._namespace,
-                include_values=include_embeddings,
-                include_metadata=include_metatata,
-            )
-            fetched_data = db_result["matches"][0]
-
-            combined_ids.append(fetched_data["id"])
-            if include_embeddings:
-                combined_embeddings.append(fetched_data["values"])
-            if include_metatata:
-                combined_metadata.append(fetched_data["metadata"])
+            combined_metadata = [
+                dict(fetched_data["metadata"]) for fetched_data in fetched_data_list
+            ]
 
         if include_metatata:
             # Remove evaluation_data_id key in metadata if requested
@@ -180,6 +460,128 @@ class Pinecone(BaseVectorStore, PineconeOriginal):
 
         return combined_db_result
 
+    def _fetch_data_per_evaluation_data_id(
+        self, evaluation_data_id_list: List[int], query: str = None
+    ) -> List[dict]:
+        """Fetches db record for each evaluation data id by deterministic vector id, in batches of ids sent in parallel.
+
+        If an evaluation data point has multiple chunks, selects the chunk most similar to the query string (or the first chunk if
+        no query string is provided).
+
+        Args:
+            evaluation_data_id_list (List[int]): list of evaluation data ids for which to fetch one db record each.
+            query (str, optional): query to find most similar chunk. Defaults to None.
+
+        Raises:
+            ValueError: checks that a db record exists for each evaluation data id.
+
+        Returns:
+            List[dict]: id, values, and metadata of fetched db record for each evaluation data id in the given order.
+        """
+        # Fetch all chunks of all requested evaluation data points
+        vector_ids = [
+            self.get_vector_id(evaluation_data_id=id, chunk_index=chunk_index)
+            for id in dict.fromkeys(evaluation_data_id_list)
+            for chunk_index in range(self.max_num_chunks)
+        ]
+        vector_id_batches = [
+            vector_ids[i : i + FETCH_BATCH_SIZE]
+            for i in range(0, len(vector_ids), FETCH_BATCH_SIZE)
+        ]
+        fetched_vectors = {}
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(MAX_CONCURRENT_REQUESTS, len(vector_id_batches)))
+        ) as executor:
+            for fetch_response in executor.map(
+                lambda ids: self._index.fetch(ids=ids, namespace=self._namespace),
+                vector_id_batches,
+            ):
+                fetched_vectors.update(fetch_response["vectors"])
+
+        # Embed query only if there are multiple chunks to choose from
+        query_embedding = None
+        if query and self.max_num_chunks > 1:
+            query_embedding = np.array(self._embedding_function(query))
+
+        # Select one chunk per evaluation data id
+        fetched_data_list = []
+        for id in evaluation_data_id_list:
+            chunks = [
+                fetched_vectors[vector_id]
+                for vector_id in [
+                    self.get_vector_id(evaluation_data_id=id, chunk_index=chunk_index)
+                    for chunk_index in range(self.max_num_chunks)
+                ]
+                if vector_id in fetched_vectors
+            ]
+            if len(chunks) == 0:
+                raise ValueError(
+                    f"No vector db record found for evaluation data id {id}."
+                )
+            if query_embedding is not None:
+                chunk = max(
+                    chunks,
+                    key=lambda chunk: np.dot(
+                        np.array(chunk["values"]), query_embedding
+                    ),
+                )
+            else:
+                chunk = chunks[0]
+            fetched_data_list.append(
+                {
+                    "id": chunk["id"],
+                    "values": chunk["values"],
+                    "metadata": chunk.get("metadata", {}),
+                }
+            )
+
+        return fetched_data_list
+
+    def _query_data_per_evaluation_data_id(
+        self,
+        evaluation_data_id_list: List[int],
+        query: str = None,
+        include_embeddings: bool = True,
+        include_metadata: bool = True,
+    ) -> List[dict]:
+        """Queries db record for each evaluation data id that is most similar to query string, with queries sent in parallel.
+
+        Used for namespaces with random vector ids, which cannot be fetched by id.
+
+        Args:
+            evaluation_data_id_list (List[int]): list of evaluation data ids for which to fetch one db record each.
+            query (str, optional): query to find most similar db entry. Defaults to None.
+            include_embeddings (bool, optional): whether to fetch embeddings from vector db. Defaults to True.
+            include_metadata (bool, optional): whether to fetch metadata from vector db. Defaults to True.
+
+        Returns:
+            List[dict]: matches for each evaluation data id in the given order.
+        """
+        # Embed query if provided
+        if query:
+            query_embedding = self._embedding_function(query)
+        # Otherwise, use zero vector
+        else:
+            query_embedding = [0] * VECTOR_DIMENSIONS
+
+        def query_evaluation_data_id(id: int) -> dict:
+            db_result = self._index.query(
+                vector=query_embedding,
+                filter={"evaluation_data_id": id},
+                top_k=1,
+                namespace=self._namespace,
+                include_values=include_embeddings,
+                include_metadata=include_metadata,
+            )
+            return db_result["matches"][0]
+
+        with ThreadPoolExecutor(
+            max_workers=max(
+                1, min(MAX_CONCURRENT_REQUESTS, len(evaluation_data_id_list))
+            )
+        ) as executor:
+            return list(executor.map(query_evaluation_data_id, evaluation_data_id_list))
+
     def max_marginal_relevance_search(
         self,
         query: str,
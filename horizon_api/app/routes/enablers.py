@@ -5,6 +5,7 @@ from app import db, api
 from app.utilities.authentication.api_key_auth import api_key_required
 from app.utilities.authentication.cognito_auth import get_user_email
 from app.utilities.dataset_processing import data_check
+from app.utilities.dataset_processing import dataset_profile
 from app.utilities.email_notifications import email_notifications
 from app.utilities.synthetic_data import synthetic_data
 from app.utilities.S3.s3_util import (
@@ -58,8 +59,10 @@ class GenerateSyntheticDataAPI(Resource):
             original_dataset.save(temp_file_path)
 
         try:
-            data_check.check_evaluation_dataset_and_data_length(
-                dataset_file_path=temp_file_path, synthetic_data_generation=True
+            checked_evaluation_dataset = (
+                data_check.check_evaluation_dataset_and_data_length(
+                    dataset_file_path=temp_file_path, synthetic_data_generation=True
+                )
             )
         except Exception as e:
             logging.error(
@@ -72,6 +75,11 @@ class GenerateSyntheticDataAPI(Resource):
             upload_file_to_s3(temp_file, dataset_s3_key)
         os.remove(temp_file_path)
 
+        # Store profile of dataset processed during validation, so that it is not processed again for synthetic data generation
+        dataset_profile.store_dataset_profile(
+            raw_dataset_s3_key=dataset_s3_key, **checked_evaluation_dataset
+        )
+
         logging.info("GenerateSyntheticDataAPI: Finished uploading original dataset")
 
         # Call the process_generate_synthetic_data function as a background job with the provided details
@@ -5,6 +5,7 @@ from app import db
 from app.utilities.authentication.api_key_auth import api_key_required
 from app.utilities.run.generate_prompt import generate_prompt_model_configuration
 from app.deploy.prompt import deploy_prompt
+from app.deploy.compiled_prompt_cache import get_compiled_prompt_cache
 
 
 class ListPromptsAPI(Resource):
@@ -125,6 +126,9 @@ class PromptAPI(Resource):
             db.session.rollback()
             return {"error": str(e)}, 400
 
+        # Drop compiled version of prompt so that it is recompiled on next deployment
+        get_compiled_prompt_cache().invalidate(prompt_id=prompt.id)
+
         return {
             "message": "Prompt updated successfully",
             "prompt": prompt.to_dict(),
@@ -142,6 +146,7 @@ class PromptAPI(Resource):
         if not prompt:
             return {"error": "Prompt not found or not associated with user"}, 404
 
+        prompt_id = prompt.id
         try:
             db.session.delete(prompt)
             db.session.commit()
@@ -149,6 +154,9 @@ class PromptAPI(Resource):
             db.session.rollback()
             return {"error": str(e)}, 400
 
+        # Drop compiled version of deleted prompt
+        get_compiled_prompt_cache().invalidate(prompt_id=prompt_id)
+
         return {"message": "Prompt deleted successfully"}, 200
 
 
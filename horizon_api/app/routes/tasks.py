@@ -1,4 +1,12 @@
-from flask import request, send_file, make_response, g, send_from_directory
+from flask import (
+    request,
+    send_file,
+    make_response,
+    g,
+    send_from_directory,
+    Response,
+    stream_with_context,
+)
 from flask_restful import Resource, reqparse
 from celery import shared_task
 from app.models.component import User, Task, Prompt, Project
@@ -7,10 +15,18 @@ from app.utilities.authentication.api_key_auth import api_key_required
 from app.utilities.authentication.cognito_auth import get_user_email
 from app.utilities.run import generate_prompt
 from app.utilities.run import task_confirmation_details
+from app.utilities.run.checkpoint import TaskGenerationCheckpoint
 from app.utilities.dataset_processing import data_check
+from app.utilities.dataset_processing import dataset_profile
 from app.utilities.output_schema import output_schema as output_schema_util
+from app.utilities.output_schema.schema_registry import get_pydantic_schema_registry
 from app.utilities.email_notifications import email_notifications
-from app.deploy.prompt import deploy_prompt
+from app.deploy.prompt import deploy_prompt, deploy_prompt_stream
+from app.deploy.batch import generate_batch_outputs
+from app.deploy.compiled_prompt_cache import (
+    get_compiled_prompt_cache,
+    touch_prompts_for_task,
+)
 from app.models.llm.factory import LLMFactory
 from app.utilities.S3.s3_util import (
     upload_file_to_s3,
@@ -24,7 +40,13 @@ import logging
 import datamodel_code_generator
 from pathlib import Path
 import tempfile
-from app.utilities.logging.task_logger import TaskLogger
+import base64
+import binascii
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+from app.utilities.logging.task_logger import EXPORT_FILE_FORMATS, TaskLogger
+from app.utilities.logging.deployment_log_writer import get_deployment_log_writer
+from config import Config
 
 ALLOWED_EVALUTION_DATASET_EXTENSIONS = {"csv"}
 ALLOWED_OUTPUT_SCHEMA_EXTENSIONS = {"json"}
@@ -260,6 +282,7 @@ class SetCurrentPromptAPI(Resource):
         if not prompt:
             return {"error": "Prompt not found or not associated with user"}, 404
 
+        previous_active_prompt_id = task.active_prompt_id
         task.active_prompt_id = prompt.id
         try:
             db.session.commit()
@@ -267,6 +290,10 @@ class SetCurrentPromptAPI(Resource):
             db.session.rollback()
             return {"error": str(e)}, 400
 
+        # Drop compiled versions of previous and new active prompts so that they are recompiled on next deployment
+        get_compiled_prompt_cache().invalidate(prompt_id=previous_active_prompt_id)
+        get_compiled_prompt_cache().invalidate(prompt_id=prompt.id)
+
         return {
             "message": "Current prompt updated successfully",
             "task": task.to_dict_filtered(),
@@ -299,8 +326,11 @@ class GetTaskConfirmationDetailsAPI(Resource):
         }, 200
 
 
-@shared_task(ignore_result=True)
+@shared_task(
+    bind=True, ignore_result=True, max_retries=Config.TASK_GENERATION_MAX_RETRIES
+)
 def process_generate_prompt_model_configuration(
+    self,
     user_objective: str,
     task_id: int,
     prompt_id: int,
@@ -309,7 +339,9 @@ def process_generate_prompt_model_configuration(
 ) -> None:
     """Runs prompt-model configuration algorithm as background job.
 
-    Emails results of algorithm to user upon completion.
+    Emails results of algorithm to user upon completion. If the algorithm fails with an unexpected error (e.g., LLM provider
+    outage), the job is retried with exponential backoff and resumes from the last checkpointed stage. The task is only deleted
+    once retries are exhausted.
 
     Args:
         user_objective (str): objective of the use case.
@@ -337,24 +369,41 @@ def process_generate_prompt_model_configuration(
             openai_api_key=openai_api_key,
             anthropic_api_key=anthropic_api_key,
         )
-
-        # If successful, email job results to user
-        email_notifications.email_task_creation_success(
-            user_email=user_email, task_details=task_configuration_dict
-        )
     except Exception as e:
+        db.session.rollback()
+
+        # Retry unexpected errors, resuming from the last checkpointed stage. Invalid inputs are not retried
+        if (
+            not isinstance(e, (ValueError, AssertionError))
+            and self.request.retries < self.max_retries
+        ):
+            raise self.retry(exc=e, countdown=60 * 2**self.request.retries)
+
         # If failed, email error details to user
         email_notifications.email_task_creation_error(
             user_email=user_email, error_message=str(e)
         )
 
-        # Delete task if task generation fails
+        # Delete checkpoints and task if task generation fails
         try:
+            TaskGenerationCheckpoint(task_id=task_id, fingerprint_data={}).delete()
             db.session.delete(task)
             db.session.commit()
         except Exception as e:
             db.session.rollback()
             return {"error": str(e)}, 400
+        return
+
+    # If successful, email job results to user. Sent outside of the retried scope, since the task is already saved and its
+    # checkpoints are deleted, so a retry would rerun the algorithm and a failure would delete the successful task
+    try:
+        email_notifications.email_task_creation_success(
+            user_email=user_email, task_details=task_configuration_dict
+        )
+    except Exception as e:
+        logging.error(
+            f"Failed to email task creation success for task {task_id}: {str(e)}"
+        )
 
 
 class GenerateTaskAPI(Resource):
@@ -417,6 +466,100 @@ class GenerateTaskAPI(Resource):
         }, 200
 
 
+def format_server_sent_event(event: dict) -> str:
+    """Formats deployment event as a server-sent event, with the event type as the event name and the rest as JSON data.
+
+    Args:
+        event (dict): deployment event with "event" key.
+
+    Returns:
+        str: server-sent event.
+    """
+    data = {key: value for key, value in event.items() if key != "event"}
+    return f"event: {event['event']}\ndata: {json.dumps(data)}\n\n"
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parses ISO 8601 timestamp from request into naive UTC datetime, as stored in db.
+
+    Args:
+        value (str): ISO 8601 timestamp (e.g., "2023-06-01T12:00:00Z"). Timestamps without timezone are assumed to be UTC.
+
+    Raises:
+        ValueError: timestamp is not in ISO 8601 format.
+
+    Returns:
+        datetime: naive UTC datetime.
+    """
+    timestamp = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def add_deployment_log_time_range_arguments(parser: reqparse.RequestParser) -> None:
+    """Adds optional start_time and end_time query arguments to filter deployment logs.
+
+    Args:
+        parser (reqparse.RequestParser): request parser.
+    """
+    parser.add_argument(
+        "start_time",
+        type=parse_timestamp,
+        location="args",
+        required=False,
+        default=None,
+        help="Include logs at or after this ISO 8601 timestamp (UTC if no timezone)",
+    )
+    parser.add_argument(
+        "end_time",
+        type=parse_timestamp,
+        location="args",
+        required=False,
+        default=None,
+        help="Include logs before this ISO 8601 timestamp (UTC if no timezone)",
+    )
+
+
+def encode_deployment_log_cursor(cursor: Tuple[datetime, int]) -> str:
+    """Encodes timestamp and id of last deployment log of a page as an opaque cursor.
+
+    Args:
+        cursor (Tuple[datetime, int]): timestamp and id of deployment log.
+
+    Returns:
+        str: cursor.
+    """
+    return base64.urlsafe_b64encode(
+        f"{cursor[0].isoformat()}|{cursor[1]}".encode("UTF-8")
+    ).decode("UTF-8")
+
+
+def decode_deployment_log_cursor(
+    cursor: Optional[str],
+) -> Optional[Tuple[datetime, int]]:
+    """Decodes cursor into timestamp and id of last deployment log of the previous page.
+
+    Args:
+        cursor (Optional[str]): cursor, or None for first page.
+
+    Raises:
+        ValueError: cursor is malformed.
+
+    Returns:
+        Optional[Tuple[datetime, int]]: timestamp and id of deployment log, or None for first page.
+    """
+    if not cursor:
+        return None
+    try:
+        timestamp, log_id = (
+            base64.urlsafe_b64decode(cursor.encode("UTF-8")).decode("UTF-8").split("|")
+        )
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+    return datetime.fromisoformat(timestamp), int(log_id)
+
+
 class DeployTaskAPI(Resource):
     @api_key_required
     def post(self):
@@ -451,6 +594,13 @@ class DeployTaskAPI(Resource):
             default=False,
             help="Set to true to log the deployment. Defaults to false.",
         )
+        parser.add_argument(
+            "stream",
+            type=bool,
+            required=False,
+            default=False,
+            help="Set to true to stream tokens of the completion as server-sent events. Defaults to false.",
+        )
         args = parser.parse_args()
 
         # Fetch task and check it is associated with user
@@ -469,6 +619,23 @@ class DeployTaskAPI(Resource):
         if not prompt:
             return {"error": "Active prompt does not exist for the task"}, 404
 
+        # Stream tokens as server-sent events, ending with the completion validated against the output schema (if any)
+        if args["stream"]:
+            deployment_events = deploy_prompt_stream(
+                prompt=prompt,
+                input_values=args["inputs"],
+                openai_api_key=args["openai_api_key"],
+                anthropic_api_key=args["anthropic_api_key"],
+                log_deployment=args["log_deployment"],
+            )
+            return Response(
+                stream_with_context(
+                    format_server_sent_event(event) for event in deployment_events
+                ),
+                mimetype="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
         # Call the deploy function with the active prompt id and provided inputs
         try:
             output = deploy_prompt(
@@ -486,6 +653,161 @@ class DeployTaskAPI(Resource):
             return {"error": f"Failed with exception: {str(e)}"}, 400
 
 
+class DeployTaskBatchAPI(Resource):
+    @api_key_required
+    def post(self):
+        parser = reqparse.RequestParser()
+        parser.add_argument(
+            "deployments",
+            type=list,
+            location="json",
+            required=True,
+            help="Deployments are required as a list of dictionaries with task_id and inputs",
+        )
+        parser.add_argument(
+            "openai_api_key",
+            type=str,
+            required=False,
+            default=None,
+            help="Provide OpenAI API key to deploy OpenAI models",
+        )
+        parser.add_argument(
+            "anthropic_api_key",
+            type=str,
+            required=False,
+            default=None,
+            help="Provide Anthropic API key to deploy Anthropic models",
+        )
+        parser.add_argument(
+            "log_deployment",
+            type=bool,
+            required=False,
+            default=False,
+            help="Set to true to log the deployments. Defaults to false.",
+        )
+        parser.add_argument(
+            "stream",
+            type=bool,
+            required=False,
+            default=False,
+            help="Set to true to stream results as newline-delimited JSON in order of completion. Defaults to false.",
+        )
+        args = parser.parse_args()
+        deployments = args["deployments"]
+
+        # Check number of deployments and format of each deployment
+        if len(deployments) == 0 or len(deployments) > Config.DEPLOY_BATCH_MAX_SIZE:
+            return {
+                "error": f"Provide between 1 and {Config.DEPLOY_BATCH_MAX_SIZE} deployments"
+            }, 400
+        for deployment in deployments:
+            if (
+                not isinstance(deployment, dict)
+                or not isinstance(deployment.get("task_id"), int)
+                or not isinstance(deployment.get("inputs"), dict)
+            ):
+                return {
+                    "error": "Each deployment must have an integer task_id and a dictionary of inputs"
+                }, 400
+
+        # Fetch tasks associated with user and their active prompts
+        task_id_list = list({deployment["task_id"] for deployment in deployments})
+        tasks = {
+            task.id: task
+            for task in Task.query.join(Project, Project.id == Task.project_id)
+            .filter(Task.id.in_(task_id_list), Project.user_id == g.user.id)
+            .all()
+        }
+        prompts = {
+            prompt.id: prompt
+            for prompt in Prompt.query.filter(
+                Prompt.id.in_(
+                    [
+                        task.active_prompt_id
+                        for task in tasks.values()
+                        if task.active_prompt_id
+                    ]
+                )
+            ).all()
+        }
+
+        # Compile active prompt of each task once for the whole batch
+        compiled_prompts = {}
+        task_errors = {}
+        for task_id in task_id_list:
+            task = tasks.get(task_id)
+            if not task:
+                task_errors[task_id] = "Task not found or not associated with user"
+                continue
+            prompt = prompts.get(task.active_prompt_id)
+            if not prompt:
+                task_errors[task_id] = "Active prompt not found for the task"
+                continue
+            try:
+                compiled_prompts[task_id] = (
+                    prompt,
+                    get_compiled_prompt_cache().get_or_compile(
+                        prompt=prompt, task=task
+                    ),
+                )
+            except Exception as e:
+                task_errors[task_id] = f"Failed with exception: {str(e)}"
+
+        batch_outputs = generate_batch_outputs(
+            deployment_list=deployments,
+            compiled_prompts=compiled_prompts,
+            task_errors=task_errors,
+            openai_api_key=args["openai_api_key"],
+            anthropic_api_key=args["anthropic_api_key"],
+            log_deployment=args["log_deployment"],
+            max_workers=Config.DEPLOY_BATCH_MAX_CONCURRENCY,
+        )
+
+        # Stream each result as a line of JSON as soon as it completes, and queue deployment logs of the batch together once
+        # streaming ends (including if the client disconnects early)
+        deployment_log_writer = get_deployment_log_writer()
+        if args["stream"]:
+
+            def generate_stream():
+                deployment_log_values_list = []
+                try:
+                    for _, result, deployment_log_values in batch_outputs:
+                        if deployment_log_values is not None:
+                            deployment_log_values_list.append(deployment_log_values)
+                        yield json.dumps(result) + "\n"
+                finally:
+                    deployment_log_writer.enqueue_many(
+                        pending_deployment_log_values_list=deployment_log_values_list
+                    )
+
+            return Response(
+                stream_with_context(generate_stream()),
+                mimetype="application/x-ndjson",
+            )
+
+        # Return results in order of deployments provided, and queue deployment logs of the batch together
+        results = [None] * len(deployments)
+        deployment_log_values_list = []
+        for i, result, deployment_log_values in batch_outputs:
+            results[i] = result
+            if deployment_log_values is not None:
+                deployment_log_values_list.append(deployment_log_values)
+        num_logs_dropped = len(
+            deployment_log_values_list
+        ) - deployment_log_writer.enqueue_many(
+            pending_deployment_log_values_list=deployment_log_values_list
+        )
+        message = "Batch deployed successfully"
+        if num_logs_dropped > 0:
+            # Still return completions, since they have already been generated
+            message = f"Batch deployed successfully, but failed to log {num_logs_dropped} deployments"
+
+        return {
+            "message": message,
+            "results": results,
+        }, 200
+
+
 class UploadEvaluationDatasetsAPI(Resource):
     @api_key_required
     def post(self, task_id):
@@ -512,8 +834,10 @@ class UploadEvaluationDatasetsAPI(Resource):
             evaluation_dataset.save(temp_file_path)
 
         try:
-            data_check.check_evaluation_dataset_and_data_length(
-                dataset_file_path=temp_file_path
+            checked_evaluation_dataset = (
+                data_check.check_evaluation_dataset_and_data_length(
+                    dataset_file_path=temp_file_path
+                )
             )
         except Exception as e:
             logging.error(
@@ -527,6 +851,11 @@ class UploadEvaluationDatasetsAPI(Resource):
             upload_file_to_s3(temp_file, s3_key)
         os.remove(temp_file_path)
 
+        # Store profile of dataset processed during validation, so that it is not processed again for task generation
+        dataset_profile.store_dataset_profile(
+            raw_dataset_s3_key=s3_key, **checked_evaluation_dataset
+        )
+
         task.evaluation_dataset = s3_key
 
         try:
@@ -696,6 +1025,12 @@ class UploadOutputSchemasAPI(Resource):
         task.output_schema = output_schema_s3_key
         task.pydantic_model = pydantic_model_s3_key
 
+        # Mark prompts of task as updated so that deployments recompile them with new output schema
+        touch_prompts_for_task(task=task)
+        get_pydantic_schema_registry().invalidate(
+            pydantic_model_s3_key=pydantic_model_s3_key
+        )
+
         try:
             db.session.commit()
         except Exception as e:
@@ -732,6 +1067,12 @@ class DeleteOutputSchemasAPI(Resource):
         delete_file_from_s3(pydantic_model_s3_key)
         task.pydantic_model = None
 
+        # Mark prompts of task as updated so that deployments recompile them without output schema
+        touch_prompts_for_task(task=task)
+        get_pydantic_schema_registry().invalidate(
+            pydantic_model_s3_key=pydantic_model_s3_key
+        )
+
         try:
             db.session.commit()
         except Exception as e:
@@ -744,6 +1085,65 @@ class DeleteOutputSchemasAPI(Resource):
         }, 200
 
 
+class ListDeploymentLogsAPI(Resource):
+    @api_key_required
+    def get(self, task_id):
+        # Fetch task and check it is associated with user
+        task = (
+            Task.query.join(Project, Project.id == Task.project_id)
+            .filter(Task.id == task_id, Project.user_id == g.user.id)
+            .first()
+        )
+        if not task:
+            return {"error": "Task not found or not associated with user"}, 404
+
+        parser = reqparse.RequestParser()
+        add_deployment_log_time_range_arguments(parser)
+        parser.add_argument(
+            "limit",
+            type=int,
+            location="args",
+            required=False,
+            default=100,
+            help=f"Max number of logs to return, up to {Config.DEPLOYMENT_LOG_PAGE_MAX_SIZE}. Defaults to 100.",
+        )
+        parser.add_argument(
+            "cursor",
+            type=str,
+            location="args",
+            required=False,
+            default=None,
+            help="Cursor returned with the previous page of logs",
+        )
+        args = parser.parse_args()
+        if args["limit"] < 1 or args["limit"] > Config.DEPLOYMENT_LOG_PAGE_MAX_SIZE:
+            return {
+                "error": f"Limit must be between 1 and {Config.DEPLOYMENT_LOG_PAGE_MAX_SIZE}"
+            }, 400
+        try:
+            cursor = decode_deployment_log_cursor(args["cursor"])
+        except ValueError:
+            return {"error": "Invalid cursor"}, 400
+
+        # Fetch next page of logs in time order
+        logs = TaskLogger().query_logs(
+            task_id=task_id,
+            start_time=args["start_time"],
+            end_time=args["end_time"],
+            cursor=cursor,
+            limit=args["limit"],
+        )
+        next_cursor = None
+        if len(logs) == args["limit"]:
+            next_cursor = encode_deployment_log_cursor(
+                (logs[-1]["timestamp"], logs[-1]["id"])
+            )
+        for log in logs:
+            log["timestamp"] = log["timestamp"].isoformat()
+
+        return {"deployment_logs": logs, "next_cursor": next_cursor}, 200
+
+
 class ViewDeploymentLogsAPI(Resource):
     @api_key_required
     def get(self, task_id):
@@ -756,8 +1156,31 @@ class ViewDeploymentLogsAPI(Resource):
         if not task:
             return {"error": "Task not found or not associated with user"}, 404
 
+        parser = reqparse.RequestParser()
+        add_deployment_log_time_range_arguments(parser)
+        parser.add_argument(
+            "format",
+            type=str,
+            location="args",
+            required=False,
+            default="csv",
+            choices=EXPORT_FILE_FORMATS,
+            help="File format of exported logs (csv or parquet). Defaults to csv.",
+        )
+        args = parser.parse_args()
+
+        # Write deployment logs still queued in this process before exporting them
+        get_deployment_log_writer().flush()
         task_logger = TaskLogger()
-        log_file_name = task_logger.get_logs(task_id)
+        try:
+            log_file_name = task_logger.get_logs(
+                task_id=task_id,
+                start_time=args["start_time"],
+                end_time=args["end_time"],
+                file_format=args["format"],
+            )
+        except ValueError as e:
+            return {"error": str(e)}, 400
 
         if not log_file_name:
             return {"error": "Logs not found for this task"}, 404
@@ -783,6 +1206,7 @@ def register_routes(api):
     )
     api.add_resource(GenerateTaskAPI, "/api/tasks/generate")
     api.add_resource(DeployTaskAPI, "/api/tasks/deploy")
+    api.add_resource(DeployTaskBatchAPI, "/api/tasks/deploy_batch")
     api.add_resource(
         UploadEvaluationDatasetsAPI,
         "/api/tasks/<int:task_id>/upload_evaluation_dataset",
@@ -802,6 +1226,7 @@ def register_routes(api):
     #     DeleteOutputSchemasAPI,
     #     "/api/tasks/<int:task_id>/delete_output_schema",
     # )
+    api.add_resource(ListDeploymentLogsAPI, "/api/tasks/<int:task_id>/deployment_logs")
     api.add_resource(
         ViewDeploymentLogsAPI, "/api/tasks/<int:task_id>/view_deployment_logs"
     )
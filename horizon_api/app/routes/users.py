@@ -4,6 +4,7 @@ from flask_restful import Resource
 from app import db
 from sqlalchemy.exc import IntegrityError
 from app.utilities.context import RequestContext
+from app.utilities.authentication.api_key_cache import get_api_key_cache
 
 # class RegisterAPI(Resource):
 #     def post(self):
@@ -32,6 +33,7 @@ class GenerateAPIKeyAPI(Resource):
         if not user:
             return {"error": "User not found"}, 404
 
+        old_api_key_hash = user.api_key_hash
         api_key = user.generate_new_api_key()
         try:
             db.session.commit()
@@ -39,6 +41,10 @@ class GenerateAPIKeyAPI(Resource):
             db.session.rollback()
             return {"error": str(e)}, 400
 
+        # Stop accepting old API key from cache, and drop any negative cache entry for new API key
+        get_api_key_cache().invalidate(api_key_hash=old_api_key_hash)
+        get_api_key_cache().invalidate(api_key_hash=user.api_key_hash)
+
         return {
             "api_key": api_key,
             "message": "API key generated successfully. Please store this securely as it cannot be retrieved. If lost, a new API key will need to be generated.",
@@ -0,0 +1,480 @@
+"""Object storage backends used by s3_util, with streaming and ranged reads and a read-through cache keyed by key and ETag.
+
+The "s3" backend reads and writes objects through a single boto3 client per process, whose connection pool is shared by all
+threads. Objects are streamed into memory or into a file-like object rather than saved to temporary files. The "local" backend
+stores objects as files under a local directory with the same interface, so that code paths that read and write objects can be
+run and benchmarked offline.
+
+Small objects read with read_object are kept in an in-memory LRU cache keyed by key and ETag. Cached objects are revalidated with
+a conditional request, so an unchanged object is never downloaded twice and a changed object is never served stale.
+
+Typical usage example:
+
+    with open_object_as_text(key=task.evaluation_dataset) as dataset_file:
+        evaluation_dataset = data_check.get_evaluation_dataset(dataset_file=dataset_file)
+"""
+
+from abc import ABC, abstractmethod
+from config import Config
+from collections import OrderedDict
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
+import boto3
+import botocore.config
+import botocore.exceptions
+import hashlib
+import io
+import os
+import pathlib
+import shutil
+import threading
+
+
+class ObjectStore(ABC):
+    """Interface of object storage backends. Keys are "/"-separated paths."""
+
+    @abstractmethod
+    def get(self, key: str) -> Tuple[Optional[bytes], Optional[str]]:
+        """Returns contents and ETag of object, or (None, None) if it does not exist."""
+        pass
+
+    @abstractmethod
+    def get_if_changed(
+        self, key: str, etag: str
+    ) -> Tuple[bool, Optional[bytes], Optional[str]]:
+        """Returns whether object has changed from the given ETag, with its contents and ETag if so (None if deleted)."""
+        pass
+
+    @abstractmethod
+    def open(self, key: str, start: int = None, end: int = None) -> BinaryIO:
+        """Returns stream of object contents, optionally limited to bytes start to end (inclusive)."""
+        pass
+
+    @abstractmethod
+    def head(self, key: str) -> Optional[str]:
+        """Returns ETag of object, or None if it does not exist."""
+        pass
+
+    @abstractmethod
+    def put(self, key: str, data: Union[bytes, BinaryIO]) -> None:
+        """Writes bytes or contents of file-like object to object."""
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Deletes object if it exists."""
+        pass
+
+    @abstractmethod
+    def list_keys(self, prefix: str) -> List[str]:
+        """Returns keys of objects starting with prefix."""
+        pass
+
+    @abstractmethod
+    def get_download_url(self, key: str, expiration_seconds: int = 3600) -> str:
+        """Returns url to download object."""
+        pass
+
+
+class S3ObjectStore(ObjectStore):
+    """Objects in an s3 bucket, accessed through a shared boto3 client."""
+
+    def __init__(self, client, bucket: str):
+        """Initializes backend.
+
+        Args:
+            client (botocore.client.S3): boto3 s3 client.
+            bucket (str): s3 bucket.
+        """
+        self.client = client
+        self.bucket = bucket
+
+    def get(self, key: str) -> Tuple[Optional[bytes], Optional[str]]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+        except self.client.exceptions.NoSuchKey:
+            return None, None
+        return response["Body"].read(), response["ETag"]
+
+    def get_if_changed(
+        self, key: str, etag: str
+    ) -> Tuple[bool, Optional[bytes], Optional[str]]:
+        # S3 responds with 304 Not Modified, without a body, if ETag still matches
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket, Key=key, IfNoneMatch=etag
+            )
+        except self.client.exceptions.NoSuchKey:
+            return True, None, None
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ["304", "NotModified"]:
+                return False, None, etag
+            raise
+        return True, response["Body"].read(), response["ETag"]
+
+    def open(self, key: str, start: int = None, end: int = None) -> BinaryIO:
+        kwargs = {}
+        if start is not None or end is not None:
+            kwargs["Range"] = f"bytes={start or 0}-{'' if end is None else end}"
+        return self.client.get_object(Bucket=self.bucket, Key=key, **kwargs)["Body"]
+
+    def head(self, key: str) -> Optional[str]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)["ETag"]
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ["404", "NoSuchKey"]:
+                return None
+            raise
+
+    def put(self, key: str, data: Union[bytes, BinaryIO]) -> None:
+        if isinstance(data, (bytes, bytearray)):
+            data = io.BytesIO(data)
+        self.client.upload_fileobj(data, self.bucket, key)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def list_keys(self, prefix: str) -> List[str]:
+        keys = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            keys += [obj["Key"] for obj in page.get("Contents", [])]
+        return keys
+
+    def get_download_url(self, key: str, expiration_seconds: int = 3600) -> str:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=expiration_seconds,
+        )
+
+
+class LocalObjectStore(ObjectStore):
+    """Objects stored as files under a local directory. ETags are derived from file size and modification time."""
+
+    def __init__(self, directory: str):
+        """Initializes backend.
+
+        Args:
+            directory (str): base directory of objects.
+        """
+        self.directory = directory
+
+    def get_path(self, key: str) -> str:
+        """Returns file path of object.
+
+        Args:
+            key (str): key of object.
+
+        Raises:
+            ValueError: checks that key does not point outside of base directory.
+
+        Returns:
+            str: file path.
+        """
+        path = os.path.abspath(os.path.join(self.directory, key))
+        if not path.startswith(os.path.abspath(self.directory) + os.sep):
+            raise ValueError(f"Invalid key: {key}")
+        return path
+
+    def get(self, key: str) -> Tuple[Optional[bytes], Optional[str]]:
+        path = self.get_path(key)
+        try:
+            with open(path, "rb") as file:
+                etag = self._get_etag(os.fstat(file.fileno()))
+                return file.read(), etag
+        except FileNotFoundError:
+            return None, None
+
+    def get_if_changed(
+        self, key: str, etag: str
+    ) -> Tuple[bool, Optional[bytes], Optional[str]]:
+        if self.head(key) == etag:
+            return False, None, etag
+        return (True,) + self.get(key)
+
+    def open(self, key: str, start: int = None, end: int = None) -> BinaryIO:
+        file = open(self.get_path(key), "rb")
+        if start is None and end is None:
+            return file
+
+        # Read requested byte range into memory, as with a ranged s3 request
+        with file:
+            file.seek(start or 0)
+            length = -1 if end is None else end - (start or 0) + 1
+            return io.BytesIO(file.read(length))
+
+    def head(self, key: str) -> Optional[str]:
+        try:
+            return self._get_etag(os.stat(self.get_path(key)))
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: Union[bytes, BinaryIO]) -> None:
+        # Write to temporary file first so that readers never see a partially written object
+        path = self.get_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as file:
+            if isinstance(data, (bytes, bytearray)):
+                file.write(data)
+            else:
+                shutil.copyfileobj(data, file)
+        os.replace(path + ".tmp", path)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.get_path(key))
+        except FileNotFoundError:
+            pass
+
+    def list_keys(self, prefix: str) -> List[str]:
+        keys = []
+        for root, _, files in os.walk(self.directory):
+            for file in files:
+                key = pathlib.Path(
+                    os.path.relpath(os.path.join(root, file), self.directory)
+                ).as_posix()
+                if key.startswith(prefix) and not key.endswith(".tmp"):
+                    keys.append(key)
+        return sorted(keys)
+
+    def get_download_url(self, key: str, expiration_seconds: int = 3600) -> str:
+        return pathlib.Path(self.get_path(key)).as_uri()
+
+    @staticmethod
+    def _get_etag(stat_result: os.stat_result) -> str:
+        return '"{}"'.format(
+            hashlib.md5(
+                f"{stat_result.st_size}-{stat_result.st_mtime_ns}".encode("UTF-8")
+            ).hexdigest()
+        )
+
+
+class ObjectReadCache:
+    """Thread-safe LRU cache of object contents keyed by key and ETag, bounded by total size."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_object_bytes: int = None):
+        """Initializes cache.
+
+        Args:
+            max_bytes (int, optional): max total size of cached objects. Defaults to 64 MB.
+            max_object_bytes (int, optional): max size of a single cached object. Defaults to 1/8 of max_bytes.
+        """
+        self.max_bytes = max_bytes
+        self.max_object_bytes = (
+            max_object_bytes if max_object_bytes is not None else max_bytes // 8
+        )
+        self._cache: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        self._num_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def read(
+        self, object_store: ObjectStore, key: str
+    ) -> Tuple[Optional[bytes], Optional[str]]:
+        """Returns contents and ETag of object, downloading it only if not cached or changed since cached.
+
+        Args:
+            object_store (ObjectStore): backend to read object from.
+            key (str): key of object.
+
+        Returns:
+            Tuple[Optional[bytes], Optional[str]]: contents and ETag of object, or (None, None) if it does not exist.
+        """
+        with self._lock:
+            cached_entry = self._cache.get(key)
+
+        if cached_entry is None:
+            data, etag = object_store.get(key)
+        else:
+            changed, data, etag = object_store.get_if_changed(key, cached_entry[0])
+            if not changed:
+                with self._lock:
+                    if key in self._cache:
+                        self._cache.move_to_end(key)
+                    self.hits += 1
+                return cached_entry[1], cached_entry[0]
+
+        with self._lock:
+            self.misses += 1
+            self._remove(key)
+            if data is not None and len(data) <= self.max_object_bytes:
+                self._cache[key] = (etag, data)
+                self._num_bytes += len(data)
+                while self._num_bytes > self.max_bytes:
+                    self._remove(next(iter(self._cache)))
+        return data, etag
+
+    def invalidate(self, key: str) -> None:
+        """Removes object from cache.
+
+        Args:
+            key (str): key of object.
+        """
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        """Removes object from cache. Assumes lock is held."""
+        cached_entry = self._cache.pop(key, None)
+        if cached_entry is not None:
+            self._num_bytes -= len(cached_entry[1])
+
+    def get_metrics(self) -> dict:
+        """Returns hit and miss counters and cache size for monitoring.
+
+        Returns:
+            dict: cache metrics.
+        """
+        with self._lock:
+            num_lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / num_lookups if num_lookups > 0 else 0,
+                "entries": len(self._cache),
+                "num_bytes": self._num_bytes,
+            }
+
+
+_s3_client = None
+_object_store = None
+_object_read_cache = None
+_object_store_lock = threading.Lock()
+
+
+def get_s3_client():
+    """Returns boto3 s3 client shared within this process, whose connection pool is reused by all threads.
+
+    Returns:
+        botocore.client.S3: shared s3 client.
+    """
+    global _s3_client
+    with _object_store_lock:
+        if _s3_client is None:
+            _s3_client = boto3.client(
+                "s3",
+                config=botocore.config.Config(
+                    max_pool_connections=Config.S3_MAX_POOL_CONNECTIONS
+                ),
+            )
+        return _s3_client
+
+
+def get_object_store() -> ObjectStore:
+    """Returns object storage backend selected by Config.OBJECT_STORE_BACKEND ("s3" or "local").
+
+    Raises:
+        ValueError: checks that object storage backend is valid.
+
+    Returns:
+        ObjectStore: shared object storage backend.
+    """
+    global _object_store
+    if _object_store is None:
+        if Config.OBJECT_STORE_BACKEND == "s3":
+            object_store = S3ObjectStore(
+                client=get_s3_client(), bucket=Config.S3_BUCKET
+            )
+        elif Config.OBJECT_STORE_BACKEND == "local":
+            object_store = LocalObjectStore(
+                directory=Config.OBJECT_STORE_LOCAL_DIRECTORY
+            )
+        else:
+            raise ValueError(
+                f"Invalid object store backend: {Config.OBJECT_STORE_BACKEND}"
+            )
+        with _object_store_lock:
+            if _object_store is None:
+                _object_store = object_store
+    return _object_store
+
+
+def get_object_read_cache() -> ObjectReadCache:
+    """Returns object read cache shared within this process, configured from Config.
+
+    Returns:
+        ObjectReadCache: shared object read cache.
+    """
+    global _object_read_cache
+    with _object_store_lock:
+        if _object_read_cache is None:
+            _object_read_cache = ObjectReadCache(
+                max_bytes=Config.OBJECT_READ_CACHE_MAX_BYTES,
+                max_object_bytes=Config.OBJECT_READ_CACHE_MAX_OBJECT_BYTES,
+            )
+        return _object_read_cache
+
+
+def read_object(key: str) -> Tuple[Optional[bytes], Optional[str]]:
+    """Returns contents and ETag of object through the read-through cache.
+
+    Args:
+        key (str): key of object.
+
+    Returns:
+        Tuple[Optional[bytes], Optional[str]]: contents and ETag of object, or (None, None) if it does not exist.
+    """
+    return get_object_read_cache().read(object_store=get_object_store(), key=key)
+
+
+def open_object_as_text(
+    key: str, encoding: str = "utf-8", object_store: ObjectStore = None
+) -> io.TextIOWrapper:
+    """Returns text stream of object contents, read incrementally (e.g., to parse large csv files without loading them whole).
+
+    Args:
+        key (str): key of object.
+        encoding (str, optional): text encoding. Defaults to "utf-8".
+        object_store (ObjectStore, optional): backend to read object from. Defaults to configured backend.
+
+    Returns:
+        io.TextIOWrapper: text stream, with newlines untranslated as required by the csv module.
+    """
+    object_store = object_store or get_object_store()
+    return io.TextIOWrapper(
+        io.BufferedReader(_RawStream(object_store.open(key))),
+        encoding=encoding,
+        newline="",
+    )
+
+
+def iterate_object_chunks(key: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """Yields contents of object in chunks.
+
+    Args:
+        key (str): key of object.
+        chunk_size (int, optional): max number of bytes per chunk. Defaults to 1 MB.
+
+    Yields:
+        Iterator[bytes]: chunks of object contents.
+    """
+    stream = get_object_store().open(key)
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        stream.close()
+
+
+class _RawStream(io.RawIOBase):
+    """Adapts stream with read(n) (e.g., botocore StreamingBody) to io.RawIOBase so that it can be buffered and decoded."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.stream.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self.stream.close()
+        super().close()
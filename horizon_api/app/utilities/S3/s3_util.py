@@ -1,41 +1,166 @@
-import boto3
+from app.utilities.S3.object_store import (
+    LocalObjectStore,
+    get_object_store,
+    get_s3_client,
+)
 from config import Config
+import io
 import tempfile
-import requests
 import os
 
-s3 = boto3.client("s3")
 S3_BUCKET = Config.S3_BUCKET
 
+# Size of each part of multipart uploads. S3 requires parts other than the last to be at least 5 MB
+MULTIPART_UPLOAD_PART_SIZE = 8 * 1024 * 1024
+
 
 def upload_file_to_s3(file, key):
-    s3.upload_fileobj(file, S3_BUCKET, key)
+    get_object_store().put(key=key, data=file)
+
+
+class S3MultipartUpload(io.RawIOBase):
+    """Writable file-like object that uploads to s3 in parts as data is written, so only one part is held in memory.
+
+    Closing the object completes the upload; exiting its context with an exception aborts it. Data smaller than one part is
+    uploaded with a single put request instead.
+    """
+
+    def __init__(self, key: str, part_size: int = MULTIPART_UPLOAD_PART_SIZE):
+        """Initializes upload. The multipart upload is created once the first part is full.
+
+        Args:
+            key (str): s3 key to upload to.
+            part_size (int, optional): number of bytes per part. Defaults to MULTIPART_UPLOAD_PART_SIZE.
+        """
+        super().__init__()
+        self.key = key
+        self.part_size = part_size
+        self.upload_id = None
+        self.parts = []
+        self.num_bytes_written = 0
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError("Cannot write to closed upload")
+        self._buffer.extend(data)
+        self.num_bytes_written += len(data)
+        if len(self._buffer) >= self.part_size:
+            self._upload_part()
+        return len(data)
+
+    def tell(self) -> int:
+        return self.num_bytes_written
+
+    def _upload_part(self) -> None:
+        # Upload buffered data as the next part, creating the multipart upload if needed
+        if self.upload_id is None:
+            self.upload_id = get_s3_client().create_multipart_upload(
+                Bucket=S3_BUCKET, Key=self.key
+            )["UploadId"]
+        part_number = len(self.parts) + 1
+        response = get_s3_client().upload_part(
+            Bucket=S3_BUCKET,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=bytes(self._buffer),
+        )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+        self._buffer = bytearray()
+
+    def close(self) -> None:
+        # Upload remaining data and complete upload
+        if self.closed:
+            return
+        try:
+            if self.upload_id is None:
+                get_s3_client().put_object(
+                    Bucket=S3_BUCKET, Key=self.key, Body=bytes(self._buffer)
+                )
+            else:
+                if len(self._buffer) > 0:
+                    self._upload_part()
+                get_s3_client().complete_multipart_upload(
+                    Bucket=S3_BUCKET,
+                    Key=self.key,
+                    UploadId=self.upload_id,
+                    MultipartUpload={"Parts": self.parts},
+                )
+        except Exception:
+            self.abort()
+            raise
+        super().close()
+
+    def abort(self) -> None:
+        # Discard uploaded parts and buffered data
+        if self.upload_id is not None:
+            get_s3_client().abort_multipart_upload(
+                Bucket=S3_BUCKET, Key=self.key, UploadId=self.upload_id
+            )
+            self.upload_id = None
+        self._buffer = bytearray()
+        super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+def open_file_for_upload_to_s3(key: str) -> io.RawIOBase:
+    # Return writable file-like object that uploads in parts as data is written (or writes to local object store file)
+    object_store = get_object_store()
+    if isinstance(object_store, LocalObjectStore):
+        file_path = object_store.get_path(key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        return open(file_path, "wb")
+    return S3MultipartUpload(key=key)
 
 
 def download_file_from_s3(key, expiration_seconds=3600):
-    return s3.generate_presigned_url(
-        "get_object",
-        Params={"Bucket": S3_BUCKET, "Key": key},
-        ExpiresIn=expiration_seconds,
+    return get_object_store().get_download_url(
+        key=key, expiration_seconds=expiration_seconds
     )
 
 
 def delete_file_from_s3(key):
-    s3.delete_object(Bucket=S3_BUCKET, Key=key)
+    get_object_store().delete(key=key)
 
 
 def download_file_from_s3_and_save_locally(key):
-    presigned_url = download_file_from_s3(key)
-    response = requests.get(presigned_url)
-
-    # Create a temporary file and write the content of the response
-    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-        temp_file.write(response.content)
-        temp_file_path = temp_file.name
+    # Stream object into a temporary file through the shared client, without holding it in memory
+    stream = get_object_store().open(key=key)
+    try:
+        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+            for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+                temp_file.write(chunk)
+            temp_file_path = temp_file.name
+    finally:
+        stream.close()
 
     return temp_file_path
 
 
+def download_file_from_s3_to_memory(key):
+    # Return None if object does not exist
+    return get_object_store().get(key=key)[0]
+
+
+def download_file_and_etag_from_s3_to_memory(key):
+    # Return contents and ETag of object in a single request, or (None, None) if object does not exist
+    return get_object_store().get(key=key)
+
+
+def get_etag_of_s3_object(key):
+    # Return None if object does not exist
+    return get_object_store().head(key=key)
+
+
 def upload_directory_to_s3(local_directory_path: str, s3_base_directory: str):
     for root, dirs, files in os.walk(local_directory_path):
         for file in files:
@@ -49,22 +174,45 @@ def upload_directory_to_s3(local_directory_path: str, s3_base_directory: str):
             s3_key = os.path.join(s3_base_directory, s3_key)
 
             # Upload the file to S3
-            s3.upload_file(local_path, S3_BUCKET, s3_key)
+            with open(local_path, "rb") as local_file:
+                get_object_store().put(key=s3_key, data=local_file)
+
+
+def get_s3_directory_prefix(s3_directory: str) -> str:
+    # End directory with "/", so that listing it does not match sibling directories sharing its name as a prefix (e.g.,
+    # "task_id_1" and "task_id_10")
+    return s3_directory.rstrip("/") + "/"
 
 
 def download_directory_from_s3_and_save_locally(s3_directory: str):
+    # Return None if there are no objects in the specified S3 directory
+    object_store = get_object_store()
+    s3_directory = get_s3_directory_prefix(s3_directory)
+    s3_keys = object_store.list_keys(prefix=s3_directory)
+    if len(s3_keys) == 0:
+        return None
+
     # Create a temporary directory
     temp_dir = tempfile.mkdtemp()
 
-    # List all objects in the specified S3 directory
-    objects = s3.list_objects_v2(Bucket=S3_BUCKET, Prefix=s3_directory)["Contents"]
-
-    # Download each object to the temporary directory
-    for obj in objects:
-        s3_key = obj["Key"]
+    # Download each object in the specified S3 directory to the temporary directory
+    for s3_key in s3_keys:
         local_path = os.path.join(temp_dir, os.path.relpath(s3_key, s3_directory))
         os.makedirs(os.path.dirname(local_path), exist_ok=True)
-        s3.download_file(S3_BUCKET, s3_key, local_path)
+        stream = object_store.open(key=s3_key)
+        try:
+            with open(local_path, "wb") as local_file:
+                for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+                    local_file.write(chunk)
+        finally:
+            stream.close()
 
     # Return temp directory
     return temp_dir
+
+
+def delete_directory_from_s3(s3_directory: str):
+    # Delete each object in the specified S3 directory
+    object_store = get_object_store()
+    for s3_key in object_store.list_keys(prefix=get_s3_directory_prefix(s3_directory)):
+        object_store.delete(key=s3_key)
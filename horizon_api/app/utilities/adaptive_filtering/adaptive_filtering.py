@@ -2,13 +2,16 @@
 
 from app.models.component.task_request import TaskRequest
 from app.models.component.prompt_model_candidates import PromptModelCandidates
-from app.models.component.inference_evaluation_results import InferenceEvaluationResults
+from app.models.component.inference_evaluation_results import (
+    InferenceEvaluationResults,
+    InferenceEvaluationResultsLog,
+)
 from app.models.component.post_processing.post_processing import PostProcessing
-from app.utilities.inference import inference
 from app.utilities.evaluation import evaluation
 from app.utilities.shortlist import shortlist
+import math
 import numpy as np
-import pandas as pd
+from statistics import NormalDist
 from typing import Tuple, List
 
 
@@ -20,10 +23,13 @@ def adaptive_filtering(
     num_iterations: int,
     openai_api_key: str,
     post_processing: PostProcessing = None,
-) -> Tuple[PromptModelCandidates, InferenceEvaluationResults]:
+    filtering_strategy: str = "schedule",
+) -> Tuple[PromptModelCandidates, InferenceEvaluationResultsLog]:
     """Runs inference, evaluation, and shortlist iterations to efficiently filter down prompt-model candidates.
 
-    Algorithm exponentially reduces prompt-model candidates until it reaches the target number of shortlisted candidates.
+    With the "schedule" filtering strategy, algorithm exponentially reduces prompt-model candidates until it reaches the target
+    number of shortlisted candidates. With the "racing" filtering strategy, candidates are instead eliminated as soon as they are
+    statistically dominated (see racing_adaptive_filtering).
 
     Args:
         task_request (TaskRequest): data structure holding task request information.
@@ -33,17 +39,31 @@ def adaptive_filtering(
         num_iterations (int): number of iterations to run adaptive filtering.
         openai_api_key (str): OpenAI API key to use.
         post_processing (PostProcessing, optional): details on llm output post-processing operations. Defaults to None.
+        filtering_strategy (str, optional): either "schedule" or "racing". Defaults to "schedule".
 
     Raises:
+        ValueError: checks that filtering strategy is valid.
         ValueError: checks that provided number of prompt-model candidates exceeds the target shortlist amount.
         ValueError: checks that at least 1 iteration is requested.
         ValueError: checks that there are sufficient test data points to run inputted number of iterations.
 
     Returns:
-        Tuple[PromptModelCandidates, InferenceEvaluationResults]: tuple containing shortlisted set of prompt-model candidates and
+        Tuple[PromptModelCandidates, InferenceEvaluationResultsLog]: tuple containing shortlisted set of prompt-model candidates and
             aggregated inference and evaluation results.
     """
     # Check input values
+    if filtering_strategy == "racing":
+        return racing_adaptive_filtering(
+            task_request=task_request,
+            prompt_model_candidates=prompt_model_candidates,
+            stage_id=stage_id,
+            num_shortlist=num_shortlist,
+            openai_api_key=openai_api_key,
+            post_processing=post_processing,
+            num_iterations=num_iterations,
+        )
+    if filtering_strategy != "schedule":
+        raise ValueError(f"Invalid filtering strategy: {filtering_strategy}")
     if num_shortlist > len(prompt_model_candidates):
         raise ValueError(
             "Target shortlist amount cannot be greater than provided number of prompt-model candidates."
@@ -80,47 +100,335 @@ def adaptive_filtering(
 
     # Run inference, evaluation, and shortlist iterations
     shortlisted_prompt_model_candidates = prompt_model_candidates.copy()
-    aggregated_inference_evaluation_results = InferenceEvaluationResults()
+    aggregated_inference_evaluation_results = InferenceEvaluationResultsLog()
     for i in range(num_iterations):
-        inference_evaluation_results = inference.run_inference(
+        # Stream each inference output to evaluation as soon as it completes
+        inference_evaluation_results = evaluation.run_inference_and_evaluation(
             task_request=task_request,
             prompt_model_candidates=shortlisted_prompt_model_candidates,
             train_or_test_dataset="test",
             stage_id=stage_id,
+            openai_api_key=openai_api_key,
             evaluation_data_id_list=evaluation_data_id_segments[i],
             post_processing=post_processing,
         )
-        print("Finished inference")
-        evaluation.run_evaluation(
+        print("Finished inference and evaluation")
+
+        # Aggregate inference and evaluation results
+        aggregated_inference_evaluation_results.append(inference_evaluation_results)
+
+        shortlisted_prompt_model_candidates = shortlist.shortlist_prompt_model_candidates(
+            prompt_model_candidates=shortlisted_prompt_model_candidates,
+            inference_evaluation_results=aggregated_inference_evaluation_results.to_dataframe(),
+            num_shortlist=candidate_batch_sizes[i + 1],
+        )
+        print(
+            f"Number of shortlisted candidates: {len(shortlisted_prompt_model_candidates)}"
+        )
+
+    return (
+        shortlisted_prompt_model_candidates,
+        aggregated_inference_evaluation_results,
+    )
+
+
+def racing_adaptive_filtering(
+    task_request: TaskRequest,
+    prompt_model_candidates: PromptModelCandidates,
+    stage_id: str,
+    num_shortlist: int,
+    openai_api_key: str,
+    post_processing: PostProcessing = None,
+    num_iterations: int = None,
+    mini_batch_size: int = 2,
+    min_num_data_before_elimination: int = 6,
+    delta: float = 0.05,
+    bound: str = "paired",
+) -> Tuple[PromptModelCandidates, InferenceEvaluationResultsLog]:
+    """Runs inference and evaluation one mini-batch of test data at a time, eliminating prompt-model candidates as soon as they
+    are statistically dominated.
+
+    After each mini-batch, each remaining candidate is compared against the candidate ranked num_shortlist-th by mean inference
+    quality (i.e., the leader when shortlisting a single candidate). Since all candidates are evaluated on the same test data
+    points, the default "paired" bound puts a confidence interval on the mean per-data-point difference in inference quality,
+    which cancels out how hard each data point is and is far tighter than intervals on each candidate's own mean. A candidate is
+    eliminated once its difference is below 0 with confidence. Confidence level is split across candidates and mini-batches.
+
+    If num_iterations is given, racing never makes more inferences than the "schedule" filtering strategy would: once the next
+    mini-batch would exceed that budget, racing stops early. Once test data or budget is exhausted or only num_shortlist
+    candidates remain, the usual shortlist scoring picks the final candidates.
+
+    Args:
+        task_request (TaskRequest): data structure holding task request information.
+        prompt_model_candidates (PromptModelCandidates): data structure with each prompt-model candidate.
+        stage_id (str): id for this inference and evaluation stage.
+        num_shortlist (int): target number of shortlisted prompt-model candidates.
+        openai_api_key (str): OpenAI API key to use.
+        post_processing (PostProcessing, optional): details on llm output post-processing operations. Defaults to None.
+        num_iterations (int, optional): number of iterations of the "schedule" filtering strategy to cap inferences at and
+            report inferences saved against. Defaults to None, in which case savings are reported against evaluating all
+            candidates on all test data.
+        mini_batch_size (int, optional): number of test data points evaluated per round. Defaults to 2.
+        min_num_data_before_elimination (int, optional): min number of test data points evaluated before any candidate can be
+            eliminated. Defaults to 6.
+        delta (float, optional): probability that any confidence interval fails to hold. Defaults to 0.05.
+        bound (str, optional): confidence bound to use; one of "paired", "hoeffding", or "empirical_bernstein". Defaults to
+            "paired".
+
+    Raises:
+        ValueError: checks that provided number of prompt-model candidates exceeds the target shortlist amount.
+        ValueError: checks that mini-batch size is at least 1.
+
+    Returns:
+        Tuple[PromptModelCandidates, InferenceEvaluationResultsLog]: tuple containing shortlisted set of prompt-model candidates and
+            aggregated inference and evaluation results.
+    """
+    # Check input values
+    if num_shortlist > len(prompt_model_candidates):
+        raise ValueError(
+            "Target shortlist amount cannot be greater than provided number of prompt-model candidates."
+        )
+    if mini_batch_size < 1:
+        raise ValueError("Mini-batch size must be at least 1.")
+
+    # Segment test data points into mini-batches
+    test_data_id_list = list(task_request.test_data_id_list)
+    evaluation_data_id_segments = [
+        test_data_id_list[i : i + mini_batch_size]
+        for i in range(0, len(test_data_id_list), mini_batch_size)
+    ]
+    max_num_rounds = len(evaluation_data_id_segments)
+
+    # Budget inferences at those of the fixed schedule, if given
+    if num_iterations is not None and num_iterations <= len(test_data_id_list):
+        num_baseline_inferences = int(
+            get_total_num_inferences(
+                num_original_prompt_model_candidates=len(prompt_model_candidates),
+                num_data=len(test_data_id_list),
+                num_shortlist=num_shortlist,
+                num_iterations=num_iterations,
+            )
+        )
+    else:
+        num_baseline_inferences = len(prompt_model_candidates) * len(test_data_id_list)
+
+    # Run inference and evaluation one mini-batch at a time until enough candidates are eliminated or test data or budget is
+    # exhausted
+    shortlisted_prompt_model_candidates = prompt_model_candidates.copy()
+    aggregated_inference_evaluation_results = InferenceEvaluationResultsLog()
+    for i in range(max_num_rounds):
+        if len(shortlisted_prompt_model_candidates) <= num_shortlist:
+            break
+        if (
+            len(aggregated_inference_evaluation_results)
+            + len(shortlisted_prompt_model_candidates)
+            * len(evaluation_data_id_segments[i])
+            > num_baseline_inferences
+        ):
+            print(f"Round {i + 1}: stopping early to stay within inference budget")
+            break
+
+        inference_evaluation_results = evaluation.run_inference_and_evaluation(
             task_request=task_request,
-            inference_evaluation_results=inference_evaluation_results,
+            prompt_model_candidates=shortlisted_prompt_model_candidates,
+            train_or_test_dataset="test",
+            stage_id=stage_id,
             openai_api_key=openai_api_key,
+            evaluation_data_id_list=evaluation_data_id_segments[i],
+            post_processing=post_processing,
         )
-        print("Finished evaluation")
 
         # Aggregate inference and evaluation results
-        aggregated_inference_evaluation_results = pd.concat(
-            [aggregated_inference_evaluation_results, inference_evaluation_results],
-            axis=0,
-        ).reset_index(drop=True)
-
-        shortlisted_prompt_model_candidates = (
-            shortlist.shortlist_prompt_model_candidates(
-                prompt_model_candidates=shortlisted_prompt_model_candidates,
-                inference_evaluation_results=aggregated_inference_evaluation_results,
-                num_shortlist=candidate_batch_sizes[i + 1],
-            )
+        aggregated_inference_evaluation_results.append(inference_evaluation_results)
+
+        # Eliminate candidates that are statistically dominated by the num_shortlist-th best candidate
+        surviving_prompt_model_ids = get_surviving_prompt_model_ids(
+            inference_evaluation_results=aggregated_inference_evaluation_results.to_dataframe(),
+            prompt_model_id_list=shortlisted_prompt_model_candidates[
+                "prompt_model_id"
+            ].to_list(),
+            num_shortlist=num_shortlist,
+            min_num_data_before_elimination=min_num_data_before_elimination,
+            delta=delta / (len(prompt_model_candidates) * max_num_rounds),
+            bound=bound,
         )
+        shortlisted_prompt_model_candidates = shortlisted_prompt_model_candidates.loc[
+            shortlisted_prompt_model_candidates["prompt_model_id"].isin(
+                surviving_prompt_model_ids
+            )
+        ]
         print(
-            f"Number of shortlisted candidates: {len(shortlisted_prompt_model_candidates)}"
+            f"Round {i + 1}: {len(shortlisted_prompt_model_candidates)} candidates remaining"
         )
 
+    # Pick final candidates among survivors using shortlist scoring
+    shortlisted_prompt_model_candidates = shortlist.shortlist_prompt_model_candidates(
+        prompt_model_candidates=shortlisted_prompt_model_candidates,
+        inference_evaluation_results=aggregated_inference_evaluation_results.to_dataframe(),
+        num_shortlist=num_shortlist,
+    )
+
+    # Report inferences saved compared to fixed schedule
+    num_inferences = len(aggregated_inference_evaluation_results)
+    aggregated_inference_evaluation_results.attrs["num_inferences_saved"] = (
+        num_baseline_inferences - num_inferences
+    )
+    print(
+        f"Racing used {num_inferences} inferences compared to {num_baseline_inferences} with fixed schedule "
+        f"({num_baseline_inferences - num_inferences} saved)"
+    )
+
     return (
         shortlisted_prompt_model_candidates,
         aggregated_inference_evaluation_results,
     )
 
 
+def get_surviving_prompt_model_ids(
+    inference_evaluation_results: InferenceEvaluationResults,
+    prompt_model_id_list: List[int],
+    num_shortlist: int,
+    min_num_data_before_elimination: int = 6,
+    delta: float = 0.05,
+    bound: str = "paired",
+) -> List[int]:
+    """Returns prompt-model ids that are not statistically dominated by the num_shortlist-th best prompt-model id.
+
+    With the "paired" bound, a prompt-model id is dominated if the upper bound of its mean per-data-point difference in inference
+    quality to the num_shortlist-th best prompt-model id (by mean inference quality) is below 0. With the "hoeffding" and
+    "empirical_bernstein" bounds, a prompt-model id is dominated if the upper bound of its mean inference quality is below the
+    num_shortlist-th highest lower bound, with the observed range of inference quality as the range of samples. At least
+    num_shortlist prompt-model ids always survive.
+
+    Args:
+        inference_evaluation_results (InferenceEvaluationResults): data structure with evaluation results.
+        prompt_model_id_list (List[int]): prompt-model ids still in the race.
+        num_shortlist (int): target number of shortlisted prompt-model candidates.
+        min_num_data_before_elimination (int, optional): min number of evaluated data points for a prompt-model id before it can
+            be eliminated. Defaults to 6.
+        delta (float, optional): probability that the confidence interval of a single prompt-model id fails to hold. Defaults
+            to 0.05.
+        bound (str, optional): confidence bound to use; one of "paired", "hoeffding", or "empirical_bernstein". Defaults to
+            "paired".
+
+    Raises:
+        ValueError: checks that bound is valid.
+
+    Returns:
+        List[int]: surviving prompt-model ids.
+    """
+    # Arrange inference quality with one row per evaluated data point and one column per prompt-model id
+    inference_quality = (
+        inference_evaluation_results.loc[
+            inference_evaluation_results["prompt_model_id"].isin(prompt_model_id_list)
+        ]
+        .pivot_table(
+            index="evaluation_data_id",
+            columns="prompt_model_id",
+            values="inference_quality",
+        )
+        .reindex(columns=prompt_model_id_list)
+    )
+    num_samples = inference_quality.count().to_numpy()
+    if len(prompt_model_id_list) <= num_shortlist or np.any(
+        num_samples < min_num_data_before_elimination
+    ):
+        return prompt_model_id_list
+    mean = inference_quality.mean().to_numpy()
+
+    if bound == "paired":
+        # Compare each prompt-model id to the num_shortlist-th best on the data points evaluated for every prompt-model id
+        reference_prompt_model_id = prompt_model_id_list[
+            np.argsort(-mean, kind="stable")[num_shortlist - 1]
+        ]
+        inference_quality = inference_quality.dropna()
+        differences = inference_quality.sub(
+            inference_quality[reference_prompt_model_id], axis=0
+        )
+        radius = np.array(
+            [
+                get_confidence_radius(
+                    num_samples=len(differences),
+                    variance=variance,
+                    delta=delta,
+                    bound=bound,
+                )
+                for variance in differences.var().fillna(0).to_numpy()
+            ]
+        )
+        upper_bounds = differences.mean().to_numpy() + radius
+        threshold = 0
+    else:
+        # Use observed range of inference quality, since inference quality rarely spans the full range of cosine similarity
+        value_range = min(
+            np.nanmax(inference_quality.to_numpy())
+            - np.nanmin(inference_quality.to_numpy()),
+            1,
+        )
+        radius = np.array(
+            [
+                get_confidence_radius(
+                    num_samples=int(count),
+                    variance=variance,
+                    delta=delta,
+                    bound=bound,
+                    value_range=value_range,
+                )
+                for count, variance in zip(
+                    num_samples, inference_quality.var().fillna(0).to_numpy()
+                )
+            ]
+        )
+        upper_bounds = mean + radius
+
+        # Keep prompt-model ids whose upper bound reaches the num_shortlist-th highest lower bound
+        threshold = np.sort(mean - radius)[::-1][num_shortlist - 1]
+
+    return [
+        prompt_model_id
+        for prompt_model_id, upper_bound in zip(prompt_model_id_list, upper_bounds)
+        if upper_bound >= threshold
+    ]
+
+
+def get_confidence_radius(
+    num_samples: int,
+    variance: float,
+    delta: float,
+    bound: str = "paired",
+    value_range: float = 1,
+) -> float:
+    """Returns half-width of confidence interval on the mean of samples.
+
+    The "paired" bound is the normal approximation used for mean differences of paired samples, while the "hoeffding" and
+    "empirical_bernstein" bounds hold for any samples within value_range.
+
+    Args:
+        num_samples (int): number of samples.
+        variance (float): sample variance. Not used by the Hoeffding bound.
+        delta (float): probability that the interval fails to hold.
+        bound (str, optional): one of "paired", "hoeffding", or "empirical_bernstein". Defaults to "paired".
+        value_range (float, optional): width of range that samples lie in. Not used by the paired bound. Defaults to 1.
+
+    Raises:
+        ValueError: checks that bound is valid.
+
+    Returns:
+        float: half-width of confidence interval.
+    """
+    if bound == "paired":
+        return NormalDist().inv_cdf(1 - delta / 2) * math.sqrt(variance / num_samples)
+    if bound == "hoeffding":
+        return value_range * math.sqrt(math.log(2 / delta) / (2 * num_samples))
+    if bound == "empirical_bernstein":
+        log_term = math.log(3 / delta)
+        return (
+            math.sqrt(2 * variance * log_term / num_samples)
+            + 3 * value_range * log_term / num_samples
+        )
+    raise ValueError(f"Invalid confidence bound: {bound}")
+
+
 def get_num_prompt_model_candidates_per_iteration(
     num_original_prompt_model_candidates: int,
     num_shortlist: int,
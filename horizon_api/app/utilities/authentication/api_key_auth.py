@@ -1,6 +1,7 @@
 """Provides function wrapper to verify Horizon API key provided by user."""
 
 from app.models.component import User
+from app.utilities.authentication.api_key_cache import get_api_key_cache
 from flask import request, g
 from functools import wraps
 import hashlib
@@ -8,6 +9,18 @@ from typing import Callable
 from app.utilities.context import RequestContext
 
 
+class AuthenticatedUser:
+    """Identity of user authenticated by API key, built from the API key cache without loading the User row."""
+
+    def __init__(self, id: str):
+        """Initializes identity.
+
+        Args:
+            id (str): id of user.
+        """
+        self.id = id
+
+
 def api_key_required(f: Callable) -> Callable:
     """Provides function wrapper to verify Horizon API key provided by user.
 
@@ -24,9 +37,17 @@ def api_key_required(f: Callable) -> Callable:
         if not api_key:
             return {"error": "API key required"}, 401
 
-        # Hash API key and look up user
+        # Hash API key and look up user, first in cache and then in db
         api_key_hash = hashlib.sha256(api_key.encode("UTF-8")).hexdigest()
-        user = User.query.filter_by(api_key_hash=api_key_hash).first()
+        api_key_cache = get_api_key_cache()
+        found, user_id = api_key_cache.get(api_key_hash=api_key_hash)
+        if found:
+            user = AuthenticatedUser(id=user_id) if user_id is not None else None
+        else:
+            user = User.query.filter_by(api_key_hash=api_key_hash).first()
+            api_key_cache.put(
+                api_key_hash=api_key_hash, user_id=user.id if user else None
+            )
         if not user:
             return {"error": "Invalid API key"}, 401
 
@@ -0,0 +1,149 @@
+"""Per-process cache of API key hashes and the users they authenticate.
+
+Valid API key hashes map to the id of their user for up to Config.API_KEY_CACHE_TTL_SECONDS. Invalid API key hashes are cached
+for a shorter Config.API_KEY_CACHE_NEGATIVE_TTL_SECONDS, in a separate LRU so that floods of invalid keys cannot evict valid
+ones. Rotating a user's API key invalidates the old hash in the process that handled the rotation; other processes may accept
+the old key until its entry expires.
+
+Typical usage example:
+
+    api_key_cache = get_api_key_cache()
+    found, user_id = api_key_cache.get(api_key_hash=api_key_hash)
+"""
+
+from config import Config
+from collections import OrderedDict
+from typing import Optional, Tuple
+import threading
+import time
+
+
+class ApiKeyCache:
+    """Thread-safe LRU + TTL cache mapping API key hashes to user ids, with negative caching of invalid API key hashes."""
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl_seconds: float = 60,
+        negative_max_entries: int = 10000,
+        negative_ttl_seconds: float = 5,
+    ):
+        """Initializes cache.
+
+        Args:
+            max_entries (int, optional): max number of valid API key hashes kept in memory. Defaults to 10000.
+            ttl_seconds (float, optional): seconds a valid API key hash is cached. Defaults to 60.
+            negative_max_entries (int, optional): max number of invalid API key hashes kept in memory. Defaults to 10000.
+            negative_ttl_seconds (float, optional): seconds an invalid API key hash is cached. Defaults to 5.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_max_entries = negative_max_entries
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._negative_entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def get(self, api_key_hash: str) -> Tuple[bool, Optional[str]]:
+        """Looks up API key hash in cache.
+
+        Args:
+            api_key_hash (str): SHA-256 hash of API key.
+
+        Returns:
+            Tuple[bool, Optional[str]]: whether API key hash is cached, and id of its user (None if API key is invalid).
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(api_key_hash)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(api_key_hash)
+                    self.hits += 1
+                    return True, entry[0]
+                del self._entries[api_key_hash]
+
+            negative_expiry = self._negative_entries.get(api_key_hash)
+            if negative_expiry is not None:
+                if negative_expiry > now:
+                    self.negative_hits += 1
+                    return True, None
+                del self._negative_entries[api_key_hash]
+
+            self.misses += 1
+            return False, None
+
+    def put(self, api_key_hash: str, user_id: Optional[str]) -> None:
+        """Caches user id of API key hash, or caches API key hash as invalid if user id is None.
+
+        Args:
+            api_key_hash (str): SHA-256 hash of API key.
+            user_id (Optional[str]): id of user with API key, or None if API key is invalid.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if user_id is None:
+                self._negative_entries[api_key_hash] = now + self.negative_ttl_seconds
+                self._negative_entries.move_to_end(api_key_hash)
+                while len(self._negative_entries) > self.negative_max_entries:
+                    self._negative_entries.popitem(last=False)
+            else:
+                self._negative_entries.pop(api_key_hash, None)
+                self._entries[api_key_hash] = (user_id, now + self.ttl_seconds)
+                self._entries.move_to_end(api_key_hash)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def invalidate(self, api_key_hash: str) -> None:
+        """Removes API key hash from cache of this process (e.g., when the API key is rotated).
+
+        Args:
+            api_key_hash (str): SHA-256 hash of API key.
+        """
+        with self._lock:
+            self._entries.pop(api_key_hash, None)
+            self._negative_entries.pop(api_key_hash, None)
+
+    def get_metrics(self) -> dict:
+        """Returns hit and miss counters and cache sizes for monitoring.
+
+        Returns:
+            dict: cache metrics.
+        """
+        with self._lock:
+            num_lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.negative_hits) / num_lookups
+                if num_lookups > 0
+                else 0,
+                "entries": len(self._entries),
+                "negative_entries": len(self._negative_entries),
+            }
+
+
+_api_key_cache = None
+_api_key_cache_lock = threading.Lock()
+
+
+def get_api_key_cache() -> ApiKeyCache:
+    """Returns API key cache shared within this process, configured from Config.
+
+    Returns:
+        ApiKeyCache: shared API key cache.
+    """
+    global _api_key_cache
+    with _api_key_cache_lock:
+        if _api_key_cache is None:
+            _api_key_cache = ApiKeyCache(
+                max_entries=Config.API_KEY_CACHE_MAX_ENTRIES,
+                ttl_seconds=Config.API_KEY_CACHE_TTL_SECONDS,
+                negative_max_entries=Config.API_KEY_CACHE_NEGATIVE_MAX_ENTRIES,
+                negative_ttl_seconds=Config.API_KEY_CACHE_NEGATIVE_TTL_SECONDS,
+            )
+        return _api_key_cache
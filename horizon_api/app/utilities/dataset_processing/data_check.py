@@ -2,11 +2,13 @@
 
 from . import data_length
 from . import llm_applicability
+from config import Config
 import os
 import csv
+import hashlib
 import re
 import pandas as pd
-from typing import List
+from typing import Iterator, List, TextIO
 from langchain.text_splitter import (
     RecursiveCharacterTextSplitter,
 )
@@ -17,9 +19,12 @@ from langchain.text_splitter import (
 
 def check_evaluation_dataset_and_data_length(
     dataset_file_path: str, synthetic_data_generation: bool = False
-) -> None:
+) -> dict:
     """Checks contents of evaluation dataset for potential errors and if data lengths meet llm token limits.
 
+    The dataset is validated and parsed in a single pass over the file. The parsed dataset is held in memory in full, so memory
+    use grows with the size of the file (bounded by Config.EVALUATION_DATASET_MAX_BYTES).
+
     Args:
         dataset_file_path (str): file path to evaluation dataset.
         synthetic_data_generation (bool, optional): whether this task request is to generate synthetic data. Defaults to False.
@@ -27,18 +32,19 @@ def check_evaluation_dataset_and_data_length(
     Raises:
         AssertionError: checks if input and output data lengths exceed token limits of available llms.
         AssertionError: checks if input and output data lengths exceed token limits of available llms.
+
+    Returns:
+        dict: processed evaluation dataset and its max data lengths, e.g. to store as dataset profile.
     """
-    # Check contents of evaluation dataset for potential errors
-    check_evaluation_dataset(
+    # Check file size, then check contents of evaluation dataset for potential errors while parsing it
+    check_evaluation_dataset_file_size(dataset_file_path=dataset_file_path)
+    evaluation_dataset = get_evaluation_dataset(
         dataset_file_path=dataset_file_path,
+        escape_curly_braces=True,
+        validate=True,
         synthetic_data_generation=synthetic_data_generation,
     )
 
-    # Get evaluation dataset
-    evaluation_dataset = get_evaluation_dataset(
-        dataset_file_path=dataset_file_path, escape_curly_braces=True
-    )
-
     # Check that evaluation data lengths are appropriate
     evaluation_data_length = data_length.get_evaluation_data_length(
         evaluation_dataset=evaluation_dataset, unescape_curly_braces=True
@@ -68,53 +74,140 @@ def check_evaluation_dataset_and_data_length(
             "Input and output data length exceed context length of available LLMs needed for prompt generation."
         )
 
+    return {
+        "evaluation_dataset": evaluation_dataset,
+        "evaluation_data_length": evaluation_data_length,
+    }
+
 
 def check_evaluation_dataset(
     dataset_file_path: str, synthetic_data_generation: bool = False
 ) -> None:
     """Checks contents of evaluation dataset for potential errors.
 
-    Does not validate if data lengths exceed llm token limits.
+    Does not validate if data lengths exceed llm token limits. Streams through the file, keeping only a hash of each unique row
+    in memory.
+
+    Args:
+        dataset_file_path (str): file path to evaluation dataset.
+        synthetic_data_generation (bool, optional): whether this task request is to generate synthetic data. Defaults to False.
+
+    Raises:
+        AssertionError: file size exceeds Config.EVALUATION_DATASET_MAX_BYTES.
+        AssertionError: see iterate_evaluation_dataset_rows.
+    """
+    check_evaluation_dataset_file_size(dataset_file_path=dataset_file_path)
+    with open(dataset_file_path, newline="") as dataset_file:
+        for _ in iterate_evaluation_dataset_rows(
+            dataset_file=dataset_file,
+            validate=True,
+            synthetic_data_generation=synthetic_data_generation,
+        ):
+            pass
+
+
+def check_evaluation_dataset_file_size(dataset_file_path: str) -> None:
+    """Checks that evaluation dataset file is at most Config.EVALUATION_DATASET_MAX_BYTES large.
 
     Args:
         dataset_file_path (str): file path to evaluation dataset.
+
+    Raises:
+        AssertionError: file size exceeds Config.EVALUATION_DATASET_MAX_BYTES.
+    """
+    if os.path.getsize(dataset_file_path) > Config.EVALUATION_DATASET_MAX_BYTES:
+        raise AssertionError(
+            f"Evaluation dataset can be at most {Config.EVALUATION_DATASET_MAX_BYTES / 1000000:g} MB large."
+        )
+
+
+def iterate_evaluation_dataset_rows(
+    dataset_file: TextIO, validate: bool = True, synthetic_data_generation: bool = False
+) -> Iterator[List[str]]:
+    """Yields rows of evaluation dataset csv, starting with column headers, and validates them in the same pass.
+
+    Duplicate rows are detected with a 64-bit hash of each row, so validation itself keeps 8 bytes per unique row rather than the
+    row values (callers that collect the yielded rows still hold them in memory). Row count checks are raised once the last row
+    has been read. Empty lines are skipped.
+
+    Args:
+        dataset_file (TextIO): text stream of evaluation dataset, opened with newline="".
+        validate (bool, optional): whether to validate rows. Defaults to True.
         synthetic_data_generation (bool, optional): whether this task request is to generate synthetic data. Defaults to False.
 
     Raises:
-        AssertionError: file size is >1 MB.
         AssertionError: file type is not csv.
         AssertionError: insufficient rows of data (must have at least 1 row plus column headers).
         AssertionError: insufficient rows of data for Task creation (must have at least 15 rows of data).
         AssertionError: insufficient number of columns (must have at least 1).
         AssertionError: improper naming of input variables (must be alphanumeric + underscores, no spaces).
         AssertionError: duplicate input variable names.
+        AssertionError: rows with a different number of values than column headers.
         AssertionError: duplicate rows of data.
-    """
-    # Check that evaluation data is at most 50 MB file size
-    if os.path.getsize(dataset_file_path) > 50000000:
-        raise AssertionError("Evaluation dataset can be at most 1 MB large.")
 
-    # Try to import evaluation dataset
+    Yields:
+        Iterator[List[str]]: column headers, then each row of data.
+    """
+    reader = csv.reader(dataset_file)
+    num_rows = 0
+    seen_row_hashes = set()
     try:
-        csvfile = open(dataset_file_path, newline="")
-        data = list(csv.reader(csvfile))
-    except:
+        for row in reader:
+            if len(row) == 0:
+                continue
+
+            # Check column headers
+            if num_rows == 0 and validate:
+                check_evaluation_dataset_columns(columns=row)
+
+            # Check that row has a value for each column, and that there are no duplicate rows
+            elif validate:
+                if len(row) != num_columns:
+                    raise AssertionError(
+                        "Each row of evaluation data must have a value for each column."
+                    )
+                row_hash = hashlib.blake2b(
+                    repr(row).encode("UTF-8", "surrogatepass"), digest_size=8
+                ).digest()
+                if row_hash in seen_row_hashes:
+                    raise AssertionError("Data cannot have duplicate rows.")
+                seen_row_hashes.add(row_hash)
+
+            if num_rows == 0:
+                num_columns = len(row)
+            num_rows += 1
+            yield row
+    except (csv.Error, UnicodeDecodeError):
         raise AssertionError(
             "Could not import evaluation data. Make sure to upload in csv format."
         )
 
+    if not validate:
+        return
+
     # Check that there is at least 1 row of evaluation data
-    if len(data) < 2:
+    if num_rows < 2:
         raise AssertionError(
             "There must be at least 1 row of evaluation data plus column headers."
         )
 
     # For Task creation request and not synthetic data generation, check that there is at least 15 rows of data
-    if (not synthetic_data_generation) and len(data) < 16:
+    if (not synthetic_data_generation) and num_rows < 16:
         raise AssertionError("There must be at least 15 rows of evaluation data.")
 
+
+def check_evaluation_dataset_columns(columns: List[str]) -> None:
+    """Checks column headers of evaluation dataset.
+
+    Args:
+        columns (List[str]): column headers. Last column is assumed to be the ground truth.
+
+    Raises:
+        AssertionError: insufficient number of columns (must have at least 1).
+        AssertionError: improper naming of input variables (must be alphanumeric + underscores, no spaces).
+        AssertionError: duplicate input variable names.
+    """
     # Check that there is at least 1 column. Last column is assumed to be the ground truth
-    columns = data[0]
     if len(columns) == 0:
         raise AssertionError(
             "There must be at least 1 column. The rightmost column is assumed to be the ground truth."
@@ -132,39 +225,63 @@ def check_evaluation_dataset(
     if len(input_variables) != len(set(input_variables)):
         raise AssertionError("Input variable names must be unique.")
 
-    # Check that there are no duplicate rows
-    seen_rows = set()
-    for row in data[1:]:
-        row_csv = ",".join(row)
-        if row_csv in seen_rows:
-            raise AssertionError("Data cannot have duplicate rows.")
-        else:
-            seen_rows.add(row_csv)
-
 
 def get_evaluation_dataset(
-    dataset_file_path: str,
+    dataset_file_path: str = None,
     escape_curly_braces: bool = True,
     input_variables_to_chunk: List[str] = None,
+    dataset_file: TextIO = None,
+    validate: bool = False,
+    synthetic_data_generation: bool = False,
 ) -> pd.DataFrame:
     """Convert evaluation dataset csv into DataFrame.
 
-    Assumes evaluation dataset has been checked appropriately. Escapes curly braces for use with format strings by adding extra curly
-        brace (e.g., converts '{'  to '{{').
+    Reads the csv in a single pass, collecting values column by column, so the whole dataset is held in memory. Escapes curly
+        braces for use with format strings by adding extra curly brace (e.g., converts '{'  to '{{').
 
     Args:
-        dataset_file_path (str): file path to evaluation dataset.
+        dataset_file_path (str, optional): file path to evaluation dataset. Defaults to None.
         escape_curly_braces (bool, optional): whether to escape curly braces when getting data lengths. Defaults to True.
+        dataset_file (TextIO, optional): text stream of evaluation dataset (e.g., streamed from s3), opened with newline="", to
+            use instead of dataset_file_path. Defaults to None.
+        validate (bool, optional): whether to check contents of evaluation dataset while reading it. Otherwise, assumes evaluation
+            dataset has been checked appropriately. Defaults to False.
+        synthetic_data_generation (bool, optional): whether this task request is to generate synthetic data, if validating.
+            Defaults to False.
+
+    Raises:
+        AssertionError: evaluation dataset is empty (must have column headers), or see iterate_evaluation_dataset_rows if
+            validating.
 
     Returns:
         pd.DataFrame: processed evaluation dataset.
     """
-    # Import evaluation dataset
-    csvfile = open(dataset_file_path, newline="")
-    data = list(csv.reader(csvfile))
+    # Import evaluation dataset column by column
+    if dataset_file is None:
+        with open(dataset_file_path, newline="") as dataset_file:
+            return get_evaluation_dataset(
+                escape_curly_braces=escape_curly_braces,
+                input_variables_to_chunk=input_variables_to_chunk,
+                dataset_file=dataset_file,
+                validate=validate,
+                synthetic_data_generation=synthetic_data_generation,
+            )
+    rows = iterate_evaluation_dataset_rows(
+        dataset_file=dataset_file,
+        validate=validate,
+        synthetic_data_generation=synthetic_data_generation,
+    )
+    columns = next(rows, None)
+    if columns is None:
+        raise AssertionError(
+            "There must be at least 1 row of evaluation data plus column headers."
+        )
+    column_values = [[] for _ in columns]
+    for row in rows:
+        for values, value in zip(column_values, row):
+            values.append(value)
 
     # Rename each input variable by prepending "var_" (to avoid duplicating with columns names in internal DataFrames)
-    columns = data[0]
     columns[:-1] = [f"var_{input_var}" for input_var in columns[:-1]]
 
     # Rename last column to "ground_truth" in case it is not already named as such
@@ -172,16 +289,19 @@ def get_evaluation_dataset(
 
     # Convert dataset to DataFrame and shuffle data
     evaluation_dataset = (
-        pd.DataFrame(data=data[1:], columns=columns)
+        pd.DataFrame(dict(zip(columns, column_values)), columns=columns)
         .sample(frac=1)
         .reset_index(drop=True)
     )
 
-    # Escape curly braces
+    # Escape curly braces of each column at once
     if escape_curly_braces:
-        evaluation_dataset = evaluation_dataset.applymap(
-            lambda x: x.replace("{", "{{").replace("}", "}}")
-        )
+        for column in columns:
+            evaluation_dataset[column] = (
+                evaluation_dataset[column]
+                .str.replace("{", "{{", regex=False)
+                .str.replace("}", "}}", regex=False)
+            )
 
     # Add evaluation_data_id column
     evaluation_dataset["evaluation_data_id"] = evaluation_dataset.index
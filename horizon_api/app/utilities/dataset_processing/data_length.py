@@ -1,7 +1,6 @@
 """Defines helper functions to assess data length in evaluation dataset."""
 
-from app.models.llm.open_ai import OpenAI, ChatOpenAI
-from app.models.llm.anthropic import ChatAnthropic
+from app.utilities.tokenization import tokenizer
 import pandas as pd
 
 
@@ -30,49 +29,34 @@ def get_evaluation_data_length(
     input_data_analysis = evaluation_dataset_analysis.drop("ground_truth", axis=1)
     ground_truth_data_analysis = evaluation_dataset_analysis[["ground_truth"]]
 
-    # Calculate data length used for input values and ground truth for each row based on
-    # count of tokens and characters. Use max value of different encodings to be conservative
-    def count_tokens(row: dict):
-        string = "\n".join([f"<{key}>: {value}" for key, value in row.items()])
+    # Build string of each row of input values and ground truth, as in few shot examples
+    input_strings = get_row_strings(data=input_data_analysis)
+    ground_truth_strings = get_row_strings(data=ground_truth_data_analysis)
+
+    # Calculate data length used for input values and ground truth for each row based on count of tokens and characters. Count
+    # tokens of all rows at once with each encoding, and use max value of different encodings to be conservative
+    def count_max_tokens(strings: pd.Series) -> int:
         if unescape_curly_braces:
-            string.replace("{{", "{").replace("}}", "}")
-        token_count = max(
-            OpenAI.get_data_length(string),
-            ChatOpenAI.get_data_length(string),
-            ChatAnthropic.get_data_length(string),
-        )
-        return token_count
-
-    def count_chars(row: dict):
-        string = "\n".join([f"<{key}>: {value}" for key, value in row.items()])
-        char_count = len(string)
-        return char_count
-
-    max_input_tokens = input_data_analysis.apply(
-        lambda row: count_tokens(row.to_dict()), axis=1
-    ).max()
-    max_ground_truth_tokens = ground_truth_data_analysis.apply(
-        lambda row: count_tokens(row.to_dict()), axis=1
-    ).max()
-    max_input_characters = input_data_analysis.apply(
-        lambda row: count_chars(row.to_dict()), axis=1
-    ).max()
-    max_ground_truth_characters = ground_truth_data_analysis.apply(
-        lambda row: count_chars(row.to_dict()), axis=1
-    ).max()
+            strings = strings.str.replace("{{", "{", regex=False).str.replace(
+                "}}", "}", regex=False
+            )
+        return int(tokenizer.count_max_tokens_batch(texts=strings.to_list()).max())
+
+    max_input_tokens = count_max_tokens(input_strings)
+    max_ground_truth_tokens = count_max_tokens(ground_truth_strings)
+    max_input_characters = int(input_strings.str.len().max())
+    max_ground_truth_characters = int(ground_truth_strings.str.len().max())
 
     # Correct for fact that "<OUTPUT>:" is part of prompt, while "<ground_truth>: " is not part of LLM completion
     output_string = "\n<OUTPUT>:"
     ground_truth_string = "\n<ground_truth>: "
     max_input_tokens += max(
-        OpenAI.get_data_length(output_string),
-        ChatOpenAI.get_data_length(output_string),
-        ChatAnthropic.get_data_length(output_string),
+        tokenizer.count_tokens(text=output_string, tokenizer_name=tokenizer_name)
+        for tokenizer_name in tokenizer.TOKENIZER_NAMES
     )
     max_ground_truth_tokens -= min(
-        OpenAI.get_data_length(ground_truth_string),
-        ChatOpenAI.get_data_length(ground_truth_string),
-        ChatAnthropic.get_data_length(ground_truth_string),
+        tokenizer.count_tokens(text=ground_truth_string, tokenizer_name=tokenizer_name)
+        for tokenizer_name in tokenizer.TOKENIZER_NAMES
     )
     max_input_characters += len(output_string)
     max_ground_truth_characters -= len(ground_truth_string)
@@ -84,3 +68,21 @@ def get_evaluation_data_length(
         "max_input_characters": max_input_characters,
         "max_ground_truth_characters": max_ground_truth_characters,
     }
+
+
+def get_row_strings(data: pd.DataFrame) -> pd.Series:
+    """Builds string of each row with one "<column>: value" line per column.
+
+    Args:
+        data (pd.DataFrame): data to convert to strings.
+
+    Returns:
+        pd.Series: string of each row.
+    """
+    row_strings = pd.Series("", index=data.index)
+    for i, column in enumerate(data.columns):
+        separator = "\n" if i > 0 else ""
+        row_strings = (
+            row_strings + f"{separator}<{column}>: " + data[column].astype(str)
+        )
+    return row_strings
@@ -0,0 +1,312 @@
+"""Derived profile of an evaluation dataset, computed once per dataset version and stored next to it in s3.
+
+Processing an uploaded dataset (parsing and shuffling the csv, escaping curly braces, counting tokens of every row with each llm
+tokenizer, determining applicable llms, and segmenting train and test data) is done the first time a given version of the dataset
+is used. The processed dataset is stored as Parquet and the remaining statistics as JSON under
+dataset_profiles/v{DATASET_PROFILE_VERSION}/{profile_id}, where profile_id is derived from the ETag (content hash) of the raw
+dataset. Later task requests on the same dataset read the JSON statistics and only read the Parquet file if they need the rows.
+
+Profiles are shared by uploads with identical contents. Bump DATASET_PROFILE_VERSION whenever processing, data length, or llm
+applicability logic changes, so that stale profiles are recomputed.
+
+Typical usage example:
+
+    profile = get_dataset_profile(raw_dataset_s3_key=task.evaluation_dataset)
+    evaluation_dataset = profile.get_evaluation_dataset()
+"""
+
+from app.utilities.dataset_processing import data_check
+from app.utilities.dataset_processing import data_length
+from app.utilities.dataset_processing import input_variable_naming
+from app.utilities.dataset_processing import llm_applicability
+from app.utilities.dataset_processing import segment_data
+from app.utilities.S3.object_store import (
+    ObjectStore,
+    get_object_read_cache,
+    get_object_store,
+    open_object_as_text,
+)
+from typing import List
+import hashlib
+import io
+import json
+import logging
+import pandas as pd
+import threading
+
+DATASET_PROFILE_VERSION = 2
+DATASET_PROFILE_DIRECTORY_FORMAT_STRING = "dataset_profiles/v{version}/{profile_id}"
+
+
+class DatasetProfile:
+    """Statistics of a processed evaluation dataset, with the processed dataset itself loaded on first use."""
+
+    def __init__(
+        self,
+        profile_data: dict,
+        evaluation_dataset_key: str,
+        object_store: ObjectStore,
+        evaluation_dataset: pd.DataFrame = None,
+    ):
+        """Initializes dataset profile.
+
+        Args:
+            profile_data (dict): statistics of processed evaluation dataset, as returned by get_dataset_profile_data.
+            evaluation_dataset_key (str): key of Parquet file with processed evaluation dataset, or None if it was not stored.
+            object_store (ObjectStore): backend to read processed evaluation dataset from.
+            evaluation_dataset (pd.DataFrame, optional): processed evaluation dataset, if already in memory. Defaults to None.
+        """
+        self.input_variables = profile_data["input_variables"]
+        self.num_rows = profile_data["num_rows"]
+        self.max_input_tokens = profile_data["max_input_tokens"]
+        self.max_ground_truth_tokens = profile_data["max_ground_truth_tokens"]
+        self.max_input_characters = profile_data["max_input_characters"]
+        self.max_ground_truth_characters = profile_data["max_ground_truth_characters"]
+        self.applicable_llms = profile_data["applicable_llms"]
+        self.num_train_data = profile_data["num_train_data"]
+        self.num_test_data = profile_data["num_test_data"]
+        self.evaluation_dataset_key = evaluation_dataset_key
+        self.object_store = object_store
+        self._evaluation_dataset = evaluation_dataset
+        self._evaluation_dataset_lock = threading.Lock()
+
+    def get_evaluation_dataset_segments(self, num_test_data_input: int = None) -> dict:
+        """Returns train and test data segmentation of evaluation dataset.
+
+        Args:
+            num_test_data_input (int, optional): number of test data points to use. Used if it does not exceed the algorithm's
+                normal assignment of test data points. Defaults to None.
+
+        Returns:
+            dict: number of training and test data points, along with segmented training and test data ids.
+        """
+        # Recompute segmentation only if number of test data points is overridden
+        if num_test_data_input is not None:
+            return segment_data.segment_evaluation_dataset(
+                num_unique_data=self.num_rows, num_test_data_input=num_test_data_input
+            )
+        return {
+            "num_train_data": self.num_train_data,
+            "num_test_data": self.num_test_data,
+            "train_data_id_list": range(self.num_train_data),
+            "test_data_id_list": range(
+                self.num_train_data, self.num_train_data + self.num_test_data
+            ),
+        }
+
+    def get_evaluation_dataset(self) -> pd.DataFrame:
+        """Returns processed evaluation dataset, reading it from its Parquet file on first use.
+
+        Callers must not modify the returned DataFrame in place.
+
+        Raises:
+            ValueError: checks that Parquet file of processed evaluation dataset exists.
+
+        Returns:
+            pd.DataFrame: processed evaluation dataset.
+        """
+        with self._evaluation_dataset_lock:
+            if self._evaluation_dataset is None:
+                data, _ = get_object_read_cache().read(
+                    object_store=self.object_store, key=self.evaluation_dataset_key
+                )
+                if data is None:
+                    raise ValueError(
+                        f"Processed evaluation dataset {self.evaluation_dataset_key} does not exist."
+                    )
+                self._evaluation_dataset = pd.read_parquet(io.BytesIO(data))
+            return self._evaluation_dataset
+
+
+def get_dataset_profile_data(
+    evaluation_dataset: pd.DataFrame, evaluation_data_length: dict = None
+) -> dict:
+    """Computes statistics of processed evaluation dataset.
+
+    Args:
+        evaluation_dataset (pd.DataFrame): processed evaluation dataset, with curly braces escaped.
+        evaluation_data_length (dict, optional): max data lengths of evaluation dataset, if already computed. Defaults to None.
+
+    Returns:
+        dict: JSON-serializable input variables, number of rows, max data lengths, applicable llms, and train and test data
+            segmentation.
+    """
+    # Get input variables
+    input_variables = input_variable_naming.get_input_variables(
+        dataset_fields=evaluation_dataset.columns.to_list()
+    )
+
+    # Get evaluation data length if not computed yet
+    if evaluation_data_length is None:
+        evaluation_data_length = data_length.get_evaluation_data_length(
+            evaluation_dataset=evaluation_dataset,
+            unescape_curly_braces=True,
+        )
+    evaluation_data_length = {
+        key: int(value) for key, value in evaluation_data_length.items()
+    }
+
+    # Get applicable llms
+    applicable_llms = llm_applicability.get_applicable_llms(**evaluation_data_length)
+
+    # Get default segmentation of train and test data
+    evaluation_dataset_segments = segment_data.segment_evaluation_dataset(
+        num_unique_data=len(evaluation_dataset)
+    )
+
+    return {
+        "input_variables": input_variables,
+        "num_rows": len(evaluation_dataset),
+        **evaluation_data_length,
+        "applicable_llms": applicable_llms,
+        "num_train_data": evaluation_dataset_segments["num_train_data"],
+        "num_test_data": evaluation_dataset_segments["num_test_data"],
+    }
+
+
+def get_dataset_profile_directory(
+    raw_dataset_etag: str, input_variables_to_chunk: List[str] = None
+) -> str:
+    """Returns storage directory of profile for given version of raw dataset and processing options.
+
+    Args:
+        raw_dataset_etag (str): ETag of raw dataset.
+        input_variables_to_chunk (List[str], optional): list of input variables to chunk. Defaults to None.
+
+    Returns:
+        str: storage directory of dataset profile.
+    """
+    profile_id = hashlib.sha256(
+        json.dumps(
+            {
+                "raw_dataset_etag": raw_dataset_etag,
+                "input_variables_to_chunk": sorted(input_variables_to_chunk or []),
+            },
+            sort_keys=True,
+        ).encode("UTF-8")
+    ).hexdigest()[:32]
+    return DATASET_PROFILE_DIRECTORY_FORMAT_STRING.format(
+        version=DATASET_PROFILE_VERSION, profile_id=profile_id
+    )
+
+
+def get_dataset_profile(
+    raw_dataset_s3_key: str,
+    input_variables_to_chunk: List[str] = None,
+    object_store: ObjectStore = None,
+) -> DatasetProfile:
+    """Returns profile of raw dataset, computing and storing it if this version of the dataset has not been profiled yet.
+
+    Args:
+        raw_dataset_s3_key (str): s3 key for raw evaluation dataset.
+        input_variables_to_chunk (List[str], optional): list of input variables to chunk. Defaults to None.
+        object_store (ObjectStore, optional): backend storing raw dataset and profiles. Defaults to configured backend.
+
+    Raises:
+        ValueError: checks that raw dataset exists.
+
+    Returns:
+        DatasetProfile: profile of raw dataset.
+    """
+    object_store = object_store or get_object_store()
+
+    # Locate profile of current version of raw dataset
+    raw_dataset_etag = object_store.head(raw_dataset_s3_key)
+    if raw_dataset_etag is None:
+        raise ValueError(f"Raw dataset {raw_dataset_s3_key} does not exist.")
+    profile_directory = get_dataset_profile_directory(
+        raw_dataset_etag=raw_dataset_etag,
+        input_variables_to_chunk=input_variables_to_chunk,
+    )
+    profile_key = f"{profile_directory}/profile.json"
+    evaluation_dataset_key = f"{profile_directory}/evaluation_dataset.parquet"
+
+    # Return stored profile if available
+    profile_json, _ = get_object_read_cache().read(
+        object_store=object_store, key=profile_key
+    )
+    if profile_json is not None:
+        return DatasetProfile(
+            profile_data=json.loads(profile_json),
+            evaluation_dataset_key=evaluation_dataset_key,
+            object_store=object_store,
+        )
+
+    # Otherwise, stream raw dataset from s3, process it, and store its profile
+    with open_object_as_text(
+        key=raw_dataset_s3_key, object_store=object_store
+    ) as raw_dataset_file:
+        evaluation_dataset = data_check.get_evaluation_dataset(
+            dataset_file=raw_dataset_file,
+            escape_curly_braces=True,
+            input_variables_to_chunk=input_variables_to_chunk,
+        )
+    return store_dataset_profile(
+        raw_dataset_s3_key=raw_dataset_s3_key,
+        evaluation_dataset=evaluation_dataset,
+        input_variables_to_chunk=input_variables_to_chunk,
+        object_store=object_store,
+        raw_dataset_etag=raw_dataset_etag,
+    )
+
+
+def store_dataset_profile(
+    raw_dataset_s3_key: str,
+    evaluation_dataset: pd.DataFrame,
+    evaluation_data_length: dict = None,
+    input_variables_to_chunk: List[str] = None,
+    object_store: ObjectStore = None,
+    raw_dataset_etag: str = None,
+) -> DatasetProfile:
+    """Computes and stores profile of raw dataset from its processed evaluation dataset (e.g., right after validating an upload).
+
+    Failing to store the profile is logged rather than raised, since the profile is then computed again on first use.
+
+    Args:
+        raw_dataset_s3_key (str): s3 key for raw evaluation dataset.
+        evaluation_dataset (pd.DataFrame): processed evaluation dataset, with curly braces escaped.
+        evaluation_data_length (dict, optional): max data lengths of evaluation dataset, if already computed. Defaults to None.
+        input_variables_to_chunk (List[str], optional): list of input variables to chunk. Defaults to None.
+        object_store (ObjectStore, optional): backend storing raw dataset and profiles. Defaults to configured backend.
+        raw_dataset_etag (str, optional): ETag of raw dataset. Defaults to ETag of current version of raw dataset.
+
+    Returns:
+        DatasetProfile: profile of raw dataset.
+    """
+    object_store = object_store or get_object_store()
+    profile_data = get_dataset_profile_data(
+        evaluation_dataset=evaluation_dataset,
+        evaluation_data_length=evaluation_data_length,
+    )
+
+    # Store processed dataset before statistics, so that a stored profile always has its processed dataset
+    evaluation_dataset_key = None
+    try:
+        raw_dataset_etag = raw_dataset_etag or object_store.head(raw_dataset_s3_key)
+        if raw_dataset_etag is None:
+            raise ValueError("raw dataset does not exist")
+        profile_directory = get_dataset_profile_directory(
+            raw_dataset_etag=raw_dataset_etag,
+            input_variables_to_chunk=input_variables_to_chunk,
+        )
+        evaluation_dataset_key = f"{profile_directory}/evaluation_dataset.parquet"
+        evaluation_dataset_buffer = io.BytesIO()
+        evaluation_dataset.to_parquet(evaluation_dataset_buffer, index=False)
+        object_store.put(
+            key=evaluation_dataset_key, data=evaluation_dataset_buffer.getvalue()
+        )
+        object_store.put(
+            key=f"{profile_directory}/profile.json",
+            data=json.dumps(profile_data).encode("UTF-8"),
+        )
+    except Exception as e:
+        logging.warning(
+            f"Could not store dataset profile of {raw_dataset_s3_key} - {str(e)}"
+        )
+
+    return DatasetProfile(
+        profile_data=profile_data,
+        evaluation_dataset_key=evaluation_dataset_key,
+        object_store=object_store,
+        evaluation_dataset=evaluation_dataset,
+    )
@@ -3,9 +3,11 @@
 from app.models.component.inference_evaluation_results import InferenceEvaluationResults
 from app.models.component.task_request import TaskRequest
 from app.models.embedding.open_ai import OpenAIEmbeddings
+from typing import Dict, List, Tuple
+import queue
+import threading
 import time
 import numpy as np
-import pandas as pd
 
 
 def get_semantic_cosine_similarity_openAI(
@@ -15,6 +17,10 @@ def get_semantic_cosine_similarity_openAI(
 ) -> None:
     """Computes cosine similarity for each combination of output and ground truth.
 
+    Non-empty outputs are deduplicated and embedded in batches, then scored against precomputed ground truth embeddings with a
+    single matrix product. Empty outputs get an inference quality of 0. Evaluation latency of the batch is split evenly across
+    the rows with non-empty outputs.
+
     Inference score and evaluation latency are inserted directly into inference_evaluation_results object.
 
     Args:
@@ -23,52 +29,269 @@ def get_semantic_cosine_similarity_openAI(
         openai_api_key (str): OpenAI API key to use.
     """
     print("Starting evaluation")
+    start_time = time.time()
 
-    # Get ground truth data corresponding to each evaluation_data_id
-    db_results = (
-        task_request.evaluation_dataset_vector_db.get_data_per_evaluation_data_id(
-            evaluation_data_id_list=inference_evaluation_results["evaluation_data_id"]
-            .unique()
-            .tolist(),
-            include_embeddings=False,
-            include_input_variables_in_metadata=False,
-        )
+    # Find rows with non-empty outputs and deduplicate identical outputs
+    outputs = inference_evaluation_results["output"].tolist()
+    non_empty_rows = np.array(
+        [
+            i
+            for i, output in enumerate(outputs)
+            if isinstance(output, str) and output != ""
+        ],
+        dtype=np.int64,
     )
-    ground_truth_data = pd.DataFrame(db_results["metadata"])
+    unique_outputs = list(dict.fromkeys(outputs[i] for i in non_empty_rows))
+    unique_output_index = {output: i for i, output in enumerate(unique_outputs)}
 
-    reference_table = inference_evaluation_results.join(
-        ground_truth_data.set_index("evaluation_data_id"),
-        on="evaluation_data_id",
+    inference_quality = np.zeros(len(outputs), dtype=np.float64)
+    evaluation_latency = np.zeros(len(outputs), dtype=np.float64)
+
+    if len(non_empty_rows) > 0:
+        # Embed unique outputs in batches
+        output_embeddings = np.array(
+            OpenAIEmbeddings(openai_api_key=openai_api_key).embed_documents(
+                unique_outputs
+            ),
+            dtype=np.float32,
+        )
+
+        # Get precomputed ground truth embedding corresponding to each evaluation_data_id
+        evaluation_data_ids = inference_evaluation_results[
+            "evaluation_data_id"
+        ].to_numpy()
+        unique_evaluation_data_ids, ground_truth_rows = np.unique(
+            evaluation_data_ids[non_empty_rows], return_inverse=True
+        )
+        ground_truth_embeddings = np.asarray(
+            task_request.evaluation_dataset_vector_db.get_ground_truth_embeddings(
+                evaluation_data_id_list=unique_evaluation_data_ids.tolist()
+            ),
+            dtype=np.float32,
+        )
+
+        # Normalize embeddings, then score every unique output against every ground truth with one matrix product
+        output_embeddings /= np.maximum(
+            np.linalg.norm(output_embeddings, axis=1, keepdims=True), 1e-12
+        )
+        ground_truth_embeddings /= np.maximum(
+            np.linalg.norm(ground_truth_embeddings, axis=1, keepdims=True), 1e-12
+        )
+        similarity_matrix = np.clip(
+            output_embeddings @ ground_truth_embeddings.T, -1, 1
+        )
+
+        # Select score for each row's combination of output and ground truth
+        output_rows = np.array(
+            [unique_output_index[outputs[i]] for i in non_empty_rows], dtype=np.int64
+        )
+        inference_quality[non_empty_rows] = similarity_matrix[
+            output_rows, ground_truth_rows.reshape(-1)
+        ]
+        evaluation_latency[non_empty_rows] = (time.time() - start_time) / len(
+            non_empty_rows
+        )
+
+    # Record inference quality and evaluation latency in inference_evaluation_results object
+    inference_evaluation_results["inference_quality"] = inference_quality
+    inference_evaluation_results["evaluation_latency"] = evaluation_latency
+
+    print(
+        f"Evaluated {len(outputs)} outputs ({len(unique_outputs)} unique non-empty outputs embedded) in {time.time() - start_time:.2f} seconds"
     )
 
-    # Compute cosine similarity over every combination of output and ground truth
-    for index, row in reference_table.iterrows():
-        start_time = time.time()
-        if row["output"] != "":
-            output_embedding = OpenAIEmbeddings(
-                openai_api_key=openai_api_key
-            ).embed_query(row["output"])
-            ground_truth_embedding = OpenAIEmbeddings(
-                openai_api_key=openai_api_key
-            ).embed_query(row["ground_truth"])
-            cosine_similarity = np.dot(output_embedding, ground_truth_embedding) / (
-                np.linalg.norm(output_embedding)
-                * np.linalg.norm(ground_truth_embedding)
+
+class StreamingCosineSimilarityEvaluator:
+    """Scores llm outputs against ground truths in a background thread as they are submitted.
+
+    Outputs are grouped into small batches (by size or by wait time), embedded, and scored against precomputed ground truth
+    embeddings, so that evaluation runs concurrently with the inferences that are still in flight. Scoring is identical to
+    get_semantic_cosine_similarity_openAI: empty outputs get an inference quality of 0, and the evaluation latency of each batch is
+    split evenly across its rows with non-empty outputs.
+
+    Typical usage example:
+
+        evaluator = StreamingCosineSimilarityEvaluator(task_request=task_request, openai_api_key=openai_api_key)
+        evaluator.submit(position=0, evaluation_data_id=3, output="...")
+        inference_quality, evaluation_latency = evaluator.close()
+    """
+
+    def __init__(
+        self,
+        task_request: TaskRequest,
+        openai_api_key: str,
+        evaluation_data_id_list: List[int] = None,
+        max_batch_size: int = 64,
+        max_batch_wait_time: float = 0.25,
+    ):
+        """Loads ground truth embeddings and starts background evaluation thread.
+
+        Args:
+            task_request (TaskRequest): data structure holding task request information such ground truth dataset.
+            openai_api_key (str): OpenAI API key to use.
+            evaluation_data_id_list (List[int], optional): evaluation data ids whose ground truth embeddings to load upfront.
+                Defaults to None, in which case ground truth embeddings are loaded as outputs arrive.
+            max_batch_size (int, optional): max number of outputs embedded together. Defaults to 64.
+            max_batch_wait_time (float, optional): max seconds to wait for more outputs before embedding a partial batch. Defaults
+                to 0.25.
+        """
+        self.task_request = task_request
+        self.embeddings = OpenAIEmbeddings(openai_api_key=openai_api_key)
+        self.max_batch_size = max_batch_size
+        self.max_batch_wait_time = max_batch_wait_time
+        self.inference_quality: Dict[int, float] = {}
+        self.evaluation_latency: Dict[int, float] = {}
+        self.num_batches = 0
+        self._ground_truth_embeddings: Dict[int, np.ndarray] = {}
+        self._queue = queue.Queue()
+        self._error = None
+
+        # Load ground truth embeddings upfront so first batch does not wait on them
+        if evaluation_data_id_list:
+            self._load_ground_truth_embeddings(
+                evaluation_data_id_list=evaluation_data_id_list
             )
-        else:
-            cosine_similarity = 0
-        end_time = time.time()
-        evaluation_latency = end_time - start_time
-
-        # Record inference quality and evaluation latency in inference_evaluation_results object
-        inference_evaluation_results.loc[index, "inference_quality"] = cosine_similarity
-        inference_evaluation_results.loc[
-            index, "evaluation_latency"
-        ] = evaluation_latency
-
-        print(
-            f"prompt_model_id: {row['prompt_model_id']} | evaluation_data_id: {row['evaluation_data_id']}"
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, position: int, evaluation_data_id: int, output: str) -> None:
+        """Queues output for evaluation.
+
+        Args:
+            position (int): row position of output in inference_evaluation_results.
+            evaluation_data_id (int): evaluation data id whose ground truth the output is scored against.
+            output (str): llm output.
+        """
+        self._queue.put((position, int(evaluation_data_id), output))
+
+    def close(self) -> Tuple[Dict[int, float], Dict[int, float]]:
+        """Waits for all queued outputs to be evaluated and stops background thread.
+
+        Raises:
+            Exception: re-raises any error encountered while evaluating.
+
+        Returns:
+            Tuple[Dict[int, float], Dict[int, float]]: inference quality and evaluation latency per row position.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self.inference_quality, self.evaluation_latency
+
+    def _run(self) -> None:
+        """Evaluates queued outputs in batches until close is called."""
+        closed = False
+        while not closed:
+            # Wait for first output of batch, then gather more until batch is full or wait time elapses
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            batch_deadline = time.time() + self.max_batch_wait_time
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0, batch_deadline - time.time()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    closed = True
+                    break
+                batch.append(item)
+
+            # Skip evaluation after an error, but keep draining queue so close returns
+            if self._error is None:
+                try:
+                    self._evaluate_batch(batch=batch)
+                except Exception as e:
+                    self._error = e
+
+    def _load_ground_truth_embeddings(self, evaluation_data_id_list: List[int]) -> None:
+        """Loads ground truth embeddings that are not already loaded.
+
+        Args:
+            evaluation_data_id_list (List[int]): evaluation data ids whose ground truth embeddings to load.
+        """
+        missing_evaluation_data_ids = [
+            int(evaluation_data_id)
+            for evaluation_data_id in dict.fromkeys(evaluation_data_id_list)
+            if int(evaluation_data_id) not in self._ground_truth_embeddings
+        ]
+        if len(missing_evaluation_data_ids) == 0:
+            return
+
+        # Store normalized ground truth embeddings
+        ground_truth_embeddings = np.asarray(
+            self.task_request.evaluation_dataset_vector_db.get_ground_truth_embeddings(
+                evaluation_data_id_list=missing_evaluation_data_ids
+            ),
+            dtype=np.float32,
+        )
+        ground_truth_embeddings /= np.maximum(
+            np.linalg.norm(ground_truth_embeddings, axis=1, keepdims=True), 1e-12
         )
-        print(f"Output: {row['output']}")
-        print(f"Ground truth: {row['ground_truth']}")
-        print(f"Inference quality: {cosine_similarity}")
+        for evaluation_data_id, ground_truth_embedding in zip(
+            missing_evaluation_data_ids, ground_truth_embeddings
+        ):
+            self._ground_truth_embeddings[evaluation_data_id] = ground_truth_embedding
+
+    def _evaluate_batch(self, batch: List[Tuple[int, int, str]]) -> None:
+        """Scores batch of outputs and records inference quality and evaluation latency for each row.
+
+        Args:
+            batch (List[Tuple[int, int, str]]): row position, evaluation data id, and output of each row.
+        """
+        start_time = time.time()
+
+        # Empty outputs get inference quality of 0
+        for position, _, output in batch:
+            self.inference_quality[position] = 0
+            self.evaluation_latency[position] = 0
+        batch = [
+            (position, evaluation_data_id, output)
+            for position, evaluation_data_id, output in batch
+            if isinstance(output, str) and output != ""
+        ]
+        if len(batch) == 0:
+            return
+
+        # Embed unique outputs and normalize
+        unique_outputs = list(dict.fromkeys(output for _, _, output in batch))
+        unique_output_index = {output: i for i, output in enumerate(unique_outputs)}
+        output_embeddings = np.array(
+            self.embeddings.embed_documents(unique_outputs), dtype=np.float32
+        )
+        output_embeddings /= np.maximum(
+            np.linalg.norm(output_embeddings, axis=1, keepdims=True), 1e-12
+        )
+
+        # Score each output against its ground truth
+        self._load_ground_truth_embeddings(
+            evaluation_data_id_list=[
+                evaluation_data_id for _, evaluation_data_id, _ in batch
+            ]
+        )
+        batch_output_embeddings = output_embeddings[
+            [unique_output_index[output] for _, _, output in batch]
+        ]
+        batch_ground_truth_embeddings = np.stack(
+            [
+                self._ground_truth_embeddings[evaluation_data_id]
+                for _, evaluation_data_id, _ in batch
+            ]
+        )
+        scores = np.clip(
+            np.einsum(
+                "ij,ij->i", batch_output_embeddings, batch_ground_truth_embeddings
+            ),
+            -1,
+            1,
+        )
+
+        # Record scores and split batch latency evenly across rows
+        evaluation_latency = (time.time() - start_time) / len(batch)
+        for (position, _, _), score in zip(batch, scores):
+            self.inference_quality[position] = float(score)
+            self.evaluation_latency[position] = evaluation_latency
+        self.num_batches += 1
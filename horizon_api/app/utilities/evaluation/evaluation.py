@@ -2,7 +2,13 @@
 
 from . import cosine_similarity
 from app.models.component.inference_evaluation_results import InferenceEvaluationResults
+from app.models.component.prompt_model_candidates import PromptModelCandidates
+from app.models.component.post_processing.post_processing import PostProcessing
 from app.models.component.task_request import TaskRequest
+from app.utilities.inference import inference
+from typing import List
+import logging
+import time
 
 
 def run_evaluation(
@@ -24,3 +30,78 @@ def run_evaluation(
         inference_evaluation_results=inference_evaluation_results,
         openai_api_key=openai_api_key,
     )
+
+
+def run_inference_and_evaluation(
+    task_request: TaskRequest,
+    prompt_model_candidates: PromptModelCandidates,
+    train_or_test_dataset: str,
+    stage_id: str,
+    openai_api_key: str,
+    evaluation_data_id_list: List[int] = None,
+    post_processing: PostProcessing = None,
+) -> InferenceEvaluationResults:
+    """Runs inference and streams each output to evaluation as soon as it completes.
+
+    Evaluation of completed outputs overlaps with inferences still in flight, so only the last few outputs remain to be evaluated
+    once the last inference finishes. Results are returned once all outputs are evaluated. Produces the same columns as
+    run_inference followed by run_evaluation.
+
+    Args:
+        task_request (TaskRequest): data structure holding task request information.
+        prompt_model_candidates (PromptModelCandidates): data structure with each prompt-model candidate.
+        train_or_test_dataset (str): indicates which dataset to use; must be either "train" or "test".
+        stage_id (str): id for this inference and evaluation stage.
+        openai_api_key (str): OpenAI API key to use for evaluation.
+        evaluation_data_id_list (List[int], optional): list of evaluation data ids to filter to for inference. Defaults to None.
+        post_processing (PostProcessing, optional): details on llm output post-processing operations. Defaults to None.
+
+    Returns:
+        InferenceEvaluationResults: data structure with inference and evaluation results.
+    """
+    # Start streaming evaluator with ground truth embeddings of data points to be evaluated
+    evaluator = cosine_similarity.StreamingCosineSimilarityEvaluator(
+        task_request=task_request,
+        openai_api_key=openai_api_key,
+        evaluation_data_id_list=evaluation_data_id_list,
+    )
+
+    # Run inference, passing each output to evaluator as soon as it completes
+    try:
+        inference_evaluation_results = inference.run_inference(
+            task_request=task_request,
+            prompt_model_candidates=prompt_model_candidates,
+            train_or_test_dataset=train_or_test_dataset,
+            stage_id=stage_id,
+            evaluation_data_id_list=evaluation_data_id_list,
+            post_processing=post_processing,
+            on_inference_complete=evaluator.submit,
+        )
+    except BaseException:
+        # Stop evaluator without masking the inference error
+        try:
+            evaluator.close()
+        except Exception as e:
+            logging.warning(
+                f"Failed to close evaluator after inference error - {str(e)}"
+            )
+        raise
+
+    # Wait for remaining outputs to be evaluated
+    inference_end_time = time.time()
+    inference_quality, evaluation_latency = evaluator.close()
+
+    # Record inference quality and evaluation latency in inference_evaluation_results object
+    positions = range(len(inference_evaluation_results))
+    inference_evaluation_results["inference_quality"] = [
+        inference_quality.get(position, 0) for position in positions
+    ]
+    inference_evaluation_results["evaluation_latency"] = [
+        evaluation_latency.get(position, 0) for position in positions
+    ]
+    print(
+        f"Finished evaluation {time.time() - inference_end_time:.2f}s after last inference "
+        f"({evaluator.num_batches} embedding batches)"
+    )
+
+    return inference_evaluation_results
@@ -7,6 +7,8 @@ from app.utilities.generation import prompt_generation_metaprompts
 from app.utilities.generation import prompt_generation_models
 from app.models.component.task_request import TaskRequest
 from app.models.prompt.factory import PromptTemplateFactory
+from app.models.llm.factory import LLMFactory
+from concurrent.futures import ThreadPoolExecutor
 import json
 import copy
 
@@ -22,6 +24,9 @@ def prompt_generation_variants(
     """Generates syntactic variants of the given prompts that are semantically similar to the original. Assumes prompts are
     PromptTemplate objects.
 
+    Variant generation calls for all prompt-model candidates are dispatched in parallel, followed by the overfit check calls for
+    all generated variants.
+
     Args:
         task_request (TaskRequest): details for this task creation run.
         prompt_model_candidates (PromptModelCandidates): data structure with current set of prompt-model candidates.
@@ -54,64 +59,91 @@ def prompt_generation_variants(
         input_variables=task_request.input_variables
     )
 
-    prompt_model_id_list = []
-    generation_id_list = []
-    prompt_object_list = []
-    prompt_prefix_list = []
-    model_object_list = []
-
-    # Iterate through each prompt-model candidate and produce variants of it
-    for index, row in prompt_model_candidates.iterrows():
-        original_prompt_prefix = row["prompt_prefix"]
-
-        metaprompt_generation_formatted = metaprompt_generation.format(
-            original_prompt_prefix=original_prompt_prefix
-        )
-        responses = metaprompt_model_generation.generate(
-            [metaprompt_generation_formatted]
-        ).generations[0]
-
-        for i in range(num_variants):
-            new_prompt_prefix = responses[i].text.strip()
-            prompt_template = (
-                new_prompt_prefix + output_format_instructions + prompt_suffix
+    # Generate variants of every prompt-model candidate in parallel
+    original_prompt_prefixes = prompt_model_candidates["prompt_prefix"].to_list()
+    max_workers = LLMFactory.get_max_concurrent_requests(
+        model_name=metaprompt_model_generation.get_model_name()
+    )
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        responses_per_candidate = list(
+            executor.map(
+                lambda original_prompt_prefix: metaprompt_model_generation.generate(
+                    [
+                        metaprompt_generation.format(
+                            original_prompt_prefix=original_prompt_prefix
+                        )
+                    ]
+                ).generations[0],
+                original_prompt_prefixes,
             )
+        )
 
-            # Check that prompt template has required input variables and is formatted correctly
-            try:
-                generated_prompt = PromptTemplateFactory.create_prompt_template(
-                    "prompt",
-                    template=prompt_template,
-                    input_variables=task_request.input_variables,
+        # Check that each prompt template has required input variables and is formatted correctly
+        variant_candidates = []
+        for row_position, responses in enumerate(responses_per_candidate):
+            for i in range(num_variants):
+                new_prompt_prefix = responses[i].text.strip()
+                prompt_template = (
+                    new_prompt_prefix + output_format_instructions + prompt_suffix
+                )
+                try:
+                    generated_prompt = PromptTemplateFactory.create_prompt_template(
+                        "prompt",
+                        template=prompt_template,
+                        input_variables=task_request.input_variables,
+                    )
+                except:
+                    continue
+                variant_candidates.append(
+                    (row_position, new_prompt_prefix, generated_prompt)
                 )
-            except:
-                continue
 
-            # Check if new generated prompt is overfitting
-            metaprompt_check_formatted = metaprompt_check.format(
-                original_prompt_prefix=original_prompt_prefix,
-                new_prompt_prefix=new_prompt_prefix,
-            )
-            overfit_assessment = (
-                metaprompt_model_check.generate([metaprompt_check_formatted])
+        # Check whether each new generated prompt is overfitting, in parallel
+        overfit_assessments = list(
+            executor.map(
+                lambda variant_candidate: metaprompt_model_check.generate(
+                    [
+                        metaprompt_check.format(
+                            original_prompt_prefix=original_prompt_prefixes[
+                                variant_candidate[0]
+                            ],
+                            new_prompt_prefix=variant_candidate[1],
+                        )
+                    ]
+                )
                 .generations[0][0]
-                .text.strip()
+                .text.strip(),
+                variant_candidates,
             )
-            try:
-                overfit_check = json.loads(overfit_assessment)
-                assert overfit_check["final_answer"] in ["YES", "NO"]
-                if overfit_check["final_answer"] == "YES":
-                    continue
-            except:
-                continue
+        )
 
-            # add the generated prompt and new prompt prefix to the prompt_candidates list
-            prompt_model_id_list.append(starting_prompt_model_id)
-            starting_prompt_model_id += 1
-            generation_id_list.append(row["generation_id"] + "_[variant]")
-            prompt_object_list.append(generated_prompt)
-            prompt_prefix_list.append(new_prompt_prefix)
-            model_object_list.append(copy.deepcopy(row["model_object"]))
+    prompt_model_id_list = []
+    generation_id_list = []
+    prompt_object_list = []
+    prompt_prefix_list = []
+    model_object_list = []
+    for (
+        row_position,
+        new_prompt_prefix,
+        generated_prompt,
+    ), overfit_assessment in zip(variant_candidates, overfit_assessments):
+        # Skip new generated prompt if it is overfitting or the assessment cannot be parsed
+        try:
+            overfit_check = json.loads(overfit_assessment)
+            assert overfit_check["final_answer"] in ["YES", "NO"]
+            if overfit_check["final_answer"] == "YES":
+                continue
+        except:
+            continue
+
+        # add the generated prompt and new prompt prefix to the prompt_candidates list
+        row = prompt_model_candidates.iloc[row_position]
+        prompt_model_id_list.append(starting_prompt_model_id)
+        starting_prompt_model_id += 1
+        generation_id_list.append(row["generation_id"] + "_[variant]")
+        prompt_object_list.append(generated_prompt)
+        prompt_prefix_list.append(new_prompt_prefix)
+        model_object_list.append(copy.deepcopy(row["model_object"]))
 
     # Return new prompt variants
     variant_prompt_model_candidates = PromptModelCandidates(
@@ -7,8 +7,10 @@ from app.models.component.task_request import TaskRequest
 from app.models.component.prompt_model_candidates import PromptModelCandidates
 from app.models.component.inference_evaluation_results import InferenceEvaluationResults
 from app.models.component.post_processing.post_processing import PostProcessing
+from app.models.llm.factory import LLMFactory
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
-from typing import List
+from typing import Callable, List, Tuple
 import pandas as pd
 
 
@@ -19,9 +21,14 @@ def run_inference(
     stage_id: str,
     evaluation_data_id_list: List[int] = None,
     post_processing: PostProcessing = None,
+    max_concurrent_inferences: int = None,
+    on_inference_complete: Callable[[int, int, str], None] = None,
 ) -> InferenceEvaluationResults:
     """Run inference with given set of prompt candidates on either train or test input dataset.
 
+    Inferences are run concurrently with a bounded thread pool. Per-row inference latency is measured around each llm call, and
+    the wall-clock time for the whole stage is stored in the "inference_wall_clock_time" attribute of the results.
+
     Args:
         task_request (TaskRequest): data structure holding task request information such input variables and input dataset.
         prompt_model_candidates (PromptModelCandidates): data structure with each prompt-model candidate.
@@ -29,6 +36,10 @@ def run_inference(
         stage_id (str): id for this inference stage.
         evaluation_data_id_list (List[int], optional): list of evaluation data ids to filter to for inference. Defaults to None.
         post_processing (PostProcessing, optional): details on llm output post-processing operations. Defaults to None.
+        max_concurrent_inferences (int, optional): max number of inferences to run concurrently. Defaults to None, in which
+            case the provider limit of the llms being evaluated is used.
+        on_inference_complete (Callable[[int, int, str], None], optional): called with the row position, evaluation data id, and
+            output of each row as soon as its inference completes (e.g., to stream outputs to evaluation). Defaults to None.
 
     Returns:
         InferenceEvaluationResults: data structure with inference results.
@@ -78,48 +89,108 @@ def run_inference(
         input_data.set_index("evaluation_data_id"), on="evaluation_data_id"
     )
 
-    # Run inference on each row
-    for index, row in reference_table.iterrows():
-        # Get input values
-        input_values = row[task_request.input_variables].to_dict()
-
-        # Format prompt and generate inference
-        print(
-            f"prompt_model_id: {row['prompt_model_id']} | evaluation_data_id: {row['evaluation_data_id']} | generation_id: {row['generation_id']}"
+    # Determine number of inferences to run concurrently. Bounded by the provider limits of the llms being evaluated
+    if max_concurrent_inferences is None:
+        max_concurrent_inferences = min(
+            [
+                LLMFactory.get_max_concurrent_requests(
+                    model_name=model_object.get_model_name()
+                )
+                for model_object in prompt_model_candidates["model_object"]
+            ],
+            default=1,
         )
+    max_concurrent_inferences = max(1, max_concurrent_inferences)
+
+    # Run inference on each row. Rows are dispatched to a bounded thread pool since each inference is a network-bound llm call
+    stage_start_time = time.time()
+    with ThreadPoolExecutor(max_workers=max_concurrent_inferences) as executor:
+        futures = {
+            executor.submit(
+                run_single_inference,
+                row=row,
+                input_variables=task_request.input_variables,
+                post_processing=post_processing,
+            ): (position, row["evaluation_data_id"])
+            for position, (index, row) in enumerate(reference_table.iterrows())
+        }
+
+        # Pass along each output as soon as it completes, if requested
+        if on_inference_complete is not None:
+            for future in as_completed(futures):
+                position, evaluation_data_id = futures[future]
+                on_inference_complete(position, evaluation_data_id, future.result()[0])
+        inference_outputs = [future.result() for future in futures]
+    stage_end_time = time.time()
+
+    # Record output and inference latency for every row at once
+    if len(inference_outputs) > 0:
+        output_list, inference_latency_list = zip(*inference_outputs)
+        inference_evaluation_results["output"] = list(output_list)
+        inference_evaluation_results["inference_latency"] = list(inference_latency_list)
+
+    # Record wall-clock time for the whole stage (per-row inference latency is tracked separately for each row)
+    inference_wall_clock_time = stage_end_time - stage_start_time
+    inference_evaluation_results.attrs[
+        "inference_wall_clock_time"
+    ] = inference_wall_clock_time
+    print(
+        f"Finished {len(inference_evaluation_results)} inferences in {inference_wall_clock_time:.2f}s with up to "
+        f"{max_concurrent_inferences} concurrent inferences"
+    )
 
-        original_formatted_prompt = row["prompt_object"].format(**input_values)
-        formatted_prompt_for_llm = original_formatted_prompt
-        model_object = row["model_object"]
-        # If model is ChatOpenAI or ChatAnthropic, then wrap message with HumanMessage object
-        if type(model_object) == ChatOpenAI or type(model_object) == ChatAnthropic:
-            formatted_prompt_for_llm = [HumanMessage(content=formatted_prompt_for_llm)]
-
-        start_time = time.time()
-        output = (
-            model_object.generate([formatted_prompt_for_llm])
-            .generations[0][0]
-            .text.strip()
-        )
+    return inference_evaluation_results
 
-        # Conduct post-processing if applicable
-        if post_processing:
-            try:
-                updated_output = post_processing.parse_and_retry_if_needed(
-                    original_output=output, prompt_string=original_formatted_prompt
-                )
-                output = updated_output
-            except:
-                # If output fails to satisfy output schema requirements, continue with original output
-                print("-----FAILED IN INFERENCE-----")
-                print(f"Original output: {output}")
-                print("-----FAILED IN INFERENCE-----")
 
-        end_time = time.time()
-        inference_latency = end_time - start_time
+def run_single_inference(
+    row: pd.Series,
+    input_variables: List[str],
+    post_processing: PostProcessing = None,
+) -> Tuple[str, float]:
+    """Run inference for a single combination of prompt-model candidate and input data.
 
-        # Record output and inference latency
-        inference_evaluation_results.loc[index, "output"] = output
-        inference_evaluation_results.loc[index, "inference_latency"] = inference_latency
+    Args:
+        row (pd.Series): row with prompt object, model object, and input values.
+        input_variables (List[str]): list of input variables.
+        post_processing (PostProcessing, optional): details on llm output post-processing operations. Defaults to None.
 
-    return inference_evaluation_results
+    Returns:
+        Tuple[str, float]: llm output and inference latency.
+    """
+    # Get input values
+    input_values = row[input_variables].to_dict()
+
+    # Format prompt and generate inference
+    print(
+        f"prompt_model_id: {row['prompt_model_id']} | evaluation_data_id: {row['evaluation_data_id']} | generation_id: {row['generation_id']}"
+    )
+
+    original_formatted_prompt = row["prompt_object"].format(**input_values)
+    formatted_prompt_for_llm = original_formatted_prompt
+    model_object = row["model_object"]
+    # If model is ChatOpenAI or ChatAnthropic, then wrap message with HumanMessage object
+    if type(model_object) == ChatOpenAI or type(model_object) == ChatAnthropic:
+        formatted_prompt_for_llm = [HumanMessage(content=formatted_prompt_for_llm)]
+
+    start_time = time.time()
+    output = (
+        model_object.generate([formatted_prompt_for_llm]).generations[0][0].text.strip()
+    )
+
+    # Conduct post-processing if applicable
+    if post_processing:
+        try:
+            updated_output = post_processing.parse_and_retry_if_needed(
+                original_output=output, prompt_string=original_formatted_prompt
+            )
+            output = updated_output
+        except:
+            # If output fails to satisfy output schema requirements, continue with original output
+            print("-----FAILED IN INFERENCE-----")
+            print(f"Original output: {output}")
+            print("-----FAILED IN INFERENCE-----")
+
+    end_time = time.time()
+    inference_latency = end_time - start_time
+
+    return output, inference_latency
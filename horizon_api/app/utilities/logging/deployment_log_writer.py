@@ -0,0 +1,397 @@
+"""Background writer that inserts deployment logs in bulk, off the request path.
+
+Deployments put their log values in a bounded in-process queue and return immediately. A daemon thread drains the queue and
+writes the logs with a single bulk insert every DEPLOYMENT_LOG_FLUSH_MAX_ROWS logs or every DEPLOYMENT_LOG_FLUSH_INTERVAL_MS
+milliseconds, whichever comes first. Token counting that the llm provider did not report (e.g., Anthropic models, streamed
+completions) and cost computation also happen in the writer thread. When the queue is full, new logs are dropped rather than
+blocking deployments, and counted in the writer's metrics.
+
+Set DEPLOYMENT_LOG_WRITER_ASYNC to false to write logs synchronously within the request instead, with one bulk insert per
+enqueue or enqueue_many call (e.g., for tests that use an in-memory sqlite db, which is not shared across threads).
+
+Typical usage example:
+
+    get_deployment_log_writer().enqueue(pending_deployment_log_values=dict(deployment_log_values, task_id=1, prompt_id=2))
+    get_deployment_log_writer().enqueue_many(pending_deployment_log_values_list=batch_deployment_log_values)
+"""
+
+from app import db
+from app.models.llm.factory import LLMFactory
+from app.utilities.logging.task_logger import TaskLogger
+from app.utilities.tokenization import tokenizer
+from flask import Flask, current_app, has_app_context
+from typing import List
+import atexit
+import logging
+import queue
+import threading
+import time
+
+
+def get_deployment_log_values(pending_deployment_log_values: dict) -> dict:
+    """Completes pending deployment log values by counting tokens not reported by the llm provider and computing costs.
+
+    Args:
+        pending_deployment_log_values (dict): log values of a deployment. If "prompt_data_length" or "completion_data_length"
+            is None, then "prompt_string" or "completion_string" holds the text to measure with the model's tokenizer.
+
+    Returns:
+        dict: arguments of TaskLogger.log_deployment.
+    """
+    deployment_log_values = dict(pending_deployment_log_values)
+    model_name = deployment_log_values["model_name"]
+    prompt_string = deployment_log_values.pop("prompt_string", None)
+    completion_string = deployment_log_values.pop("completion_string", None)
+
+    # Count tokens with the model's tokenizer if not reported by the llm provider
+    tokenizer_name = LLMFactory.get_tokenizer_name(model_name=model_name)
+    if deployment_log_values.get("prompt_data_length") is None:
+        deployment_log_values["prompt_data_length"] = tokenizer.count_tokens(
+            text=prompt_string or "", tokenizer_name=tokenizer_name
+        )
+    if deployment_log_values.get("completion_data_length") is None:
+        deployment_log_values["completion_data_length"] = tokenizer.count_tokens(
+            text=completion_string or "", tokenizer_name=tokenizer_name
+        )
+
+    # Compute costs
+    deployment_log_values["data_unit"] = LLMFactory.get_data_unit(model_name=model_name)
+    deployment_log_values["prompt_cost"] = LLMFactory.get_prompt_cost(
+        model_name=model_name,
+        prompt_data_length=deployment_log_values["prompt_data_length"],
+    )
+    deployment_log_values["completion_cost"] = LLMFactory.get_completion_cost(
+        model_name=model_name,
+        completion_data_length=deployment_log_values["completion_data_length"],
+    )
+    deployment_log_values["total_inference_cost"] = (
+        deployment_log_values["prompt_cost"] + deployment_log_values["completion_cost"]
+    )
+    return deployment_log_values
+
+
+def get_deployment_log_values_list(
+    pending_deployment_log_values_list: List[dict],
+) -> List[dict]:
+    """Completes pending log values of a batch of deployments, counting tokens of all deployments that share a tokenizer at once.
+
+    Args:
+        pending_deployment_log_values_list (List[dict]): log values of deployments, as accepted by get_deployment_log_values.
+
+    Returns:
+        List[dict]: arguments of TaskLogger.log_deployment for each deployment.
+    """
+    pending_deployment_log_values_list = [
+        dict(pending_deployment_log_values)
+        for pending_deployment_log_values in pending_deployment_log_values_list
+    ]
+
+    # Group strings whose tokens were not reported by the llm provider by tokenizer
+    strings_by_tokenizer = {}
+    for pending_deployment_log_values in pending_deployment_log_values_list:
+        tokenizer_name = LLMFactory.get_tokenizer_name(
+            model_name=pending_deployment_log_values["model_name"]
+        )
+        for data_length_key, string_key in [
+            ("prompt_data_length", "prompt_string"),
+            ("completion_data_length", "completion_string"),
+        ]:
+            if pending_deployment_log_values.get(data_length_key) is None:
+                strings_by_tokenizer.setdefault(tokenizer_name, []).append(
+                    (
+                        pending_deployment_log_values,
+                        data_length_key,
+                        pending_deployment_log_values.pop(string_key, None) or "",
+                    )
+                )
+
+    # Count tokens of each group in a single batch
+    for tokenizer_name, strings in strings_by_tokenizer.items():
+        token_counts = tokenizer.count_tokens_batch(
+            texts=[string for _, _, string in strings], tokenizer_name=tokenizer_name
+        )
+        for (pending_deployment_log_values, data_length_key, _), token_count in zip(
+            strings, token_counts
+        ):
+            pending_deployment_log_values[data_length_key] = int(token_count)
+
+    # Compute costs
+    return [
+        get_deployment_log_values(
+            pending_deployment_log_values=pending_deployment_log_values
+        )
+        for pending_deployment_log_values in pending_deployment_log_values_list
+    ]
+
+
+class DeploymentLogWriter:
+    """Bounded queue of deployment logs drained by a background thread that writes them in bulk."""
+
+    def __init__(
+        self,
+        app: Flask,
+        max_queue_size: int = 10000,
+        flush_max_rows: int = 500,
+        flush_interval_ms: int = 1000,
+        asynchronous: bool = True,
+    ):
+        """Initializes writer. The background thread is started on first use.
+
+        Args:
+            app (Flask): app whose db the logs are written to.
+            max_queue_size (int, optional): max number of logs waiting to be written before new logs are dropped. Defaults to
+                10000.
+            flush_max_rows (int, optional): max number of logs written per bulk insert. Defaults to 500.
+            flush_interval_ms (int, optional): max milliseconds a log waits in the queue before being written. Defaults to 1000.
+            asynchronous (bool, optional): whether to write logs in a background thread. If False, logs are written
+                synchronously by the caller. Defaults to True.
+        """
+        self.app = app
+        self.max_queue_size = max_queue_size
+        self.flush_max_rows = max(1, flush_max_rows)
+        self.flush_interval_ms = flush_interval_ms
+        self.asynchronous = asynchronous
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._thread = None
+
+        # Metrics
+        self.num_enqueued = 0
+        self.num_dropped = 0
+        self.num_written = 0
+        self.num_failed = 0
+        self.num_flushes = 0
+        self.max_queue_depth = 0
+        self.total_flush_time = 0.0
+
+    def enqueue(self, pending_deployment_log_values: dict) -> bool:
+        """Queues deployment log to be written. Never blocks; drops the log if the queue is full.
+
+        Args:
+            pending_deployment_log_values (dict): log values of a deployment, as accepted by get_deployment_log_values.
+
+        Returns:
+            bool: whether log was queued (or written, if not asynchronous).
+        """
+        return (
+            self.enqueue_many(
+                pending_deployment_log_values_list=[pending_deployment_log_values]
+            )
+            == 1
+        )
+
+    def enqueue_many(self, pending_deployment_log_values_list: List[dict]) -> int:
+        """Queues batch of deployment logs to be written. Never blocks; drops logs that do not fit in the queue.
+
+        If not asynchronous, the batch is written with a single bulk insert instead.
+
+        Args:
+            pending_deployment_log_values_list (List[dict]): log values of deployments, as accepted by
+                get_deployment_log_values.
+
+        Returns:
+            int: number of logs queued (or written, if not asynchronous).
+        """
+        if len(pending_deployment_log_values_list) == 0:
+            return 0
+        if not self.asynchronous:
+            with self._lock:
+                self.num_enqueued += len(pending_deployment_log_values_list)
+            if self.write(
+                pending_deployment_log_values_list=pending_deployment_log_values_list
+            ):
+                return len(pending_deployment_log_values_list)
+            return 0
+
+        self._start()
+        num_queued = 0
+        for pending_deployment_log_values in pending_deployment_log_values_list:
+            try:
+                self._queue.put_nowait(pending_deployment_log_values)
+                num_queued += 1
+            except queue.Full:
+                break
+        num_dropped = len(pending_deployment_log_values_list) - num_queued
+
+        with self._lock:
+            self.num_enqueued += num_queued
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+            previous_num_dropped = self.num_dropped
+            self.num_dropped += num_dropped
+            total_num_dropped = self.num_dropped
+
+        # Warn on first drop and periodically after, rather than once per dropped log
+        if num_dropped > 0 and (
+            previous_num_dropped == 0
+            or previous_num_dropped // 1000 != total_num_dropped // 1000
+        ):
+            logging.warning(
+                f"Deployment log queue is full ({self.max_queue_size} logs); {total_num_dropped} logs dropped so far"
+            )
+
+        # Wake up writer early once a full batch is waiting
+        if self._queue.qsize() >= self.flush_max_rows:
+            self._flush_requested.set()
+        return num_queued
+
+    def flush(self, timeout: float = 10) -> bool:
+        """Waits until all logs queued so far have been written (or failed).
+
+        Args:
+            timeout (float, optional): max seconds to wait. Defaults to 10.
+
+        Returns:
+            bool: whether queue was drained before timeout.
+        """
+        if not self.asynchronous or self._thread is None:
+            return True
+        deadline = time.monotonic() + timeout
+        self._flush_requested.set()
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._thread.is_alive():
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def write(self, pending_deployment_log_values_list: List[dict]) -> bool:
+        """Counts tokens, computes costs, and inserts deployment logs in a single bulk insert.
+
+        Uses the current app context if there is one (e.g., synchronous writes within a request), and otherwise pushes an app
+        context for the duration of the write.
+
+        Args:
+            pending_deployment_log_values_list (List[dict]): log values of deployments.
+
+        Returns:
+            bool: whether logs were written.
+        """
+        if has_app_context():
+            return self._write(pending_deployment_log_values_list)
+        with self.app.app_context():
+            return self._write(pending_deployment_log_values_list)
+
+    def _write(self, pending_deployment_log_values_list: List[dict]) -> bool:
+        """Writes deployment logs within the current app context.
+
+        Args:
+            pending_deployment_log_values_list (List[dict]): log values of deployments.
+
+        Returns:
+            bool: whether logs were written.
+        """
+        start_time = time.monotonic()
+        try:
+            TaskLogger().log_deployments(
+                deployment_log_values_list=get_deployment_log_values_list(
+                    pending_deployment_log_values_list=pending_deployment_log_values_list
+                )
+            )
+        except Exception as e:
+            db.session.rollback()
+            with self._lock:
+                self.num_failed += len(pending_deployment_log_values_list)
+            logging.error(
+                f"Failed to write {len(pending_deployment_log_values_list)} deployment logs: {str(e)}"
+            )
+            return False
+
+        with self._lock:
+            self.num_written += len(pending_deployment_log_values_list)
+            self.num_flushes += 1
+            self.total_flush_time += time.monotonic() - start_time
+        return True
+
+    def _start(self) -> None:
+        """Starts background writer thread if it is not running."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="deployment-log-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        """Drains queue in batches of up to flush_max_rows logs, waiting at most flush_interval_ms for a batch to fill."""
+        while True:
+            # Block until the first log of the next batch arrives
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval_ms / 1000
+
+            # Collect more logs until batch is full, interval has elapsed, or a flush is requested
+            while len(batch) < self.flush_max_rows:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    pass
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._flush_requested.is_set():
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=min(remaining, 0.05)))
+                except queue.Empty:
+                    continue
+            if self._queue.empty():
+                self._flush_requested.clear()
+
+            try:
+                self.write(pending_deployment_log_values_list=batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def get_metrics(self) -> dict:
+        """Returns queue depth, back-pressure, and write counters for monitoring.
+
+        Returns:
+            dict: writer metrics.
+        """
+        queue_depth = self._queue.qsize()
+        with self._lock:
+            return {
+                "queue_depth": queue_depth,
+                "max_queue_size": self.max_queue_size,
+                "queue_utilization": queue_depth / self.max_queue_size
+                if self.max_queue_size > 0
+                else 0,
+                "max_queue_depth": self.max_queue_depth,
+                "num_enqueued": self.num_enqueued,
+                "num_dropped": self.num_dropped,
+                "num_written": self.num_written,
+                "num_failed": self.num_failed,
+                "num_flushes": self.num_flushes,
+                "average_flush_time": self.total_flush_time / self.num_flushes
+                if self.num_flushes > 0
+                else 0,
+            }
+
+
+_deployment_log_writer_lock = threading.Lock()
+
+
+def get_deployment_log_writer() -> DeploymentLogWriter:
+    """Returns deployment log writer of the current app, configured from app config. Requires app context.
+
+    Returns:
+        DeploymentLogWriter: deployment log writer shared within this process.
+    """
+    app = current_app._get_current_object()
+    with _deployment_log_writer_lock:
+        if "deployment_log_writer" not in app.extensions:
+            deployment_log_writer = DeploymentLogWriter(
+                app=app,
+                max_queue_size=app.config["DEPLOYMENT_LOG_QUEUE_MAX_SIZE"],
+                flush_max_rows=app.config["DEPLOYMENT_LOG_FLUSH_MAX_ROWS"],
+                flush_interval_ms=app.config["DEPLOYMENT_LOG_FLUSH_INTERVAL_MS"],
+                asynchronous=app.config["DEPLOYMENT_LOG_WRITER_ASYNC"],
+            )
+
+            # Write logs still queued when the process exits
+            atexit.register(deployment_log_writer.flush)
+            app.extensions["deployment_log_writer"] = deployment_log_writer
+        return app.extensions["deployment_log_writer"]
@@ -0,0 +1,82 @@
+"""Periodic structured log of metrics of in-process caches and writers.
+
+A daemon thread logs the metrics of the deployment log writer and the API key cache of this process as a single line of JSON
+every METRICS_LOG_INTERVAL_SECONDS seconds, so that queue depth, dropped logs, and hit rates can be monitored through the log
+pipeline. The thread is started on the first request handled by each process (e.g., each forked web server worker), and is
+not started if METRICS_LOG_INTERVAL_SECONDS is 0.
+
+Typical usage example:
+
+    app.before_request(lambda: start_metrics_reporter(app=app))
+"""
+
+from app.utilities.authentication.api_key_cache import get_api_key_cache
+from flask import Flask
+import json
+import logging
+import os
+import threading
+import time
+
+_metrics_reporter_lock = threading.Lock()
+
+
+def get_metrics(app: Flask) -> dict:
+    """Returns metrics of in-process caches and writers of app.
+
+    Args:
+        app (Flask): app whose deployment log writer to report on.
+
+    Returns:
+        dict: metrics of each cache and writer, keyed by name. Writers not used yet in this process are omitted.
+    """
+    metrics = {"pid": os.getpid(), "api_key_cache": get_api_key_cache().get_metrics()}
+    deployment_log_writer = app.extensions.get("deployment_log_writer")
+    if deployment_log_writer is not None:
+        metrics["deployment_log_writer"] = deployment_log_writer.get_metrics()
+    return metrics
+
+
+def start_metrics_reporter(app: Flask, interval_seconds: float = None) -> None:
+    """Starts thread that periodically logs metrics of app, unless it is already running in this process.
+
+    Args:
+        app (Flask): app to report metrics of.
+        interval_seconds (float, optional): seconds between metrics logs. Defaults to app config METRICS_LOG_INTERVAL_SECONDS.
+    """
+    if interval_seconds is None:
+        interval_seconds = app.config["METRICS_LOG_INTERVAL_SECONDS"]
+    if interval_seconds <= 0:
+        return
+
+    # Threads do not survive forks, so check that the reporter was started by this process
+    metrics_reporter = app.extensions.get("metrics_reporter")
+    if metrics_reporter is not None and metrics_reporter["pid"] == os.getpid():
+        return
+    with _metrics_reporter_lock:
+        metrics_reporter = app.extensions.get("metrics_reporter")
+        if metrics_reporter is not None and metrics_reporter["pid"] == os.getpid():
+            return
+        thread = threading.Thread(
+            target=_run,
+            args=(app, interval_seconds),
+            name="metrics-reporter",
+            daemon=True,
+        )
+        thread.start()
+        app.extensions["metrics_reporter"] = {"pid": os.getpid(), "thread": thread}
+
+
+def _run(app: Flask, interval_seconds: float) -> None:
+    """Logs metrics of app every interval_seconds seconds.
+
+    Args:
+        app (Flask): app to report metrics of.
+        interval_seconds (float): seconds between metrics logs.
+    """
+    while True:
+        time.sleep(interval_seconds)
+        try:
+            logging.info(f"metrics {json.dumps(get_metrics(app=app))}")
+        except Exception as e:
+            logging.warning(f"Failed to log metrics - {str(e)}")
@@ -3,11 +3,20 @@ from sqlalchemy.exc import IntegrityError
 from app.models.component.task_deployment_log.task_deployment_log import (
     TaskDeploymentLog,
 )
-from app.utilities.S3.s3_util import upload_file_to_s3
+from app.utilities.S3.s3_util import open_file_for_upload_to_s3
+from config import Config
 from datetime import datetime
+from sqlalchemy import tuple_
 import pandas as pd
-from io import BytesIO
+import itertools
 import json
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+# File formats that deployment logs can be exported to
+EXPORT_FILE_FORMATS = ["csv", "parquet"]
+
+# Columns of exported deployment logs, in order
+EXPORT_COLUMNS = [column.name for column in TaskDeploymentLog.__table__.columns]
 
 
 class TaskLogger:
@@ -52,30 +61,173 @@ class TaskLogger:
 
         return log_entry
 
-    def get_logs(self, task_id=None):
-        if task_id:
-            logs = TaskDeploymentLog.query.filter_by(task_id=task_id).all()
-        else:
-            logs = TaskDeploymentLog.query.all()
+    def log_deployments(self, deployment_log_values_list: List[dict]) -> None:
+        # Insert log entries for many deployments in a single statement. Each dict has the arguments of log_deployment
+        if len(deployment_log_values_list) == 0:
+            return
+        db.session.bulk_insert_mappings(
+            TaskDeploymentLog,
+            [
+                dict(
+                    deployment_log_values,
+                    input_values=json.dumps(deployment_log_values["input_values"]),
+                )
+                for deployment_log_values in deployment_log_values_list
+            ],
+        )
+        db.session.commit()
 
-        if len(logs) == 0:
-            return None
+    def query_logs(
+        self,
+        task_id: int = None,
+        start_time: datetime = None,
+        end_time: datetime = None,
+        cursor: Tuple[datetime, int] = None,
+        limit: int = 1000,
+    ) -> List[dict]:
+        # Return a page of logs in time order using keyset pagination on the (task_id, timestamp, id) index. Cursor is the
+        # (timestamp, id) of the last log of the previous page. Time range includes start_time and excludes end_time
+        query = db.session.query(*TaskDeploymentLog.__table__.columns)
+        if task_id is not None:
+            query = query.filter(TaskDeploymentLog.task_id == task_id)
+        if start_time is not None:
+            query = query.filter(TaskDeploymentLog.timestamp >= start_time)
+        if end_time is not None:
+            query = query.filter(TaskDeploymentLog.timestamp < end_time)
+        if cursor is not None:
+            query = query.filter(
+                tuple_(TaskDeploymentLog.timestamp, TaskDeploymentLog.id)
+                > tuple_(*cursor)
+            )
+        rows = (
+            query.order_by(TaskDeploymentLog.timestamp, TaskDeploymentLog.id)
+            .limit(limit)
+            .all()
+        )
+        return [dict(row._mapping) for row in rows]
 
-        df = pd.DataFrame([log.to_dict() for log in logs])
-        csv_buffer = BytesIO()
-        df.to_csv(csv_buffer, index=False)
-        csv_buffer.seek(0)
+    def iterate_log_pages(
+        self,
+        task_id: int = None,
+        start_time: datetime = None,
+        end_time: datetime = None,
+        page_size: int = 5000,
+    ) -> Iterator[List[dict]]:
+        # Yield pages of logs in time order until all logs in time range have been read
+        cursor = None
+        while True:
+            logs = self.query_logs(
+                task_id=task_id,
+                start_time=start_time,
+                end_time=end_time,
+                cursor=cursor,
+                limit=page_size,
+            )
+            if len(logs) == 0:
+                return
+            yield logs
+            if len(logs) < page_size:
+                return
+            cursor = (logs[-1]["timestamp"], logs[-1]["id"])
+
+    def get_logs(
+        self,
+        task_id: int = None,
+        start_time: datetime = None,
+        end_time: datetime = None,
+        file_format: str = "csv",
+    ) -> Optional[str]:
+        # Export logs page by page to a file in s3 and return its s3 key, or None if there are no logs. Each page is written to
+        # a multipart upload as soon as it is read, so memory use does not grow with the number of logs
+        if file_format not in EXPORT_FILE_FORMATS:
+            raise ValueError(
+                f"Invalid file format: {file_format}. Must be one of {EXPORT_FILE_FORMATS}"
+            )
+        log_pages = self.iterate_log_pages(
+            task_id=task_id,
+            start_time=start_time,
+            end_time=end_time,
+            page_size=Config.DEPLOYMENT_LOG_EXPORT_PAGE_SIZE,
+        )
+        first_page = next(log_pages, None)
+        if first_page is None:
+            return None
 
         # Prepare a unique log file name
         if task_id:
-            log_file_name = f"deployment_logs/{task_id}/{datetime.now().strftime('%Y/%m/%d/%H%M%SZ')}/deployment_logs_{task_id}.csv"
+            log_file_name = f"deployment_logs/{task_id}/{datetime.now().strftime('%Y/%m/%d/%H%M%SZ')}/deployment_logs_{task_id}.{file_format}"
         else:
-            log_file_name = f"deployment_logs/all_tasks/{datetime.now().strftime('%Y/%m/%d/%H%M%SZ')}/deployment_logs.csv"
+            log_file_name = f"deployment_logs/all_tasks/{datetime.now().strftime('%Y/%m/%d/%H%M%SZ')}/deployment_logs.{file_format}"
 
-        upload_file_to_s3(file=csv_buffer, key=log_file_name)
+        with open_file_for_upload_to_s3(key=log_file_name) as upload:
+            if file_format == "csv":
+                write_logs_as_csv(
+                    log_pages=itertools.chain([first_page], log_pages), file=upload
+                )
+            else:
+                write_logs_as_parquet(
+                    log_pages=itertools.chain([first_page], log_pages), file=upload
+                )
 
         return log_file_name
 
     def clear_logs():
         TaskDeploymentLog.query.delete()
         db.session.commit()
+
+
+def write_logs_as_csv(log_pages: Iterator[List[dict]], file: BinaryIO) -> None:
+    # Write header once, then each page of logs as rows. Timestamps are formatted as in TaskDeploymentLog.to_dict
+    for i, logs in enumerate(log_pages):
+        df = pd.DataFrame(logs, columns=EXPORT_COLUMNS)
+        df["timestamp"] = df["timestamp"].map(datetime.isoformat)
+        file.write(df.to_csv(index=False, header=(i == 0)).encode("utf-8"))
+
+
+def write_logs_as_parquet(log_pages: Iterator[List[dict]], file: BinaryIO) -> None:
+    # Write each page of logs as a row group
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError(
+            "Could not import pyarrow python package. "
+            "Please install it with `pip install pyarrow` to export logs as Parquet."
+        )
+
+    # Use schema of TaskDeploymentLog columns rather than inferring it from the first page, where a column that is entirely
+    # null would be inferred as null type and fail to hold values of later pages
+    schema = get_export_parquet_schema()
+    writer = None
+    try:
+        for logs in log_pages:
+            table = pa.Table.from_pandas(
+                pd.DataFrame(logs, columns=EXPORT_COLUMNS),
+                schema=schema,
+                preserve_index=False,
+            )
+            if writer is None:
+                writer = pq.ParquetWriter(file, schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def get_export_parquet_schema():
+    # Map type of each TaskDeploymentLog column to the Parquet type of its exported column
+    import pyarrow as pa
+
+    parquet_types = {
+        bool: pa.bool_(),
+        int: pa.int64(),
+        float: pa.float64(),
+        str: pa.string(),
+        datetime: pa.timestamp("us"),
+    }
+    return pa.schema(
+        [
+            pa.field(column.name, parquet_types[column.type.python_type])
+            for column in TaskDeploymentLog.__table__.columns
+        ]
+    )
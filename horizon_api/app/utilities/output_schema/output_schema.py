@@ -1,12 +1,14 @@
 """Helper functions to manage output schemas and associated Pydantic objects."""
 
-from app.utilities.S3.s3_util import download_file_from_s3_and_save_locally
+from app.utilities.S3.object_store import read_object
 from app.utilities.dataset_processing import data_check
 from pydantic import BaseModel
 import json
 import os
 import importlib
 import sys
+import types
+import uuid
 from typing import Any
 
 
@@ -26,7 +28,7 @@ VALID_JSON_KEYS_FOR_OUTPUT_SCHEMA = [
 
 
 def get_pydantic_object_from_s3(pydantic_model_s3_key: str) -> BaseModel:
-    """Downloads Python file defining Pydantic model from s3, then imports it and creates corresponding Pydantic object.
+    """Reads Python file defining Pydantic model from s3 into memory, then executes it and creates corresponding Pydantic object.
 
     Args:
         pydantic_model_s3_key (str): s3 key for Python file defining Pydantic model.
@@ -34,27 +36,17 @@ def get_pydantic_object_from_s3(pydantic_model_s3_key: str) -> BaseModel:
     Returns:
         BaseModel: Pydantic object.
     """
-    # Download Pydantic model file from s3
-    pydantic_model_file_path = download_file_from_s3_and_save_locally(
-        pydantic_model_s3_key
+    # Read Pydantic model source from s3 (served from memory if unchanged since last read)
+    pydantic_model_source, etag = read_object(key=pydantic_model_s3_key)
+    if pydantic_model_source is None:
+        raise ValueError(f"Pydantic model {pydantic_model_s3_key} does not exist.")
+
+    # Get Pydantic object from source code
+    return get_pydantic_object_from_source(
+        pydantic_model_source=pydantic_model_source.decode("utf-8"),
+        pydantic_module_name=f"pydantic_model_{uuid.uuid4().hex}",
     )
 
-    # Add .py extension to the file path
-    new_pydantic_model_file_path = os.path.splitext(pydantic_model_file_path)[0] + ".py"
-    os.rename(pydantic_model_file_path, new_pydantic_model_file_path)
-    pydantic_model_file_path = new_pydantic_model_file_path
-
-    # Get Pydantic object from file path
-    pydantic_object = get_pydantic_object_from_file_path(
-        pydantic_model_file_path=pydantic_model_file_path
-    )
-
-    # Clean up temp file
-    os.remove(pydantic_model_file_path)
-
-    # Return Pydantic object
-    return pydantic_object
-
 
 def get_pydantic_object_from_file_path(pydantic_model_file_path: str) -> BaseModel:
     """Given path to local Python file defining Pydantic model, imports it and creates corresponding Pydantic object.
@@ -85,6 +77,36 @@ def get_pydantic_object_from_file_path(pydantic_model_file_path: str) -> BaseMod
     return pydantic_object
 
 
+def get_pydantic_object_from_source(
+    pydantic_model_source: str, pydantic_module_name: str
+) -> BaseModel:
+    """Given source code of Python file defining Pydantic model, executes it in memory and returns corresponding Pydantic object.
+
+    Args:
+        pydantic_model_source (str): source code of Python file defining Pydantic model.
+        pydantic_module_name (str): unique module name to execute source code under.
+
+    Returns:
+        BaseModel: Pydantic object.
+    """
+    # Execute source code as module. Module is registered while executing so that Pydantic can resolve forward references
+    pydantic_module_object = types.ModuleType(pydantic_module_name)
+    sys.modules[pydantic_module_name] = pydantic_module_object
+    try:
+        exec(
+            compile(pydantic_model_source, pydantic_module_name, "exec"),
+            pydantic_module_object.__dict__,
+        )
+
+        # Pydantic class / object assumed to be called "OutputSchema"
+        pydantic_object = getattr(pydantic_module_object, ASSUMED_PYDANTIC_CLASS_NAME)
+    finally:
+        # Delete module from system reference
+        del sys.modules[pydantic_module_name]
+
+    return pydantic_object
+
+
 def check_and_process_output_schema(output_schema_file_path: str) -> None:
     """Checks contents of output schema for potential errors and standardizes Pydantic class / object name for later reference.
 
@@ -0,0 +1,213 @@
+"""Per-process registry of Pydantic objects loaded from output schemas stored in s3.
+
+Loading a Pydantic object from s3 requires downloading and executing the Python file generated from the output schema. The
+registry keeps each loaded Pydantic object, its output parser, and its format instructions in memory, keyed by s3 key and the
+ETag of the s3 object. Cached entries are revalidated against the current ETag (a single HEAD request) at most once every
+Config.PYDANTIC_SCHEMA_REGISTRY_REVALIDATE_SECONDS, so overwriting the file under the same s3 key is picked up by every process.
+
+Typical usage example:
+
+    loaded_schema = get_pydantic_schema_registry().get(pydantic_model_s3_key=task.pydantic_model)
+    parsed_output = loaded_schema.pydantic_output_parser.parse(text=output)
+"""
+
+from app.models.component.task import Task
+from app.models.parser.pydantic_output_parser import PydanticOutputParser
+from app.utilities.output_schema import output_schema
+from app.utilities.S3.s3_util import (
+    download_file_and_etag_from_s3_to_memory,
+    get_etag_of_s3_object,
+)
+from config import Config
+from collections import OrderedDict
+from pydantic import BaseModel
+from typing import Type
+import hashlib
+import logging
+import threading
+import time
+
+
+class LoadedPydanticSchema:
+    """Pydantic object loaded from s3, with its output parser and format instructions."""
+
+    def __init__(
+        self, pydantic_model_s3_key: str, etag: str, pydantic_object: Type[BaseModel]
+    ):
+        """Initializes loaded schema and its output parser.
+
+        Args:
+            pydantic_model_s3_key (str): s3 key for Python file defining Pydantic model.
+            etag (str): ETag of s3 object that Pydantic object was loaded from.
+            pydantic_object (Type[BaseModel]): Pydantic object.
+        """
+        self.pydantic_model_s3_key = pydantic_model_s3_key
+        self.etag = etag
+        self.pydantic_object = pydantic_object
+        self.pydantic_output_parser = PydanticOutputParser(
+            pydantic_object=pydantic_object
+        )
+        self.output_format_instructions = (
+            self.pydantic_output_parser.get_format_instructions()
+        )
+        self.last_validated_time = time.time()
+
+
+class PydanticSchemaRegistry:
+    """Thread-safe LRU registry of Pydantic objects loaded from s3, keyed by s3 key and ETag."""
+
+    def __init__(self, max_entries: int = 128, revalidate_seconds: float = 0):
+        """Initializes registry.
+
+        Args:
+            max_entries (int, optional): max number of loaded Pydantic objects kept in memory. Defaults to 128.
+            revalidate_seconds (float, optional): min number of seconds between checks that a cached entry matches the current
+                ETag of its s3 object. Defaults to 0 (check on every lookup).
+        """
+        self.max_entries = max_entries
+        self.revalidate_seconds = revalidate_seconds
+        self._registry: "OrderedDict[str, LoadedPydanticSchema]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, pydantic_model_s3_key: str) -> LoadedPydanticSchema:
+        """Returns loaded Pydantic object for s3 key, loading it from s3 if missing or if s3 object has changed.
+
+        Args:
+            pydantic_model_s3_key (str): s3 key for Python file defining Pydantic model.
+
+        Raises:
+            ValueError: checks that Pydantic model exists in s3.
+
+        Returns:
+            LoadedPydanticSchema: loaded Pydantic object, output parser, and format instructions.
+        """
+        with self._lock:
+            loaded_schema = self._registry.get(pydantic_model_s3_key)
+            if (
+                loaded_schema is not None
+                and time.time() - loaded_schema.last_validated_time
+                < self.revalidate_seconds
+            ):
+                self._registry.move_to_end(pydantic_model_s3_key)
+                self.hits += 1
+                return loaded_schema
+
+        # Revalidate cached entry against current ETag of s3 object
+        if loaded_schema is not None:
+            etag = get_etag_of_s3_object(key=pydantic_model_s3_key)
+            if etag == loaded_schema.etag:
+                with self._lock:
+                    loaded_schema.last_validated_time = time.time()
+                    if pydantic_model_s3_key in self._registry:
+                        self._registry.move_to_end(pydantic_model_s3_key)
+                    self.hits += 1
+                return loaded_schema
+
+        # Download and load Pydantic object
+        with self._lock:
+            self.misses += 1
+        pydantic_model_source, etag = download_file_and_etag_from_s3_to_memory(
+            key=pydantic_model_s3_key
+        )
+        if pydantic_model_source is None:
+            raise ValueError(f"Pydantic model not found: {pydantic_model_s3_key}")
+        loaded_schema = self.load(
+            pydantic_model_s3_key=pydantic_model_s3_key,
+            etag=etag,
+            pydantic_model_source=pydantic_model_source.decode("UTF-8"),
+        )
+        return loaded_schema
+
+    def load(
+        self, pydantic_model_s3_key: str, etag: str, pydantic_model_source: str
+    ) -> LoadedPydanticSchema:
+        """Loads Pydantic object from source code and stores it in registry.
+
+        Args:
+            pydantic_model_s3_key (str): s3 key for Python file defining Pydantic model.
+            etag (str): ETag of s3 object that source code was downloaded from.
+            pydantic_model_source (str): source code of Python file defining Pydantic model.
+
+        Returns:
+            LoadedPydanticSchema: loaded Pydantic object, output parser, and format instructions.
+        """
+        pydantic_module_name = (
+            "pydantic_model_"
+            + hashlib.sha256(
+                f"{pydantic_model_s3_key}:{etag}".encode("UTF-8")
+            ).hexdigest()[:16]
+        )
+        loaded_schema = LoadedPydanticSchema(
+            pydantic_model_s3_key=pydantic_model_s3_key,
+            etag=etag,
+            pydantic_object=output_schema.get_pydantic_object_from_source(
+                pydantic_model_source=pydantic_model_source,
+                pydantic_module_name=pydantic_module_name,
+            ),
+        )
+        with self._lock:
+            self._registry[pydantic_model_s3_key] = loaded_schema
+            self._registry.move_to_end(pydantic_model_s3_key)
+            while len(self._registry) > self.max_entries:
+                self._registry.popitem(last=False)
+        return loaded_schema
+
+    def invalidate(self, pydantic_model_s3_key: str) -> None:
+        """Removes loaded Pydantic object from registry of this process.
+
+        Args:
+            pydantic_model_s3_key (str): s3 key for Python file defining Pydantic model.
+        """
+        with self._lock:
+            self._registry.pop(pydantic_model_s3_key, None)
+
+    def warm_up(self, pydantic_model_s3_key_list: list) -> None:
+        """Loads Pydantic objects for s3 keys ahead of first use. Keys that fail to load are skipped.
+
+        Args:
+            pydantic_model_s3_key_list (list): s3 keys for Python files defining Pydantic models, most important first.
+        """
+        for pydantic_model_s3_key in pydantic_model_s3_key_list[: self.max_entries]:
+            try:
+                self.get(pydantic_model_s3_key=pydantic_model_s3_key)
+            except Exception as e:
+                logging.warning(
+                    f"Failed to warm up Pydantic model {pydantic_model_s3_key}: {str(e)}"
+                )
+
+
+_pydantic_schema_registry = None
+_pydantic_schema_registry_lock = threading.Lock()
+
+
+def get_pydantic_schema_registry() -> PydanticSchemaRegistry:
+    """Returns Pydantic schema registry shared within this process, configured from Config.
+
+    Returns:
+        PydanticSchemaRegistry: shared Pydantic schema registry.
+    """
+    global _pydantic_schema_registry
+    with _pydantic_schema_registry_lock:
+        if _pydantic_schema_registry is None:
+            _pydantic_schema_registry = PydanticSchemaRegistry(
+                max_entries=Config.PYDANTIC_SCHEMA_REGISTRY_MAX_ENTRIES,
+                revalidate_seconds=Config.PYDANTIC_SCHEMA_REGISTRY_REVALIDATE_SECONDS,
+            )
+        return _pydantic_schema_registry
+
+
+def warm_up_pydantic_schema_registry() -> None:
+    """Loads Pydantic models of most recently created tasks into the registry of this process. Requires app context."""
+    pydantic_model_s3_key_list = [
+        pydantic_model_s3_key
+        for (pydantic_model_s3_key,) in Task.query.with_entities(Task.pydantic_model)
+        .filter(Task.pydantic_model.isnot(None))
+        .order_by(Task.create_timestamp.desc())
+        .limit(Config.PYDANTIC_SCHEMA_REGISTRY_WARM_UP_MAX_ENTRIES)
+    ]
+    get_pydantic_schema_registry().warm_up(
+        pydantic_model_s3_key_list=pydantic_model_s3_key_list
+    )
+    logging.info(f"Warmed up {len(pydantic_model_s3_key_list)} Pydantic models")
@@ -0,0 +1,355 @@
+"""Rate limiter shared by all calls made to an LLM provider with a given API key.
+
+Each (provider, API key) pair gets a single RateLimiter instance, so that llm inference, embeddings, and metaprompt generation
+running in the same process draw from one requests-per-minute and tokens-per-minute budget. Budgets are tracked with token
+buckets. The number of requests in flight is capped by an adaptive (additive increase / multiplicative decrease) concurrency
+limit that backs off when the provider responds with a rate limit error and recovers as requests succeed.
+
+Typical usage example:
+
+    rate_limiter = get_rate_limiter(provider="OpenAI", api_key=openai_api_key)
+    with rate_limiter.limit(num_tokens=estimate_num_tokens(prompts=[prompt], max_output_tokens=256)):
+        result = llm.generate([prompt])
+"""
+
+from config import Config
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+import hashlib
+import re
+import threading
+import time
+
+# Rough number of characters per token, used to estimate token usage before a request is sent
+CHARACTERS_PER_TOKEN = 4
+
+# Time to block new requests after a rate limit error if the provider does not say how long to wait
+DEFAULT_RATE_LIMIT_WAIT_SECONDS = 1.0
+
+
+class TokenBucket:
+    """Token bucket that continuously refills up to its per-minute capacity."""
+
+    def __init__(self, capacity_per_minute: float):
+        """Initializes full token bucket.
+
+        Args:
+            capacity_per_minute (float): number of units that can be consumed per minute.
+        """
+        self.capacity = float(capacity_per_minute)
+        self.available = self.capacity
+        self.last_refill_time = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        """Adds units accrued since the last refill.
+
+        Args:
+            now (float): current monotonic time.
+        """
+        elapsed = now - self.last_refill_time
+        self.available = min(
+            self.capacity, self.available + elapsed * self.capacity / 60
+        )
+        self.last_refill_time = now
+
+    def get_wait_time(self, amount: float) -> float:
+        """Returns seconds until the given amount can be consumed. Assumes bucket was just refilled.
+
+        Requests larger than the bucket capacity only wait for a full bucket, so they can still proceed.
+
+        Args:
+            amount (float): number of units to consume.
+
+        Returns:
+            float: seconds to wait.
+        """
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0
+        return (amount - self.available) * 60 / self.capacity
+
+    def consume(self, amount: float) -> None:
+        """Consumes the given amount of units.
+
+        Args:
+            amount (float): number of units to consume.
+        """
+        self.available -= min(amount, self.capacity)
+
+    def set_capacity(self, capacity_per_minute: float) -> None:
+        """Updates capacity (e.g., based on limits reported by the provider).
+
+        Args:
+            capacity_per_minute (float): number of units that can be consumed per minute.
+        """
+        self.capacity = float(capacity_per_minute)
+        self.available = min(self.available, self.capacity)
+
+
+class RateLimiter:
+    """Shared requests-per-minute and tokens-per-minute budget with an adaptive concurrency limit."""
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        max_concurrent_requests: int,
+    ):
+        """Initializes rate limiter.
+
+        Args:
+            requests_per_minute (int): max number of requests per minute.
+            tokens_per_minute (int): max number of tokens (prompt and completion) per minute.
+            max_concurrent_requests (int): max number of requests in flight.
+        """
+        self._condition = threading.Condition()
+        self.request_bucket = TokenBucket(capacity_per_minute=requests_per_minute)
+        self.token_bucket = TokenBucket(capacity_per_minute=tokens_per_minute)
+        self.max_concurrent_requests = max_concurrent_requests
+        self.concurrency_limit = float(max_concurrent_requests)
+        self.num_requests_in_flight = 0
+        self.blocked_until = 0.0
+        self.num_requests = 0
+        self.num_rate_limit_errors = 0
+        self.total_wait_time = 0.0
+
+    def acquire(self, num_tokens: int = 0) -> None:
+        """Blocks until a request with the given number of tokens fits within the budget and concurrency limit.
+
+        Args:
+            num_tokens (int, optional): estimated number of tokens used by the request. Defaults to 0.
+        """
+        start_time = time.monotonic()
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self.request_bucket.refill(now)
+                self.token_bucket.refill(now)
+                wait_time = max(
+                    self.blocked_until - now,
+                    self.request_bucket.get_wait_time(1),
+                    self.token_bucket.get_wait_time(num_tokens),
+                )
+                if self.num_requests_in_flight >= int(self.concurrency_limit):
+                    # Wait until a request in flight is released
+                    self._condition.wait()
+                elif wait_time > 0:
+                    self._condition.wait(timeout=wait_time)
+                else:
+                    self.request_bucket.consume(1)
+                    self.token_bucket.consume(num_tokens)
+                    self.num_requests_in_flight += 1
+                    self.num_requests += 1
+                    self.total_wait_time += now - start_time
+                    return
+
+    def release(self) -> None:
+        """Marks a request as no longer in flight."""
+        with self._condition:
+            self.num_requests_in_flight -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def limit(self, num_tokens: int = 0) -> Iterator[None]:
+        """Context manager that acquires the rate limiter around a request and records success if no exception is raised.
+
+        Args:
+            num_tokens (int, optional): estimated number of tokens used by the request. Defaults to 0.
+        """
+        self.acquire(num_tokens=num_tokens)
+        try:
+            yield
+            self.record_success()
+        finally:
+            self.release()
+
+    def record_success(self) -> None:
+        """Additively increases concurrency limit (by about one request per round of requests) up to the max."""
+        with self._condition:
+            self.concurrency_limit = min(
+                self.max_concurrent_requests,
+                self.concurrency_limit + 1 / max(1.0, self.concurrency_limit),
+            )
+            self._condition.notify_all()
+
+    def record_rate_limit(self, headers: Dict[str, str] = None) -> None:
+        """Halves concurrency limit and blocks new requests until the provider's rate limit resets.
+
+        Args:
+            headers (Dict[str, str], optional): response headers from the provider, if available. Defaults to None.
+        """
+        headers = {key.lower(): value for key, value in (headers or {}).items()}
+        wait_time = get_wait_time_from_headers(headers=headers)
+        if wait_time is None:
+            wait_time = DEFAULT_RATE_LIMIT_WAIT_SECONDS
+
+        with self._condition:
+            self.num_rate_limit_errors += 1
+            self.concurrency_limit = max(1.0, self.concurrency_limit / 2)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + wait_time)
+            self._update_budget_from_headers(headers=headers)
+            self._condition.notify_all()
+
+    def _update_budget_from_headers(self, headers: Dict[str, str]) -> None:
+        """Aligns token buckets with limits and remaining budget reported by the provider. Assumes lock is held.
+
+        Args:
+            headers (Dict[str, str]): response headers from the provider with lowercase keys.
+        """
+        for bucket, limit_header, remaining_header in [
+            (
+                self.request_bucket,
+                "x-ratelimit-limit-requests",
+                "x-ratelimit-remaining-requests",
+            ),
+            (
+                self.token_bucket,
+                "x-ratelimit-limit-tokens",
+                "x-ratelimit-remaining-tokens",
+            ),
+        ]:
+            try:
+                if limit_header in headers:
+                    bucket.set_capacity(float(headers[limit_header]))
+                if remaining_header in headers:
+                    bucket.available = min(
+                        bucket.available, float(headers[remaining_header])
+                    )
+            except ValueError:
+                continue
+
+    def get_metrics(self) -> dict:
+        """Returns usage metrics for monitoring.
+
+        Returns:
+            dict: rate limiter metrics.
+        """
+        with self._condition:
+            return {
+                "num_requests": self.num_requests,
+                "num_rate_limit_errors": self.num_rate_limit_errors,
+                "num_requests_in_flight": self.num_requests_in_flight,
+                "concurrency_limit": int(self.concurrency_limit),
+                "total_wait_time": self.total_wait_time,
+            }
+
+
+_rate_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, api_key: str) -> RateLimiter:
+    """Returns the rate limiter shared by all calls to the given provider with the given API key.
+
+    Args:
+        provider (str): llm provider (e.g., "OpenAI", "Anthropic").
+        api_key (str): API key used for the calls.
+
+    Returns:
+        RateLimiter: shared rate limiter.
+    """
+    # Hash API key so that it is not held in plain text as a dict key
+    api_key_hash = hashlib.sha256((api_key or "").encode("UTF-8")).hexdigest()
+    with _rate_limiters_lock:
+        if (provider, api_key_hash) not in _rate_limiters:
+            provider_limits = Config.LLM_PROVIDER_LIMITS[provider]
+            _rate_limiters[(provider, api_key_hash)] = RateLimiter(
+                requests_per_minute=provider_limits["requests_per_minute"],
+                tokens_per_minute=provider_limits["tokens_per_minute"],
+                max_concurrent_requests=provider_limits["max_concurrent_requests"],
+            )
+        return _rate_limiters[(provider, api_key_hash)]
+
+
+def estimate_num_tokens(prompts: List[Any], max_output_tokens: int = 0) -> int:
+    """Estimates number of tokens a request will use from the prompt length and max output length.
+
+    Args:
+        prompts (List[Any]): list of prompt strings or lists of chat messages.
+        max_output_tokens (int, optional): max number of tokens that may be generated. Defaults to 0.
+
+    Returns:
+        int: estimated number of tokens.
+    """
+    num_characters = 0
+    for prompt in prompts:
+        if isinstance(prompt, str):
+            num_characters += len(prompt)
+        elif isinstance(prompt, list):
+            num_characters += sum(
+                len(getattr(message, "content", str(message))) for message in prompt
+            )
+        else:
+            num_characters += len(str(prompt))
+    return num_characters // CHARACTERS_PER_TOKEN + (max_output_tokens or 0)
+
+
+def get_wait_time_from_headers(headers: Dict[str, str]) -> float:
+    """Parses how long to wait before the rate limit resets from provider response headers.
+
+    Supports "retry-after" (seconds) and OpenAI's "x-ratelimit-reset-requests" / "x-ratelimit-reset-tokens" (e.g., "6m0s",
+    "20ms").
+
+    Args:
+        headers (Dict[str, str]): response headers with lowercase keys.
+
+    Returns:
+        float: seconds to wait, or None if headers do not specify it.
+    """
+    if "retry-after" in headers:
+        try:
+            return float(headers["retry-after"])
+        except ValueError:
+            pass
+
+    wait_times = [
+        parse_duration(headers[header])
+        for header in ["x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"]
+        if header in headers
+    ]
+    wait_times = [wait_time for wait_time in wait_times if wait_time is not None]
+    if len(wait_times) == 0:
+        return None
+    return max(wait_times)
+
+
+def parse_duration(duration: str) -> float:
+    """Parses duration string such as "1m30s", "2.5s", or "20ms" into seconds.
+
+    Args:
+        duration (str): duration string.
+
+    Returns:
+        float: duration in seconds, or None if string cannot be parsed.
+    """
+    unit_seconds = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", duration)
+    if len(parts) == 0:
+        return None
+    return sum(float(value) * unit_seconds[unit] for value, unit in parts)
+
+
+def wait_unless_rate_limited(
+    is_rate_limit_error: Callable[[BaseException], bool],
+    fallback_wait: Callable[[Any], float],
+) -> Callable[[Any], float]:
+    """Creates tenacity wait strategy that retries rate limit errors immediately and waits with fallback strategy otherwise.
+
+    Rate limit errors do not need their own backoff since the next attempt blocks in RateLimiter.acquire until the shared
+    budget allows it, so only other errors (e.g., timeouts) use the fallback wait.
+
+    Args:
+        is_rate_limit_error (Callable[[BaseException], bool]): checks if exception is a rate limit error.
+        fallback_wait (Callable[[Any], float]): tenacity wait strategy for other errors.
+
+    Returns:
+        Callable[[Any], float]: tenacity wait strategy.
+    """
+
+    def wait(retry_state: Any) -> float:
+        exception = retry_state.outcome.exception()
+        if exception is not None and is_rate_limit_error(exception):
+            return 0
+        return fallback_wait(retry_state)
+
+    return wait
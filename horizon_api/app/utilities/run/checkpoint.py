@@ -0,0 +1,332 @@
+"""Stores and restores intermediate state of task generation so that failed jobs can resume from the last completed stage.
+
+Each checkpoint is a JSON document holding serialized prompt-model candidates, inference and evaluation results, and prompt-model id
+counters. Checkpoints are stored in s3 (or a local directory) under a fingerprint of the task generation inputs, so a run with a
+different objective, dataset, allowed models, or algorithm parameters never resumes from stale state.
+
+Prompt-model candidates are stored without llm API keys; model objects are recreated with the keys provided to the resumed job.
+
+Typical usage example:
+
+    checkpoint = TaskGenerationCheckpoint(task_id=task.id, fingerprint_data={"user_objective": user_objective})
+    checkpoint_data = checkpoint.load_stage(name="stage_1_generation", task_request=task_request)
+    if checkpoint_data is None:
+        ...
+        checkpoint.save_stage(name="stage_1_generation", prompt_model_candidates=x, starting_prompt_model_id=x)
+"""
+
+from app.models.component.prompt_model_candidates import PromptModelCandidates
+from app.models.component.inference_evaluation_results import (
+    InferenceEvaluationResultsLog,
+)
+from app.models.component.task_request import TaskRequest
+from app.models.llm.base import BaseLLM
+from app.models.llm.factory import LLMFactory
+from app.models.prompt.factory import PromptTemplateFactory
+from app.utilities.S3.s3_util import (
+    upload_file_to_s3,
+    download_file_from_s3_to_memory,
+    delete_directory_from_s3,
+)
+from config import Config
+from typing import Optional, Tuple
+import hashlib
+import io
+import json
+import os
+import pandas as pd
+import shutil
+
+CHECKPOINT_DIRECTORY_FORMAT_STRING = "task_generation_checkpoints/{task_id}"
+
+
+class TaskGenerationCheckpoint:
+    """Reads and writes named checkpoints for one task generation run."""
+
+    def __init__(
+        self,
+        task_id: int,
+        fingerprint_data: dict,
+        backend: str = None,
+        local_directory: str = None,
+    ):
+        """Initializes checkpoint store for task generation run.
+
+        Args:
+            task_id (int): id of task.
+            fingerprint_data (dict): JSON-serializable inputs of task generation run. Checkpoints are only shared between runs with
+                the same inputs.
+            backend (str, optional): either "s3" or "local". Defaults to Config.TASK_GENERATION_CHECKPOINT_BACKEND.
+            local_directory (str, optional): base directory for "local" backend. Defaults to
+                Config.TASK_GENERATION_CHECKPOINT_DIRECTORY.
+
+        Raises:
+            ValueError: checks that checkpoint backend is valid.
+        """
+        self.task_id = task_id
+        self.backend = backend or Config.TASK_GENERATION_CHECKPOINT_BACKEND
+        if self.backend not in ["s3", "local"]:
+            raise ValueError(f"Invalid checkpoint backend: {self.backend}")
+        self.local_directory = (
+            local_directory or Config.TASK_GENERATION_CHECKPOINT_DIRECTORY
+        )
+        self.fingerprint = hashlib.sha256(
+            json.dumps(fingerprint_data, sort_keys=True, default=str).encode("UTF-8")
+        ).hexdigest()[:16]
+
+    def get_key(self, name: str) -> str:
+        """Returns storage key of named checkpoint.
+
+        Args:
+            name (str): name of checkpoint (e.g., "gpt-3.5-turbo/stage_1").
+
+        Returns:
+            str: storage key of checkpoint.
+        """
+        return os.path.join(
+            CHECKPOINT_DIRECTORY_FORMAT_STRING.format(task_id=self.task_id),
+            self.fingerprint,
+            f"{name}.json",
+        )
+
+    def save(self, name: str, data: dict) -> None:
+        """Stores named checkpoint, replacing any previous version.
+
+        Args:
+            name (str): name of checkpoint.
+            data (dict): JSON-serializable checkpoint data.
+        """
+        serialized_data = json.dumps(data).encode("UTF-8")
+        key = self.get_key(name=name)
+        if self.backend == "s3":
+            upload_file_to_s3(file=io.BytesIO(serialized_data), key=key)
+        else:
+            file_path = os.path.join(self.local_directory, key)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path + ".tmp", "wb") as file:
+                file.write(serialized_data)
+            os.replace(file_path + ".tmp", file_path)
+        print(f"Saved checkpoint {name}")
+
+    def load(self, name: str) -> Optional[dict]:
+        """Returns named checkpoint, or None if it does not exist.
+
+        Args:
+            name (str): name of checkpoint.
+
+        Returns:
+            Optional[dict]: checkpoint data.
+        """
+        key = self.get_key(name=name)
+        if self.backend == "s3":
+            serialized_data = download_file_from_s3_to_memory(key=key)
+        else:
+            file_path = os.path.join(self.local_directory, key)
+            serialized_data = None
+            if os.path.exists(file_path):
+                with open(file_path, "rb") as file:
+                    serialized_data = file.read()
+
+        if serialized_data is None:
+            return None
+        print(f"Resuming from checkpoint {name}")
+        return json.loads(serialized_data)
+
+    def save_stage(
+        self,
+        name: str,
+        prompt_model_candidates: PromptModelCandidates,
+        starting_prompt_model_id: int,
+        inference_evaluation_results: InferenceEvaluationResultsLog = None,
+    ) -> None:
+        """Stores state at the end of a task generation stage.
+
+        Args:
+            name (str): name of checkpoint.
+            prompt_model_candidates (PromptModelCandidates): prompt-model candidates carried into the next stage.
+            starting_prompt_model_id (int): next available prompt-model id.
+            inference_evaluation_results (InferenceEvaluationResultsLog, optional): inference and evaluation results so far.
+                Defaults to None.
+        """
+        self.save(
+            name=name,
+            data={
+                "prompt_model_candidates": serialize_prompt_model_candidates(
+                    prompt_model_candidates=prompt_model_candidates
+                ),
+                "starting_prompt_model_id": int(starting_prompt_model_id),
+                "inference_evaluation_results": serialize_inference_evaluation_results(
+                    inference_evaluation_results=inference_evaluation_results
+                    if inference_evaluation_results is not None
+                    else InferenceEvaluationResultsLog()
+                ),
+            },
+        )
+
+    def load_stage(
+        self,
+        name: str,
+        task_request: TaskRequest,
+        openai_api_key: str = None,
+        anthropic_api_key: str = None,
+    ) -> Optional[Tuple[PromptModelCandidates, int, InferenceEvaluationResultsLog]]:
+        """Returns state stored at the end of a task generation stage, or None if the stage has no checkpoint.
+
+        Args:
+            name (str): name of checkpoint.
+            task_request (TaskRequest): data structure holding task request information.
+            openai_api_key (str, optional): OpenAI API key to use for OpenAI models. Defaults to None.
+            anthropic_api_key (str, optional): Anthropic API key to use for Anthropic models. Defaults to None.
+
+        Returns:
+            Optional[Tuple[PromptModelCandidates, int, InferenceEvaluationResultsLog]]: prompt-model candidates, next available prompt-model id,
+                and inference and evaluation results so far.
+        """
+        data = self.load(name=name)
+        if data is None:
+            return None
+        return (
+            deserialize_prompt_model_candidates(
+                records=data["prompt_model_candidates"],
+                task_request=task_request,
+                openai_api_key=openai_api_key,
+                anthropic_api_key=anthropic_api_key,
+            ),
+            data["starting_prompt_model_id"],
+            deserialize_inference_evaluation_results(
+                data=data["inference_evaluation_results"]
+            ),
+        )
+
+    def delete(self) -> None:
+        """Deletes all checkpoints of the task, including those of runs with other inputs."""
+        directory = CHECKPOINT_DIRECTORY_FORMAT_STRING.format(task_id=self.task_id)
+        if self.backend == "s3":
+            delete_directory_from_s3(s3_directory=directory + "/")
+        else:
+            shutil.rmtree(
+                os.path.join(self.local_directory, directory), ignore_errors=True
+            )
+
+
+def serialize_prompt_model_candidates(
+    prompt_model_candidates: PromptModelCandidates,
+) -> list:
+    """Serializes prompt-model candidates without llm API keys.
+
+    Args:
+        prompt_model_candidates (PromptModelCandidates): data structure with each prompt-model candidate.
+
+    Returns:
+        list: JSON-serializable record for each prompt-model candidate.
+    """
+    template_types = {
+        template_class: template_type
+        for template_type, template_class in PromptTemplateFactory.prompt_template_classes.items()
+    }
+    records = []
+    for _, row in prompt_model_candidates.iterrows():
+        model_object = (
+            row["model_object"] if isinstance(row["model_object"], BaseLLM) else None
+        )
+        records.append(
+            {
+                "prompt_model_id": int(row["prompt_model_id"]),
+                "generation_id": row["generation_id"],
+                "prompt_prefix": row["prompt_prefix"],
+                "template_type": template_types[type(row["prompt_object"])],
+                "template_data": row["prompt_object"].to_dict(),
+                "model_name": model_object.get_model_name() if model_object else None,
+                "model_params": model_object.get_model_params_to_store()
+                if model_object
+                else None,
+            }
+        )
+    return records
+
+
+def deserialize_prompt_model_candidates(
+    records: list,
+    task_request: TaskRequest,
+    openai_api_key: str = None,
+    anthropic_api_key: str = None,
+) -> PromptModelCandidates:
+    """Recreates prompt-model candidates from serialized records, adding provided llm API keys to model objects.
+
+    Args:
+        records (list): serialized prompt-model candidates.
+        task_request (TaskRequest): data structure holding task request information, used to recreate few-shot example selectors.
+        openai_api_key (str, optional): OpenAI API key to use for OpenAI models. Defaults to None.
+        anthropic_api_key (str, optional): Anthropic API key to use for Anthropic models. Defaults to None.
+
+    Returns:
+        PromptModelCandidates: data structure with each prompt-model candidate.
+    """
+    prompt_object_list = []
+    model_object_list = []
+    for record in records:
+        # Recreate prompt object
+        if record["template_type"] == "fewshot":
+            prompt_object = PromptTemplateFactory.reconstruct_prompt_object(
+                template_type="fewshot",
+                evaluation_dataset_vector_db=task_request.evaluation_dataset_vector_db,
+                template_data=record["template_data"],
+            )
+        else:
+            prompt_object = PromptTemplateFactory.reconstruct_prompt_object(
+                record["template_type"], **record["template_data"]
+            )
+        prompt_object_list.append(prompt_object)
+
+        # Recreate model object with user's llm API key
+        model_object = None
+        if record["model_name"] is not None:
+            model_params = dict(record["model_params"])
+            if LLMFactory.llm_classes[record["model_name"]]["provider"] == "OpenAI":
+                model_params["openai_api_key"] = openai_api_key
+            elif (
+                LLMFactory.llm_classes[record["model_name"]]["provider"] == "Anthropic"
+            ):
+                model_params["anthropic_api_key"] = anthropic_api_key
+            model_object = LLMFactory.create_llm(record["model_name"], **model_params)
+        model_object_list.append(model_object)
+
+    return PromptModelCandidates(
+        prompt_model_id_list=[record["prompt_model_id"] for record in records],
+        generation_id_list=[record["generation_id"] for record in records],
+        prompt_prefix_list=[record["prompt_prefix"] for record in records],
+        prompt_object_list=prompt_object_list,
+        model_object_list=model_object_list,
+    )
+
+
+def serialize_inference_evaluation_results(
+    inference_evaluation_results: InferenceEvaluationResultsLog,
+) -> dict:
+    """Serializes inference and evaluation results column by column.
+
+    Args:
+        inference_evaluation_results (InferenceEvaluationResultsLog): log with inference and evaluation results.
+
+    Returns:
+        dict: JSON-serializable list of values for each column.
+    """
+    return json.loads(
+        inference_evaluation_results.to_dataframe().to_json(orient="split", index=False)
+    )
+
+
+def deserialize_inference_evaluation_results(
+    data: dict,
+) -> InferenceEvaluationResultsLog:
+    """Recreates inference and evaluation results from serialized columns.
+
+    Args:
+        data (dict): serialized inference and evaluation results.
+
+    Returns:
+        InferenceEvaluationResultsLog: log with inference and evaluation results.
+    """
+    return InferenceEvaluationResultsLog.from_dataframe(
+        pd.DataFrame(data["data"], columns=data["columns"])
+    )
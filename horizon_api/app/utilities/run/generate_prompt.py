@@ -4,7 +4,9 @@ from app.models.prompt import factory
 from app.models.llm.factory import LLMFactory
 from app.models.component.task_request import TaskRequest
 from app.models.component.prompt_model_candidates import PromptModelCandidates
-from app.models.component.inference_evaluation_results import InferenceEvaluationResults
+from app.models.component.inference_evaluation_results import (
+    InferenceEvaluationResultsLog,
+)
 from app.models.component.post_processing.post_processing import PostProcessing
 from app.models.component.prompt import Prompt
 from app.models.component.task import Task
@@ -15,15 +17,17 @@ from app.utilities.generation import variants
 from app.utilities.generation import few_shot
 from app.utilities.generation import temperature_variation
 from app.utilities.clustering import cluster_prompts
-from app.utilities.inference import inference
 from app.utilities.evaluation import evaluation
 from app.utilities.adaptive_filtering import adaptive_filtering
 from app.utilities.shortlist import shortlist
 from app.utilities.run.prompt_generation_algorithm_parameters import (
     PROMPT_GENERATION_ALGORITHM_PARAMETERS,
 )
+from app.utilities.run.checkpoint import TaskGenerationCheckpoint
 from app import db
 from config import Config
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
 import pandas as pd
 import json
 import copy
@@ -101,7 +105,7 @@ def generate_prompt_model_configuration(
 
     # Initiate objects to store selected prompt-model candidates and aggregated inference and evaluation results
     prompt_model_candidates_selected = PromptModelCandidates()
-    aggregated_inference_evaluation_results = InferenceEvaluationResults()
+    aggregated_inference_evaluation_results = InferenceEvaluationResultsLog()
 
     # If task has Pydantic model, than initialize post-processing data structure
     post_processing = None
@@ -111,68 +115,228 @@ def generate_prompt_model_configuration(
     # Define starting prompt-model candidate id
     starting_prompt_model_id = 1
 
-    # STAGE 1 - Initial prompt generation - used as starting point for all applicable llms
-    print("Beginning stage 1")
+    # Resume from checkpoints of a previous attempt with the same inputs, if available
+    checkpoint = TaskGenerationCheckpoint(
+        task_id=task.id,
+        fingerprint_data={
+            "prompt_id": prompt.id,
+            "user_objective": task.objective,
+            "evaluation_dataset": task.evaluation_dataset,
+            "pydantic_model": task.pydantic_model,
+            "allowed_models": task_request.allowed_models,
+            "prompt_generation_algorithm_parameters": PROMPT_GENERATION_ALGORITHM_PARAMETERS,
+        },
+    )
 
-    # Generate prompt-model candidates using user objective method
-    try:
-        prompt_model_candidates_user_objective = (
-            prompt_generation_user_objective.prompt_generation_user_objective(
-                task_request=task_request,
-                num_prompts=PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_1"][
-                    "num_prompts_user_objective"
-                ],
-                starting_prompt_model_id=starting_prompt_model_id,
-                openai_api_key=Config.HORIZON_OPENAI_API_KEY,
-                post_processing=post_processing,
-            )
+    # STAGE 1 - Initial prompt generation - used as starting point for all applicable llms
+    checkpoint_data = checkpoint.load_stage(
+        name="stage_1_generation", task_request=task_request
+    )
+    if checkpoint_data is None:
+        (
+            prompt_model_candidates_stage_1,
+            starting_prompt_model_id,
+        ) = generate_stage_1_prompt_model_candidates(
+            task_request=task_request,
+            starting_prompt_model_id=starting_prompt_model_id,
+            post_processing=post_processing,
+        )
+        checkpoint.save_stage(
+            name="stage_1_generation",
+            prompt_model_candidates=prompt_model_candidates_stage_1,
+            starting_prompt_model_id=starting_prompt_model_id,
         )
-        starting_prompt_model_id += PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_1"][
-            "num_prompts_user_objective"
+    else:
+        prompt_model_candidates_stage_1, starting_prompt_model_id, _ = checkpoint_data
+
+    # Continue task generation with each allowed LLM candidate
+    selected_llms = [
+        (llm, llm_info)
+        for llm, llm_info in task_request.applicable_llms.items()
+        if task_request.allowed_models is None or llm in task_request.allowed_models
+    ]
+
+    # Reserve a block of prompt-model ids for each llm so that pipelines can run concurrently without id collisions
+    num_prompt_model_ids_per_llm = (
+        PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_1"]["num_shortlist"]
+        + PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_3"][
+            "num_prompts_temperature_variation"
         ]
-        print("finished prompt_generation_user_objective")
-    except:
-        prompt_model_candidates_user_objective = None
+    )
 
-    # Generate prompt-model candidates using role play pattern method
-    try:
-        prompt_model_candidates_pattern_role_play = (
-            pattern_role_play.prompt_generation_pattern_role_play(
+    # Run stages 1 to 3 for each llm as independent pipelines, then merge results in llm order
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(Config.MAX_CONCURRENT_LLM_PIPELINES, len(selected_llms)))
+    ) as executor:
+        futures = [
+            executor.submit(
+                run_llm_pipeline,
+                llm=llm,
+                llm_info=llm_info,
                 task_request=task_request,
-                num_prompts=PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_1"][
-                    "num_prompts_pattern_role_play"
-                ],
-                starting_prompt_model_id=starting_prompt_model_id,
-                openai_api_key=Config.HORIZON_OPENAI_API_KEY,
+                prompt_model_candidates_stage_1=prompt_model_candidates_stage_1,
+                starting_prompt_model_id=starting_prompt_model_id
+                + i * num_prompt_model_ids_per_llm,
+                openai_api_key=openai_api_key,
+                anthropic_api_key=anthropic_api_key,
                 post_processing=post_processing,
+                checkpoint=checkpoint,
             )
-        )
-        starting_prompt_model_id += PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_1"][
-            "num_prompts_pattern_role_play"
+            for i, (llm, llm_info) in enumerate(selected_llms)
         ]
-        print("finished prompt_generation_pattern_role_play")
-    except:
-        prompt_model_candidates_pattern_role_play = None
+        llm_pipeline_results = [future.result() for future in futures]
+
+    num_prompt_model_candidates_considered = starting_prompt_model_id - 1
+    for (
+        prompt_model_candidates_llm,
+        inference_evaluation_results_llm,
+        num_prompt_model_ids_used,
+    ) in llm_pipeline_results:
+        prompt_model_candidates_selected = pd.concat(
+            [prompt_model_candidates_selected, prompt_model_candidates_llm],
+            axis=0,
+        ).reset_index(drop=True)
+        aggregated_inference_evaluation_results.extend(inference_evaluation_results_llm)
+        num_prompt_model_candidates_considered += num_prompt_model_ids_used
 
-    # Generate prompt-model candidates using user objective with training data method
-    try:
-        prompt_model_candidates_user_objective_training_data = (
-            user_objective_training_data.prompt_generation_user_objective_training_data(
-                task_request=task_request,
-                num_prompts=PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_1"][
-                    "num_prompts_user_objective_training_data"
-                ],
-                starting_prompt_model_id=starting_prompt_model_id,
-                openai_api_key=Config.HORIZON_OPENAI_API_KEY,
-                post_processing=post_processing,
-            )
+    # Shortlist best prompt-model candidate across applicable llms
+    aggregated_inference_evaluation_results = (
+        aggregated_inference_evaluation_results.to_dataframe()
+    )
+    prompt_model_candidates_final = shortlist.shortlist_prompt_model_candidates(
+        prompt_model_candidates=prompt_model_candidates_selected,
+        inference_evaluation_results=aggregated_inference_evaluation_results,
+        num_shortlist=1,
+    )
+    final_prompt_model_id = prompt_model_candidates_final["prompt_model_id"].iloc[0]
+    final_prompt_object = prompt_model_candidates_final["prompt_object"].iloc[0]
+    final_model_object = prompt_model_candidates_final["model_object"].iloc[0]
+
+    # Save the model parameters to the database to later reconstruct model. DO NOT STORE USER LLM API KEY!
+    prompt.model_name = final_model_object.get_model_name()
+    model_params = final_model_object.get_model_params_to_store()
+    prompt.model = json.dumps(model_params)
+
+    # Look up the prompt template type for the final prompt and store in the database
+    prompt.template_type = list(
+        factory.PromptTemplateFactory.prompt_template_classes.keys()
+    )[
+        list(factory.PromptTemplateFactory.prompt_template_classes.values()).index(
+            type(final_prompt_object)
         )
-        starting_prompt_model_id += PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_1"][
-            "num_prompts_user_objective_training_data"
-        ]
-        print("finished prompt_generation_user_objective_training_data")
-    except:
-        prompt_model_candidates_user_objective_training_data = None
+    ]
+
+    # Store the winning prompt in the database
+    serialized_prompt_object = final_prompt_object.to_dict()
+    prompt.template_data = json.dumps(serialized_prompt_object)
+
+    # Store example selector if few-shot based. CURRENTLY HARDCODED TO MAXMARGINALRELEVANCE
+    if prompt.template_type == "fewshot":
+        prompt.few_shot_example_selector = "MaxMarginalRelevanceExampleSelector"
+
+    # Store inference statistics with prompt object
+    inference_statistics = {
+        "inference_quality": aggregated_inference_evaluation_results.loc[
+            aggregated_inference_evaluation_results["prompt_model_id"]
+            == final_prompt_model_id,
+            "inference_quality",
+        ].mean(),
+        "inference_latency": aggregated_inference_evaluation_results.loc[
+            aggregated_inference_evaluation_results["prompt_model_id"]
+            == final_prompt_model_id,
+            "inference_latency",
+        ].mean(),
+    }
+    prompt.inference_statistics = json.dumps(inference_statistics)
+
+    # Store evaluation statistics with task object
+    evaluation_statistics = {
+        "number_of_prompt_model_candidates_considered": num_prompt_model_candidates_considered,
+        "number_of_inferences_and_evaluations_done": len(
+            aggregated_inference_evaluation_results
+        ),
+    }
+    task.evaluation_statistics = json.dumps(evaluation_statistics)
+
+    # Set newly created prompt as the active prompt for the task if it is not already so
+    task.active_prompt_id = prompt.id
+
+    print("Finished prompt-model configuration.")
+
+    # Commit the changes to the database
+    db.session.commit()
+
+    # Delete checkpoints now that task generation is complete
+    checkpoint.delete()
+
+    print("Returning from generate_prompt_model_configuration function.")
+
+    # Return task overview with selected prompt-model candidate
+    return task.to_dict_filtered()
+
+
+def generate_stage_1_prompt_model_candidates(
+    task_request: TaskRequest,
+    starting_prompt_model_id: int,
+    post_processing: PostProcessing = None,
+) -> Tuple[PromptModelCandidates, int]:
+    """Generates initial prompt-model candidates shared by all llms, then adds syntactic variants and cluster shortlists them.
+
+    Args:
+        task_request (TaskRequest): data structure holding task request information.
+        starting_prompt_model_id (int): starting id for prompt-model candidates.
+        post_processing (PostProcessing, optional): details on llm output post-processing operations. Defaults to None.
+
+    Returns:
+        Tuple[PromptModelCandidates, int]: stage 1 prompt-model candidates and next available prompt-model id.
+    """
+    print("Beginning stage 1")
+
+    # Generate prompt-model candidates with the user objective, role play pattern, and user objective with training data
+    # methods concurrently. Each method gets its own block of prompt-model ids
+    generation_methods = [
+        (
+            "prompt_generation_user_objective",
+            prompt_generation_user_objective.prompt_generation_user_objective,
+            PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_1"][
+                "num_prompts_user_objective"
+            ],
+        ),
+        (
+            "prompt_generation_pattern_role_play",
+            pattern_role_play.prompt_generation_pattern_role_play,
+            PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_1"][
+                "num_prompts_pattern_role_play"
+            ],
+        ),
+        (
+            "prompt_generation_user_objective_training_data",
+            user_objective_training_data.prompt_generation_user_objective_training_data,
+            PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_1"][
+                "num_prompts_user_objective_training_data"
+            ],
+        ),
+    ]
+    with ThreadPoolExecutor(max_workers=len(generation_methods)) as executor:
+        futures = []
+        for method_name, generation_method, num_prompts in generation_methods:
+            futures.append(
+                executor.submit(
+                    run_prompt_generation_method,
+                    method_name=method_name,
+                    generation_method=generation_method,
+                    task_request=task_request,
+                    num_prompts=num_prompts,
+                    starting_prompt_model_id=starting_prompt_model_id,
+                    post_processing=post_processing,
+                )
+            )
+            starting_prompt_model_id += num_prompts
+        (
+            prompt_model_candidates_user_objective,
+            prompt_model_candidates_pattern_role_play,
+            prompt_model_candidates_user_objective_training_data,
+        ) = [future.result() for future in futures]
 
     # Concatenate current set of prompt-model candidates
     prompt_model_candidates_stage_1_initial = pd.concat(
@@ -228,51 +392,117 @@ def generate_prompt_model_configuration(
     )
     print("finished cluster_shortlist_prompts")
 
-    # Continue task generation with each LLM candidate. Iterate over applicable llms for this task
-    for llm, llm_info in task_request.applicable_llms.items():
-        # Skip if not one of the allowed models
-        if (
-            task_request.allowed_models is not None
-            and llm not in task_request.allowed_models
-        ):
-            continue
-        print(f"working on {llm}")
-
-        # Set user's llm api key
-        if LLMFactory.llm_classes[llm]["provider"] == "OpenAI":
-            llm_api_key = openai_api_key
-        elif LLMFactory.llm_classes[llm]["provider"] == "Anthropic":
-            llm_api_key = anthropic_api_key
-
-        # Define llm instance parameters
-        llm_instance_params = LLMFactory.create_model_params(
-            llm=llm,
-            max_output_length=llm_info["max_output_length"],
-            llm_api_key=llm_api_key,
-        )
+    return prompt_model_candidates_stage_1, starting_prompt_model_id
+
+
+def run_llm_pipeline(
+    llm: str,
+    llm_info: dict,
+    task_request: TaskRequest,
+    prompt_model_candidates_stage_1: PromptModelCandidates,
+    starting_prompt_model_id: int,
+    openai_api_key: str = None,
+    anthropic_api_key: str = None,
+    post_processing: PostProcessing = None,
+    checkpoint: TaskGenerationCheckpoint = None,
+) -> Tuple[PromptModelCandidates, InferenceEvaluationResultsLog, int]:
+    """Runs stage 1 adaptive filtering, stage 2 few shots, and stage 3 temperature variation for a single llm.
 
-        # Create llm instance with user's llm api key
-        llm_instance = LLMFactory.create_llm(llm, **llm_instance_params)
-        print(f"Created llm instance for {llm}")
+    Does not modify shared inputs, so pipelines for different llms can run concurrently. If a checkpoint store is provided, state
+    is saved after each stage and the pipeline resumes after the latest stage completed by a previous attempt.
 
-        # Create copy of stage 1 prompt candidates and add llm instance to each row
-        prompt_model_candidates_stage_1_iteration = (
-            prompt_model_candidates_stage_1.copy(deep=True)
+    Args:
+        llm (str): name of llm.
+        llm_info (dict): details about llm applicable to this task (e.g., max output length, max few shots).
+        task_request (TaskRequest): data structure holding task request information.
+        prompt_model_candidates_stage_1 (PromptModelCandidates): stage 1 prompt-model candidates shared across llms.
+        starting_prompt_model_id (int): first prompt-model id reserved for candidates generated in this pipeline.
+        openai_api_key (str, optional): OpenAI API key to use for OpenAI models. Defaults to None.
+        anthropic_api_key (str, optional): Anthropic API key to use for Anthropic models. Defaults to None.
+        post_processing (PostProcessing, optional): details on llm output post-processing operations. Defaults to None.
+        checkpoint (TaskGenerationCheckpoint, optional): checkpoint store for this task generation run. Defaults to None.
+
+    Returns:
+        Tuple[PromptModelCandidates, InferenceEvaluationResultsLog, int]: shortlisted prompt-model candidate for this llm,
+            inference and evaluation results across stages, and number of prompt-model ids used.
+    """
+    first_prompt_model_id = starting_prompt_model_id
+    print(f"working on {llm}")
+
+    # Set user's llm api key
+    if LLMFactory.llm_classes[llm]["provider"] == "OpenAI":
+        llm_api_key = openai_api_key
+    elif LLMFactory.llm_classes[llm]["provider"] == "Anthropic":
+        llm_api_key = anthropic_api_key
+
+    # Define llm instance parameters
+    llm_instance_params = LLMFactory.create_model_params(
+        llm=llm,
+        max_output_length=llm_info["max_output_length"],
+        llm_api_key=llm_api_key,
+    )
+
+    # Create llm instance with user's llm api key
+    llm_instance = LLMFactory.create_llm(llm, **llm_instance_params)
+    print(f"Created llm instance for {llm}")
+
+    # Create copy of stage 1 prompt candidates and add llm instance to each row
+    prompt_model_candidates_stage_1_iteration = prompt_model_candidates_stage_1.copy(
+        deep=True
+    )
+    prompt_model_candidates_stage_1_iteration = (
+        prompt_model_candidates_stage_1_iteration.assign(
+            model_object=prompt_model_candidates_stage_1_iteration[
+                "model_object"
+            ].apply(lambda x: copy.deepcopy(llm_instance))
         )
-        prompt_model_candidates_stage_1_iteration = (
-            prompt_model_candidates_stage_1_iteration.assign(
-                model_object=prompt_model_candidates_stage_1_iteration[
-                    "model_object"
-                ].apply(lambda x: copy.deepcopy(llm_instance))
-            )
+    )
+
+    # Add llm instance to post_processing retry attempts, if applicable. Copy post_processing so that concurrent pipelines for
+    # other llms are not affected
+    if post_processing:
+        post_processing = post_processing.copy_with_llm_for_retry_output_parser(
+            llm=copy.deepcopy(llm_instance)
         )
 
-        # Add llm instance to post_processing retry attempts, if applicable
-        if post_processing:
-            post_processing.set_llm_for_retry_output_parser(
-                llm=copy.deepcopy(llm_instance)
+    # Resume after latest stage completed by a previous attempt, if any
+    completed_stage = 0
+    aggregated_inference_evaluation_results = InferenceEvaluationResultsLog()
+    for stage in [3, 2, 1]:
+        checkpoint_data = (
+            checkpoint.load_stage(
+                name=f"{llm}/stage_{stage}",
+                task_request=task_request,
+                openai_api_key=openai_api_key,
+                anthropic_api_key=anthropic_api_key,
             )
+            if checkpoint
+            else None
+        )
+        if checkpoint_data is not None:
+            completed_stage = stage
+            (
+                prompt_model_candidates_shortlisted,
+                starting_prompt_model_id,
+                aggregated_inference_evaluation_results,
+            ) = checkpoint_data
+            break
+    if completed_stage == 3:
+        return (
+            prompt_model_candidates_shortlisted,
+            aggregated_inference_evaluation_results,
+            starting_prompt_model_id - first_prompt_model_id,
+        )
+    elif completed_stage == 2:
+        prompt_model_candidates_stage_2_shortlisted = (
+            prompt_model_candidates_shortlisted
+        )
+    elif completed_stage == 1:
+        prompt_model_candidates_stage_1_shortlisted = (
+            prompt_model_candidates_shortlisted
+        )
 
+    if completed_stage < 1:
         # Run adaptive filtering and aggregate inference and evaluation results
         (
             prompt_model_candidates_stage_1_shortlisted,
@@ -289,13 +519,21 @@ def generate_prompt_model_configuration(
             ],
             openai_api_key=Config.HORIZON_OPENAI_API_KEY,
             post_processing=post_processing,
+            filtering_strategy=PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_1"][
+                "filtering_strategy"
+            ],
         )
-        aggregated_inference_evaluation_results = pd.concat(
-            [aggregated_inference_evaluation_results, inference_evaluation_results],
-            axis=0,
-        ).reset_index(drop=True)
+        aggregated_inference_evaluation_results.extend(inference_evaluation_results)
         print("finished adaptive_filtering for stage_1")
+        if checkpoint:
+            checkpoint.save_stage(
+                name=f"{llm}/stage_1",
+                prompt_model_candidates=prompt_model_candidates_stage_1_shortlisted,
+                starting_prompt_model_id=starting_prompt_model_id,
+                inference_evaluation_results=aggregated_inference_evaluation_results,
+            )
 
+    if completed_stage < 2:
         # STAGE 2 - Few shots
         # Generate few shot prompts if allowed by token limits
         if llm_info["max_few_shots"] > 0:
@@ -311,25 +549,19 @@ def generate_prompt_model_configuration(
             print("finished prompt_generation_few_shots")
 
             # Run inference and evaluation of few-shot based prompts, and store in aggregated results
-            inference_evaluation_results_stage_2 = inference.run_inference(
-                task_request=task_request,
-                prompt_model_candidates=prompt_model_candidates_stage_2,
-                train_or_test_dataset="test",
-                stage_id="stage_2",
-                post_processing=post_processing,
+            inference_evaluation_results_stage_2 = (
+                evaluation.run_inference_and_evaluation(
+                    task_request=task_request,
+                    prompt_model_candidates=prompt_model_candidates_stage_2,
+                    train_or_test_dataset="test",
+                    stage_id="stage_2",
+                    openai_api_key=Config.HORIZON_OPENAI_API_KEY,
+                    post_processing=post_processing,
+                )
             )
-            evaluation.run_evaluation(
-                task_request=task_request,
-                inference_evaluation_results=inference_evaluation_results_stage_2,
-                openai_api_key=Config.HORIZON_OPENAI_API_KEY,
+            aggregated_inference_evaluation_results.append(
+                inference_evaluation_results_stage_2
             )
-            aggregated_inference_evaluation_results = pd.concat(
-                [
-                    aggregated_inference_evaluation_results,
-                    inference_evaluation_results_stage_2,
-                ],
-                axis=0,
-            ).reset_index(drop=True)
 
             # Shortlist from stage 1 prompts and few-shot versions in stage 2
             prompt_model_candidates_stage_1_and_2 = pd.concat(
@@ -346,131 +578,107 @@ def generate_prompt_model_configuration(
                 prompt_model_candidates_stage_1_shortlisted.copy(deep=True)
             )
 
-        prompt_model_candidates_stage_2_shortlisted = (
-            shortlist.shortlist_prompt_model_candidates(
-                prompt_model_candidates=prompt_model_candidates_stage_1_and_2,
-                inference_evaluation_results=aggregated_inference_evaluation_results,
-                num_shortlist=PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_2"][
-                    "num_shortlist"
-                ],
-                stage_id_list=["stage_1", "stage_2"],
-            )
+        prompt_model_candidates_stage_2_shortlisted = shortlist.shortlist_prompt_model_candidates(
+            prompt_model_candidates=prompt_model_candidates_stage_1_and_2,
+            inference_evaluation_results=aggregated_inference_evaluation_results.to_dataframe(),
+            num_shortlist=PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_2"][
+                "num_shortlist"
+            ],
+            stage_id_list=["stage_1", "stage_2"],
         )
         print("finished inference, evaluation, and shortlist for stage_2")
-
-        # STAGE 3 - Temperature variation
-        # Generate temperature variants
-        prompt_model_candidates_stage_3 = (
-            temperature_variation.prompt_generation_temperature_variation(
+        if checkpoint:
+            checkpoint.save_stage(
+                name=f"{llm}/stage_2",
                 prompt_model_candidates=prompt_model_candidates_stage_2_shortlisted,
-                num_prompts=PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_3"][
-                    "num_prompts_temperature_variation"
-                ],
                 starting_prompt_model_id=starting_prompt_model_id,
+                inference_evaluation_results=aggregated_inference_evaluation_results,
             )
-        )
-        starting_prompt_model_id += PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_3"][
-            "num_prompts_temperature_variation"
-        ]
-        print("finished prompt_generation_temperature_variation")
 
-        # Run adaptive filtering
-        (
-            prompt_model_candidates_stage_3_shortlisted,
-            inference_evaluation_results,
-        ) = adaptive_filtering.adaptive_filtering(
-            task_request=task_request,
-            prompt_model_candidates=prompt_model_candidates_stage_3,
-            stage_id="stage_3",
-            num_shortlist=PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_3"][
-                "num_shortlist"
+    # STAGE 3 - Temperature variation
+    # Generate temperature variants
+    prompt_model_candidates_stage_3 = (
+        temperature_variation.prompt_generation_temperature_variation(
+            prompt_model_candidates=prompt_model_candidates_stage_2_shortlisted,
+            num_prompts=PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_3"][
+                "num_prompts_temperature_variation"
             ],
-            num_iterations=PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_3"][
-                "num_iterations"
-            ],
-            openai_api_key=Config.HORIZON_OPENAI_API_KEY,
-            post_processing=post_processing,
+            starting_prompt_model_id=starting_prompt_model_id,
         )
-        aggregated_inference_evaluation_results = pd.concat(
-            [aggregated_inference_evaluation_results, inference_evaluation_results],
-            axis=0,
-        ).reset_index(drop=True)
-        print("finished adaptive_filtering for stage_3")
-
-        # Store best prompt-model candidate for this llm
-        prompt_model_candidates_selected = pd.concat(
-            [
-                prompt_model_candidates_selected,
-                prompt_model_candidates_stage_3_shortlisted,
-            ],
-            axis=0,
-        ).reset_index(drop=True)
-
-    # Shortlist best prompt-model candidate across applicable llms
-    prompt_model_candidates_final = shortlist.shortlist_prompt_model_candidates(
-        prompt_model_candidates=prompt_model_candidates_selected,
-        inference_evaluation_results=aggregated_inference_evaluation_results,
-        num_shortlist=1,
     )
-    final_prompt_model_id = prompt_model_candidates_final["prompt_model_id"].iloc[0]
-    final_prompt_object = prompt_model_candidates_final["prompt_object"].iloc[0]
-    final_model_object = prompt_model_candidates_final["model_object"].iloc[0]
-
-    # Save the model parameters to the database to later reconstruct model. DO NOT STORE USER LLM API KEY!
-    prompt.model_name = final_model_object.get_model_name()
-    model_params = final_model_object.get_model_params_to_store()
-    prompt.model = json.dumps(model_params)
-
-    # Look up the prompt template type for the final prompt and store in the database
-    prompt.template_type = list(
-        factory.PromptTemplateFactory.prompt_template_classes.keys()
-    )[
-        list(factory.PromptTemplateFactory.prompt_template_classes.values()).index(
-            type(final_prompt_object)
-        )
+    starting_prompt_model_id += PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_3"][
+        "num_prompts_temperature_variation"
     ]
+    print("finished prompt_generation_temperature_variation")
 
-    # Store the winning prompt in the database
-    serialized_prompt_object = final_prompt_object.to_dict()
-    prompt.template_data = json.dumps(serialized_prompt_object)
-
-    # Store example selector if few-shot based. CURRENTLY HARDCODED TO MAXMARGINALRELEVANCE
-    if prompt.template_type == "fewshot":
-        prompt.few_shot_example_selector = "MaxMarginalRelevanceExampleSelector"
-
-    # Store inference statistics with prompt object
-    inference_statistics = {
-        "inference_quality": aggregated_inference_evaluation_results.loc[
-            aggregated_inference_evaluation_results["prompt_model_id"]
-            == final_prompt_model_id,
-            "inference_quality",
-        ].mean(),
-        "inference_latency": aggregated_inference_evaluation_results.loc[
-            aggregated_inference_evaluation_results["prompt_model_id"]
-            == final_prompt_model_id,
-            "inference_latency",
-        ].mean(),
-    }
-    prompt.inference_statistics = json.dumps(inference_statistics)
-
-    # Store evaluation statistics with task object
-    evaluation_statistics = {
-        "number_of_prompt_model_candidates_considered": starting_prompt_model_id - 1,
-        "number_of_inferences_and_evaluations_done": len(
-            aggregated_inference_evaluation_results
-        ),
-    }
-    task.evaluation_statistics = json.dumps(evaluation_statistics)
+    # Run adaptive filtering
+    (
+        prompt_model_candidates_stage_3_shortlisted,
+        inference_evaluation_results,
+    ) = adaptive_filtering.adaptive_filtering(
+        task_request=task_request,
+        prompt_model_candidates=prompt_model_candidates_stage_3,
+        stage_id="stage_3",
+        num_shortlist=PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_3"][
+            "num_shortlist"
+        ],
+        num_iterations=PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_3"][
+            "num_iterations"
+        ],
+        openai_api_key=Config.HORIZON_OPENAI_API_KEY,
+        post_processing=post_processing,
+        filtering_strategy=PROMPT_GENERATION_ALGORITHM_PARAMETERS["stage_3"][
+            "filtering_strategy"
+        ],
+    )
+    aggregated_inference_evaluation_results.extend(inference_evaluation_results)
+    print("finished adaptive_filtering for stage_3")
+    if checkpoint:
+        checkpoint.save_stage(
+            name=f"{llm}/stage_3",
+            prompt_model_candidates=prompt_model_candidates_stage_3_shortlisted,
+            starting_prompt_model_id=starting_prompt_model_id,
+            inference_evaluation_results=aggregated_inference_evaluation_results,
+        )
 
-    # Set newly created prompt as the active prompt for the task if it is not already so
-    task.active_prompt_id = prompt.id
+    # Return best prompt-model candidate for this llm
+    return (
+        prompt_model_candidates_stage_3_shortlisted,
+        aggregated_inference_evaluation_results,
+        starting_prompt_model_id - first_prompt_model_id,
+    )
 
-    print("Finished prompt-model configuration.")
 
-    # Commit the changes to the database
-    db.session.commit()
+def run_prompt_generation_method(
+    method_name: str,
+    generation_method: Callable[..., PromptModelCandidates],
+    task_request: TaskRequest,
+    num_prompts: int,
+    starting_prompt_model_id: int,
+    post_processing: PostProcessing = None,
+) -> Optional[PromptModelCandidates]:
+    """Runs stage 1 prompt generation method, returning None if it fails so that other methods can still be used.
 
-    print("Returning from generate_prompt_model_configuration function.")
+    Args:
+        method_name (str): name of prompt generation method, used for logging.
+        generation_method (Callable[..., PromptModelCandidates]): prompt generation method.
+        task_request (TaskRequest): data structure holding task request information.
+        num_prompts (int): number of prompts to generate.
+        starting_prompt_model_id (int): starting id for prompt-model candidates.
+        post_processing (PostProcessing, optional): details on llm output post-processing operations. Defaults to None.
 
-    # Return task overview with selected prompt-model candidate
-    return task.to_dict_filtered()
+    Returns:
+        Optional[PromptModelCandidates]: generated prompt-model candidates, or None if method failed.
+    """
+    try:
+        prompt_model_candidates = generation_method(
+            task_request=task_request,
+            num_prompts=num_prompts,
+            starting_prompt_model_id=starting_prompt_model_id,
+            openai_api_key=Config.HORIZON_OPENAI_API_KEY,
+            post_processing=post_processing,
+        )
+        print(f"finished {method_name}")
+        return prompt_model_candidates
+    except:
+        return None
@@ -10,11 +10,13 @@ PROMPT_GENERATION_ALGORITHM_PARAMETERS = {
         "num_clusters": 10,  # 20,
         "num_shortlist": 5,  # 10,
         "num_iterations": 3,  # 3,
+        "filtering_strategy": "schedule",  # "schedule" or "racing"
     },
     "stage_2": {"num_shortlist": 1},
     "stage_3": {
         "num_prompts_temperature_variation": 4,  # 5,
         "num_shortlist": 1,
         "num_iterations": 3,  # 3,
+        "filtering_strategy": "schedule",  # "schedule" or "racing"
     },
 }
@@ -0,0 +1,173 @@
+"""Tokenizers used to measure data length for supported llms, with batch token counting.
+
+Encoders are loaded once per process and reused, instead of being looked up on every call. Batches of strings are encoded with
+each encoder's native batch method (tiktoken and Hugging Face tokenizers both encode batches on multiple threads outside the
+GIL), and token counts are returned as numpy arrays so that callers can aggregate them without Python loops.
+
+Very large batches can additionally be split across a pool of processes by setting Config.TOKENIZER_NUM_PROCESSES above 1.
+Batches smaller than Config.TOKENIZER_PROCESS_POOL_MIN_TEXTS, and batches counted within daemonic processes (e.g., celery prefork
+workers, which cannot start child processes), are always counted in the calling process.
+
+Typical usage example:
+
+    num_tokens = count_max_tokens_batch(texts=evaluation_dataset["ground_truth"].to_list())
+"""
+
+from config import Config
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Sequence
+import anthropic
+import multiprocessing
+import numpy as np
+import threading
+import tiktoken
+
+# Names of tokenizers. OpenAI tokenizers are named after a model that uses them
+TOKENIZER_NAMES = ["text-davinci-003", "gpt-3.5-turbo", "claude"]
+
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+
+def get_encoder(tokenizer_name: str):
+    """Returns encoder of tokenizer, loading it on first use in this process.
+
+    Args:
+        tokenizer_name (str): name of tokenizer.
+
+    Raises:
+        ValueError: checks that tokenizer name is valid.
+
+    Returns:
+        Union[tiktoken.Encoding, tokenizers.Tokenizer]: encoder of tokenizer.
+    """
+    encoder = _encoders.get(tokenizer_name)
+    if encoder is not None:
+        return encoder
+
+    with _encoders_lock:
+        if tokenizer_name not in _encoders:
+            if tokenizer_name == "claude":
+                _encoders[tokenizer_name] = anthropic.get_tokenizer()
+            elif tokenizer_name in TOKENIZER_NAMES:
+                _encoders[tokenizer_name] = tiktoken.encoding_for_model(tokenizer_name)
+            else:
+                raise ValueError(f"Invalid tokenizer: {tokenizer_name}")
+        return _encoders[tokenizer_name]
+
+
+def count_tokens(text: str, tokenizer_name: str) -> int:
+    """Counts tokens of string.
+
+    Args:
+        text (str): string to tokenize.
+        tokenizer_name (str): name of tokenizer.
+
+    Returns:
+        int: number of tokens.
+    """
+    encoder = get_encoder(tokenizer_name)
+    if tokenizer_name == "claude":
+        return len(encoder.encode(text).ids)
+    return len(encoder.encode(text))
+
+
+def encode_batch(texts: Sequence[str], tokenizer_name: str) -> List[List[int]]:
+    """Encodes batch of strings into token ids.
+
+    Args:
+        texts (Sequence[str]): strings to tokenize.
+        tokenizer_name (str): name of tokenizer.
+
+    Returns:
+        List[List[int]]: token ids of each string.
+    """
+    if len(texts) == 0:
+        return []
+    encoder = get_encoder(tokenizer_name)
+    if tokenizer_name == "claude":
+        return [encoding.ids for encoding in encoder.encode_batch(list(texts))]
+    return encoder.encode_batch(list(texts))
+
+
+def count_tokens_batch(
+    texts: Sequence[str], tokenizer_name: str, num_processes: int = None
+) -> np.ndarray:
+    """Counts tokens of each string in batch.
+
+    Args:
+        texts (Sequence[str]): strings to tokenize.
+        tokenizer_name (str): name of tokenizer.
+        num_processes (int, optional): number of processes to split large batches across. Defaults to
+            Config.TOKENIZER_NUM_PROCESSES.
+
+    Returns:
+        np.ndarray: number of tokens of each string.
+    """
+    if num_processes is None:
+        num_processes = Config.TOKENIZER_NUM_PROCESSES
+
+    # Count tokens in the calling process unless batch is large enough to benefit from a process pool
+    if (
+        num_processes <= 1
+        or len(texts) < Config.TOKENIZER_PROCESS_POOL_MIN_TEXTS
+        or multiprocessing.current_process().daemon
+    ):
+        return _count_tokens_batch(texts=texts, tokenizer_name=tokenizer_name)
+
+    # Otherwise, split batch into one contiguous chunk per process
+    chunk_size = -(-len(texts) // num_processes)
+    chunks = [texts[i : i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+        token_counts = list(
+            executor.map(_count_tokens_batch, chunks, [tokenizer_name] * len(chunks))
+        )
+    return np.concatenate(token_counts)
+
+
+def count_max_tokens_batch(
+    texts: Sequence[str],
+    tokenizer_names: List[str] = TOKENIZER_NAMES,
+    num_processes: int = None,
+) -> np.ndarray:
+    """Counts tokens of each string in batch with each tokenizer and keeps the max count, to be conservative across llms.
+
+    Args:
+        texts (Sequence[str]): strings to tokenize.
+        tokenizer_names (List[str], optional): names of tokenizers. Defaults to TOKENIZER_NAMES.
+        num_processes (int, optional): number of processes to split large batches across. Defaults to
+            Config.TOKENIZER_NUM_PROCESSES.
+
+    Returns:
+        np.ndarray: max number of tokens of each string across tokenizers.
+    """
+    max_token_counts = np.zeros(len(texts), dtype=np.int64)
+    for tokenizer_name in tokenizer_names:
+        np.maximum(
+            max_token_counts,
+            count_tokens_batch(
+                texts=texts, tokenizer_name=tokenizer_name, num_processes=num_processes
+            ),
+            out=max_token_counts,
+        )
+    return max_token_counts
+
+
+def _count_tokens_batch(texts: Sequence[str], tokenizer_name: str) -> np.ndarray:
+    """Counts tokens of each string in batch within this process.
+
+    Args:
+        texts (Sequence[str]): strings to tokenize.
+        tokenizer_name (str): name of tokenizer.
+
+    Returns:
+        np.ndarray: number of tokens of each string.
+    """
+    return np.fromiter(
+        (
+            len(token_ids)
+            for token_ids in encode_batch(texts=texts, tokenizer_name=tokenizer_name)
+        ),
+        dtype=np.int64,
+        count=len(texts),
+    )
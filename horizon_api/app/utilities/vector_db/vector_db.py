@@ -1,34 +1,118 @@
 """Defines helper methods for vector databases."""
 
 from app.models.embedding.open_ai import OpenAIEmbeddings
+from app.models.vector_stores.base import BaseVectorStore
+from app.models.vector_stores.local import LocalVectorStore
 from app.models.vector_stores.pinecone import Pinecone
 from app.utilities.dataset_processing import input_variable_naming
+from app.utilities.S3.s3_util import (
+    upload_file_to_s3,
+    delete_file_from_s3,
+    download_directory_from_s3_and_save_locally,
+)
 from config import Config
+import io
+import numpy as np
+import os
 import pandas as pd
 import pinecone
+import shutil
+import threading
 
-pinecone.init(api_key=Config.PINECONE_API_KEY, environment=Config.PINECONE_ENVIRONMENT)
-pinecone_index = pinecone.Index(Config.PINECONE_INDEX)
+VECTOR_DB_NAMESPACE_FORMAT_STRING = "task_id_{task_id}"
+GROUND_TRUTH_EMBEDDINGS_S3_KEY_FORMAT_STRING = (
+    "ground_truth_embeddings/{task_id}/ground_truth_embeddings.npz"
+)
+LOCAL_VECTOR_STORE_S3_DIRECTORY_FORMAT_STRING = "vector_stores/{namespace}/"
 
+_pinecone_index = None
+_pinecone_index_lock = threading.Lock()
 
-VECTOR_DB_NAMESPACE_FORMAT_STRING = "task_id_{task_id}"
+
+def get_pinecone_index() -> pinecone.Index:
+    """Initializes Pinecone client on first use and returns index.
+
+    Returns:
+        pinecone.Index: Pinecone index.
+    """
+    global _pinecone_index
+    with _pinecone_index_lock:
+        if _pinecone_index is None:
+            pinecone.init(
+                api_key=Config.PINECONE_API_KEY,
+                environment=Config.PINECONE_ENVIRONMENT,
+            )
+            _pinecone_index = pinecone.Index(Config.PINECONE_INDEX)
+        return _pinecone_index
+
+
+def get_local_vector_store(
+    namespace: str,
+    embeddings: OpenAIEmbeddings,
+    input_variables: list = None,
+    num_unique_data: int = None,
+    download_from_s3: bool = True,
+) -> LocalVectorStore:
+    """Creates local vector store for namespace, first downloading namespace files from s3 if they are not on local disk.
+
+    Args:
+        namespace (str): namespace of vector store.
+        embeddings (OpenAIEmbeddings): embeddings object.
+        input_variables (list, optional): list of input variables. Defaults to None.
+        num_unique_data (int, optional): number of unique data points. Defaults to None.
+        download_from_s3 (bool, optional): whether to download namespace files from s3 if not on local disk. Defaults to True.
+
+    Returns:
+        LocalVectorStore: local vector store.
+    """
+    directory = os.path.join(Config.LOCAL_VECTOR_STORE_DIRECTORY, namespace)
+    s3_directory = None
+    if Config.LOCAL_VECTOR_STORE_S3_PERSISTENCE:
+        s3_directory = LOCAL_VECTOR_STORE_S3_DIRECTORY_FORMAT_STRING.format(
+            namespace=namespace
+        )
+
+        # Download namespace files from s3 if they are not on local disk
+        if download_from_s3 and not os.path.exists(directory):
+            temp_directory = download_directory_from_s3_and_save_locally(s3_directory)
+
+            # Skip if no namespace files are stored in s3, so that they are downloaded once they are stored
+            if temp_directory is not None:
+                os.makedirs(Config.LOCAL_VECTOR_STORE_DIRECTORY, exist_ok=True)
+                shutil.move(temp_directory, directory)
+
+    return LocalVectorStore(
+        directory=directory,
+        namespace=namespace,
+        embedding_function=embeddings.embed_query,
+        embed_documents_function=embeddings.embed_documents,
+        input_variables=input_variables,
+        num_unique_data=num_unique_data,
+        s3_directory=s3_directory,
+    )
 
 
 def initialize_vector_db_from_dataset(
     task_id: int,
     evaluation_dataset: pd.DataFrame,
     openai_api_key: str,
-) -> Pinecone:
+    backend: str = None,
+) -> BaseVectorStore:
     """Initializes entries into vector db from raw evaluation dataset.
 
     Args:
         task_id (int): id of task.
         evaluation_dataset (pd.DataFrame): dataframe holding evaluation dataset.
         openai_api_key (str): OpenAI API key to use for embeddings.
+        backend (str, optional): vector db backend ("pinecone" or "local"). Defaults to Config.VECTOR_DB_BACKEND.
+
+    Raises:
+        ValueError: checks that vector db backend is valid.
 
     Returns:
-        Pinecone: initialized vector db.
+        BaseVectorStore: initialized vector db.
     """
+    backend = backend or Config.VECTOR_DB_BACKEND
     num_unique_data = len(evaluation_dataset)
     input_variables = input_variable_naming.get_input_variables(
         dataset_fields=evaluation_dataset.columns.to_list()
@@ -50,25 +134,71 @@ def initialize_vector_db_from_dataset(
     ]
 
     # Initialize vector db namespace for this task_id
-    embedding_function = OpenAIEmbeddings(openai_api_key=openai_api_key).embed_query
+    embeddings = OpenAIEmbeddings(openai_api_key=openai_api_key)
     namespace = VECTOR_DB_NAMESPACE_FORMAT_STRING.format(task_id=task_id)
-    vector_db = Pinecone(
-        index=pinecone_index,
-        embedding_function=embedding_function,
-        text_key="text",
-        namespace=namespace,
-        input_variables=input_variables,
-        num_unique_data=num_unique_data,
-    )
+    if backend == "pinecone":
+        vector_db = Pinecone(
+            index=get_pinecone_index(),
+            embedding_function=embeddings.embed_query,
+            text_key="text",
+            namespace=namespace,
+            input_variables=input_variables,
+            num_unique_data=num_unique_data,
+            ground_truth_embeddings_s3_key=GROUND_TRUTH_EMBEDDINGS_S3_KEY_FORMAT_STRING.format(
+                task_id=task_id
+            ),
+            embed_documents_function=embeddings.embed_documents,
+            deterministic_vector_ids=True,
+        )
+    elif backend == "local":
+        vector_db = get_local_vector_store(
+            namespace=namespace,
+            embeddings=embeddings,
+            input_variables=input_variables,
+            num_unique_data=num_unique_data,
+            download_from_s3=False,
+        )
+
+        # Clear any namespace files left over from a previous initialization
+        vector_db.delete_namespace()
+    else:
+        raise ValueError(f"Invalid vector db backend: {backend}")
     vector_db.add_text_embeddings_and_metadata(texts=texts, metadata=metadata)
 
+    # Embed ground truths once so that evaluation only needs to embed llm outputs
+    evaluation_data_id_list = evaluation_dataset["evaluation_data_id"].tolist()
+    ground_truth_embeddings = np.array(
+        embeddings.embed_documents(
+            evaluation_dataset["ground_truth"].astype(str).tolist()
+        ),
+        dtype=np.float32,
+    )
+    vector_db.set_ground_truth_embeddings(
+        evaluation_data_id_list=evaluation_data_id_list,
+        ground_truth_embeddings=ground_truth_embeddings,
+    )
+
+    # Store ground truth embeddings matrix in s3 if vector db does not persist it with the namespace
+    if vector_db.get_ground_truth_embeddings_s3_key():
+        ground_truth_embeddings_buffer = io.BytesIO()
+        np.savez(
+            ground_truth_embeddings_buffer,
+            evaluation_data_ids=np.array(evaluation_data_id_list, dtype=np.int64),
+            embeddings=ground_truth_embeddings,
+        )
+        ground_truth_embeddings_buffer.seek(0)
+        upload_file_to_s3(
+            file=ground_truth_embeddings_buffer,
+            key=vector_db.get_ground_truth_embeddings_s3_key(),
+        )
+
     return vector_db
 
 
 def load_vector_db(
     vector_db_metadata: dict,
     openai_api_key: str,
-) -> Pinecone:
+) -> BaseVectorStore:
     """Loads namespace for the task from vector db.
 
     Args:
@@ -76,17 +206,34 @@ def load_vector_db(
         openai_api_key (str): OpenAI API key to use for embeddings.
 
     Returns:
-        Pinecone: vector db with selected namespace.
+        BaseVectorStore: vector db with selected namespace.
     """
-    embedding_function = OpenAIEmbeddings(openai_api_key=openai_api_key).embed_query
+    embeddings = OpenAIEmbeddings(openai_api_key=openai_api_key)
+
+    # Load from local vector store if namespace was stored there
+    if vector_db_metadata.get("backend", "pinecone") == "local":
+        return get_local_vector_store(
+            namespace=vector_db_metadata["namespace"],
+            embeddings=embeddings,
+            input_variables=vector_db_metadata["input_variables"],
+            num_unique_data=vector_db_metadata["num_unique_data"],
+        )
 
     vector_db = Pinecone(
-        index=pinecone_index,
-        embedding_function=embedding_function,
+        index=get_pinecone_index(),
+        embedding_function=embeddings.embed_query,
         text_key="text",
         namespace=vector_db_metadata["namespace"],
         input_variables=vector_db_metadata["input_variables"],
         num_unique_data=vector_db_metadata["num_unique_data"],
+        ground_truth_embeddings_s3_key=vector_db_metadata.get(
+            "ground_truth_embeddings_s3_key"
+        ),
+        embed_documents_function=embeddings.embed_documents,
+        deterministic_vector_ids=vector_db_metadata.get(
+            "deterministic_vector_ids", False
+        ),
+        max_num_chunks=vector_db_metadata.get("max_num_chunks", 1),
     )
     return vector_db
 
@@ -97,13 +244,24 @@ def delete_vector_db(vector_db_metadata: dict) -> None:
     Args:
         vector_db_metadata (dict): metadata about vector db usage for this task.
     """
-    embedding_function = OpenAIEmbeddings(openai_api_key="NOT_NEEDED").embed_query
+    embeddings = OpenAIEmbeddings(openai_api_key="NOT_NEEDED")
 
     # Delete namespace from vector db
-    vector_db = Pinecone(
-        index=pinecone_index,
-        embedding_function=embedding_function,
-        text_key="text",
-        namespace=vector_db_metadata["namespace"],
-    )
+    if vector_db_metadata.get("backend", "pinecone") == "local":
+        vector_db = get_local_vector_store(
+            namespace=vector_db_metadata["namespace"],
+            embeddings=embeddings,
+            download_from_s3=False,
+        )
+    else:
+        vector_db = Pinecone(
+            index=get_pinecone_index(),
+            embedding_function=embeddings.embed_query,
+            text_key="text",
+            namespace=vector_db_metadata["namespace"],
+        )
     vector_db.delete_namespace()
+
+    # Delete ground truth embeddings from s3, if they exist
+    if vector_db_metadata.get("ground_truth_embeddings_s3_key"):
+        delete_file_from_s3(vector_db_metadata["ground_truth_embeddings_s3_key"])
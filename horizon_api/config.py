@@ -1,4 +1,5 @@
 import os
+import tempfile
 from kombu.utils.url import safequote
 
 
@@ -22,11 +23,167 @@ class Config:
     HORIZON_OPENAI_API_KEY = os.environ.get("HORIZON_OPENAI_API_KEY")
     HORIZON_ANTHROPIC_API_KEY = os.environ.get("HORIZON_ANTHROPIC_API_KEY")
 
+    # LLM provider limits applied per API key (e.g., concurrent inference calls during task generation)
+    LLM_PROVIDER_LIMITS = {
+        "OpenAI": {
+            "max_concurrent_requests": int(
+                os.environ.get("OPENAI_MAX_CONCURRENT_REQUESTS", 8)
+            ),
+            "requests_per_minute": int(
+                os.environ.get("OPENAI_REQUESTS_PER_MINUTE", 3500)
+            ),
+            "tokens_per_minute": int(os.environ.get("OPENAI_TOKENS_PER_MINUTE", 90000)),
+        },
+        "Anthropic": {
+            "max_concurrent_requests": int(
+                os.environ.get("ANTHROPIC_MAX_CONCURRENT_REQUESTS", 4)
+            ),
+            "requests_per_minute": int(
+                os.environ.get("ANTHROPIC_REQUESTS_PER_MINUTE", 1000)
+            ),
+            "tokens_per_minute": int(
+                os.environ.get("ANTHROPIC_TOKENS_PER_MINUTE", 100000)
+            ),
+        },
+    }
+
+    # Max number of llms whose task generation pipelines (stages 1 to 3) run concurrently
+    MAX_CONCURRENT_LLM_PIPELINES = int(
+        os.environ.get("MAX_CONCURRENT_LLM_PIPELINES", 4)
+    )
+
+    # Embedding cache shared by task generations and deployments on this host. Set EMBEDDING_CACHE_PATH to "" to keep cache in
+    # memory only
+    EMBEDDING_CACHE_PATH = os.environ.get(
+        "EMBEDDING_CACHE_PATH",
+        os.path.join(tempfile.gettempdir(), "horizon_embedding_cache.sqlite3"),
+    )
+    EMBEDDING_CACHE_MEMORY_MAX_ENTRIES = int(
+        os.environ.get("EMBEDDING_CACHE_MEMORY_MAX_ENTRIES", 10000)
+    )
+    EMBEDDING_CACHE_DISK_MAX_BYTES = int(
+        os.environ.get("EMBEDDING_CACHE_DISK_MAX_BYTES", 512 * 1024 * 1024)
+    )
+
+    # Max number of prompts compiled for deployment (prompt object, output parser, and model config) kept in memory per process
+    COMPILED_PROMPT_CACHE_MAX_ENTRIES = int(
+        os.environ.get("COMPILED_PROMPT_CACHE_MAX_ENTRIES", 256)
+    )
+
+    # Pydantic models loaded from output schemas kept in memory per process. Cached models are checked against the ETag of their
+    # s3 object at most once every PYDANTIC_SCHEMA_REGISTRY_REVALIDATE_SECONDS. Celery workers preload models of the most
+    # recently created tasks at startup
+    PYDANTIC_SCHEMA_REGISTRY_MAX_ENTRIES = int(
+        os.environ.get("PYDANTIC_SCHEMA_REGISTRY_MAX_ENTRIES", 128)
+    )
+    PYDANTIC_SCHEMA_REGISTRY_REVALIDATE_SECONDS = float(
+        os.environ.get("PYDANTIC_SCHEMA_REGISTRY_REVALIDATE_SECONDS", 0)
+    )
+    PYDANTIC_SCHEMA_REGISTRY_WARM_UP_MAX_ENTRIES = int(
+        os.environ.get("PYDANTIC_SCHEMA_REGISTRY_WARM_UP_MAX_ENTRIES", 32)
+    )
+
+    # Max number of deployments per batch deployment request, and max number of them run concurrently
+    DEPLOY_BATCH_MAX_SIZE = int(os.environ.get("DEPLOY_BATCH_MAX_SIZE", 500))
+    DEPLOY_BATCH_MAX_CONCURRENCY = int(
+        os.environ.get("DEPLOY_BATCH_MAX_CONCURRENCY", 8)
+    )
+
+    # Deployment logs are queued in memory and written in bulk by a background thread every DEPLOYMENT_LOG_FLUSH_MAX_ROWS logs or
+    # DEPLOYMENT_LOG_FLUSH_INTERVAL_MS milliseconds. Logs are dropped once DEPLOYMENT_LOG_QUEUE_MAX_SIZE logs are waiting. Set
+    # DEPLOYMENT_LOG_WRITER_ASYNC to false to write each log within the request instead
+    DEPLOYMENT_LOG_QUEUE_MAX_SIZE = int(
+        os.environ.get("DEPLOYMENT_LOG_QUEUE_MAX_SIZE", 10000)
+    )
+    DEPLOYMENT_LOG_FLUSH_MAX_ROWS = int(
+        os.environ.get("DEPLOYMENT_LOG_FLUSH_MAX_ROWS", 500)
+    )
+    DEPLOYMENT_LOG_FLUSH_INTERVAL_MS = int(
+        os.environ.get("DEPLOYMENT_LOG_FLUSH_INTERVAL_MS", 1000)
+    )
+    DEPLOYMENT_LOG_WRITER_ASYNC = (
+        os.environ.get("DEPLOYMENT_LOG_WRITER_ASYNC", "true").lower() == "true"
+    )
+
+    # Number of deployment logs read per query when exporting logs to s3, and max number of logs per page when listing logs
+    DEPLOYMENT_LOG_EXPORT_PAGE_SIZE = int(
+        os.environ.get("DEPLOYMENT_LOG_EXPORT_PAGE_SIZE", 5000)
+    )
+    DEPLOYMENT_LOG_PAGE_MAX_SIZE = int(
+        os.environ.get("DEPLOYMENT_LOG_PAGE_MAX_SIZE", 1000)
+    )
+
+    # Cache of API key hashes and their users kept in memory per process. Invalid API keys are cached for a shorter time. A
+    # rotated API key may still be accepted by other processes for up to API_KEY_CACHE_TTL_SECONDS
+    API_KEY_CACHE_MAX_ENTRIES = int(os.environ.get("API_KEY_CACHE_MAX_ENTRIES", 10000))
+    API_KEY_CACHE_TTL_SECONDS = float(os.environ.get("API_KEY_CACHE_TTL_SECONDS", 60))
+    API_KEY_CACHE_NEGATIVE_MAX_ENTRIES = int(
+        os.environ.get("API_KEY_CACHE_NEGATIVE_MAX_ENTRIES", 10000)
+    )
+    API_KEY_CACHE_NEGATIVE_TTL_SECONDS = float(
+        os.environ.get("API_KEY_CACHE_NEGATIVE_TTL_SECONDS", 5)
+    )
+
+    # Seconds between logs of metrics of the deployment log writer and API key cache of each process. Set to 0 to disable
+    METRICS_LOG_INTERVAL_SECONDS = float(
+        os.environ.get("METRICS_LOG_INTERVAL_SECONDS", 60)
+    )
+
+    # Object storage backend ("s3" or "local"). The local backend stores objects under OBJECT_STORE_LOCAL_DIRECTORY, e.g. to run
+    # and benchmark without AWS access. Small objects are cached in memory per process by key and ETag
+    OBJECT_STORE_BACKEND = os.environ.get("OBJECT_STORE_BACKEND", "s3")
+    OBJECT_STORE_LOCAL_DIRECTORY = os.environ.get(
+        "OBJECT_STORE_LOCAL_DIRECTORY",
+        os.path.join(tempfile.gettempdir(), "horizon_object_store"),
+    )
+    S3_MAX_POOL_CONNECTIONS = int(os.environ.get("S3_MAX_POOL_CONNECTIONS", 32))
+    OBJECT_READ_CACHE_MAX_BYTES = int(
+        os.environ.get("OBJECT_READ_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+    )
+    OBJECT_READ_CACHE_MAX_OBJECT_BYTES = int(
+        os.environ.get("OBJECT_READ_CACHE_MAX_OBJECT_BYTES", 8 * 1024 * 1024)
+    )
+
+    # Max size of uploaded evaluation datasets. Uploads are parsed into a DataFrame in memory, so memory use of an upload grows
+    # with its size (a few times EVALUATION_DATASET_MAX_BYTES at most)
+    EVALUATION_DATASET_MAX_BYTES = int(
+        os.environ.get("EVALUATION_DATASET_MAX_BYTES", 50 * 1000 * 1000)
+    )
+
+    # Process pool parallelism for counting tokens of large batches (e.g., evaluation datasets). Disabled by default since
+    # encoders already encode batches on multiple threads
+    TOKENIZER_NUM_PROCESSES = int(os.environ.get("TOKENIZER_NUM_PROCESSES", 0))
+    TOKENIZER_PROCESS_POOL_MIN_TEXTS = int(
+        os.environ.get("TOKENIZER_PROCESS_POOL_MIN_TEXTS", 20000)
+    )
+
+    # Vector db backend for new tasks ("pinecone" or "local"). Existing tasks keep the backend recorded in their metadata
+    VECTOR_DB_BACKEND = os.environ.get("VECTOR_DB_BACKEND", "pinecone")
+
     # Pinecone vector db details
     PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY")
     PINECONE_ENVIRONMENT = os.environ.get("PINECONE_ENVIRONMENT")
     PINECONE_INDEX = "horizonai"
 
+    # Local vector db details. Namespaces are stored on local disk and mirrored to s3 unless disabled
+    LOCAL_VECTOR_STORE_DIRECTORY = os.environ.get(
+        "LOCAL_VECTOR_STORE_DIRECTORY",
+        os.path.join(tempfile.gettempdir(), "horizon_vector_stores"),
+    )
+    LOCAL_VECTOR_STORE_S3_PERSISTENCE = (
+        os.environ.get("LOCAL_VECTOR_STORE_S3_PERSISTENCE", "true").lower() == "true"
+    )
+
+    # Task generation checkpoints, used to resume failed task generation jobs from the last completed stage
+    TASK_GENERATION_CHECKPOINT_BACKEND = os.environ.get(
+        "TASK_GENERATION_CHECKPOINT_BACKEND", "s3"
+    )
+    TASK_GENERATION_CHECKPOINT_DIRECTORY = os.environ.get(
+        "TASK_GENERATION_CHECKPOINT_DIRECTORY",
+        os.path.join(tempfile.gettempdir(), "horizon_task_generation_checkpoints"),
+    )
+    TASK_GENERATION_MAX_RETRIES = int(os.environ.get("TASK_GENERATION_MAX_RETRIES", 2))
+
     # Horizon AI test details
     HORIZON_TEST_EMAIL = os.environ.get("HORIZON_TEST_EMAIL")
     HORIZON_TEST_PASSWORD = os.environ.get("HORIZON_TEST_PASSWORD")
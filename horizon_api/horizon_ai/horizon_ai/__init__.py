@@ -1,7 +1,8 @@
 # horizon_ai/__init__.py
 
+import json
 import requests
-from urllib.parse import urljoin
+from urllib.parse import urlencode, urljoin
 
 # Base url for API calls
 base_url = "http://127.0.0.1:5000"
@@ -307,6 +308,54 @@ def deploy_task(task_id, inputs, log_deployment=False):
     return response
 
 
+# Deploy task and yield events as the completion is generated: a "token" event for each token, then either a "completion"
+# event with the full output (validated against the output schema, if any) or an "error" event
+def deploy_task_stream(task_id, inputs, log_deployment=False):
+    global api_key, openai_api_key, anthropic_api_key, base_url
+    if api_key == None:
+        raise Exception("Must set Horizon API key.")
+    headers = {"Content-Type": "application/json", "X-Api-Key": api_key}
+    payload = {
+        "task_id": task_id,
+        "inputs": inputs,
+        "openai_api_key": openai_api_key,
+        "anthropic_api_key": anthropic_api_key,
+        "log_deployment": log_deployment,
+        "stream": True,
+    }
+    with requests.post(
+        urljoin(base_url, "/api/tasks/deploy"),
+        json=payload,
+        headers=headers,
+        stream=True,
+    ) as response:
+        if response.status_code not in [200, 201]:
+            _handle_response(response)
+        event_name = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event_name = line[len("event: ") :]
+            elif line.startswith("data: "):
+                yield dict(json.loads(line[len("data: ") :]), event=event_name)
+
+
+# Deploy many inputs in a single request, each using the current prompt of its task. Each deployment is a dict with task_id
+# and inputs. Results are returned in the same order as deployments, each with either a completion or an error
+def deploy_task_batch(deployments, log_deployment=False):
+    global api_key, openai_api_key, anthropic_api_key
+    if api_key == None:
+        raise Exception("Must set Horizon API key.")
+    headers = {"Content-Type": "application/json", "X-Api-Key": api_key}
+    payload = {
+        "deployments": deployments,
+        "openai_api_key": openai_api_key,
+        "anthropic_api_key": anthropic_api_key,
+        "log_deployment": log_deployment,
+    }
+    response = _post(endpoint="/api/tasks/deploy_batch", json=payload, headers=headers)
+    return response
+
+
 def upload_evaluation_dataset(task_id, file_path):
     global api_key
     if api_key == None:
@@ -335,13 +384,44 @@ def upload_output_schema(task_id, file_path):
         return response
 
 
-def view_deployment_logs(task_id):
+# Export deployment logs of task to a file and return url to download it. Optionally filter by ISO 8601 start and end times,
+# and export as "csv" or "parquet"
+def view_deployment_logs(task_id, start_time=None, end_time=None, file_format="csv"):
     global api_key
     if api_key == None:
         raise Exception("Must set Horizon API key.")
     headers = {"X-Api-Key": api_key}
+    params = {"format": file_format}
+    if start_time:
+        params["start_time"] = start_time
+    if end_time:
+        params["end_time"] = end_time
     response = _get(
-        endpoint=f"/api/tasks/{task_id}/view_deployment_logs", headers=headers
+        endpoint=f"/api/tasks/{task_id}/view_deployment_logs?{urlencode(params)}",
+        headers=headers,
+    )
+    return response
+
+
+# Return a page of deployment logs of task in time order. Pass the next_cursor from the response to get the next page; it is
+# None once all logs have been returned
+def list_deployment_logs(
+    task_id, start_time=None, end_time=None, limit=100, cursor=None
+):
+    global api_key
+    if api_key == None:
+        raise Exception("Must set Horizon API key.")
+    headers = {"X-Api-Key": api_key}
+    params = {"limit": limit}
+    if start_time:
+        params["start_time"] = start_time
+    if end_time:
+        params["end_time"] = end_time
+    if cursor:
+        params["cursor"] = cursor
+    response = _get(
+        endpoint=f"/api/tasks/{task_id}/deployment_logs?{urlencode(params)}",
+        headers=headers,
     )
     return response
 
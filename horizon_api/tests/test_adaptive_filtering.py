@@ -6,6 +6,7 @@ from app.utilities.adaptive_filtering import adaptive_filtering
 from app.utilities.generation import user_objective
 from app.utilities.generation import few_shot
 from config import Config
+import numpy as np
 import pytest
 import pandas as pd
 
@@ -81,5 +82,59 @@ def test_adaptive_filtering():
     ), "Shortlisted different number of prompts than expected"
 
 
+def test_racing_elimination():
+    """Test that racing eliminates only statistically dominated prompt-model candidates with a realistic test set."""
+    # 40 test data points of varying difficulty; candidate 2 is close behind candidate 1 and candidates 3-5 trail by 0.1-0.2
+    num_data = 40
+    rng = np.random.default_rng(0)
+    difficulty = rng.normal(0, 0.08, num_data)
+    mean_inference_quality = {1: 0.85, 2: 0.84, 3: 0.75, 4: 0.7, 5: 0.65}
+    inference_evaluation_results = pd.DataFrame(
+        [
+            {
+                "prompt_model_id": prompt_model_id,
+                "evaluation_data_id": evaluation_data_id,
+                "inference_quality": np.clip(
+                    mean + difficulty[evaluation_data_id] + rng.normal(0, 0.03),
+                    0,
+                    1,
+                ),
+            }
+            for prompt_model_id, mean in mean_inference_quality.items()
+            for evaluation_data_id in range(num_data)
+        ]
+    )
+
+    # Confidence level is split across candidates and 20 mini-batches of 2 test data points
+    surviving_prompt_model_ids = adaptive_filtering.get_surviving_prompt_model_ids(
+        inference_evaluation_results=inference_evaluation_results,
+        prompt_model_id_list=[1, 2, 3, 4, 5],
+        num_shortlist=1,
+        delta=0.05 / (5 * 20),
+    )
+    assert surviving_prompt_model_ids == [1, 2]
+
+    # Dominated candidates are already eliminated after the first 10 test data points
+    surviving_prompt_model_ids = adaptive_filtering.get_surviving_prompt_model_ids(
+        inference_evaluation_results=inference_evaluation_results.loc[
+            inference_evaluation_results["evaluation_data_id"] < 10
+        ],
+        prompt_model_id_list=[1, 2, 3, 4, 5],
+        num_shortlist=1,
+        delta=0.05 / (5 * 20),
+    )
+    assert surviving_prompt_model_ids == [1, 2]
+
+    # No candidate is eliminated before minimum number of data points are evaluated
+    surviving_prompt_model_ids = adaptive_filtering.get_surviving_prompt_model_ids(
+        inference_evaluation_results=inference_evaluation_results.loc[
+            inference_evaluation_results["evaluation_data_id"] < 2
+        ],
+        prompt_model_id_list=[1, 2, 3, 4, 5],
+        num_shortlist=1,
+    )
+    assert surviving_prompt_model_ids == [1, 2, 3, 4, 5]
+
+
 if __name__ == "__main__":
     pytest.main()
@@ -0,0 +1,47 @@
+"""Test cache of API key hashes used for authentication."""
+
+from app.utilities.authentication.api_key_cache import ApiKeyCache
+import pytest
+
+
+def test_api_key_cache():
+    """Test that valid and invalid API key hashes are cached, evicted, and invalidated."""
+    api_key_cache = ApiKeyCache(max_entries=2, ttl_seconds=60, negative_ttl_seconds=60)
+    assert api_key_cache.get(api_key_hash="hash_1") == (False, None)
+
+    # Check that valid and invalid API key hashes are cached
+    api_key_cache.put(api_key_hash="hash_1", user_id="user_1")
+    api_key_cache.put(api_key_hash="invalid_hash", user_id=None)
+    assert api_key_cache.get(api_key_hash="hash_1") == (True, "user_1")
+    assert api_key_cache.get(api_key_hash="invalid_hash") == (True, None)
+
+    # Check that least recently used API key hash is evicted
+    api_key_cache.put(api_key_hash="hash_2", user_id="user_2")
+    api_key_cache.get(api_key_hash="hash_1")
+    api_key_cache.put(api_key_hash="hash_3", user_id="user_3")
+    assert api_key_cache.get(api_key_hash="hash_2") == (False, None)
+    assert api_key_cache.get(api_key_hash="hash_1") == (True, "user_1")
+
+    # Check that invalidated API key hash is no longer cached
+    api_key_cache.invalidate(api_key_hash="hash_1")
+    assert api_key_cache.get(api_key_hash="hash_1") == (False, None)
+
+    metrics = api_key_cache.get_metrics()
+    assert metrics["hits"] == 3
+    assert metrics["negative_hits"] == 1
+    assert metrics["misses"] == 3
+    assert metrics["hit_rate"] == 4 / 7
+
+
+def test_api_key_cache_expiry():
+    """Test that cached API key hashes expire after their time to live."""
+    api_key_cache = ApiKeyCache(ttl_seconds=0, negative_ttl_seconds=0)
+    api_key_cache.put(api_key_hash="hash_1", user_id="user_1")
+    api_key_cache.put(api_key_hash="invalid_hash", user_id=None)
+    assert api_key_cache.get(api_key_hash="hash_1") == (False, None)
+    assert api_key_cache.get(api_key_hash="invalid_hash") == (False, None)
+    assert api_key_cache.get_metrics()["entries"] == 0
+
+
+if __name__ == "__main__":
+    pytest.main()
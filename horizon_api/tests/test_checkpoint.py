@@ -0,0 +1,86 @@
+"""Test task generation checkpoints."""
+
+from app.models.component.prompt_model_candidates import PromptModelCandidates
+from app.models.component.inference_evaluation_results import (
+    InferenceEvaluationResults,
+    InferenceEvaluationResultsLog,
+)
+from app.models.prompt.factory import PromptTemplateFactory
+from app.utilities.run.checkpoint import TaskGenerationCheckpoint
+import pytest
+
+
+def test_checkpoint(tmp_path):
+    """Test that stage state round trips through local checkpoint store and is scoped to task generation inputs."""
+    checkpoint = TaskGenerationCheckpoint(
+        task_id=1,
+        fingerprint_data={"user_objective": "generate a marketing email"},
+        backend="local",
+        local_directory=str(tmp_path),
+    )
+    assert checkpoint.load_stage(name="stage_1_generation", task_request=None) is None
+
+    # Save stage with zero-shot prompt-model candidates and inference and evaluation results
+    prompt_object = PromptTemplateFactory.create_prompt_template(
+        "prompt",
+        template="Write an email about {var_product}",
+        input_variables=["var_product"],
+    )
+    prompt_model_candidates = PromptModelCandidates(
+        prompt_model_id_list=[1],
+        generation_id_list=["[user_objective]"],
+        prompt_prefix_list=["Write an email"],
+        prompt_object_list=[prompt_object],
+        model_object_list=[None],
+    )
+    inference_evaluation_results = InferenceEvaluationResults(
+        prompt_model_id_list=[1], evaluation_data_id_list=[5, 6], stage_id="stage_1"
+    )
+    inference_evaluation_results["output"] = ["Hello", "Hi"]
+    inference_evaluation_results["inference_quality"] = [0.9, 0.8]
+    checkpoint.save_stage(
+        name="stage_1_generation",
+        prompt_model_candidates=prompt_model_candidates,
+        starting_prompt_model_id=2,
+        inference_evaluation_results=InferenceEvaluationResultsLog.from_dataframe(
+            inference_evaluation_results
+        ),
+    )
+
+    # Check that stage state is restored
+    (
+        restored_prompt_model_candidates,
+        starting_prompt_model_id,
+        restored_inference_evaluation_results,
+    ) = checkpoint.load_stage(name="stage_1_generation", task_request=None)
+    assert starting_prompt_model_id == 2
+    assert restored_prompt_model_candidates["prompt_model_id"].to_list() == [1]
+    assert (
+        restored_prompt_model_candidates["prompt_object"].iloc[0].template
+        == prompt_object.template
+    )
+    restored_inference_evaluation_results = (
+        restored_inference_evaluation_results.to_dataframe()
+    )
+    assert restored_inference_evaluation_results["output"].to_list() == ["Hello", "Hi"]
+    assert restored_inference_evaluation_results["inference_quality"].to_list() == [
+        0.9,
+        0.8,
+    ]
+
+    # Check that runs with different inputs do not share checkpoints
+    other_checkpoint = TaskGenerationCheckpoint(
+        task_id=1,
+        fingerprint_data={"user_objective": "summarize a document"},
+        backend="local",
+        local_directory=str(tmp_path),
+    )
+    assert other_checkpoint.load(name="stage_1_generation") is None
+
+    # Check that deleting removes all checkpoints of the task
+    other_checkpoint.delete()
+    assert checkpoint.load(name="stage_1_generation") is None
+
+
+if __name__ == "__main__":
+    pytest.main()
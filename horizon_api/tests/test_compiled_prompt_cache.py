@@ -0,0 +1,52 @@
+"""Test cache of prompts compiled for deployment."""
+
+from app.deploy import compiled_prompt_cache
+from app.deploy.compiled_prompt_cache import CompiledPrompt, CompiledPromptCache
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+
+
+def test_compiled_prompt_cache(monkeypatch):
+    """Test that compiled prompts are reused until prompt is updated or invalidated, and evicted in LRU order."""
+    compiled_prompt_ids = []
+
+    def compile_prompt(prompt, task):
+        compiled_prompt_ids.append(prompt.id)
+        return CompiledPrompt(
+            prompt_object=None, model_name="gpt-3.5-turbo", model_params={}
+        )
+
+    monkeypatch.setattr(compiled_prompt_cache, "compile_prompt", compile_prompt)
+    cache = CompiledPromptCache(max_entries=2)
+    prompt_1 = SimpleNamespace(id=1, updated_at=datetime(2023, 6, 1))
+    prompt_2 = SimpleNamespace(id=2, updated_at=datetime(2023, 6, 1))
+    prompt_3 = SimpleNamespace(id=3, updated_at=datetime(2023, 6, 1))
+
+    # Check that compiled prompt is reused for same prompt version
+    compiled_prompt = cache.get_or_compile(prompt=prompt_1, task=None)
+    assert cache.get_or_compile(prompt=prompt_1, task=None) is compiled_prompt
+    assert compiled_prompt_ids == [1]
+
+    # Check that updating prompt causes recompilation
+    prompt_1.updated_at = datetime(2023, 6, 2)
+    assert cache.get_or_compile(prompt=prompt_1, task=None) is not compiled_prompt
+    assert compiled_prompt_ids == [1, 1]
+
+    # Check that invalidation causes recompilation
+    cache.invalidate(prompt_id=1)
+    cache.get_or_compile(prompt=prompt_1, task=None)
+    assert compiled_prompt_ids == [1, 1, 1]
+
+    # Check that least recently used prompt is evicted
+    cache.get_or_compile(prompt=prompt_2, task=None)
+    cache.get_or_compile(prompt=prompt_1, task=None)
+    cache.get_or_compile(prompt=prompt_3, task=None)
+    cache.get_or_compile(prompt=prompt_1, task=None)
+    cache.get_or_compile(prompt=prompt_2, task=None)
+    assert compiled_prompt_ids == [1, 1, 1, 2, 3, 2]
+    assert cache.hits == 3
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,57 @@
+"""Test single-pass validation and parsing of evaluation datasets."""
+
+from app.utilities.dataset_processing import data_check
+import io
+import pytest
+
+
+def get_sample_dataset_file(rows: list) -> io.StringIO:
+    """Returns text stream of csv with given rows."""
+    return io.StringIO("\n".join(rows) + "\n", newline="")
+
+
+def test_get_evaluation_dataset():
+    """Test that evaluation dataset is validated and parsed column by column in a single pass."""
+    rows = ["product,email"] + [f'"product {i}, {{new}}",email {i}' for i in range(15)]
+    evaluation_dataset = data_check.get_evaluation_dataset(
+        dataset_file=get_sample_dataset_file(rows), validate=True
+    )
+    assert evaluation_dataset.columns.to_list() == [
+        "var_product",
+        "ground_truth",
+        "evaluation_data_id",
+    ]
+    assert len(evaluation_dataset) == 15
+    assert evaluation_dataset["evaluation_data_id"].to_list() == list(range(15))
+    assert evaluation_dataset["var_product"].str.endswith("{{new}}").all()
+
+
+@pytest.mark.parametrize(
+    "rows, error",
+    [
+        (["product,email", "a,b"], "at least 15 rows"),
+        (["product name,email"] + [f"a {i},b" for i in range(15)], "Input variable"),
+        (["product,email"] + [f"a {i},b" for i in range(15)] + ["a 0,b"], "duplicate"),
+        (["product,email"] + [f"a {i},b" for i in range(15)] + ["a,b,c"], "each"),
+    ],
+)
+def test_iterate_evaluation_dataset_rows(rows, error):
+    """Test that invalid evaluation datasets are rejected while streaming through them."""
+    with pytest.raises(AssertionError, match=error):
+        for _ in data_check.iterate_evaluation_dataset_rows(
+            dataset_file=get_sample_dataset_file(rows)
+        ):
+            pass
+
+
+def test_get_evaluation_dataset_empty():
+    """Test that an empty evaluation dataset is rejected whether or not it is validated."""
+    for validate in [True, False]:
+        with pytest.raises(AssertionError, match="at least 1 row"):
+            data_check.get_evaluation_dataset(
+                dataset_file=io.StringIO("", newline=""), validate=validate
+            )
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,56 @@
+"""Test profiles of evaluation datasets stored per dataset version."""
+
+from app.utilities.dataset_processing.dataset_profile import get_dataset_profile
+from app.utilities.S3.object_store import LocalObjectStore
+import pandas as pd
+import pytest
+
+
+def get_sample_dataset(num_rows: int) -> bytes:
+    """Returns csv contents of evaluation dataset with given number of rows."""
+    rows = ["product,email"] + [
+        f"product {i},Buy product {{{i}}} today" for i in range(num_rows)
+    ]
+    return ("\n".join(rows) + "\n").encode("UTF-8")
+
+
+def test_dataset_profile(tmp_path):
+    """Test that dataset profile is computed once per dataset version and then loaded from storage."""
+    object_store = LocalObjectStore(directory=str(tmp_path))
+    object_store.put(key="evaluation_datasets/1/data.csv", data=get_sample_dataset(20))
+
+    # Check that profile is computed and stored on first use
+    profile = get_dataset_profile(
+        raw_dataset_s3_key="evaluation_datasets/1/data.csv", object_store=object_store
+    )
+    assert profile.input_variables == ["var_product"]
+    assert profile.num_rows == 20
+    assert "text-davinci-003" in profile.applicable_llms
+    assert len(object_store.list_keys(prefix="dataset_profiles/")) == 2
+
+    # Check that stored profile is loaded with the same processed dataset and segmentation
+    stored_profile = get_dataset_profile(
+        raw_dataset_s3_key="evaluation_datasets/1/data.csv", object_store=object_store
+    )
+    assert stored_profile.max_input_tokens == profile.max_input_tokens
+    assert stored_profile.applicable_llms == profile.applicable_llms
+    assert (
+        stored_profile.get_evaluation_dataset_segments()
+        == profile.get_evaluation_dataset_segments()
+    )
+    pd.testing.assert_frame_equal(
+        stored_profile.get_evaluation_dataset(), profile.get_evaluation_dataset()
+    )
+    assert "{{" in stored_profile.get_evaluation_dataset()["ground_truth"].iloc[0]
+
+    # Check that a new version of the dataset gets a new profile
+    object_store.put(key="evaluation_datasets/1/data.csv", data=get_sample_dataset(30))
+    new_profile = get_dataset_profile(
+        raw_dataset_s3_key="evaluation_datasets/1/data.csv", object_store=object_store
+    )
+    assert new_profile.num_rows == 30
+    assert len(object_store.list_keys(prefix="dataset_profiles/")) == 4
+
+
+if __name__ == "__main__":
+    pytest.main()
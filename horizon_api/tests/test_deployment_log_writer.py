@@ -0,0 +1,122 @@
+"""Test background writer of deployment logs."""
+
+from app.models.llm.factory import LLMFactory
+from app.utilities.logging.deployment_log_writer import (
+    DeploymentLogWriter,
+    get_deployment_log_values,
+)
+from app.utilities.logging.metrics_reporter import get_metrics
+from datetime import datetime
+from flask import Flask
+import json
+import threading
+import pytest
+
+
+def get_sample_pending_deployment_log_values(task_id: int) -> dict:
+    """Returns log values of a deployment whose token usage was reported by the llm provider."""
+    return {
+        "task_id": task_id,
+        "prompt_id": 1,
+        "timestamp": datetime.utcnow(),
+        "model_name": "gpt-3.5-turbo",
+        "input_values": {"product": "shoes"},
+        "llm_completion": "Buy our shoes",
+        "inference_latency": 0.5,
+        "prompt_data_length": 100,
+        "completion_data_length": 20,
+    }
+
+
+def test_get_deployment_log_values():
+    """Test that costs are computed from token counts of pending deployment log values."""
+    deployment_log_values = get_deployment_log_values(
+        pending_deployment_log_values=get_sample_pending_deployment_log_values(
+            task_id=1
+        )
+    )
+    assert deployment_log_values["data_unit"] == "token"
+    assert deployment_log_values["prompt_cost"] == LLMFactory.get_prompt_cost(
+        model_name="gpt-3.5-turbo", prompt_data_length=100
+    )
+    assert deployment_log_values["total_inference_cost"] == (
+        deployment_log_values["prompt_cost"] + deployment_log_values["completion_cost"]
+    )
+
+
+def test_deployment_log_writer():
+    """Test that queued logs are written in batches and that logs are dropped once the queue is full."""
+    written_batches = []
+    write_started = threading.Event()
+    allow_write = threading.Event()
+
+    def write(pending_deployment_log_values_list):
+        write_started.set()
+        allow_write.wait(timeout=10)
+        written_batches.append(pending_deployment_log_values_list)
+        return True
+
+    deployment_log_writer = DeploymentLogWriter(
+        app=None, max_queue_size=2, flush_max_rows=2, flush_interval_ms=10
+    )
+    deployment_log_writer.write = write
+
+    # Block writer on first log, then fill queue
+    assert deployment_log_writer.enqueue(get_sample_pending_deployment_log_values(1))
+    assert write_started.wait(timeout=10)
+    assert deployment_log_writer.enqueue(get_sample_pending_deployment_log_values(2))
+    assert deployment_log_writer.enqueue(get_sample_pending_deployment_log_values(3))
+    assert not deployment_log_writer.enqueue(
+        get_sample_pending_deployment_log_values(4)
+    )
+
+    # Check that remaining logs are written in a single batch once writer is unblocked
+    allow_write.set()
+    assert deployment_log_writer.flush(timeout=10)
+    assert [[values["task_id"] for values in batch] for batch in written_batches] == [
+        [1],
+        [2, 3],
+    ]
+
+    metrics = deployment_log_writer.get_metrics()
+    assert metrics["num_enqueued"] == 3
+    assert metrics["num_dropped"] == 1
+    assert metrics["max_queue_depth"] == 2
+    assert metrics["queue_depth"] == 0
+
+
+def test_enqueue_many_synchronous():
+    """Test that a batch of logs is written with a single bulk insert when writing synchronously."""
+    written_batches = []
+
+    deployment_log_writer = DeploymentLogWriter(app=None, asynchronous=False)
+    deployment_log_writer.write = lambda pending_deployment_log_values_list: (
+        written_batches.append(pending_deployment_log_values_list) or True
+    )
+
+    assert (
+        deployment_log_writer.enqueue_many(
+            [get_sample_pending_deployment_log_values(i) for i in range(3)]
+        )
+        == 3
+    )
+    assert deployment_log_writer.enqueue_many([]) == 0
+    assert [[values["task_id"] for values in batch] for batch in written_batches] == [
+        [0, 1, 2]
+    ]
+    assert deployment_log_writer.get_metrics()["num_enqueued"] == 3
+
+
+def test_get_metrics():
+    """Test that metrics of the deployment log writer and API key cache are reported as a JSON-serializable dict."""
+    app = Flask(__name__)
+    assert "deployment_log_writer" not in get_metrics(app=app)
+
+    app.extensions["deployment_log_writer"] = DeploymentLogWriter(app=app)
+    metrics = json.loads(json.dumps(get_metrics(app=app)))
+    assert metrics["deployment_log_writer"]["num_enqueued"] == 0
+    assert "hit_rate" in metrics["api_key_cache"]
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -69,6 +69,85 @@ def test_evaluation():
     for index, row in inference_evaluation_results.iterrows():
         assert row["inference_quality"] != np.NaN
         assert row["evaluation_latency"] != np.NaN
+        assert -1 <= row["inference_quality"] <= 1
+
+
+def test_streaming_evaluation():
+    """Test that streaming inference and evaluation populates the same results as running them in sequence."""
+    # Create the TaskRequest instance
+    num_test_data = 2
+    task_request = TaskRequest(
+        user_objective="generate a marketing email",
+        dataset_file_path="./data/email_gen_demo.csv",
+        num_test_data_input=num_test_data,
+    )
+
+    # Create the OpenAI instance
+    openai_instance = LLMFactory().create_llm(
+        "gpt-3.5-turbo",
+        model_name="gpt-3.5-turbo",
+        temperature=0.4,
+        max_tokens=task_request.max_ground_truth_tokens,
+        openai_api_key=Config.HORIZON_OPENAI_API_KEY,
+    )
+
+    # Generate prompts using prompt generation user objective method
+    num_prompts = 3
+    prompt_model_candidates = user_objective.prompt_generation_user_objective(
+        task_request=task_request,
+        model_object=openai_instance,
+        num_prompts=num_prompts,
+        starting_prompt_model_id=1,
+        openai_api_key=Config.HORIZON_OPENAI_API_KEY,
+    )
+
+    # Run inference and evaluation together
+    inference_evaluation_results = evaluation.run_inference_and_evaluation(
+        task_request=task_request,
+        prompt_model_candidates=prompt_model_candidates,
+        train_or_test_dataset="test",
+        stage_id="[test_streaming_evaluation]",
+        openai_api_key=Config.HORIZON_OPENAI_API_KEY,
+    )
+
+    # Check that evaluation results are populated
+    assert len(inference_evaluation_results) == num_prompts * num_test_data
+    for index, row in inference_evaluation_results.iterrows():
+        assert not np.isnan(row["inference_quality"])
+        assert not np.isnan(row["evaluation_latency"])
+        assert -1 <= row["inference_quality"] <= 1
+
+
+def test_streaming_evaluation_inference_error(monkeypatch):
+    """Test that an inference error is raised even if stopping the evaluator also fails."""
+
+    class FailingEvaluator:
+        def __init__(self, **kwargs):
+            pass
+
+        def submit(self, **kwargs):
+            pass
+
+        def close(self):
+            raise RuntimeError("evaluation failed")
+
+    def run_inference(**kwargs):
+        raise RuntimeError("inference failed")
+
+    monkeypatch.setattr(
+        evaluation.cosine_similarity,
+        "StreamingCosineSimilarityEvaluator",
+        FailingEvaluator,
+    )
+    monkeypatch.setattr(evaluation.inference, "run_inference", run_inference)
+    with pytest.raises(RuntimeError, match="inference failed"):
+        evaluation.run_inference_and_evaluation(
+            task_request=None,
+            prompt_model_candidates=None,
+            train_or_test_dataset="test",
+            stage_id="[test_streaming_evaluation_inference_error]",
+            openai_api_key=None,
+        )
 
 
 if __name__ == "__main__":
@@ -62,6 +62,9 @@ def test_inference():
         assert row["output"] != np.NaN
         assert row["inference_latency"] != np.NaN
 
+    # Check that wall-clock time for the whole stage is reported
+    assert inference_evaluation_results.attrs["inference_wall_clock_time"] > 0
+
 
 if __name__ == "__main__":
     pytest.main()
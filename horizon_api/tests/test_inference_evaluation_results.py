@@ -0,0 +1,73 @@
+"""Test inference and evaluation results data structures."""
+
+from app.models.component.inference_evaluation_results import (
+    InferenceEvaluationResults,
+    InferenceEvaluationResultsLog,
+)
+import pytest
+
+
+def test_inference_evaluation_results_log():
+    """Test that appended blocks of results are kept in order as the log grows past its initial capacity."""
+    inference_evaluation_results_log = InferenceEvaluationResultsLog(initial_capacity=2)
+    for stage_id, prompt_model_id_list in [("stage_1", [1, 2]), ("stage_2", [3])]:
+        inference_evaluation_results = InferenceEvaluationResults(
+            prompt_model_id_list=prompt_model_id_list,
+            evaluation_data_id_list=[5, 6],
+            stage_id=stage_id,
+        )
+        inference_evaluation_results["output"] = [
+            f"output {i}" for i in range(len(inference_evaluation_results))
+        ]
+        inference_evaluation_results["inference_quality"] = 0.5
+        inference_evaluation_results_log.append(inference_evaluation_results)
+    assert len(inference_evaluation_results_log) == 6
+    assert inference_evaluation_results_log.get_capacity() >= 6
+
+    # Check that DataFrame view has all rows in order
+    aggregated_inference_evaluation_results = (
+        inference_evaluation_results_log.to_dataframe()
+    )
+    assert aggregated_inference_evaluation_results["prompt_model_id"].to_list() == [
+        1,
+        1,
+        2,
+        2,
+        3,
+        3,
+    ]
+    assert (
+        aggregated_inference_evaluation_results["evaluation_data_id"].to_list()
+        == [
+            5,
+            6,
+        ]
+        * 3
+    )
+    assert (
+        aggregated_inference_evaluation_results["stage_id"].to_list()
+        == ["stage_1"] * 4 + ["stage_2"] * 2
+    )
+    assert aggregated_inference_evaluation_results["output"].iloc[4] == "output 0"
+
+    # Check that extending with another log appends its rows
+    other_inference_evaluation_results_log = InferenceEvaluationResultsLog()
+    other_inference_evaluation_results_log.extend(inference_evaluation_results_log)
+    other_inference_evaluation_results_log.extend(inference_evaluation_results_log)
+    assert len(other_inference_evaluation_results_log) == 12
+    assert (
+        other_inference_evaluation_results_log.to_dataframe()[
+            "inference_quality"
+        ].mean()
+        == 0.5
+    )
+
+    # Check that blocks missing columns are rejected
+    with pytest.raises(ValueError):
+        inference_evaluation_results_log.append(
+            aggregated_inference_evaluation_results[["prompt_model_id"]]
+        )
+
+
+if __name__ == "__main__":
+    pytest.main()
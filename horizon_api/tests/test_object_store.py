@@ -0,0 +1,91 @@
+"""Test local object store backend and in-memory read cache of objects."""
+
+from app.utilities.S3 import s3_util
+from app.utilities.S3.object_store import LocalObjectStore, ObjectReadCache
+import io
+import os
+import pytest
+
+
+def test_local_object_store(tmp_path):
+    """Test that objects can be written, read by range, listed, and deleted."""
+    object_store = LocalObjectStore(directory=str(tmp_path))
+    object_store.put(key="datasets/1/data.csv", data=b"a,b\n1,2\n")
+    object_store.put(key="datasets/2/data.csv", data=io.BytesIO(b"c\n3\n"))
+
+    # Check full and ranged reads
+    data, etag = object_store.get(key="datasets/1/data.csv")
+    assert data == b"a,b\n1,2\n"
+    assert object_store.head(key="datasets/1/data.csv") == etag
+    with object_store.open(key="datasets/1/data.csv", start=4, end=6) as file:
+        assert file.read() == b"1,2"
+    assert object_store.get(key="datasets/3/data.csv") == (None, None)
+
+    # Check listing and deletion
+    assert object_store.list_keys(prefix="datasets/") == [
+        "datasets/1/data.csv",
+        "datasets/2/data.csv",
+    ]
+    object_store.delete(key="datasets/2/data.csv")
+    assert object_store.list_keys(prefix="datasets/") == ["datasets/1/data.csv"]
+
+    # Check that keys cannot point outside of base directory
+    with pytest.raises(ValueError):
+        object_store.get(key="../outside.csv")
+
+
+def test_object_read_cache(tmp_path):
+    """Test that cached objects are served from memory until they change, and that large objects are not cached."""
+    object_store = LocalObjectStore(directory=str(tmp_path))
+    object_read_cache = ObjectReadCache(max_bytes=100, max_object_bytes=10)
+    object_store.put(key="small", data=b"v1")
+    object_store.put(key="large", data=b"x" * 20)
+
+    # Check that small object is cached and large object is not
+    assert object_read_cache.read(object_store=object_store, key="small")[0] == b"v1"
+    assert object_read_cache.read(object_store=object_store, key="small")[0] == b"v1"
+    assert object_read_cache.read(object_store=object_store, key="large")[0] == (
+        b"x" * 20
+    )
+    metrics = object_read_cache.get_metrics()
+    assert metrics["hits"] == 1
+    assert metrics["entries"] == 1
+
+    # Check that changed object is downloaded again
+    object_store.put(key="small", data=b"v2!")
+    assert object_read_cache.read(object_store=object_store, key="small")[0] == b"v2!"
+    assert object_read_cache.get_metrics()["num_bytes"] == 3
+
+
+def test_s3_directory(tmp_path, monkeypatch):
+    """Test that downloading and deleting a directory does not touch sibling directories sharing its name as a prefix."""
+    object_store = LocalObjectStore(directory=str(tmp_path / "objects"))
+    monkeypatch.setattr(s3_util, "get_object_store", lambda: object_store)
+    object_store.put(key="vector_stores/task_id_1/index.bin", data=b"1")
+    object_store.put(key="vector_stores/task_id_10/index.bin", data=b"10")
+
+    # Check that only files of the directory are downloaded
+    temp_directory = s3_util.download_directory_from_s3_and_save_locally(
+        s3_directory="vector_stores/task_id_1"
+    )
+    assert os.listdir(temp_directory) == ["index.bin"]
+    with open(os.path.join(temp_directory, "index.bin"), "rb") as file:
+        assert file.read() == b"1"
+
+    # Check that only files of the directory are deleted
+    s3_util.delete_directory_from_s3(s3_directory="vector_stores/task_id_1/")
+    assert object_store.list_keys(prefix="vector_stores/") == [
+        "vector_stores/task_id_10/index.bin"
+    ]
+
+    # Check that nothing is downloaded for a directory without files
+    assert (
+        s3_util.download_directory_from_s3_and_save_locally(
+            s3_directory="vector_stores/task_id_1/"
+        )
+        is None
+    )
+
+
+if __name__ == "__main__":
+    pytest.main()
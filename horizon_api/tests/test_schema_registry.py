@@ -0,0 +1,68 @@
+"""Test registry of Pydantic objects loaded from output schemas."""
+
+from app.utilities.output_schema import schema_registry
+from app.utilities.output_schema.schema_registry import PydanticSchemaRegistry
+import pytest
+
+PYDANTIC_MODEL_SOURCE = """from pydantic import BaseModel
+
+
+class OutputSchema(BaseModel):
+    {field}: str
+"""
+
+
+def test_pydantic_schema_registry(monkeypatch):
+    """Test that Pydantic objects are loaded once per ETag and reloaded when s3 object changes."""
+    s3_objects = {
+        "pydantic_models/1/schema.py": (
+            PYDANTIC_MODEL_SOURCE.format(field="subject").encode("UTF-8"),
+            '"etag-1"',
+        )
+    }
+    downloaded_keys = []
+
+    def download_file_and_etag_from_s3_to_memory(key):
+        downloaded_keys.append(key)
+        return s3_objects.get(key, (None, None))
+
+    monkeypatch.setattr(
+        schema_registry,
+        "download_file_and_etag_from_s3_to_memory",
+        download_file_and_etag_from_s3_to_memory,
+    )
+    monkeypatch.setattr(
+        schema_registry,
+        "get_etag_of_s3_object",
+        lambda key: s3_objects[key][1] if key in s3_objects else None,
+    )
+    registry = PydanticSchemaRegistry(max_entries=2)
+
+    # Check that Pydantic object is loaded with output parser and reused while ETag is unchanged
+    loaded_schema = registry.get(pydantic_model_s3_key="pydantic_models/1/schema.py")
+    assert (
+        loaded_schema.pydantic_object.parse_obj({"subject": "Hello"}).subject == "Hello"
+    )
+    assert "subject" in loaded_schema.output_format_instructions
+    assert (
+        registry.get(pydantic_model_s3_key="pydantic_models/1/schema.py")
+        is loaded_schema
+    )
+    assert downloaded_keys == ["pydantic_models/1/schema.py"]
+
+    # Check that overwritten s3 object is reloaded
+    s3_objects["pydantic_models/1/schema.py"] = (
+        PYDANTIC_MODEL_SOURCE.format(field="body").encode("UTF-8"),
+        '"etag-2"',
+    )
+    reloaded_schema = registry.get(pydantic_model_s3_key="pydantic_models/1/schema.py")
+    assert "body" in reloaded_schema.pydantic_object.__fields__
+    assert len(downloaded_keys) == 2
+
+    # Check that missing Pydantic model raises error
+    with pytest.raises(ValueError):
+        registry.get(pydantic_model_s3_key="pydantic_models/2/schema.py")
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,47 @@
+"""Test export of deployment logs."""
+
+from app.utilities.logging.task_logger import EXPORT_COLUMNS, write_logs_as_parquet
+from datetime import datetime
+import io
+import pyarrow.parquet as pq
+import pytest
+
+
+def get_sample_log(log_id: int, prompt_id: int = None) -> dict:
+    """Returns deployment log as read from the db, with all columns set."""
+    return {
+        "id": log_id,
+        "task_id": 1,
+        "prompt_id": prompt_id,
+        "timestamp": datetime(2023, 6, 1, 12, 0, log_id),
+        "model_name": "gpt-3.5-turbo",
+        "input_values": '{"product": "shoes"}',
+        "llm_completion": "Buy our shoes",
+        "inference_latency": 0.5,
+        "data_unit": "token",
+        "prompt_data_length": 100,
+        "completion_data_length": 20,
+        "prompt_cost": 0.0002,
+        "completion_cost": 0.00004,
+        "total_inference_cost": 0.00024,
+    }
+
+
+def test_write_logs_as_parquet():
+    """Test that a column that is null throughout the first page can hold values in later pages."""
+    log_pages = [
+        [get_sample_log(log_id=1), get_sample_log(log_id=2)],
+        [get_sample_log(log_id=3, prompt_id=7)],
+    ]
+    file = io.BytesIO()
+    write_logs_as_parquet(log_pages=iter(log_pages), file=file)
+
+    table = pq.read_table(io.BytesIO(file.getvalue()))
+    assert table.column_names == EXPORT_COLUMNS
+    assert table.num_rows == 3
+    assert table.column("prompt_id").to_pylist() == [None, None, 7]
+    assert table.column("timestamp").to_pylist()[2] == datetime(2023, 6, 1, 12, 0, 3)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -2,11 +2,15 @@
 
 import pytest
 import json
-from app.models.component import Task, User, Project
+from app.models.component import Task, User, Project, Prompt
+from app.models.component.task_deployment_log.task_deployment_log import (
+    TaskDeploymentLog,
+)
 from app import create_app, db
 import tempfile
 import csv
 import os
+from datetime import datetime
 
 
 @pytest.fixture
@@ -260,6 +264,181 @@ def test_delete_task(test_client):
         db.session.commit()
 
 
+def test_deploy_task_batch(test_client):
+    """Test API method to deploy batch returns per-deployment errors in order for tasks that cannot be deployed."""
+    with test_client.application.app_context():
+        # Create sample user
+        u = User(email="john@example.com", password="cat")
+        api_key = u.generate_new_api_key()
+        db.session.add(u)
+        db.session.commit()
+
+        # Create sample project
+        p = Project(name="Sample Project", user_id=u.id)
+        db.session.add(p)
+        db.session.commit()
+
+        # Create sample task without active prompt
+        t = Task(
+            name="Sample Task",
+            task_type="testing",
+            project_id=p.id,
+            allowed_models=json.dumps(["gpt-3.5-turbo"]),
+        )
+        db.session.add(t)
+        db.session.commit()
+
+        # Test the /api/tasks/deploy_batch endpoint (POST)
+        response = test_client.post(
+            "/api/tasks/deploy_batch",
+            headers={"X-Api-Key": api_key},
+            json={
+                "deployments": [
+                    {"task_id": t.id, "inputs": {"product": "shoes"}},
+                    {"task_id": 100, "inputs": {"product": "socks"}},
+                ],
+            },
+        )
+        data = json.loads(response.data)
+
+        assert response.status_code == 200
+        assert [result["task_id"] for result in data["results"]] == [t.id, 100]
+        assert data["results"][0]["error"] == "Active prompt not found for the task"
+        assert (
+            data["results"][1]["error"] == "Task not found or not associated with user"
+        )
+
+        # Test that malformed deployments are rejected
+        response = test_client.post(
+            "/api/tasks/deploy_batch",
+            headers={"X-Api-Key": api_key},
+            json={"deployments": [{"task_id": t.id}]},
+        )
+        assert response.status_code == 400
+
+        # Clean up
+        db.session.delete(t)
+        db.session.delete(p)
+        db.session.delete(u)
+        db.session.commit()
+
+
+def test_list_deployment_logs(test_client):
+    """Test API method to list deployment logs pages through logs in time order and filters by time range."""
+    with test_client.application.app_context():
+        # Create sample user, project, task, and prompt
+        u = User(email="john@example.com", password="cat")
+        api_key = u.generate_new_api_key()
+        db.session.add(u)
+        db.session.commit()
+        p = Project(name="Sample Project", user_id=u.id)
+        db.session.add(p)
+        db.session.commit()
+        t = Task(
+            name="Sample Task",
+            task_type="testing",
+            project_id=p.id,
+            allowed_models=json.dumps(["gpt-3.5-turbo"]),
+        )
+        db.session.add(t)
+        db.session.commit()
+        prompt = Prompt(name="Sample Prompt", task_id=t.id)
+        db.session.add(prompt)
+        db.session.commit()
+
+        # Create sample deployment logs, two of which share a timestamp
+        timestamps = [
+            datetime(2023, 6, 1, 12, 0, 0),
+            datetime(2023, 6, 1, 12, 0, 0),
+            datetime(2023, 6, 2, 12, 0, 0),
+            datetime(2023, 6, 3, 12, 0, 0),
+        ]
+        for i, timestamp in enumerate(timestamps):
+            db.session.add(
+                TaskDeploymentLog(
+                    task_id=t.id,
+                    prompt_id=prompt.id,
+                    timestamp=timestamp,
+                    model_name="gpt-3.5-turbo",
+                    input_values=json.dumps({"product": f"product {i}"}),
+                    llm_completion=f"completion {i}",
+                    inference_latency=0.5,
+                    data_unit="token",
+                    prompt_data_length=10,
+                    completion_data_length=5,
+                    prompt_cost=0.01,
+                    completion_cost=0.01,
+                    total_inference_cost=0.02,
+                )
+            )
+        db.session.commit()
+
+        # Test the /api/tasks/<task_id>/deployment_logs endpoint (GET) pages through all logs
+        completions = []
+        cursor = None
+        for _ in range(3):
+            query_string = {"limit": 3}
+            if cursor:
+                query_string["cursor"] = cursor
+            response = test_client.get(
+                f"/api/tasks/{t.id}/deployment_logs",
+                headers={"X-Api-Key": api_key},
+                query_string=query_string,
+            )
+            assert response.status_code == 200
+            data = json.loads(response.data)
+            completions += [log["llm_completion"] for log in data["deployment_logs"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+        assert completions == [f"completion {i}" for i in range(4)]
+
+        # Test time range filter
+        response = test_client.get(
+            f"/api/tasks/{t.id}/deployment_logs",
+            headers={"X-Api-Key": api_key},
+            query_string={
+                "start_time": "2023-06-01T12:00:01Z",
+                "end_time": "2023-06-03T12:00:00Z",
+            },
+        )
+        data = json.loads(response.data)
+        assert [log["llm_completion"] for log in data["deployment_logs"]] == [
+            "completion 2"
+        ]
+        assert data["next_cursor"] is None
+
+        # Test that invalid cursor is rejected
+        response = test_client.get(
+            f"/api/tasks/{t.id}/deployment_logs",
+            headers={"X-Api-Key": api_key},
+            query_string={"cursor": "not a cursor"},
+        )
+        assert response.status_code == 400
+
+        # Clean up
+        TaskDeploymentLog.query.delete()
+        db.session.delete(prompt)
+        db.session.delete(t)
+        db.session.delete(p)
+        db.session.delete(u)
+        db.session.commit()
+
+
+def test_format_server_sent_event():
+    """Test that deployment events are formatted as server-sent events."""
+    from app.routes.tasks import format_server_sent_event
+
+    assert (
+        format_server_sent_event({"event": "token", "token": "Hello"})
+        == 'event: token\ndata: {"token": "Hello"}\n\n'
+    )
+    assert (
+        format_server_sent_event({"event": "completion", "completion": "Hello world"})
+        == 'event: completion\ndata: {"completion": "Hello world"}\n\n'
+    )
+
+
 def test_upload_evaluation_datasets(test_client):
     """Test API method to upload evaluation dataset."""
     with test_client.application.app_context():
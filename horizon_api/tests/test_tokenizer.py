@@ -0,0 +1,35 @@
+"""Test batch token counting with cached encoders."""
+
+from app.utilities.tokenization import tokenizer
+import pytest
+
+
+def test_count_tokens_batch():
+    """Test that batch token counts match token counts of individual strings for each tokenizer."""
+    texts = ["", "Write a marketing email", "<var_product>: shoes\n<var_color>: red"]
+    for tokenizer_name in tokenizer.TOKENIZER_NAMES:
+        assert tokenizer.get_encoder(tokenizer_name) is tokenizer.get_encoder(
+            tokenizer_name
+        )
+        token_counts = tokenizer.count_tokens_batch(
+            texts=texts, tokenizer_name=tokenizer_name
+        )
+        assert token_counts.tolist() == [
+            tokenizer.count_tokens(text=text, tokenizer_name=tokenizer_name)
+            for text in texts
+        ]
+
+    # Check that max token counts are at least the token counts of each tokenizer
+    max_token_counts = tokenizer.count_max_tokens_batch(texts=texts)
+    for tokenizer_name in tokenizer.TOKENIZER_NAMES:
+        assert (
+            max_token_counts
+            >= tokenizer.count_tokens_batch(texts=texts, tokenizer_name=tokenizer_name)
+        ).all()
+
+    with pytest.raises(ValueError):
+        tokenizer.count_tokens(text="test", tokenizer_name="invalid")
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,98 @@
+"""Test local vector store."""
+
+from app.models.vector_stores.local import LocalVectorStore
+import pytest
+import numpy as np
+
+
+def embed_text(text: str) -> list:
+    """Returns deterministic bag-of-characters embedding for text."""
+    embedding = np.zeros(32, dtype=np.float32)
+    for character in text:
+        embedding[ord(character) % 32] += 1
+    return embedding.tolist()
+
+
+def embed_texts(texts: list) -> list:
+    """Returns deterministic bag-of-characters embedding for each text."""
+    return [embed_text(text) for text in texts]
+
+
+def create_vector_store(directory: str) -> LocalVectorStore:
+    """Creates local vector store with a small evaluation dataset."""
+    vector_db = LocalVectorStore(
+        directory=directory,
+        namespace="task_id_test",
+        embedding_function=embed_text,
+        embed_documents_function=embed_texts,
+        input_variables=["var_product"],
+        num_unique_data=4,
+    )
+    metadata = [
+        {"evaluation_data_id": i, "var_product": product, "ground_truth": f"email {i}"}
+        for i, product in enumerate(["shoes", "socks", "hats", "scarves"])
+    ]
+    vector_db.add_text_embeddings_and_metadata(
+        texts=[f"<var_product>: {record['var_product']}" for record in metadata],
+        metadata=metadata,
+    )
+    return vector_db
+
+
+def test_local_vector_store(tmp_path):
+    """Test adding, fetching, filtering, and persisting records in local vector store."""
+    directory = str(tmp_path / "task_id_test")
+    vector_db = create_vector_store(directory=directory)
+    assert vector_db.get_backend() == "local"
+
+    # Check that records are fetched by evaluation data id in the requested order
+    db_result = vector_db.get_data_per_evaluation_data_id(
+        evaluation_data_id_list=[2, 0], include_ground_truth_in_metadata=False
+    )
+    assert [record["var_product"] for record in db_result["metadata"]] == [
+        "hats",
+        "shoes",
+    ]
+    assert all("ground_truth" not in record for record in db_result["metadata"])
+    assert len(db_result["embeddings"][0]) == 32
+
+    # Check that filter statement excludes records
+    examples = vector_db.max_marginal_relevance_search(
+        query="<var_product>: socks",
+        k=2,
+        filter_statement={"evaluation_data_id": {"$nin": [1, 3]}},
+    )
+    assert len(examples) == 2
+    assert all(example["evaluation_data_id"] in [0, 2] for example in examples)
+
+    # Check that records and ground truth embeddings persist across instances
+    vector_db.set_ground_truth_embeddings(
+        evaluation_data_id_list=[0, 1, 2, 3],
+        ground_truth_embeddings=np.array(
+            embed_texts([f"email {i}" for i in range(4)]), dtype=np.float32
+        ),
+    )
+    reloaded_vector_db = LocalVectorStore(
+        directory=directory,
+        namespace="task_id_test",
+        embedding_function=embed_text,
+    )
+    assert (
+        reloaded_vector_db.similarity_search("<var_product>: hats", k=1)[0].metadata[
+            "var_product"
+        ]
+        == "hats"
+    )
+    assert np.allclose(
+        reloaded_vector_db.get_ground_truth_embeddings(evaluation_data_id_list=[3, 1]),
+        embed_texts(["email 3", "email 1"]),
+    )
+
+    # Check that deleting namespace removes records
+    reloaded_vector_db.delete_namespace()
+    with pytest.raises(ValueError):
+        reloaded_vector_db.get_data_per_evaluation_data_id(evaluation_data_id_list=[0])
+
+
+if __name__ == "__main__":
+    pytest.main()